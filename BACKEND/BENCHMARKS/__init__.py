@@ -0,0 +1,2 @@
+# Руководство к файлу
+# Назначение: объявляет пакет VKMax.BACKEND.BENCHMARKS (ручные бенчмарки производительности).
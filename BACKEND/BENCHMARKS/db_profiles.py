@@ -0,0 +1,120 @@
+# Руководство к файлу (BENCHMARKS/db_profiles.py)
+# Назначение:
+# - Сравнение профилей движка БД (baseline vs tuned) из DATABASE/session.py.
+# - Нагрузка: N конкурентных писателей (INSERT + commit) и M читателей (SELECT count/последние строки)
+#   поверх отдельного временного файла SQLite либо переданного URL Postgres.
+# Использование:
+# - PYTHONPATH=. python -m BACKEND.BENCHMARKS.db_profiles
+# - PYTHONPATH=. python -m BACKEND.BENCHMARKS.db_profiles --url postgresql+asyncpg://... --seconds 10
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from BACKEND.DATABASE.session import EngineSettings, create_engine_for_url
+
+
+@dataclass
+class ProfileResult:
+    profile: str
+    writes: int = 0
+    reads: int = 0
+    errors: int = 0
+    write_latency_ms: List[float] = field(default_factory=list)
+    read_latency_ms: List[float] = field(default_factory=list)
+
+    def summary(self, seconds: float) -> Dict[str, float]:
+        def p(values: List[float], q: float) -> float:
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        return {
+            "writes/s": round(self.writes / seconds, 1),
+            "reads/s": round(self.reads / seconds, 1),
+            "errors": self.errors,
+            "write_p50_ms": round(statistics.median(self.write_latency_ms), 2) if self.write_latency_ms else 0.0,
+            "write_p99_ms": round(p(self.write_latency_ms, 0.99), 2),
+            "read_p50_ms": round(statistics.median(self.read_latency_ms), 2) if self.read_latency_ms else 0.0,
+            "read_p99_ms": round(p(self.read_latency_ms, 0.99), 2),
+        }
+
+
+async def _run_profile(url: str, settings: EngineSettings, *, writers: int, readers: int, seconds: float) -> ProfileResult:
+    engine = create_engine_for_url(url, settings)
+    result = ProfileResult(profile=settings.profile)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS bench_ops"))
+        await conn.execute(
+            text("CREATE TABLE bench_ops (id INTEGER PRIMARY KEY, status VARCHAR(32), payload TEXT)")
+        )
+
+    deadline = time.perf_counter() + seconds
+    counter = iter(range(1, 10**9))
+
+    async def writer() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        text("INSERT INTO bench_ops (id, status, payload) VALUES (:id, 'queued', :payload)"),
+                        {"id": next(counter), "payload": "x" * 256},
+                    )
+                result.writes += 1
+                result.write_latency_ms.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                result.errors += 1
+
+    async def reader() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT id, status FROM bench_ops ORDER BY id DESC LIMIT 20"))
+                    await conn.execute(text("SELECT count(*) FROM bench_ops WHERE status = 'queued'"))
+                result.reads += 1
+                result.read_latency_ms.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                result.errors += 1
+
+    await asyncio.gather(*(writer() for _ in range(writers)), *(reader() for _ in range(readers)))
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS bench_ops"))
+    await engine.dispose()
+    return result
+
+
+async def main(url: Optional[str], *, writers: int, readers: int, seconds: float) -> None:
+    base = EngineSettings.from_env()
+    for profile in ("baseline", "tuned"):
+        if url:
+            target = url
+        else:
+            tmp_dir = tempfile.mkdtemp(prefix="vkmax-bench-")
+            target = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.sqlite3')}"
+        res = await _run_profile(target, replace(base, profile=profile), writers=writers, readers=readers, seconds=seconds)
+        print(profile, res.summary(seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение профилей движка БД VKMax")
+    parser.add_argument("--url", default=None, help="URL БД (по умолчанию временный SQLite-файл)")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, writers=args.writers, readers=args.readers, seconds=args.seconds))
@@ -0,0 +1,114 @@
+# Руководство к файлу (BENCHMARKS/import_profile.py)
+# Назначение:
+# - Профиль холодного старта по `python -X importtime`: для каждой роли процесса (api, bot,
+#   convert) импортирует её точку входа в чистом интерпретаторе несколько раз и печатает
+#   суммарное время импорта (минимум и медиана), самые дорогие модули (cumulative) и то,
+#   какие тяжёлые библиотеки (reportlab, mammoth, pdf2docx, fitz, selectolax, bs4, networkx,
+#   matplotlib, ...) оказались загружены.
+# - --check: код выхода 1, если точка входа api или bot тянет тяжёлую библиотеку — регрессия
+#   ленивых импортов (CONVERT/__init__.py, webparser_service, converters).
+# Использование:
+# - PYTHONPATH=.:BACKEND/WebParser python -m BACKEND.BENCHMARKS.import_profile [--runs 5] [--top 15] [--check]
+# - --warmup ROLES: дополнительно замерить CONVERT.warmup.warmup(ROLES) после импорта
+#   (например, api,convert,crawl; пул cpu_pool не запускается).
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+TARGETS: Dict[str, str] = {
+    "api": "BACKEND.FAST_API.fast_api",
+    "bot": "BACKEND.BOT.run_bot",
+    "convert": "BACKEND.CONVERT",
+}
+
+HEAVY = (
+    "reportlab",
+    "mammoth",
+    "pdf2docx",
+    "fitz",
+    "docx",
+    "pdfkit",
+    "selectolax",
+    "bs4",
+    "lxml",
+    "tldextract",
+    "networkx",
+    "matplotlib",
+    "playwright",
+)
+
+# Роли, которым тяжёлые библиотеки при импорте не нужны
+LIGHT_ROLES = ("api", "bot")
+
+
+def _profile(module: str, warmup_role: Optional[str]) -> Tuple[int, List[Tuple[int, str]]]:
+    """(суммарное время импорта, мкс; [(cumulative мкс, модуль)]) одного холодного запуска."""
+
+    code = f"import {module}"
+    if warmup_role:
+        code += f"; from BACKEND.CONVERT.warmup import parse_roles, warmup; warmup(*parse_roles({warmup_role!r}), prestart_pool=False)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "VKMAX_LOG_LEVEL": "WARNING"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows: List[Tuple[int, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.rstrip()))
+    # Модули верхнего уровня (без отступа) в сумме дают всё время импорта
+    total = sum(us for us, name in rows if not name.startswith("  "))
+    return total, rows
+
+
+def report(role: str, module: str, runs: int, top: int, warmup_role: Optional[str]) -> List[str]:
+    totals = []
+    rows: List[Tuple[int, str]] = []
+    for _ in range(runs):
+        total, rows = _profile(module, warmup_role)
+        totals.append(total)
+    loaded = sorted({name.strip().split(".")[0] for _, name in rows} & set(HEAVY))
+    label = f"{role} (+warmup {warmup_role})" if warmup_role else role
+    print(f"== {label}: import {module}")
+    print(f"   total: min {min(totals) / 1000:.0f} мс, median {statistics.median(totals) / 1000:.0f} мс ({runs} runs)")
+    print(f"   heavy: {', '.join(loaded) or '-'}")
+    for us, name in sorted(rows, reverse=True)[:top]:
+        print(f"   {us / 1000:8.1f} мс  {name.strip()}")
+    return loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Профиль импорта VKMax по ролям процесса")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--roles", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--warmup", default=None, help="роли CONVERT.warmup после импорта (api,convert,crawl)")
+    parser.add_argument("--check", action="store_true", help="ошибка, если api/bot импортируют тяжёлые библиотеки")
+    args = parser.parse_args()
+
+    failed = []
+    for role in args.roles:
+        loaded = report(role, TARGETS[role], args.runs, args.top, None)
+        if role in LIGHT_ROLES and loaded:
+            failed.append(f"{role}: {', '.join(loaded)}")
+        if args.warmup:
+            report(role, TARGETS[role], args.runs, args.top, args.warmup)
+    if args.check and failed:
+        print("heavy imports at startup: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
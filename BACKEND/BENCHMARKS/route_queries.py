@@ -0,0 +1,66 @@
+# Руководство к файлу (BENCHMARKS/route_queries.py)
+# Назначение:
+# - Бюджет SQL-запросов для list-маршрутов: наполняет временную SQLite-БД N файлами
+#   и операциями и печатает число запросов/время БД на маршрут (DATABASE/instrumentation.py).
+# - Рост числа запросов с N указывает на N+1 — удобно сравнивать в CI между коммитами.
+# Использование:
+# - PYTHONPATH=.:BACKEND/WebParser python -m BACKEND.BENCHMARKS.route_queries --items 50
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+
+async def main(items: int) -> None:
+    from httpx import ASGITransport, AsyncClient
+
+    from BACKEND.DATABASE.alembic import create_tables, seed_formats
+    from BACKEND.DATABASE.session import async_session_factory
+    from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager, UserManager
+    from BACKEND.FAST_API.config import settings
+    from BACKEND.FAST_API.fast_api import app
+
+    settings.debug = True
+    await create_tables()
+    await seed_formats()
+
+    async with async_session_factory() as session:
+        user = await UserManager(session).create_user(max_id="bench-user", name="Bench")
+        user_id = int(user.id)
+        fm = FilesManager(session)
+        cm = ConvertManager(session)
+        for i in range(items):
+            f = await fm.create_file(
+                user_id=user_id, format_id=1, filename=f"bench-{i}.pdf", mime_type="application/pdf", path=None
+            )
+            await cm.create_file_operation(user_id=user_id, source_file_id=int(f.id), target_format_id=2)
+            await cm.create_website_operation(user_id=user_id, target_format_id=4)
+        await session.commit()
+
+    routes = [
+        f"/files?user_id={user_id}&limit=100",
+        f"/operations?user_id={user_id}",
+        f"/websites/history?user_id={user_id}",
+        f"/users/{user_id}/operations",
+        "/formats",
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for path in routes:
+            resp = await client.get(path)
+            print(
+                f"{path:45s} status={resp.status_code} queries={resp.headers.get('X-DB-Query-Count')} "
+                f"db_ms={resp.headers.get('X-DB-Time-Ms')}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Число SQL-запросов на list-маршруты VKMax")
+    parser.add_argument("--items", type=int, default=50)
+    args = parser.parse_args()
+    if not os.getenv("VKMAX_DATABASE_URL"):
+        tmp_dir = tempfile.mkdtemp(prefix="vkmax-bench-")
+        os.environ["VKMAX_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.sqlite3')}"
+    asyncio.run(main(args.items))
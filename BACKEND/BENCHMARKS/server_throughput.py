@@ -0,0 +1,142 @@
+# Руководство к файлу (BENCHMARKS/server_throughput.py)
+# Назначение:
+# - Пропускная способность HTTP-сервера VKMax (requests/s, p50/p99) для трёх профилей запуска:
+#   baseline — один процесс uvicorn, asyncio + h11 (как прежний запуск без uvloop/httptools);
+#   single   — один процесс FAST_API/server.py, uvloop + httptools;
+#   prefork  — FAST_API/server.py с --workers N (предзагрузка приложения до fork).
+# - Нагрузка — лёгкий HTTP/1.1-клиент на asyncio-потоках (keep-alive), в нескольких процессах,
+#   чтобы клиент не был узким местом; маршруты /health и /formats (кэшированный JSON).
+# Использование:
+# - PYTHONPATH=.:BACKEND/WebParser python -m BACKEND.BENCHMARKS.server_throughput --workers 4
+# Важно:
+# - Сервер и клиент делят машину: на малом числе ядер prefork упирается в CPU клиента.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    "baseline": {"VKMAX_SERVER_LOOP": "asyncio", "VKMAX_SERVER_HTTP": "h11"},
+    "single": {"VKMAX_SERVER_LOOP": "auto", "VKMAX_SERVER_HTTP": "auto"},
+    "prefork": {"VKMAX_SERVER_LOOP": "auto", "VKMAX_SERVER_HTTP": "auto"},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _connection(port: int, path: str, until: float, latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    try:
+        while time.perf_counter() < until:
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+def _client(port: int, path: str, connections: int, seconds: float, out: "multiprocessing.Queue[List[float]]") -> None:
+    latencies: List[float] = []
+
+    async def run() -> None:
+        until = time.perf_counter() + seconds
+        await asyncio.gather(*(_connection(port, path, until, latencies) for _ in range(connections)))
+
+    asyncio.run(run())
+    out.put(latencies)
+
+
+def _wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                if s.recv(12).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def _load(port: int, path: str, clients: int, connections: int, seconds: float) -> Tuple[float, float, float]:
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_client, args=(port, path, connections, seconds, out)) for _ in range(clients)]
+    for p in procs:
+        p.start()
+    latencies = sorted(x for _ in procs for x in out.get())
+    for p in procs:
+        p.join()
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return len(latencies) / seconds, p50, p99
+
+
+def run_profile(name: str, workers: int, args: argparse.Namespace, env: Dict[str, str]) -> None:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "BACKEND.FAST_API.server", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers if name == "prefork" else 1)]
+    server = subprocess.Popen(cmd, env={**env, **PROFILES[name]}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        _load(port, "/formats", 1, 4, 1.0)  # прогрев: кэш /formats, соединения БД
+        for path in args.paths:
+            rps, p50, p99 = _load(port, path, args.clients, args.connections, args.seconds)
+            print(f"{name:9s} {path:10s} {rps:9.0f} req/s  p50={p50:6.2f} мс  p99={p99:6.2f} мс")
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="requests/s VKMax API по профилям запуска")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=2, help="процессов нагрузки")
+    parser.add_argument("--connections", type=int, default=32, help="соединений на процесс")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--paths", nargs="+", default=["/health", "/formats"])
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="vkmax_bench_") as tmp:
+        env = {
+            **os.environ,
+            "VKMAX_DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.sqlite3",
+            "VKMAX_STORAGE_DIR": f"{tmp}/storage",
+            "VKMAX_LOG_LEVEL": "WARNING",
+            "VKMAX_WEBHOOK_WORKER": "off",
+        }
+        subprocess.run(
+            [sys.executable, "-c", "import asyncio; from BACKEND.DATABASE.alembic import create_tables, seed_formats; asyncio.run(create_tables()); asyncio.run(seed_formats())"],
+            env=env,
+            check=True,
+        )
+        for name in args.profiles:
+            run_profile(name, args.workers, args, env)
+
+
+if __name__ == "__main__":
+    main()
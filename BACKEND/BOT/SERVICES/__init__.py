@@ -4,15 +4,27 @@
   - vkmax_api — клиент к HTTP‑слою VKMax (FAST_API);
   - max_api — обёртка над platform-api.max.ru (при необходимости);
   - state — FSM‑состояния;
-  - mapping — вспомогательные функции маппинга пользователей.
+  - mapping — вспомогательные функции маппинга пользователей;
+  - webhook_receiver — приём подписанных вебхуков VKMax (события вместо поллинга);
+    импортируется при первом обращении (aiohttp.web нужен только при VKMAX_BOT_WEBHOOK_URL).
 """
 
+import importlib
+from typing import Any
+
 from . import max_api, mapping, state, vkmax_api
 
+
+def __getattr__(name: str) -> Any:
+    if name == "webhook_receiver":
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     "max_api",
     "mapping",
     "state",
     "vkmax_api",
+    "webhook_receiver",
 ]
 
@@ -1,14 +1,19 @@
 """Руководство к файлу (BACKEND/BOT/SERVICES/vkmax_api.py)
 Назначение:
 - HTTP‑клиент к FAST_API‑слою VKMax для использования из чат‑бота.
-- Реализует запросы к /stats, /formats, /supported-conversions, /files и др.
+- Реализует запросы к /stats, /formats, /supported-conversions, /files, /webhooks и др.
+- Справочники (/formats, /supported-conversions) запрашиваются с учётом HTTP-кэша:
+  в пределах Cache-Control max-age ответ берётся из памяти, после — If-None-Match,
+  и на 304 сервер не пересылает тело.
 """
 
 from __future__ import annotations
 
 import os
+import re
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Mapping, Optional
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 import httpx
 
@@ -36,6 +41,8 @@ class VkmaxApiClient:
             base_url=config.fastapi_base_url,
             admin_token=admin_token,
         )
+        # path -> (ETag, свежо до (monotonic), тело)
+        self._validated: Dict[str, Tuple[str, float, Any]] = {}
 
     async def _request(
         self,
@@ -61,6 +68,28 @@ class VkmaxApiClient:
         resp.raise_for_status()
         return resp.json()
 
+    async def _get_cached(self, path: str) -> Any:
+        """GET справочника с учётом Cache-Control max-age и ETag ответа."""
+
+        cached = self._validated.get(path)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[2]
+        headers = {"If-None-Match": cached[0]} if cached is not None else {}
+
+        async with httpx.AsyncClient(base_url=self._cfg.base_url, timeout=self._cfg.timeout) as client:
+            resp = await client.get(path, headers=headers)
+        if resp.status_code == 304 and cached is not None:
+            data = cached[2]
+        else:
+            resp.raise_for_status()
+            data = resp.json()
+        etag = resp.headers.get("etag")
+        if etag:
+            max_age = re.search(r"max-age=(\d+)", resp.headers.get("cache-control", ""))
+            fresh_until = time.monotonic() + (int(max_age.group(1)) if max_age else 0)
+            self._validated[path] = (etag, fresh_until, data)
+        return data
+
     async def get_stats(self) -> Mapping[str, Any]:
         """Вернуть агрегированную статистику сервиса (/stats)."""
 
@@ -69,14 +98,14 @@ class VkmaxApiClient:
     async def list_formats(self) -> list[Dict[str, Any]]:
         """Вернуть список форматов из /formats."""
 
-        data = await self._request("GET", "/formats")
+        data = await self._get_cached("/formats")
         assert isinstance(data, list)
         return data  # список словарей FormatItem
 
     async def list_supported_conversions(self) -> Mapping[str, Any]:
         """Вернуть матрицу поддерживаемых конверсий из /supported-conversions."""
 
-        data = await self._request("GET", "/supported-conversions")
+        data = await self._get_cached("/supported-conversions")
         assert isinstance(data, dict)
         return data
 
@@ -125,6 +154,17 @@ class VkmaxApiClient:
         assert isinstance(data, dict)
         return data
 
+    async def register_webhook(self, *, url: str, secret: str, events: Optional[list[str]] = None) -> Mapping[str, Any]:
+        """Зарегистрировать приёмник событий бота через POST /webhooks (все пользователи, admin‑токен).
+
+        Повторная регистрация того же url обновляет секрет и фильтр событий.
+        """
+
+        payload: Dict[str, Any] = {"url": url, "secret": secret, "events": events or ["operation.*", "batch.finished"]}
+        data = await self._request("POST", "/webhooks", json=payload, use_admin=True)
+        assert isinstance(data, dict)
+        return data
+
 
 # Глобальный экземпляр клиента по умолчанию.
 client = VkmaxApiClient()
\ No newline at end of file
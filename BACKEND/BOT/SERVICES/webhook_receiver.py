@@ -0,0 +1,133 @@
+"""Руководство к файлу (BACKEND/BOT/SERVICES/webhook_receiver.py)
+Назначение:
+- Приём исходящих вебхуков VKMax (operation.<статус>, batch.finished): бот узнаёт о
+  завершении операций сразу, без поллинга /operations, и пишет пользователю в чат.
+- Поднимает небольшой aiohttp-сервер (VKMAX_BOT_WEBHOOK_HOST/PORT) на пути из
+  VKMAX_BOT_WEBHOOK_URL и при старте регистрирует этот адрес в VKMax (POST /webhooks
+  без user_id — события всех пользователей, нужен VKMAX_ADMIN_TOKEN).
+- Проверяет подпись X-VKMax-Signature (HMAC-SHA256 секретом адреса, тот же алгоритм,
+  что у CONVERT/webhook_dispatcher.sign_payload) и отбрасывает повторы по events[].id.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+
+logger = logging.getLogger("vkmax.bot.webhooks")
+
+SIGNATURE_HEADER = "X-VKMax-Signature"
+
+_STATUS_TEXT = {
+    "completed": "готова",
+    "failed": "завершилась ошибкой",
+    "cancelled": "отменена",
+    "timed_out": "прервана по таймауту",
+    "dead_letter": "не выполнена после нескольких попыток",
+}
+
+
+def verify_signature(secret: str, body: bytes, header: str, *, tolerance_sec: float = 300.0) -> bool:
+    """Подпись вида t=<unix>,v1=<hex>: HMAC от "<t>." + тело, метка не старше tolerance_sec."""
+
+    try:
+        parts = dict(item.split("=", 1) for item in (header or "").split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_sec:
+        return False
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, parts.get("v1", ""))
+
+
+def format_event(event: Dict[str, Any]) -> Optional[str]:
+    """Текст сообщения пользователю по событию; None — событие боту не интересно."""
+
+    data = event.get("data") or {}
+    kind = event.get("type") or ""
+    if kind.startswith("operation."):
+        status = data.get("status") or kind.split(".", 1)[1]
+        text = f"Операция {data.get('operation_id')} {_STATUS_TEXT.get(status, status)}."
+        if status == "completed" and data.get("result_file_id") is not None:
+            text += f" Файл результата: {data['result_file_id']}."
+        elif data.get("error_message"):
+            text += f"\nПричина: {data['error_message']}"
+        return text
+    if kind == "batch.finished":
+        counts = ", ".join(f"{k}: {v}" for k, v in sorted((data.get("counts") or {}).items()))
+        return f"Пакет {data.get('batch_id')} завершён ({data.get('status')}). {counts}".strip()
+    return None
+
+
+class WebhookReceiver:
+    """aiohttp-приёмник вебхуков VKMax, пересылающий события в чат MAX."""
+
+    def __init__(self, bot: Any, *, url: str, secret: str, host: str = "0.0.0.0", port: int = 8081, seen_limit: int = 10_000) -> None:
+        self.bot = bot
+        self.url = url
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = urlparse(url).path or "/"
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._seen_limit = seen_limit
+        self._runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    def _first_time(self, event_id: str) -> bool:
+        if event_id in self._seen:
+            return False
+        self._seen[event_id] = None
+        if len(self._seen) > self._seen_limit:
+            self._seen.popitem(last=False)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not verify_signature(self.secret, body, request.headers.get(SIGNATURE_HEADER, "")):
+            logger.warning("[webhook_receiver.handle] bad signature from %s", request.remote)
+            return web.json_response({"ok": False}, status=401)
+        try:
+            events = json.loads(body).get("events") or []
+        except (ValueError, AttributeError):
+            return web.json_response({"ok": False}, status=400)
+        for event in events:
+            if not self._first_time(str(event.get("id"))):
+                continue
+            text = format_event(event)
+            data = event.get("data") or {}
+            # Бот создаёт операции с MAX user_id; max_id — если пользователь заведён через мини-аппу
+            target = data.get("max_id") or data.get("user_id")
+            if text is None or target is None:
+                continue
+            try:
+                await self.bot.send_message(text, user_id=int(target))
+            except Exception as exc:  # noqa: WPS430
+                # Повтор доставки не поможет (пользователь не найден, бот заблокирован) — 200
+                logger.warning("[webhook_receiver.handle] send to %s failed: %s", target, exc)
+        return web.json_response({"ok": True})
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("[webhook_receiver.start] listening on %s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -19,11 +19,17 @@ class BotConfig:
     - bot_token: токен бота MAX (обязателен для запуска).
     - fastapi_base_url: базовый URL HTTP‑API VKMax (FAST_API).
     - debug: флаг детализированного логирования.
+    - webhook_url: публичный адрес приёмника вебхуков VKMax (пусто — приёмник выключен).
+    - webhook_secret / webhook_host / webhook_port: секрет подписи и адрес aiohttp-сервера.
     """
 
     bot_token: str
     fastapi_base_url: str
     debug: bool = False
+    webhook_url: str = ""
+    webhook_secret: str = ""
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8081
 
 
 def load_config() -> BotConfig:
@@ -33,6 +39,9 @@ def load_config() -> BotConfig:
     - VKMAX_BOT_TOKEN — токен бота MAX.
     - VKMAX_FASTAPI_BASE_URL — базовый URL FastAPI (по умолчанию http://localhost:8000).
     - VKMAX_BOT_DEBUG — включает debug‑режим ("1", "true", "yes").
+    - VKMAX_BOT_WEBHOOK_URL — адрес, на который VKMax шлёт события (например, http://bot:8081/vkmax/events).
+    - VKMAX_BOT_WEBHOOK_SECRET — секрет подписи (пусто — случайный на каждый запуск).
+    - VKMAX_BOT_WEBHOOK_HOST / VKMAX_BOT_WEBHOOK_PORT — где слушает приёмник (0.0.0.0:8081).
     """
 
     bot_token = os.getenv("VKMAX_BOT_TOKEN", "")
@@ -42,10 +51,19 @@ def load_config() -> BotConfig:
     )
     debug = os.getenv("VKMAX_BOT_DEBUG", "false").lower() in {"1", "true", "yes"}
 
+    try:
+        webhook_port = int(os.getenv("VKMAX_BOT_WEBHOOK_PORT", "8081"))
+    except ValueError:
+        webhook_port = 8081
+
     return BotConfig(
         bot_token=bot_token,
         fastapi_base_url=fastapi_base_url,
         debug=debug,
+        webhook_url=os.getenv("VKMAX_BOT_WEBHOOK_URL", ""),
+        webhook_secret=os.getenv("VKMAX_BOT_WEBHOOK_SECRET", ""),
+        webhook_host=os.getenv("VKMAX_BOT_WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=webhook_port,
     )
 
 
@@ -2,18 +2,27 @@
 Назначение:
 - Точка входа для запуска бота VKMax на платформе MAX.
 - Создаёт экземпляр aiomax.Bot, подключает роутеры и настраивает логирование.
+- При VKMAX_BOT_WEBHOOK_URL поднимает приёмник вебхуков VKMax и регистрирует его
+  (SERVICES/webhook_receiver.py): о готовых операциях бот пишет пользователю сам.
 - Вызывается командой `python -m BACKEND.BOT.run_bot` или аналогом.
+- Приёмник вебхуков (aiohttp.web) импортируется, только если он включён.
 """
 
 from __future__ import annotations
 
+import secrets
 import sys
+from typing import TYPE_CHECKING
 
 import aiomax
 
 from .confg import config
 from .logging_config import logger, setup_logging
 from .ROUTERS import auth, convert, download, files, format as format_router, system, user
+from .SERVICES.vkmax_api import client as vkmax_client
+
+if TYPE_CHECKING:
+    from .SERVICES.webhook_receiver import WebhookReceiver
 
 
 def create_bot() -> aiomax.Bot:
@@ -39,9 +48,36 @@ def create_bot() -> aiomax.Bot:
     bot.add_router(system.router)
     bot.add_router(auth.router)
 
+    if config.webhook_url:
+        _attach_webhook_receiver(bot)
+
     return bot
 
 
+def _attach_webhook_receiver(bot: aiomax.Bot) -> WebhookReceiver:
+    """Запускает приёмник вебхуков вместе с ботом и регистрирует его адрес в VKMax."""
+
+    from .SERVICES.webhook_receiver import WebhookReceiver
+
+    receiver = WebhookReceiver(
+        bot,
+        url=config.webhook_url,
+        secret=config.webhook_secret or secrets.token_hex(32),
+        host=config.webhook_host,
+        port=config.webhook_port,
+    )
+
+    @bot.on_ready()
+    async def _start_receiver() -> None:
+        await receiver.start()
+        try:
+            await vkmax_client.register_webhook(url=receiver.url, secret=receiver.secret)
+        except Exception as exc:  # noqa: WPS430
+            logger.error("Не удалось зарегистрировать вебхук бота в VKMax: %s", exc)
+
+    return receiver
+
+
 def main() -> None:
     """Точка входа: настраивает логирование и запускает long polling бота."""
 
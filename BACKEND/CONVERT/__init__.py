@@ -2,51 +2,79 @@
 # Назначение:
 # - Объявляет пакет VKMax.BACKEND.CONVERT и экспортирует основные сущности
 #   конвертеров и сервисов (конвертация, графы, WebParser, логирование).
+# Важно:
+# - Экспорт ленивый (PEP 562, __getattr__): `import BACKEND.CONVERT` и импорт одного
+#   подмодуля (например, CONVERT.job_dispatcher) не тянут остальные сервисы; модуль
+#   загружается при первом обращении к его имени. Тяжёлые библиотеки (reportlab, mammoth,
+#   pdf2docx, fitz, стек WebParser) импортируются внутри функций, которые их используют;
+#   заранее их подгружает CONVERT/warmup.py.
+# - job_dispatcher, eta_estimator и progress_bus — одновременно подмодули и экземпляры:
+#   атрибут пакета всегда экземпляр, даже если подмодуль импортирован напрямую
+#   (import BACKEND.CONVERT.job_dispatcher) раньше обращения через пакет.
 
 from __future__ import annotations
 
-from .converters import (
-    ConversionError,
-    ConversionResult,
-    SUPPORTED_INPUT_FORMATS,
-    SUPPORTED_OUTPUT_FORMATS,
-    convert_docx_to_pdf,
-    convert_pdf_to_docx,
-    convert_docx_to_docx,
-    convert_pdf_to_pdf,
-    extract_text_from_docx,
-    extract_text_from_pdf,
-    extract_plain_text,
-)
-from .conversion_service import run_file_conversion
-from .graph_service import generate_graph_for_operation
-from .webparser_service import (
-    enqueue_website_job,
-    get_website_status,
-    build_website_preview,
-    search_site_graph,
-    generate_site_pdf_from_bundle,
-)
-from .logging_config import setup_logging
-
-__all__ = [
-    "ConversionError",
-    "ConversionResult",
-    "SUPPORTED_INPUT_FORMATS",
-    "SUPPORTED_OUTPUT_FORMATS",
-    "convert_docx_to_pdf",
-    "convert_pdf_to_docx",
-    "convert_docx_to_docx",
-    "convert_pdf_to_pdf",
-    "extract_text_from_docx",
-    "extract_text_from_pdf",
-    "extract_plain_text",
-    "run_file_conversion",
-    "generate_graph_for_operation",
-    "enqueue_website_job",
-    "get_website_status",
-    "build_website_preview",
-    "search_site_graph",
-    "generate_site_pdf_from_bundle",
-    "setup_logging",
-]
+import importlib
+import sys
+import types
+from typing import Any, Dict
+
+# имя → подмодуль, из которого оно экспортируется
+_EXPORTS: Dict[str, str] = {
+    "ConversionError": "converters",
+    "ConversionResult": "converters",
+    "SUPPORTED_INPUT_FORMATS": "converters",
+    "SUPPORTED_OUTPUT_FORMATS": "converters",
+    "convert_docx_to_pdf": "converters",
+    "convert_pdf_to_docx": "converters",
+    "convert_docx_to_docx": "converters",
+    "convert_pdf_to_pdf": "converters",
+    "extract_text_from_docx": "converters",
+    "extract_text_from_pdf": "converters",
+    "extract_plain_text": "converters",
+    "CONVERTER_REGISTRY": "converters",
+    "get_converter": "converters",
+    "run_file_conversion": "conversion_service",
+    "generate_graph_for_operation": "graph_service",
+    "enqueue_website_job": "webparser_service",
+    "get_website_status": "webparser_service",
+    "build_website_preview": "webparser_service",
+    "search_site_graph": "webparser_service",
+    "generate_site_pdf_from_bundle": "webparser_service",
+    "setup_logging": "logging_config",
+    "track_stage": "progress",
+    "eta_estimator": "eta_estimator",
+    "progress_bus": "progress_bus",
+    "JobSpec": "job_dispatcher",
+    "job_dispatcher": "job_dispatcher",
+}
+
+# Экспорты, совпадающие с именем своего подмодуля
+_SINGLETONS = frozenset({"eta_estimator", "progress_bus", "job_dispatcher"})
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Система импорта после загрузки подмодуля кладёт его в атрибут пакета
+        if name in _SINGLETONS and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # следующее обращение — без __getattr__
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,130 @@
+# Руководство к файлу (CONVERT/cancellation.py)
+# Назначение:
+# - Общие средства отмены и жёстких таймаутов задач конвертации:
+#   * job_timeout(kind) — дедлайн выполнения задачи по типу (file / graph / website);
+#   * track_artifact(path) — сервис регистрирует создаваемый выходной файл, чтобы при
+#     отмене/таймауте JobDispatcher удалил недописанный результат;
+#   * remove_artifacts(paths) — удаление зарегистрированных файлов (ошибки логируются);
+#   * atomic_output(path) — результат пишется во временный файл рядом (<имя>.part-<hex>.<ext>)
+#     и переименовывается в *path* только целиком: упавший посреди записи процесс не оставит
+#     недописанный результат, повтор задачи просто перезапишет файл;
+#     sweep_partials(dir, older_than_sec) убирает временные файлы упавших процессов.
+# Важно:
+# - Реестр артефактов — contextvar задачи диспетчера: вне JobDispatcher.execute
+#   track_artifact ничего не делает.
+# - Дедлайн доходит до всех уровней через отмену asyncio: обход сайта (воркеры
+#   CrawlerOrchestrator), запросы httpx к LLM и ожидание cpu_pool.run_cpu (процесс
+#   с конвертацией завершается).
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+logger = logging.getLogger("vkmax.convert.cancellation")
+
+# Дедлайны по умолчанию (сек): конвертация файла, граф (извлечение + LLM), обход сайта
+DEFAULT_JOB_TIMEOUTS: Dict[str, float] = {"file": 600.0, "graph": 900.0, "website": 1800.0}
+
+_artifacts: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("vkmax_job_artifacts", default=None)
+
+
+def job_timeout(kind: str) -> float:
+    """Дедлайн задачи: VKMAX_JOB_TIMEOUT_<KIND>_SEC или DEFAULT_JOB_TIMEOUTS."""
+
+    default = DEFAULT_JOB_TIMEOUTS.get(kind, DEFAULT_JOB_TIMEOUTS["file"])
+    try:
+        value = float(os.getenv(f"VKMAX_JOB_TIMEOUT_{kind.upper()}_SEC", "") or 0)
+    except ValueError:
+        value = 0.0
+    return value if value > 0 else default
+
+
+def bind_artifacts(paths: List[str]) -> None:
+    """Связывает текущую задачу со списком, куда track_artifact складывает пути."""
+
+    _artifacts.set(paths)
+
+
+def track_artifact(path: str) -> None:
+    paths = _artifacts.get()
+    if paths is not None and path:
+        paths.append(path)
+
+
+def remove_artifacts(paths: Iterable[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            logger.warning("[cancellation.remove_artifacts] Failed to remove %s: %s", path, exc)
+    return removed
+
+
+_PARTIAL_RE = re.compile(r"\.part-[0-9a-f]{12}(\.|$)")
+
+
+def partial_path(path: str) -> str:
+    """Временный путь рядом с *path* с тем же расширением (конвертеры смотрят на суффикс)."""
+
+    head, tail = os.path.split(path)
+    stem, dot, ext = tail.partition(".")
+    return os.path.join(head, f"{stem}.part-{uuid.uuid4().hex[:12]}{dot}{ext}")
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """Отдаёт временный путь для записи результата и атомарно (os.replace) ставит его на место *path*.
+
+    Новый *path* регистрируется как артефакт задачи (удаляется при отмене); при ошибке
+    временный файл удаляется, существующий *path* остаётся нетронутым.
+    """
+
+    tmp = partial_path(path)
+    if not os.path.exists(path):
+        track_artifact(path)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        remove_artifacts([tmp])
+        raise
+
+
+def sweep_partials(directory: str, *, older_than_sec: float) -> int:
+    """Удаляет временные файлы atomic_output старше *older_than_sec* (остались от упавших процессов)."""
+
+    if not directory or not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - older_than_sec
+    stale: List[str] = []
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and _PARTIAL_RE.search(entry.name) and entry.stat().st_mtime < cutoff:
+                stale.append(entry.path)
+        except OSError:
+            continue
+    return remove_artifacts(stale)
+
+
+__all__ = [
+    "DEFAULT_JOB_TIMEOUTS",
+    "job_timeout",
+    "bind_artifacts",
+    "track_artifact",
+    "remove_artifacts",
+    "partial_path",
+    "atomic_output",
+    "sweep_partials",
+]
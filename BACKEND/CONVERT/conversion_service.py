@@ -2,12 +2,19 @@
 # Назначение:
 # - Сервис оркестрации файловых конверсий поверх низкоуровневых конвертеров
 #   (CONVERT/converters.py) и БД (AsyncSession, ConvertManager, FilesManager).
+# - Этапы (convert/render/db_write) пишутся в operation_events через track_stage.
+# - Конвертер берётся из CONVERTER_REGISTRY: тяжёлые выполняются в CPU-пуле (cpu_pool.run_cpu),
+#   тривиальные (копирование) — в потоке; event loop не блокируется.
 # - Не знает о FastAPI напрямую: принимает сессию БД и параметры как аргументы.
+# - Результат пишется через atomic_output (временный файл + os.replace): повтор операции
+#   после падения воркера идемпотентен.
 # Важно:
 # - Предполагается вызов из фонового воркера или BackgroundTasks по operation_id.
 
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
 import os
 from pathlib import Path
@@ -16,14 +23,11 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .converters import (
-    ConversionError,
-    ConversionResult,
-    convert_docx_to_docx,
-    convert_docx_to_pdf,
-    convert_pdf_to_docx,
-    convert_pdf_to_pdf,
-)
+from .cancellation import atomic_output
+from .converters import ConversionError, ConversionResult, get_converter
+from .cpu_pool import run_cpu
+from .progress import track_stage
+from .retry_policy import note_error
 from .webparser_service import generate_site_pdf_from_bundle
 from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager
 from BACKEND.DATABASE.models import File as FileModel, Format, Operation
@@ -104,6 +108,10 @@ async def run_file_conversion(
         file_id,
         new_format_id,
     )
+    await cm.update_status(operation_id, status="processing")
+    # Не держим write-транзакцию во время конвертации: в SQLite она блокирует
+    # параллельные операции пакета (блокировка на всю БД)
+    await session.commit()
 
     src: Optional[FileModel] = await fm.get_file(int(file_id))
     if src is None:
@@ -135,13 +143,15 @@ async def run_file_conversion(
             file_id,
         )
         try:
-            new_file_id = await generate_site_pdf_from_bundle(session, file_id=int(file_id), storage_dir=storage_dir)
+            async with track_stage(session, operation_id, "render", progress=90):
+                new_file_id = await generate_site_pdf_from_bundle(session, file_id=int(file_id), storage_dir=storage_dir)
         except Exception as exc:  # noqa: WPS430
             logger.exception(
                 "[conversion_service.run_file_conversion] generate_site_pdf_from_bundle failed for file_id=%s: %s",
                 file_id,
                 exc,
             )
+            note_error(exc)
             await cm.update_status(operation_id, status="failed", error_message=str(exc))
             return
 
@@ -190,16 +200,19 @@ async def run_file_conversion(
 
     try:
         result: ConversionResult
-        if src_ext == "docx" and dst_ext == "docx":
-            result = convert_docx_to_docx(src_path, dst_path)
-        elif src_ext == "docx" and dst_ext == "pdf":
-            result = convert_docx_to_pdf(src_path, dst_path)
-        elif src_ext == "pdf" and dst_ext == "pdf":
-            result = convert_pdf_to_pdf(src_path, dst_path)
-        elif src_ext == "pdf" and dst_ext == "docx":
-            result = convert_pdf_to_docx(src_path, dst_path)
-        else:
-            raise ConversionError(f"Unsupported conversion: {src_ext} -> {dst_ext}")
+        async with track_stage(session, operation_id, "convert", progress=80):
+            spec = get_converter(src_ext, dst_ext)
+            if spec is None:
+                raise ConversionError(f"Unsupported conversion: {src_ext} -> {dst_ext}")
+            # Конвертер пишет во временный файл, на место dst_path он встаёт только целиком:
+            # повтор после падения процесса не увидит недописанный результат
+            with atomic_output(dst_path) as tmp_path:
+                if spec.pool == "cpu":
+                    result = await run_cpu(spec.func, src_path, tmp_path)
+                else:
+                    # Копирование не занимает слот процессного пула (не ждёт pdf2docx)
+                    result = await asyncio.to_thread(spec.func, src_path, tmp_path)
+            result = dataclasses.replace(result, output_path=dst_path)
 
         logger.info(
             "[conversion_service.run_file_conversion] Conversion success op=%s %s->%s input=%s output=%s",
@@ -211,14 +224,15 @@ async def run_file_conversion(
         )
 
         # Создаём запись файла результата
-        new_file = await fm.create_file(
-            user_id=getattr(op, "user_id", None),
-            format_id=int(new_format_id),
-            filename=os.path.basename(result.output_path),
-            mime_type=None,
-            content_bytes=None,
-            path=result.output_path,
-        )
+        async with track_stage(session, operation_id, "db_write", progress=95):
+            new_file = await fm.create_file(
+                user_id=getattr(op, "user_id", None),
+                format_id=int(new_format_id),
+                filename=os.path.basename(result.output_path),
+                mime_type=None,
+                content_bytes=None,
+                path=result.output_path,
+            )
 
         await cm.update_status(
             operation_id,
@@ -236,9 +250,11 @@ async def run_file_conversion(
     except ConversionError as exc:
         msg = f"conversion failed: {exc}"
         logger.error("[conversion_service.run_file_conversion] %s", msg)
+        note_error(exc)
         await cm.update_status(operation_id, status="failed", error_message=msg)
     except Exception as exc:  # noqa: WPS430
         logger.exception("[conversion_service.run_file_conversion] Unexpected error for op=%s: %s", operation_id, exc)
+        note_error(exc)
         await cm.update_status(operation_id, status="failed", error_message=str(exc))
 
 
@@ -5,6 +5,8 @@
 # Важно:
 # - Все функции должны быть максимально лёгковесными по памяти.
 # - В LLM-пайплайнах извлекается не более 10 000 слов текста.
+# - CONVERTER_REGISTRY: (src, dst) → функция, пул исполнения и относительная стоимость
+#   (используется conversion_service и планировщиком job_dispatcher).
 
 from __future__ import annotations
 
@@ -12,7 +14,7 @@ import logging
 import shutil
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Set
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
 
 
 logger = logging.getLogger(__name__)
@@ -329,3 +331,33 @@ def extract_plain_text(input_path: str, input_format: str, max_words: int = 10_0
     if fmt == "pdf":
         return extract_text_from_pdf(input_path, max_words=max_words)
     raise ConversionError(f"Unsupported input format for text extraction: {input_format}")
+
+
+# ---------------------------------------------------------------------------
+# Реестр конвертеров
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class ConverterSpec:
+    """Описание конвертера для планировщика задач.
+
+    - pool — пул исполнения: "trivial" (копирование) или "cpu" (тяжёлый разбор/рендер);
+    - cost — относительная стоимость в условных секундах на 1 МБ входа (вес в fair-share).
+    """
+
+    func: Callable[..., ConversionResult]
+    pool: str
+    cost: float
+
+
+CONVERTER_REGISTRY: Dict[Tuple[str, str], ConverterSpec] = {
+    ("docx", "docx"): ConverterSpec(convert_docx_to_docx, pool="trivial", cost=0.1),
+    ("pdf", "pdf"): ConverterSpec(convert_pdf_to_pdf, pool="trivial", cost=0.1),
+    ("docx", "pdf"): ConverterSpec(convert_docx_to_pdf, pool="cpu", cost=3.0),
+    ("pdf", "docx"): ConverterSpec(convert_pdf_to_docx, pool="cpu", cost=15.0),
+}
+
+
+def get_converter(input_format: str, output_format: str) -> Optional[ConverterSpec]:
+    return CONVERTER_REGISTRY.get((_normalize_fmt(input_format), _normalize_fmt(output_format)))
@@ -0,0 +1,280 @@
+# Руководство к файлу (CONVERT/cpu_pool.py)
+# Назначение:
+# - Пул для CPU-тяжёлых синхронных конвертеров (pdf2docx, docx2pdf, извлечение текста),
+#   чтобы они не блокировали event loop и пакет из N файлов занимал все ядра.
+# - run_cpu(fn, *args) — await-обёртка над пулом процессов (spawn-контекст).
+# - Отмена: если ожидающая задача отменена (POST /operations/{id}/cancel, таймаут задачи),
+#   дочерний процесс с её работой завершается (terminate) и заменяется новым при
+#   следующем вызове — зависший pdf2docx не занимает ядро после отмены. Выхода процесса
+#   (join) ждём в потоке executor'а, а не в event loop.
+# Важно:
+# - Режим задаётся VKMAX_CPU_POOL: process (по умолчанию) | thread | inline.
+#   inline выполняет функцию прямо в event loop (отладка), thread — в потоках
+#   (GIL: параллелизма по CPU нет, но loop не блокируется).
+# - Размер пула — VKMAX_CPU_POOL_SIZE или os.cpu_count(); worker_concurrency() — общий
+#   лимит одновременных задач диспетчера (VKMAX_WORKER_CONCURRENCY, по умолчанию = пулу).
+# - fn и аргументы должны быть picklable: передаём функции уровня модуля и пути к файлам.
+# - ProcessPoolExecutor не умеет снимать уже начатую задачу, поэтому пул свой: процесс
+#   на слот, задание и результат идут через Pipe, ожидание — add_reader на сокете пайпа.
+#   В режиме thread отменяется только ожидание, сама функция дорабатывает в потоке.
+# - prestart(modules) запускает процессы пула заранее (CONVERT/warmup.py): каждый сразу
+#   импортирует библиотеки конвертеров, и первая конвертация не ждёт импорта. Процесс,
+#   заменивший убитый, стартует без прогрева — нужное подгрузит первая задача.
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable, List, Optional, Set, Tuple, TypeVar
+
+
+logger = logging.getLogger("vkmax.convert.cpu_pool")
+
+T = TypeVar("T")
+
+
+class WorkerCrashed(RuntimeError):
+    """Дочерний процесс пула умер посреди задачи (segfault, OOM killer)."""
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def pool_mode() -> str:
+    mode = (os.getenv("VKMAX_CPU_POOL", "") or "process").strip().lower()
+    return mode if mode in ("process", "thread", "inline") else "process"
+
+
+def pool_size() -> int:
+    try:
+        size = int(os.getenv("VKMAX_CPU_POOL_SIZE", "") or 0)
+    except ValueError:
+        size = 0
+    return size if size > 0 else (os.cpu_count() or 1)
+
+
+def worker_concurrency() -> int:
+    try:
+        value = int(os.getenv("VKMAX_WORKER_CONCURRENCY", "") or 0)
+    except ValueError:
+        value = 0
+    return value if value > 0 else pool_size()
+
+
+def _worker_main(conn: Connection, warm_modules: Tuple[str, ...] = ()) -> None:
+    """Цикл дочернего процесса: (fn, args) → (ok, результат | исключение); None — выход."""
+
+    for name in warm_modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass  # конвертер сообщит об отсутствующей библиотеке при вызове
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        fn, args = job
+        try:
+            conn.send((True, fn(*args)))
+        except BaseException as exc:  # noqa: WPS424 — исключение передаётся родителю
+            try:
+                conn.send((False, exc))
+            except Exception:
+                # Непиклируемое исключение — передаём текстом
+                conn.send((False, RuntimeError(repr(exc))))
+
+
+class _Worker:
+    def __init__(self, warm_modules: Tuple[str, ...] = ()) -> None:
+        ctx = multiprocessing.get_context("spawn")  # не наследуем event loop и соединения БД
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, tuple(warm_modules)), name="vkmax-cpu", daemon=True)
+        self.process.start()
+        child.close()
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        """SIGTERM без ожидания: выход процесса дожидается reap() вне event loop."""
+
+        self.process.terminate()
+        self.conn.close()
+
+    def reap(self, timeout: float = 5.0) -> None:
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+async def _recv(conn: Connection) -> Tuple[bool, Any]:
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    fd = conn.fileno()
+    loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        loop.remove_reader(fd)
+    return conn.recv()
+
+
+class _ProcessPool:
+    def __init__(self, size: int) -> None:
+        self.size = max(1, int(size))
+        self._idle: List[_Worker] = []
+        self._all: Set[_Worker] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reaping: Set["asyncio.Future[None]"] = set()
+        self.killed = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.size)
+            self._slots_loop = loop
+        return self._slots
+
+    def _take(self) -> _Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive():
+                return worker
+            self._all.discard(worker)
+        worker = _Worker()
+        self._all.add(worker)
+        return worker
+
+    def prestart(self, warm_modules: Tuple[str, ...]) -> int:
+        started = 0
+        while len(self._all) < self.size:
+            worker = _Worker(warm_modules)
+            self._all.add(worker)
+            self._idle.append(worker)
+            started += 1
+        return started
+
+    def _drop(self, worker: _Worker) -> None:
+        self._all.discard(worker)
+        worker.kill()
+        # join блокирует до 5 с — ждём процесс в потоке, ссылку держим до завершения
+        reaping = asyncio.get_running_loop().run_in_executor(None, worker.reap)
+        self._reaping.add(reaping)
+        reaping.add_done_callback(self._reaping.discard)
+
+    async def run(self, fn: Callable[..., T], args: Tuple[Any, ...]) -> T:
+        async with self._semaphore():
+            worker = self._take()
+            try:
+                worker.conn.send((fn, args))
+                ok, value = await _recv(worker.conn)
+            except asyncio.CancelledError:
+                self.killed += 1
+                logger.info("[cpu_pool.run] Cancelled %s: terminating worker pid=%s", getattr(fn, "__name__", fn), worker.process.pid)
+                self._drop(worker)
+                raise
+            except (EOFError, OSError) as exc:
+                self._drop(worker)
+                raise WorkerCrashed(f"cpu worker died (exitcode={worker.process.exitcode})") from exc
+            except BaseException:
+                self._drop(worker)
+                raise
+            self._idle.append(worker)
+        if ok:
+            return value
+        raise value
+
+    def shutdown(self) -> None:
+        for worker in list(self._all):
+            worker.stop()
+        self._all.clear()
+        self._idle.clear()
+
+
+_process_pool: Optional[_ProcessPool] = None
+
+
+def _get_process_pool() -> _ProcessPool:
+    global _process_pool
+    with _executor_lock:
+        if _process_pool is None:
+            _process_pool = _ProcessPool(pool_size())
+            logger.info("[cpu_pool._get_process_pool] Started process pool size=%s", _process_pool.size)
+        return _process_pool
+
+
+def prestart(warm_modules: Tuple[str, ...] = ()) -> int:
+    """Запускает недостающие процессы пула сейчас (только режим process); возвращает их число."""
+
+    if pool_mode() != "process":
+        return 0
+    return _get_process_pool().prestart(tuple(warm_modules))
+
+
+def killed_workers() -> int:
+    """Сколько процессов пула убито при отмене/таймауте (0, если пул не запускался)."""
+
+    return _process_pool.killed if _process_pool is not None else 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix="vkmax-cpu")
+            logger.info("[cpu_pool._get_executor] Started thread pool size=%s", pool_size())
+        return _executor
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """Выполняет синхронную fn(*args) в пуле и возвращает результат (исключения пробрасываются).
+
+    Отмена ожидающей корутины в режиме process завершает процесс, выполняющий fn.
+    """
+
+    mode = pool_mode()
+    if mode == "inline":
+        return fn(*args)
+    if mode == "process":
+        return await _get_process_pool().run(fn, args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+def shutdown() -> None:
+    global _executor, _process_pool
+    with _executor_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown()
+            _process_pool = None
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+__all__ = ["WorkerCrashed", "killed_workers", "pool_mode", "prestart", "run_cpu", "pool_size", "worker_concurrency", "shutdown"]
@@ -0,0 +1,384 @@
+# Руководство к файлу (CONVERT/eta_estimator.py)
+# Назначение:
+# - Оценка времени выполнения (estimated_time) и позиции в очереди (queue_position)
+#   для новых операций по истории длительностей из operation_events.
+# - История группируется по корзинам (исходный формат, целевой формат, размер файла,
+#   число страниц); в каждой корзине — потоковый квантильный скетч P² (p50/p90),
+#   память O(1) на корзину независимо от объёма истории.
+# Как считается ETA:
+# - время выполнения операции — p50 её корзины (с откатом на более грубые корзины,
+#   если в точной мало наблюдений, и на VKMAX_ETA_DEFAULT_SEC без истории);
+# - ожидание — сумма p50 операций впереди (queued целиком, processing — половина)
+#   делённая на число параллельных задач (cpu_pool.worker_concurrency()).
+# Важно:
+# - backlog() — глубина очереди и секунды до её разбора для admission control (FAST_API/rate_limit.py).
+# - Скетчи живут в памяти процесса и дочитывают новые события из БД инкрементально
+#   (курсор по id, не чаще раза в VKMAX_ETA_REFRESH_SEC), поэтому видят и чужие воркеры.
+# - Число страниц известно только для site_bundle-источников (site_pages); для
+#   документов и обхода сайтов страница-корзина "na".
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cpu_pool import worker_concurrency
+from BACKEND.DATABASE.models import File as FileModel, Format, Operation, OperationArchive, OperationEvent, SitePage
+
+
+logger = logging.getLogger("vkmax.convert.eta")
+
+ANY = "*"
+NA = "na"
+
+# Границы корзин по размеру файла (байты) и по числу страниц
+_SIZE_BOUNDS: Sequence[Tuple[int, str]] = (
+    (64 * 1024, "<64K"),
+    (256 * 1024, "<256K"),
+    (1024 * 1024, "<1M"),
+    (4 * 1024 * 1024, "<4M"),
+    (16 * 1024 * 1024, "<16M"),
+)
+_PAGE_BOUNDS: Sequence[Tuple[int, str]] = (
+    (10, "<=10"),
+    (50, "<=50"),
+    (200, "<=200"),
+    (1000, "<=1000"),
+)
+
+_MIN_SAMPLES = 3
+_HISTORY_DAYS = 30
+_HISTORY_LIMIT = 20_000
+_MAX_AHEAD = 1000
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def size_bucket(size_bytes: Optional[int]) -> str:
+    if size_bytes is None:
+        return NA
+    for bound, label in _SIZE_BOUNDS:
+        if size_bytes < bound:
+            return label
+    return ">=16M"
+
+
+def page_bucket(pages: Optional[int]) -> str:
+    if pages is None:
+        return NA
+    for bound, label in _PAGE_BOUNDS:
+        if pages <= bound:
+            return label
+    return ">1000"
+
+
+BucketKey = Tuple[str, str, str, str]
+
+
+def bucket_key(src: Optional[str], dst: Optional[str], size_bytes: Optional[int], pages: Optional[int]) -> BucketKey:
+    return (src or NA, dst or NA, size_bucket(size_bytes), page_bucket(pages))
+
+
+def _fallback_keys(key: BucketKey) -> List[BucketKey]:
+    src, dst, size, pages = key
+    return [key, (src, dst, size, ANY), (src, dst, ANY, ANY), (ANY, dst, ANY, ANY)]
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля алгоритмом P² (Jain & Chlamtac, 1985).
+
+    Хранит 5 маркеров вместо всех наблюдений; до 5 наблюдений квантиль точный.
+    """
+
+    def __init__(self, q: float):
+        self.q = q
+        self.count = 0
+        self._heights: List[float] = []
+        self._pos = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self._desired = [1.0, 1.0 + 2 * q, 1.0 + 4 * q, 3.0 + 2 * q, 5.0]
+        self._incr = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        h = self._heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        for i in range(k + 1, 5):
+            self._pos[i] += 1
+        for i in range(5):
+            self._desired[i] += self._incr[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - self._pos[i]
+            if (d >= 1 and self._pos[i + 1] - self._pos[i] > 1) or (d <= -1 and self._pos[i - 1] - self._pos[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + step * (h[i + step] - h[i]) / (self._pos[i + step] - self._pos[i])
+                h[i] = candidate
+                self._pos[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self._heights, self._pos
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if not self._heights:
+            return None
+        if self.count <= 5:
+            ordered = sorted(self._heights)
+            return ordered[max(0, math.ceil(self.q * len(ordered)) - 1)]
+        return self._heights[2]
+
+
+class BucketSketch:
+    def __init__(self) -> None:
+        self.p50 = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+
+    @property
+    def count(self) -> int:
+        return self.p50.count
+
+    def add(self, seconds: float) -> None:
+        self.p50.add(seconds)
+        self.p90.add(seconds)
+
+
+@dataclass
+class Estimate:
+    estimated_time: float
+    queue_position: int
+    run_p50: float
+    run_p90: float
+
+
+@dataclass
+class _OpInfo:
+    id: int
+    status: str
+    key: BucketKey
+
+
+def _format_label(fmt: Optional[Format]) -> Optional[str]:
+    if fmt is None:
+        return None
+    if fmt.type in ("graph", "site_bundle"):
+        return fmt.type
+    return (fmt.file_extension or "").lstrip(".") or None
+
+
+class EtaEstimator:
+    """Скетчи длительностей по корзинам + оценка ETA/позиции в очереди."""
+
+    def __init__(self) -> None:
+        self._sketches: Dict[BucketKey, BucketSketch] = {}
+        self._cursor = 0
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def reset(self) -> None:
+        self._sketches.clear()
+        self._cursor = 0
+        self._refreshed_at = 0.0
+
+    # ------------------------------ обучение ------------------------------
+
+    def observe(self, key: BucketKey, seconds: float) -> None:
+        """Добавляет длительность во все уровни корзин (точная → грубые)."""
+
+        for k in _fallback_keys(key):
+            self._sketches.setdefault(k, BucketSketch()).add(max(0.0, seconds))
+
+    async def refresh(self, session: AsyncSession, *, force: bool = False) -> int:
+        """Дочитывает завершённые операции из operation_events; возвращает число новых наблюдений."""
+
+        interval = _env_float("VKMAX_ETA_REFRESH_SEC", 30.0)
+        if not force and time.monotonic() - self._refreshed_at < interval:
+            return 0
+        async with self._lock:
+            q = select(OperationEvent.id, OperationEvent.operation_id, OperationEvent.duration_ms).where(
+                OperationEvent.kind == "status",
+                OperationEvent.name == "completed",
+                OperationEvent.duration_ms.is_not(None),
+                OperationEvent.id > self._cursor,
+            )
+            if self._cursor == 0:
+                q = q.where(OperationEvent.created_at >= datetime.now(timezone.utc) - timedelta(days=_HISTORY_DAYS))
+            rows = (await session.execute(q.order_by(OperationEvent.id).limit(_HISTORY_LIMIT))).all()
+            self._refreshed_at = time.monotonic()
+            if not rows:
+                return 0
+            infos = await self._operation_infos(session, {int(r[1]) for r in rows})
+            added = 0
+            for event_id, op_id, duration_ms in rows:
+                info = infos.get(int(op_id))
+                if info is not None:
+                    self.observe(info.key, float(duration_ms) / 1000.0)
+                    added += 1
+                self._cursor = max(self._cursor, int(event_id))
+            logger.debug("[eta_estimator.refresh] +%s observations, cursor=%s", added, self._cursor)
+            return added
+
+    # ------------------------------ оценка ------------------------------
+
+    def run_quantiles(self, key: BucketKey) -> Tuple[float, float]:
+        for k in _fallback_keys(key):
+            sketch = self._sketches.get(k)
+            if sketch is not None and sketch.count >= _MIN_SAMPLES:
+                return float(sketch.p50.value() or 0.0), float(sketch.p90.value() or 0.0)
+        default = _env_float("VKMAX_ETA_DEFAULT_SEC", 5.0)
+        return default, default
+
+    async def estimate(self, session: AsyncSession, operation_id: int) -> Estimate:
+        return (await self.estimate_many(session, [operation_id]))[operation_id]
+
+    async def estimate_many(self, session: AsyncSession, operation_ids: Iterable[int]) -> Dict[int, Estimate]:
+        """ETA для новых операций: очередь впереди каждой + собственное p50."""
+
+        ids = sorted({int(i) for i in operation_ids})
+        out: Dict[int, Estimate] = {}
+        if not ids:
+            return out
+        try:
+            await self.refresh(session)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[eta_estimator.estimate_many] refresh failed: %s", exc)
+
+        concurrency = float(worker_concurrency())
+        ahead_rows = (
+            await session.execute(
+                select(Operation.id)
+                .where(Operation.status.in_(("queued", "processing")), Operation.id < ids[-1])
+                .order_by(Operation.id.desc())
+                .limit(_MAX_AHEAD)
+            )
+        ).scalars().all()
+        infos = await self._operation_infos(session, set(ids) | {int(i) for i in ahead_rows}, hot_only=True)
+        pending = sorted((i for i in infos.values() if i.status in ("queued", "processing")), key=lambda i: i.id)
+
+        for op_id in ids:
+            info = infos.get(op_id)
+            key = info.key if info is not None else (ANY, ANY, ANY, ANY)
+            p50, p90 = self.run_quantiles(key)
+            wait = 0.0
+            position = 0
+            for other in pending:
+                if other.id >= op_id:
+                    break
+                other_p50 = self.run_quantiles(other.key)[0]
+                if other.status == "queued":
+                    position += 1
+                    wait += other_p50
+                else:
+                    wait += other_p50 / 2
+            out[op_id] = Estimate(
+                estimated_time=round(wait / concurrency + p50, 1),
+                queue_position=position,
+                run_p50=round(p50, 2),
+                run_p90=round(p90, 2),
+            )
+        return out
+
+    async def backlog(self, session: AsyncSession) -> Tuple[int, float]:
+        """Глубина очереди (queued + processing) и оценка секунд до её разбора.
+
+        Секунды — та же модель, что у ETA: сумма p50 (processing — половина) / worker_concurrency();
+        при очереди длиннее _MAX_AHEAD оценка по последним операциям масштабируется на всю глубину.
+        """
+
+        try:
+            await self.refresh(session)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[eta_estimator.backlog] refresh failed: %s", exc)
+
+        pending = Operation.status.in_(("queued", "processing"))
+        depth = int((await session.execute(select(func.count()).select_from(Operation).where(pending))).scalar_one() or 0)
+        if depth == 0:
+            return 0, 0.0
+        ids = (await session.execute(select(Operation.id).where(pending).order_by(Operation.id.desc()).limit(_MAX_AHEAD))).scalars().all()
+        infos = await self._operation_infos(session, ids, hot_only=True)
+        work = 0.0
+        for info in infos.values():
+            p50 = self.run_quantiles(info.key)[0]
+            work += p50 if info.status == "queued" else p50 / 2
+        if infos and depth > len(infos):
+            work *= depth / len(infos)
+        return depth, round(work / float(worker_concurrency()), 1)
+
+    # ------------------------------ корзины ------------------------------
+
+    async def _operation_infos(
+        self,
+        session: AsyncSession,
+        operation_ids: Iterable[int],
+        *,
+        hot_only: bool = False,
+    ) -> Dict[int, _OpInfo]:
+        ids = list(operation_ids)
+        if not ids:
+            return {}
+        formats = {int(f.id): _format_label(f) for f in (await session.execute(select(Format))).scalars().all()}
+
+        rows: List[Tuple[int, str, Optional[int], Optional[int], Optional[int]]] = []
+        models = (Operation,) if hot_only else (Operation, OperationArchive)
+        for model in models:
+            res = await session.execute(
+                select(model.id, model.status, model.file_id, model.old_format_id, model.new_format_id).where(model.id.in_(ids))
+            )
+            rows.extend(res.all())
+
+        file_ids = {int(r[2]) for r in rows if r[2] is not None}
+        sizes: Dict[int, Optional[int]] = {}
+        pages: Dict[int, int] = {}
+        if file_ids:
+            res = await session.execute(select(FileModel.id, FileModel.file_size).where(FileModel.id.in_(file_ids)))
+            sizes = {int(fid): (int(sz) if sz is not None else None) for fid, sz in res.all()}
+            res = await session.execute(
+                select(SitePage.file_id, func.count()).where(SitePage.file_id.in_(file_ids)).group_by(SitePage.file_id)
+            )
+            pages = {int(fid): int(cnt) for fid, cnt in res.all()}
+
+        out: Dict[int, _OpInfo] = {}
+        for op_id, status, file_id, old_fmt, new_fmt in rows:
+            src = formats.get(int(old_fmt)) if old_fmt is not None else None
+            dst = formats.get(int(new_fmt)) if new_fmt is not None else None
+            fid = int(file_id) if file_id is not None else None
+            key = bucket_key(src, dst, sizes.get(fid) if fid is not None else None, pages.get(fid) if fid is not None else None)
+            out[int(op_id)] = _OpInfo(id=int(op_id), status=str(status), key=key)
+        return out
+
+
+eta_estimator = EtaEstimator()
+
+
+__all__ = ["EtaEstimator", "Estimate", "P2Quantile", "bucket_key", "eta_estimator"]
@@ -6,6 +6,13 @@
 # - Реализует двухшаговый пайплайн: LLM сначала возвращает упрощённый JSON-outline
 #   (entities/relations/meta), а затем Python-функция преобразует его в итоговый
 #   graph JSON (nodes/edges/meta).
+# - Этапы extract/llm/render/db_write пишутся в operation_events через track_stage,
+#   попытки LLM публикуются в progress_bus.
+# - Граф пишется компактным UTF-8 JSON (orjson): GET /graph отдаёт файл без разбора.
+# - Извлечение текста идёт в CPU-пуле; в пакете (shared=SharedWork) текст одного
+#   исходника извлекается один раз для всех операций.
+# - Ответы LLM кэшируются (LLM_SERVICE/response_cache.py, VKMAX_LLM_CACHE): повторный граф
+#   по тому же тексту строится без запроса к провайдеру.
 # Важно:
 # - Не зависит от FastAPI напрямую, принимает сессию и параметры как аргументы.
 
@@ -15,17 +22,25 @@ import logging
 import json
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
+import orjson
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cancellation import atomic_output
 from .converters import ConversionError, extract_plain_text
+from .cpu_pool import run_cpu
+from .progress import track_stage
+from .progress_bus import progress_bus
+from .retry_policy import note_error
+from .shared_work import SharedWork
 from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager
 from BACKEND.DATABASE.models import File as FileModel, Format, Operation
 from BACKEND.LLM_SERVICE.cleaner import CleanerService
 from BACKEND.LLM_SERVICE.document_generator import DocumentGenerator
 from BACKEND.LLM_SERVICE.llm_service import LlmService
+from BACKEND.LLM_SERVICE.response_cache import default_cache
 from BACKEND.LLM_SERVICE.validator import ValidatorService
 
 
@@ -46,7 +61,7 @@ async def _resolve_format_ext(session: AsyncSession, format_id: Optional[int]) -
     return ext.lstrip(".") if isinstance(ext, str) else None
 
 
-def _build_document_generator() -> DocumentGenerator:
+def _build_document_generator(on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> DocumentGenerator:
     """Создаёт DocumentGenerator с реестром задач для JSON-графа.
 
     LLM возвращает доменный JSON-граф (узлы/связи/метаданные) в строгом
@@ -102,7 +117,16 @@ def _build_document_generator() -> DocumentGenerator:
         },
     }
 
-    return DocumentGenerator(llm, cleaner, validator, registry=registry)
+    return DocumentGenerator(llm, cleaner, validator, registry=registry, on_progress=on_progress, cache=default_cache())
+
+
+def _llm_progress_publisher(operation_id: int) -> Callable[[str, Dict[str, Any]], None]:
+    """Колбэк DocumentGenerator → progress_bus (попытки/повторы LLM для push-прогресса)."""
+
+    def _publish(event: str, data: Dict[str, Any]) -> None:
+        progress_bus.publish_progress(operation_id, "llm", progress=20, event=event, **data)
+
+    return _publish
 
 
 def _outline_to_graph(data: dict) -> dict:
@@ -182,11 +206,13 @@ async def generate_graph_for_operation(
     *,
     operation_id: int,
     storage_dir: str,
+    shared: Optional[SharedWork] = None,
 ) -> None:
     """Генерирует JSON-граф для операции *operation_id*.
 
     Ожидается, что Operation.new_format_id указывает на формат graph/json, а
-    Operation.file_id — на исходный DOCX/PDF.
+    Operation.file_id — на исходный DOCX/PDF. *shared* — общий кэш пакета
+    (хэш исходника и извлечённый текст).
     """
 
     cm = ConvertManager(session)
@@ -217,6 +243,9 @@ async def generate_graph_for_operation(
         file_id,
         new_format_id,
     )
+    await cm.update_status(operation_id, status="processing")
+    # Не держим write-транзакцию во время извлечения/LLM (SQLite блокирует всю БД)
+    await session.commit()
 
     src: Optional[FileModel] = await fm.get_file(int(file_id))
     if src is None:
@@ -242,18 +271,25 @@ async def generate_graph_for_operation(
 
     try:
         # 1. Извлекаем текст до 10 000 слов
-        text = extract_plain_text(src_path, input_format=src_ext, max_words=10_000)
+        async with track_stage(session, operation_id, "extract", progress=20):
+            if shared is not None:
+                text = await shared.plain_text(src_path, src_ext, 10_000)
+            else:
+                text = await run_cpu(extract_plain_text, src_path, src_ext, 10_000)
         logger.info(
             "[graph_service.generate_graph_for_operation] Extracted text for op=%s len(text)~=%s",
             operation_id,
             len(text),
         )
 
+        await session.commit()
+
         # 2. Готовим LLM-оркестратор
-        doc_gen = _build_document_generator()
+        doc_gen = _build_document_generator(on_progress=_llm_progress_publisher(operation_id))
 
         # 3. Запрашиваем упрощённый JSON-outline (entities/relations/meta)
-        raw_output = await doc_gen.create_document(GRAPH_TASK_ID, document_text=text)
+        async with track_stage(session, operation_id, "llm", progress=75):
+            raw_output = await doc_gen.create_document(GRAPH_TASK_ID, document_text=text)
         if not isinstance(raw_output, str) or not raw_output.strip():
             raise RuntimeError("LLM returned empty graph outline")
 
@@ -263,26 +299,29 @@ async def generate_graph_for_operation(
         except Exception as exc:  # noqa: WPS430
             raise RuntimeError(f"LLM returned non-JSON outline: {exc}") from exc
 
-        graph_data = _outline_to_graph(outline_data)
-        graph_json = json.dumps(graph_data, ensure_ascii=False, indent=2)
+        # 4. Строим граф и сохраняем как файл (JSON с nodes/edges/meta)
+        async with track_stage(session, operation_id, "render", progress=85):
+            graph_data = _outline_to_graph(outline_data)
+            # Компактный UTF-8 JSON: GET /graph отдаёт эти байты как есть, без разбора
+            graph_json = orjson.dumps(graph_data)
 
-        # 4. Сохраняем как файл (JSON с nodes/edges/meta)
-        base_name = os.path.splitext(getattr(src, "filename") or os.path.basename(src_path))[0]
-        dst_filename = f"{base_name}.graph.json"
-        dst_path = os.path.join(storage_dir, dst_filename)
-        Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(dst_path, "w", encoding="utf-8") as f:
-            f.write(graph_json)
+            base_name = os.path.splitext(getattr(src, "filename") or os.path.basename(src_path))[0]
+            dst_filename = f"{base_name}.graph.json"
+            dst_path = os.path.join(storage_dir, dst_filename)
+            Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+            with atomic_output(dst_path) as tmp_path, open(tmp_path, "wb") as f:
+                f.write(graph_json)
 
         # 5. Создаём запись файла результата
-        new_file = await fm.create_file(
-            user_id=getattr(op, "user_id", None),
-            format_id=int(new_format_id),
-            filename=dst_filename,
-            mime_type="application/json",
-            content_bytes=None,
-            path=dst_path,
-        )
+        async with track_stage(session, operation_id, "db_write", progress=95):
+            new_file = await fm.create_file(
+                user_id=getattr(op, "user_id", None),
+                format_id=int(new_format_id),
+                filename=dst_filename,
+                mime_type="application/json",
+                content_bytes=None,
+                path=dst_path,
+            )
 
         await cm.update_status(
             operation_id,
@@ -300,9 +339,11 @@ async def generate_graph_for_operation(
     except ConversionError as exc:
         msg = f"text extraction failed: {exc}"
         logger.error("[graph_service.generate_graph_for_operation] %s", msg)
+        note_error(exc)
         await cm.update_status(operation_id, status="failed", error_message=msg)
     except Exception as exc:  # noqa: WPS430
         logger.exception("[graph_service.generate_graph_for_operation] Unexpected error for op=%s: %s", operation_id, exc)
+        note_error(exc)
         await cm.update_status(operation_id, status="failed", error_message=str(exc))
 
 
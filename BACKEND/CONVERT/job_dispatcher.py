@@ -0,0 +1,688 @@
+# Руководство к файлу (CONVERT/job_dispatcher.py)
+# Назначение:
+# - Внутрипроцессный диспетчер задач конвертации: операции /batch-convert выполняются
+#   конкурентно с лимитом на пакет; /convert, /convert/website и /upload/website берут
+#   слот того же диспетчера (класс interactive) и выполняются в запросе.
+# - Планирование (CONVERT/scheduler.py): отдельные пулы cpu (worker_concurrency()),
+#   network (обход сайтов, LLM; VKMAX_NETWORK_CONCURRENCY=8) и trivial (копирование;
+#   VKMAX_TRIVIAL_CONCURRENCY=4); в пуле — классы interactive > batch > background и
+#   fair-share между пользователями, взвешенный стоимостью из CONVERTER_REGISTRY
+#   (cost × (1 + размер в МБ)); не больше VKMAX_USER_MAX_PARALLEL слотов пула на пользователя.
+# - Общая работа пакета дедуплицируется (SharedWork): исходники хэшируются один раз,
+#   одинаковые (исходник, целевой формат) выполняются один раз — дубликаты получают
+#   тот же result_file_id/ошибку; текст для графов извлекается один раз на исходник.
+# - По завершении всех операций пакету выставляется итоговый статус (BatchManager).
+# - Отмена и таймауты: каждая задача (пакетная и интерактивная) выполняется через
+#   execute() дочерней asyncio-задачей с дедлайном job_timeout(kind) от момента получения
+#   слота. cancel(operation_id) (POST /operations/{id}/cancel) и истёкший дедлайн отменяют
+#   её: отмена доходит до воркеров обхода сайта, запросов к LLM и процесса cpu_pool;
+#   транзакция откатывается, выходные файлы (track_artifact) удаляются, операция получает
+#   статус cancelled / timed_out.
+# - Повторы (CONVERT/retry_policy.py): если сервис пометил операцию failed из-за временного
+#   сбоя (note_error + classify), незакоммиченный failed откатывается, операция снова
+#   queued (error_message — причина и пауза), и после паузы с экспоненциальным ростом и
+#   jitter задача повторяется; слоты пула и пакета на время паузы освобождаются.
+#   Номер попытки — operations.attempts; после VKMAX_RETRY_MAX_ATTEMPTS временных сбоев
+#   операция уходит в dead_letter, постоянная ошибка сразу оставляет failed.
+# - Аренда (восстановление после падения процесса): диспетчер — владелец (owner) всех
+#   операций, которые он принял (пакет ждёт слота или задача выполняется); фоновый
+#   heartbeat раз в job_lease_sec()/3 продлевает их operations.lease_expires_at.
+#   Если процесс умер, аренда истекает, и CONVERT/lease_reaper.py перезапускает операции.
+#   Если аренду забрал другой процесс (этот завис дольше срока аренды), задача здесь
+#   прерывается без смены статуса и без записи результата (fencing): операцию уже
+#   выполняет новый владелец; begin_attempt тоже не начнёт чужую арендованную операцию.
+#   Воркер, созданный fork из мастера FAST_API/server.py, получает свой owner (after_fork).
+# - Остановка: wait_idle(timeout) дожидается пакетов и задач (lifespan, VKMAX_JOB_DRAIN_TIMEOUT_SEC).
+# Важно:
+# - Каждая задача работает в своей сессии (async_session_factory) и коммитит её сама:
+#   события статусов уходят в progress_bus сразу после commit.
+# - Сначала берётся слот пакета, затем слот пула: задача, упёршаяся в лимит своего
+#   пакета, не стоит в очереди пула и не сдвигает fair-share пользователя.
+# - CPU-тяжёлые конвертеры уходят в процессный пул (cpu_pool), так что N файлов
+#   обрабатываются на N ядрах; обход сайтов и LLM — I/O, им хватает event loop.
+# - Задачи живут в памяти процесса: незавершённые операции упавшего процесса подхватывает
+#   lease_reaper после истечения аренды; cancel() отменяет только задачи этого процесса.
+# - Метрики (METRICS, GET /metrics): ожидание слота vkmax_job_wait_seconds{pool},
+#   длительность попытки vkmax_conversion_duration_seconds{pair, outcome} (pair — пара
+#   форматов "pdf->html" из JobProfile), повторы vkmax_job_retries_total{kind, outcome}.
+# - Задачи (шаг задачи, пакет, heartbeat) создаются в instrumentation.background_context():
+#   их SQL учитывается как background, а не в счётчиках HTTP-запроса, который их запустил.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+
+from .cancellation import bind_artifacts, job_timeout, remove_artifacts
+from .conversion_service import run_file_conversion
+from .converters import get_converter
+from .cpu_pool import worker_concurrency
+from .graph_service import generate_graph_for_operation
+from .retry_policy import RetryPolicy, bind_errors, classify
+from .scheduler import FairScheduler
+from .shared_work import SharedWork
+from .webparser_service import enqueue_website_job
+from BACKEND import METRICS
+from BACKEND.DATABASE.CACHE_MANAGER import BatchManager, ConvertManager
+from BACKEND.DATABASE.CACHE_MANAGER.convert import job_lease_sec
+from BACKEND.DATABASE.CACHE_MANAGER.events import FINAL_STATUSES
+from BACKEND.DATABASE.instrumentation import background_context
+from BACKEND.DATABASE.models import File as FileModel, Format
+from BACKEND.DATABASE.session import async_session_factory
+
+
+logger = logging.getLogger("vkmax.convert.dispatcher")
+
+JOB_KINDS = ("file", "graph", "website")
+
+WAIT_SECONDS = METRICS.histogram("vkmax_job_wait_seconds", "Time a job waited for a pool slot", ("pool",), buckets=METRICS.SLOW_BUCKETS)
+CONVERSION_SECONDS = METRICS.histogram(
+    "vkmax_conversion_duration_seconds",
+    "Duration of one job attempt by format pair and outcome",
+    ("pair", "outcome"),
+    buckets=METRICS.SLOW_BUCKETS,
+)
+RETRIES = METRICS.counter("vkmax_job_retries_total", "Transient job failures by kind: retried or dead-lettered", ("kind", "outcome"))
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, "") or 0)
+    except ValueError:
+        value = 0
+    return value if value > 0 else default
+
+
+def batch_max_parallel() -> int:
+    return _env_int("VKMAX_BATCH_MAX_PARALLEL", 4)
+
+
+def user_max_parallel() -> int:
+    return _env_int("VKMAX_USER_MAX_PARALLEL", 4)
+
+
+@dataclass
+class JobSpec:
+    """Задача диспетчера: одна операция и всё, чего нет в строке operations (url)."""
+
+    operation_id: int
+    kind: str  # file | graph | website
+    user_id: Optional[int] = None
+    batch_id: Optional[int] = None
+    url: Optional[str] = None
+    source_file_id: Optional[int] = None
+    target_format_id: Optional[int] = None
+    priority: str = "batch"  # interactive | batch | background
+
+
+@dataclass(frozen=True)
+class JobProfile:
+    pool: str  # cpu | network | trivial
+    cost: float
+    pair: str = "unknown"  # метка метрик: "<исходный>-><целевой>" формат
+
+
+def format_pair(src: Optional[str], dst: Optional[str]) -> str:
+    return f"{(src or '?').lstrip('.')}->{(dst or '?').lstrip('.')}"
+
+
+# Задачи вне реестра конвертеров: сеть (обход сайта, LLM), стоимость в условных секундах
+JOB_PROFILES: Dict[str, JobProfile] = {
+    "graph": JobProfile(pool="network", cost=30.0, pair="document->graph"),
+    "website": JobProfile(pool="network", cost=60.0, pair="website->html"),
+}
+_RENDER_PROFILE = JobProfile(pool="cpu", cost=5.0)  # site_bundle → PDF
+_UNKNOWN_PROFILE = JobProfile(pool="trivial", cost=0.1)  # упадёт на валидации сервиса
+
+
+@dataclass(eq=False)
+class _JobHandle:
+    """Выполняемая задача операции: её asyncio-задача и причина прерывания."""
+
+    spec: JobSpec
+    task: Optional[asyncio.Task] = None
+    reason: Optional[str] = None  # cancelled | timed_out | lease_lost
+    detail: Optional[str] = None
+    attempt: int = 0
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+def pool_capacities() -> Dict[str, int]:
+    return {
+        "cpu": worker_concurrency(),
+        "network": _env_int("VKMAX_NETWORK_CONCURRENCY", 8),
+        "trivial": _env_int("VKMAX_TRIVIAL_CONCURRENCY", 4),
+    }
+
+
+def _new_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobDispatcher:
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        self._session_factory = session_factory or async_session_factory
+        self._pools: Dict[str, FairScheduler] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._jobs: Dict[int, _JobHandle] = {}
+        self.running = 0
+        # Владелец аренды операций: уникален для процесса (и экземпляра диспетчера)
+        self.owner = _new_owner()
+        self._held: Counter = Counter()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.leases_lost = 0
+
+    def pool(self, name: str) -> FairScheduler:
+        sched = self._pools.get(name)
+        if sched is None:
+            sched = FairScheduler(
+                name,
+                pool_capacities().get(name, 1),
+                user_limit=user_max_parallel(),
+                aging_sec=float(_env_int("VKMAX_PRIORITY_AGING_SEC", 60)),
+            )
+            self._pools[name] = sched
+        return sched
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: sched.stats() for name, sched in self._pools.items()}
+
+    def jobs_by_kind(self) -> Dict[str, int]:
+        """Задачи в execute() (ждут слота пула, выполняются или ждут повтора) по виду."""
+
+        counts = dict.fromkeys(JOB_KINDS, 0)
+        for handle in list(self._jobs.values()):
+            counts[handle.spec.kind] = counts.get(handle.spec.kind, 0) + 1
+        return counts
+
+    # --- аренда операций ----------------------------------------------------------------
+
+    def _hold(self, operation_ids: Iterable[int]) -> None:
+        """Операции переходят под heartbeat этого диспетчера (до _release)."""
+
+        self._held.update(int(i) for i in operation_ids)
+        if self._held and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop(), context=background_context())
+
+    def _release(self, operation_ids: Iterable[int]) -> None:
+        self._held.subtract(int(i) for i in operation_ids)
+        self._held = +self._held  # убрать нулевые счётчики
+
+    async def renew_leases(self) -> List[int]:
+        """Продлевает аренду удерживаемых операций; операции, чью аренду забрали, прерываются."""
+
+        held = list(self._held)
+        if not held:
+            return []
+        async with self._session_factory() as session:
+            lost = await ConvertManager(session).renew_leases(held, owner=self.owner, lease_sec=job_lease_sec())
+            await session.commit()
+        for op_id in lost:
+            self.leases_lost += 1
+            del self._held[op_id]
+            handle = self._jobs.get(op_id)
+            logger.error("[job_dispatcher.renew_leases] op=%s lease taken over by another worker, stopping local job", op_id)
+            if handle is not None and handle.reason is None:
+                handle.reason = "lease_lost"
+                handle.detail = "lease taken over by another worker"
+                if handle.task is not None:
+                    handle.task.cancel()
+        return lost
+
+    async def _heartbeat_loop(self) -> None:
+        while self._held:
+            await asyncio.sleep(job_lease_sec() / 3)
+            try:
+                await self.renew_leases()
+            except Exception as exc:  # noqa: WPS430
+                # Следующий такт попробует снова: срок аренды втрое больше периода
+                logger.warning("[job_dispatcher._heartbeat_loop] lease renewal failed: %s", exc)
+
+    @property
+    def active_batches(self) -> int:
+        return len(self._tasks)
+
+    async def profile(self, session: Any, spec: JobSpec) -> JobProfile:
+        """Пул и стоимость задачи: по CONVERTER_REGISTRY и размеру исходника (cost × (1 + МБ))."""
+
+        if spec.kind == "website" and spec.target_format_id is not None:
+            dst_fmt = await session.get(Format, spec.target_format_id)
+            target = "site_bundle" if dst_fmt is not None and dst_fmt.type == "site_bundle" else getattr(dst_fmt, "file_extension", None)
+            return replace(JOB_PROFILES["website"], pair=format_pair("website", target))
+        if spec.kind in JOB_PROFILES:
+            return JOB_PROFILES[spec.kind]
+        if spec.source_file_id is None or spec.target_format_id is None:
+            return _UNKNOWN_PROFILE
+        # Только нужные колонки: content site_bundle может весить мегабайты
+        row = (
+            await session.execute(
+                select(FileModel.format_id, FileModel.file_size, func.length(FileModel.content)).where(FileModel.id == spec.source_file_id)
+            )
+        ).first()
+        if row is None:
+            return _UNKNOWN_PROFILE
+        src_format_id, file_size, content_len = row
+        src_fmt = await session.get(Format, src_format_id) if src_format_id is not None else None
+        dst_fmt = await session.get(Format, spec.target_format_id)
+        if src_fmt is not None and src_fmt.type == "site_bundle":
+            return replace(_RENDER_PROFILE, pair=format_pair("site_bundle", getattr(dst_fmt, "file_extension", None)))
+        converter = get_converter(src_fmt.file_extension or "", dst_fmt.file_extension or "") if src_fmt and dst_fmt else None
+        if converter is None:
+            return _UNKNOWN_PROFILE
+        size = int(file_size or content_len or 0)
+        return JobProfile(
+            pool=converter.pool,
+            cost=converter.cost * (1.0 + size / (1024 * 1024)),
+            pair=format_pair(src_fmt.file_extension, dst_fmt.file_extension),
+        )
+
+    @asynccontextmanager
+    async def slot(self, spec: JobSpec, profile: JobProfile) -> AsyncIterator[None]:
+        """Слот пула задачи по её классу приоритета и fair-share пользователя."""
+
+        async with self.pool(profile.pool).slot(spec.user_id, priority=spec.priority, cost=profile.cost) as ticket:
+            WAIT_SECONDS.labels(profile.pool).observe(ticket.waited)
+            if ticket.waited > 1.0:
+                logger.debug(
+                    "[job_dispatcher.slot] op=%s pool=%s priority=%s waited=%.2fs",
+                    spec.operation_id,
+                    profile.pool,
+                    spec.priority,
+                    ticket.waited,
+                )
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+
+    async def _guarded(
+        self,
+        session: Any,
+        handle: _JobHandle,
+        profile: JobProfile,
+        work: Callable[[], Awaitable[Any]],
+        artifacts: List[str],
+        errors: List[BaseException],
+    ) -> None:
+        bind_artifacts(artifacts)
+        bind_errors(errors)
+        spec = handle.spec
+        async with self.slot(spec, profile):
+            attempt = await ConvertManager(session).begin_attempt(spec.operation_id, owner=self.owner)
+            if attempt is None:
+                # Операцию отменили, пока задача ждала слот или паузу перед повтором,
+                # либо её аренду забрал другой процесс
+                await session.rollback()
+                logger.info("[job_dispatcher._guarded] op=%s already final or leased elsewhere, skipping", spec.operation_id)
+                return
+            handle.attempt = attempt
+            await session.commit()
+            timeout = job_timeout(spec.kind)
+            deadline = asyncio.timeout(timeout)
+            started = time.perf_counter()
+            outcome = "failed"
+            try:
+                async with deadline:
+                    await work()
+                # Сервис сам помечает операцию failed и сообщает ошибку через note_error
+                outcome = "failed" if errors else "completed"
+            except TimeoutError:
+                if not deadline.expired():
+                    raise
+                outcome = handle.reason = "timed_out"
+                handle.detail = f"{spec.kind} job timed out after {timeout:g}s"
+            except asyncio.CancelledError:
+                outcome = handle.reason or "cancelled"
+                raise
+            finally:
+                CONVERSION_SECONDS.labels(profile.pair, outcome).observe(time.perf_counter() - started)
+
+    async def _abort(self, session: Any, handle: _JobHandle, artifacts: List[str]) -> None:
+        spec = handle.spec
+        await session.rollback()
+        if handle.reason == "lease_lost":
+            # Операцию выполняет новый владелец: статус не трогаем, свои файлы убираем
+            removed = remove_artifacts(artifacts)
+            logger.warning("[job_dispatcher._abort] op=%s kind=%s lease lost (removed_files=%s)", spec.operation_id, spec.kind, removed)
+            return
+        marked = await ConvertManager(session).finish_open(spec.operation_id, status=str(handle.reason), error_message=handle.detail)
+        await session.commit()
+        # Уже завершённую операцию (успела закоммитить результат) не трогаем, как и её файлы
+        removed = remove_artifacts(artifacts) if marked else 0
+        logger.warning(
+            "[job_dispatcher._abort] op=%s kind=%s %s (marked=%s, removed_files=%s)",
+            spec.operation_id,
+            spec.kind,
+            handle.reason,
+            marked,
+            removed,
+        )
+
+    async def _retry_delay(
+        self,
+        session: Any,
+        handle: _JobHandle,
+        policy: RetryPolicy,
+        errors: List[BaseException],
+        artifacts: List[str],
+    ) -> Optional[float]:
+        """Пауза перед повтором, если попытка упала на временном сбое; None — результат окончательный."""
+
+        spec = handle.spec
+        if not errors or handle.reason is not None or handle.attempt == 0:
+            return None
+        cm = ConvertManager(session)
+        row = (await cm.get_statuses([spec.operation_id])).get(spec.operation_id)
+        exc = errors[-1]
+        if row is None or row["status"] != "failed" or classify(exc) != "transient":
+            return None
+        # failed сервиса ещё не закоммичен: откатываем его вместе с недописанным результатом
+        await session.rollback()
+        remove_artifacts(artifacts)
+        artifacts.clear()
+        if handle.attempt >= policy.max_attempts:
+            RETRIES.labels(spec.kind, "dead_letter").inc()
+            await cm.update_status(spec.operation_id, status="dead_letter", error_message=f"gave up after {handle.attempt} attempts: {exc}")
+            await session.commit()
+            logger.error("[job_dispatcher._retry_delay] op=%s kind=%s dead_letter after %s attempts: %s", spec.operation_id, spec.kind, handle.attempt, exc)
+            return None
+        RETRIES.labels(spec.kind, "retried").inc()
+        delay = policy.delay(handle.attempt)
+        message = f"attempt {handle.attempt}/{policy.max_attempts} failed, retrying in {delay:.1f}s: {exc}"
+        await cm.update_status(spec.operation_id, status="queued", error_message=message)
+        await session.commit()
+        logger.warning("[job_dispatcher._retry_delay] op=%s kind=%s %s", spec.operation_id, spec.kind, message)
+        return delay
+
+    @staticmethod
+    async def _backoff(delay: float, gate: Optional[asyncio.Semaphore]) -> None:
+        if gate is None:
+            await asyncio.sleep(delay)
+            return
+        # Слот пакета на время паузы отдаём соседним операциям
+        gate.release()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # shield: при повторной отмене слот всё равно вернётся, и release вызывающего сойдётся
+            await asyncio.shield(gate.acquire())
+
+    async def _step(self, handle: _JobHandle, coro: Awaitable[None]) -> bool:
+        """Выполняет шаг задачи как handle.task; False — шаг прервал cancel()."""
+
+        if handle.reason is not None:
+            coro.close()
+            return False
+        handle.task = asyncio.create_task(coro, context=background_context())
+        try:
+            await handle.task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            # Отменили не задачу, а вызывающего (остановка приложения) — пробрасываем
+            if handle.reason is None or (current is not None and current.cancelling()):
+                raise
+            return False
+        return True
+
+    async def execute(
+        self,
+        session: Any,
+        spec: JobSpec,
+        work: Callable[[], Awaitable[Any]],
+        *,
+        profile: Optional[JobProfile] = None,
+        gate: Optional[asyncio.Semaphore] = None,
+    ) -> Optional[str]:
+        """Выполняет work() (сервис поверх *session*) в слоте пула под дедлайном задачи.
+
+        Временный сбой (retry_policy) повторяется после паузы; *gate* — занятый вызывающим
+        семафор (слот пакета), который на время паузы освобождается.
+        Возвращает None, если работа завершилась сама, иначе "cancelled" / "timed_out":
+        транзакция *session* откатывается, операции ставится этот статус (commit),
+        созданные сервисом файлы удаляются; "lease_lost" — операцию забрал другой процесс,
+        статус не меняется.
+        """
+
+        if profile is None:
+            profile = await self.profile(session, spec)
+        handle = _JobHandle(spec)
+        artifacts: List[str] = []
+        policy = RetryPolicy.from_env()
+        self._jobs[spec.operation_id] = handle
+        self._hold([spec.operation_id])
+        try:
+            while True:
+                errors: List[BaseException] = []
+                if not await self._step(handle, self._guarded(session, handle, profile, work, artifacts, errors)):
+                    break
+                if handle.reason == "timed_out":
+                    break
+                delay = await self._retry_delay(session, handle, policy, errors, artifacts)
+                if delay is None:
+                    return None
+                if not await self._step(handle, self._backoff(delay, gate)):
+                    break
+            await self._abort(session, handle, artifacts)
+            return handle.reason
+        finally:
+            self._release([spec.operation_id])
+            if self._jobs.get(spec.operation_id) is handle:
+                del self._jobs[spec.operation_id]
+            handle.done.set()
+
+    def is_running(self, operation_id: int) -> bool:
+        return operation_id in self._jobs
+
+    async def cancel(self, operation_id: int, *, wait: float = 10.0) -> bool:
+        """Отменяет задачу операции в этом процессе и ждёт её остановки (до *wait* сек).
+
+        False — задачи этой операции здесь нет (не начиналась, завершена или в другом процессе).
+        """
+
+        handle = self._jobs.get(operation_id)
+        if handle is None or handle.task is None:
+            return False
+        if handle.reason is None:
+            handle.reason = "cancelled"
+            handle.detail = "cancelled by request"
+            handle.task.cancel()
+            logger.info("[job_dispatcher.cancel] op=%s kind=%s cancel requested", operation_id, handle.spec.kind)
+        try:
+            await asyncio.wait_for(handle.done.wait(), wait)
+        except TimeoutError:
+            logger.warning("[job_dispatcher.cancel] op=%s still stopping after %.1fs", operation_id, wait)
+        return True
+
+    async def _work(self, session: Any, spec: JobSpec, *, storage_dir: str, shared: Optional[SharedWork]) -> None:
+        if spec.kind == "graph":
+            await generate_graph_for_operation(session, operation_id=spec.operation_id, storage_dir=storage_dir, shared=shared)
+        elif spec.kind == "website":
+            await enqueue_website_job(session, operation_id=spec.operation_id, url=spec.url)
+        else:
+            await run_file_conversion(session, operation_id=spec.operation_id, storage_dir=storage_dir)
+
+    async def _run_job(
+        self,
+        spec: JobSpec,
+        *,
+        profile: JobProfile,
+        storage_dir: str,
+        shared: Optional[SharedWork],
+        gate: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        async with self._session_factory() as session:
+            try:
+                outcome = await self.execute(
+                    session,
+                    spec,
+                    lambda: self._work(session, spec, storage_dir=storage_dir, shared=shared),
+                    profile=profile,
+                    gate=gate,
+                )
+                if outcome is not None:
+                    return
+                # Сервис мог пропустить операцию (например, website с не-site_bundle целью):
+                # в пакете она не должна навсегда остаться queued
+                cm = ConvertManager(session)
+                row = (await cm.get_statuses([spec.operation_id])).get(spec.operation_id)
+                if row is not None and row["status"] == "queued":
+                    await cm.update_status(spec.operation_id, status="failed", error_message=f"unsupported {spec.kind} job target")
+                await session.commit()
+            except Exception as exc:  # noqa: WPS430
+                logger.exception("[job_dispatcher._run_job] op=%s kind=%s failed: %s", spec.operation_id, spec.kind, exc)
+                await session.rollback()
+                await ConvertManager(session).update_status(spec.operation_id, status="failed", error_message=str(exc))
+                await session.commit()
+
+    async def run_limited(self, spec: JobSpec, *, storage_dir: str, batch_slots: asyncio.Semaphore, shared: Optional[SharedWork] = None) -> None:
+        async with batch_slots:
+            async with self._session_factory() as session:
+                profile = await self.profile(session, spec)
+            await self._run_job(spec, profile=profile, storage_dir=storage_dir, shared=shared, gate=batch_slots)
+
+    async def _dedup_key(self, session: Any, spec: JobSpec, shared: SharedWork) -> Hashable:
+        if spec.kind == "website":
+            return (spec.kind, spec.url, spec.target_format_id)
+        src = await session.get(FileModel, spec.source_file_id) if spec.source_file_id is not None else None
+        if src is None:
+            # Операция упадёт сама с понятной ошибкой — не склеиваем её с другими
+            return ("missing", spec.operation_id)
+        path = getattr(src, "path", None)
+        if path and os.path.exists(path):
+            digest = await shared.file_digest(path, known=getattr(src, "sha256", None))
+        else:
+            digest = await shared.content_digest(("file", int(src.id)), getattr(src, "content", None))
+        return (spec.kind, digest, spec.target_format_id)
+
+    async def _group(self, specs: List[JobSpec], shared: SharedWork) -> Dict[Hashable, List[JobSpec]]:
+        async with self._session_factory() as session:
+            keys = await asyncio.gather(*(self._dedup_key(session, spec, shared) for spec in specs))
+        groups: Dict[Hashable, List[JobSpec]] = {}
+        for key, spec in zip(keys, specs):
+            groups.setdefault(key, []).append(spec)
+        return groups
+
+    async def _copy_result(self, primary: JobSpec, duplicates: List[JobSpec]) -> None:
+        async with self._session_factory() as session:
+            cm = ConvertManager(session)
+            row = (await cm.get_statuses([primary.operation_id])).get(primary.operation_id) or {}
+            dup_rows = await cm.get_statuses([dup.operation_id for dup in duplicates])
+            for dup in duplicates:
+                if (dup_rows.get(dup.operation_id) or {}).get("status") in FINAL_STATUSES:
+                    continue  # дубликат отменили отдельно
+                await cm.update_status(dup.operation_id, status="processing")
+                if row.get("status") == "completed":
+                    await cm.update_status(dup.operation_id, status="completed", result_file_id=row.get("result_file_id"))
+                elif row.get("status") in ("cancelled", "timed_out", "dead_letter"):
+                    await cm.update_status(dup.operation_id, status=row["status"], error_message=row.get("error_message"))
+                else:
+                    error = row.get("error_message") or f"primary operation {primary.operation_id} did not complete"
+                    await cm.update_status(dup.operation_id, status="failed", error_message=error)
+            await session.commit()
+
+    async def _run_batch(self, batch_id: Optional[int], specs: List[JobSpec], *, storage_dir: str, max_parallel: int) -> None:
+        try:
+            await self._run_specs(batch_id, specs, storage_dir=storage_dir, max_parallel=max_parallel)
+        finally:
+            self._release(spec.operation_id for spec in specs)
+
+    async def _run_specs(self, batch_id: Optional[int], specs: List[JobSpec], *, storage_dir: str, max_parallel: int) -> None:
+        shared = SharedWork()
+        batch_slots = asyncio.Semaphore(max_parallel)
+        try:
+            groups = await self._group(specs, shared)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[job_dispatcher._run_batch] batch=%s dedup failed, running all items: %s", batch_id, exc)
+            groups = {("op", s.operation_id): [s] for s in specs}
+
+        async def _run_group(items: List[JobSpec]) -> None:
+            await self.run_limited(items[0], storage_dir=storage_dir, batch_slots=batch_slots, shared=shared)
+            if len(items) > 1:
+                await self._copy_result(items[0], items[1:])
+
+        logger.info(
+            "[job_dispatcher._run_batch] batch=%s items=%s unique=%s max_parallel=%s",
+            batch_id,
+            len(specs),
+            len(groups),
+            max_parallel,
+        )
+        results = await asyncio.gather(*(_run_group(items) for items in groups.values()), return_exceptions=True)
+        for res in results:
+            if isinstance(res, BaseException):
+                logger.error("[job_dispatcher._run_batch] batch=%s group failed: %s", batch_id, res)
+
+        if batch_id is None:
+            return
+        async with self._session_factory() as session:
+            status = await BatchManager(session).mark_finished(batch_id)
+            await session.commit()
+        logger.info("[job_dispatcher._run_batch] batch=%s finished status=%s shared_hits=%s", batch_id, status, shared.hits)
+
+    def submit_batch(self, batch_id: Optional[int], specs: List[JobSpec], *, storage_dir: str, max_parallel: Optional[int] = None) -> asyncio.Task:
+        """Запускает пакет в фоне; операции и строка batches должны быть уже закоммичены.
+
+        batch_id=None — операции вне пакета (перезапуск lease_reaper): итог пакета не считается.
+        """
+
+        limit = max(1, int(max_parallel or batch_max_parallel()))
+        self._hold(spec.operation_id for spec in specs)
+        task = asyncio.create_task(
+            self._run_batch(batch_id, specs, storage_dir=storage_dir, max_parallel=limit),
+            context=background_context(),
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self) -> None:
+        """Дожидается всех запущенных пакетов (тесты, остановка приложения)."""
+
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Ждёт пакеты и задачи execute() не дольше *timeout*; False — что-то не успело.
+
+        Остановка приложения: незавершённые задачи затем отменяются вместе с event loop,
+        их операции остаются processing с истекающей арендой и перезапускаются lease_reaper
+        другого процесса.
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        while self._tasks or self._jobs:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            waiters = [asyncio.ensure_future(handle.done.wait()) for handle in list(self._jobs.values())]
+            try:
+                await asyncio.wait([*self._tasks, *waiters], timeout=remaining)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+        return True
+
+    def after_fork(self) -> None:
+        """Воркер, созданный fork из мастера с предзагруженным приложением: своя аренда."""
+
+        self.owner = _new_owner()
+
+
+job_dispatcher = JobDispatcher()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=job_dispatcher.after_fork)
+
+
+__all__ = ["JobDispatcher", "JobSpec", "JobProfile", "JOB_KINDS", "JOB_PROFILES", "job_dispatcher", "batch_max_parallel", "user_max_parallel", "pool_capacities"]
@@ -0,0 +1,154 @@
+# Руководство к файлу (CONVERT/lease_reaper.py)
+# Назначение:
+# - Восстановление после падения воркера: операции, чья аренда (operations.lease_expires_at)
+#   истекла, выполнял процесс, который больше не продлевает её heartbeat-ом
+#   (JobDispatcher.renew_leases) — он упал или завис. Reaper переводит их обратно в queued
+#   под арендой своего диспетчера и запускает заново (JobDispatcher.submit_batch,
+#   операции пакета — в тот же batch_id).
+# - Операция, уже исчерпавшая попытки (operations.attempts >= VKMAX_RETRY_MAX_ATTEMPTS),
+#   получает dead_letter: так задача, валящая процесс, не перезапускается бесконечно.
+#   Операцию, которую нельзя собрать заново (website без source_url, файл без исходника),
+#   reaper помечает failed.
+# - Раз в VKMAX_PARTIAL_SWEEP_SEC (600 с) удаляет из storage_dir временные файлы
+#   atomic_output, оставшиеся от упавших процессов (старше самого длинного дедлайна задачи).
+# Важно:
+# - Цикл start()/stop() запускает lifespan приложения (VKMAX_LEASE_REAPER=off отключает),
+#   период — VKMAX_LEASE_REAPER_INTERVAL_SEC (по умолчанию половина срока аренды);
+#   run_once() — один проход (тесты, ручной запуск).
+# - Несколько процессов могут запускать reaper одновременно: reclaim_lease — условный
+#   UPDATE по прежнему lease_expires_at, операцию забирает только один.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .cancellation import DEFAULT_JOB_TIMEOUTS, job_timeout, sweep_partials
+from .job_dispatcher import JobDispatcher, JobSpec, job_dispatcher
+from .retry_policy import RetryPolicy
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+from BACKEND.DATABASE.CACHE_MANAGER.convert import job_lease_sec
+from BACKEND.DATABASE.session import async_session_factory
+
+
+logger = logging.getLogger("vkmax.convert.lease_reaper")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def spec_from_row(row: Dict[str, Any]) -> Optional[JobSpec]:
+    """Задача диспетчера по строке expired_leases; None — данных для перезапуска нет."""
+
+    common = {
+        "operation_id": row["operation_id"],
+        "user_id": row["user_id"],
+        "batch_id": row["batch_id"],
+        "target_format_id": row["new_format_id"],
+    }
+    if row["source_type"] == "website" or row["source_url"]:
+        if not row["source_url"]:
+            return None
+        return JobSpec(kind="website", url=row["source_url"], **common)
+    if row["file_id"] is None:
+        return None
+    kind = "graph" if row["target_type"] == "graph" else "file"
+    return JobSpec(kind=kind, source_file_id=row["file_id"], **common)
+
+
+class LeaseReaper:
+    def __init__(self, dispatcher: Optional[JobDispatcher] = None, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        self.dispatcher = dispatcher or job_dispatcher
+        self._session_factory = session_factory or async_session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep = 0.0
+        self.requeued = 0
+        self.dead = 0
+
+    async def run_once(self, *, storage_dir: str, now: Optional[float] = None, limit: int = 100) -> Dict[str, int]:
+        """Один проход: забрать операции с истёкшей арендой и перезапустить; счётчики по исходу."""
+
+        now = time.time() if now is None else now
+        lease = job_lease_sec()
+        policy = RetryPolicy.from_env()
+        owner = self.dispatcher.owner
+        outcome = {"requeued": 0, "dead_letter": 0, "failed": 0}
+        requeued: List[JobSpec] = []
+        async with self._session_factory() as session:
+            cm = ConvertManager(session)
+            for row in await cm.expired_leases(now=now, limit=limit):
+                spec = spec_from_row(row)
+                lost = f"lease of {row['lease_owner'] or 'unclaimed job'} expired in {row['status']}"
+                if spec is None:
+                    status, target_owner, message = "failed", None, f"worker lost ({lost}); cannot resume: source is missing"
+                elif row["attempts"] >= policy.max_attempts:
+                    status, target_owner, message = "dead_letter", None, f"worker lost after {row['attempts']} attempts ({lost})"
+                else:
+                    status, target_owner, message = "queued", owner, f"{lost}, requeued"
+                taken = await cm.reclaim_lease(
+                    row["operation_id"],
+                    expected_expires_at=row["lease_expires_at"],
+                    status=status,
+                    owner=target_owner,
+                    lease_sec=lease,
+                    error_message=message,
+                )
+                if not taken:
+                    continue  # владелец продлил аренду или операцию забрал другой reaper
+                outcome["requeued" if status == "queued" else status] += 1
+                logger.warning("[lease_reaper.run_once] op=%s %s: %s", row["operation_id"], status, message)
+                if spec is not None and status == "queued":
+                    requeued.append(spec)
+            await session.commit()
+
+        by_batch: Dict[Optional[int], List[JobSpec]] = {}
+        for spec in requeued:
+            by_batch.setdefault(spec.batch_id, []).append(spec)
+        for batch_id, specs in by_batch.items():
+            self.dispatcher.submit_batch(batch_id, specs, storage_dir=storage_dir)
+        self.requeued += outcome["requeued"]
+        self.dead += outcome["dead_letter"]
+
+        if now - self._last_sweep >= _env_float("VKMAX_PARTIAL_SWEEP_SEC", 600.0):
+            self._last_sweep = now
+            # Временный файл живой задачи не старше её дедлайна
+            older_than = max(job_timeout(kind) for kind in DEFAULT_JOB_TIMEOUTS) + lease
+            outcome["swept"] = await asyncio.to_thread(sweep_partials, storage_dir, older_than_sec=older_than)
+        return outcome
+
+    async def _loop(self, storage_dir: str) -> None:
+        logger.info("[lease_reaper._loop] started owner=%s", self.dispatcher.owner)
+        while True:
+            try:
+                await self.run_once(storage_dir=storage_dir)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: WPS430
+                logger.exception("[lease_reaper._loop] pass failed: %s", exc)
+            await asyncio.sleep(_env_float("VKMAX_LEASE_REAPER_INTERVAL_SEC", job_lease_sec() / 2))
+
+    def start(self, *, storage_dir: str) -> None:
+        if (os.getenv("VKMAX_LEASE_REAPER", "") or "on").strip().lower() in ("0", "off", "false", "no"):
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(storage_dir))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+lease_reaper = LeaseReaper()
+
+
+__all__ = ["LeaseReaper", "lease_reaper", "spec_from_row"]
@@ -3,15 +3,28 @@
 # - Централизованная настройка логирования для бэкенда VKMax (в первую очередь
 #   для конвертации и LLM-пайплайнов).
 # - Определяет формат логов и базовые именованные логгеры `vkmax.*`.
+# - Запись в stdout не блокирует event loop: root-логгер получает QueueHandler, а
+#   форматирование и вывод выполняет QueueListener в отдельном потоке
+#   (VKMAX_LOG_QUEUE=off — писать в stdout напрямую, как раньше).
+# - Уровень — аргумент level или VKMAX_LOG_LEVEL (INFO по умолчанию).
 # Важно:
 # - Модуль не зависит от FastAPI, его можно вызывать как из веб-приложения,
 #   так и из фоновых воркеров.
+# - Поток слушателя останавливается shutdown_logging() (и atexit): очередь
+#   дописывается до конца, записи не теряются.
 
 from __future__ import annotations
 
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from typing import Iterable
+from typing import Iterable, Optional
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
 
 
 def _configure_handler(formatter: logging.Formatter) -> logging.Handler:
@@ -25,7 +38,39 @@ def _configure_handler(formatter: logging.Formatter) -> logging.Handler:
     return handler
 
 
-def setup_logging(level: int = logging.INFO, extra_loggers: Iterable[str] | None = None) -> None:
+def _env_level(default: int) -> int:
+    name = (os.getenv("VKMAX_LOG_LEVEL", "") or "").strip().upper()
+    value = logging.getLevelName(name) if name else default
+    return value if isinstance(value, int) else default
+
+
+def _queue_enabled() -> bool:
+    return (os.getenv("VKMAX_LOG_QUEUE", "") or "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() форматирует запись (и traceback) до постановки в очередь;
+    здесь в очередь уходит сама запись, а % -подстановку и форматирование выполняет
+    поток слушателя. Логгеры vkmax передают в аргументах строки и числа; изменяемый
+    объект, поменявшийся после вызова, попадёт в лог в новом виде.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def shutdown_logging() -> None:
+    """Останавливает поток слушателя, дописав очередь (идемпотентно)."""
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level: Optional[int] = None, extra_loggers: Iterable[str] | None = None) -> None:
     """Настраивает базовое логирование для VKMax.
 
     Формат сообщения:
@@ -33,9 +78,12 @@ def setup_logging(level: int = logging.INFO, extra_loggers: Iterable[str] | None
 
     Переиспользуется как в FastAPI-приложении, так и в сторонних воркерах.
     Повторный вызов функции безопасен: обработчики root-логгера будут очищены
-    и заново инициализированы.
+    и заново инициализированы (прежний слушатель очереди останавливается).
     """
 
+    if level is None:
+        level = _env_level(logging.INFO)
+
     # Базовый форматтер
     formatter = logging.Formatter(
         fmt="[%(asctime)s] [%(levelname)s] [%(name)s:%(funcName)s:%(lineno)d] %(message)s",
@@ -46,10 +94,19 @@ def setup_logging(level: int = logging.INFO, extra_loggers: Iterable[str] | None
     root.setLevel(level)
 
     # Удаляем старые обработчики, чтобы избежать дублирования
+    shutdown_logging()
     for h in list(root.handlers):
         root.removeHandler(h)
 
-    root.addHandler(_configure_handler(formatter))
+    stream = _configure_handler(formatter)
+    if _queue_enabled():
+        global _listener
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root.addHandler(_DeferredQueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+    else:
+        root.addHandler(stream)
 
     # Базовые доменные логгеры VKMax
     for name in [
@@ -64,6 +121,7 @@ def setup_logging(level: int = logging.INFO, extra_loggers: Iterable[str] | None
         "vkmax.fastapi.system",
         "vkmax.fastapi.user",
         "vkmax.fastapi.format",
+        "vkmax.fastapi.requests",
     ]:
         lg = logging.getLogger(name)
         lg.setLevel(level)
@@ -77,5 +135,7 @@ def setup_logging(level: int = logging.INFO, extra_loggers: Iterable[str] | None
             lg.propagate = True
 
 
-__all__ = ["setup_logging"]
+atexit.register(shutdown_logging)
+
 
+__all__ = ["setup_logging", "shutdown_logging"]
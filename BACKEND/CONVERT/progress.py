@@ -0,0 +1,97 @@
+# Руководство к файлу (CONVERT/progress.py)
+# Назначение:
+# - Учёт этапов обработки операции (extract/llm/render/crawl/db_write и т.п.):
+#   длительность по монотонным часам и прогресс после этапа пишутся в operation_events.
+# - Используется conversion_service, graph_service и webparser_service.
+# Использование:
+#   async with track_stage(session, operation_id, "extract", progress=30):
+#       text = extract_plain_text(...)
+# Важно:
+# - Событие этапа фиксируется сразу, отдельной короткой сессией: progress_bus публикует
+#   его после commit, и клиент видит прогресс по этапам, а не скачок к концу задачи.
+#   Если транзакция задачи уже что-то записала (flush), событие пишется в её сессию:
+#   на SQLite вторая пишущая сессия ждала бы блокировку, которую держит задача.
+# - Ошибка записи события не ломает конвертацию: логируется и проглатывается.
+# - Исключение внутри этапа записывается как outcome="error" и пробрасывается дальше;
+#   отмена (CancelledError) пробрасывается без записи.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from BACKEND.DATABASE.CACHE_MANAGER import EventsManager
+from BACKEND.DATABASE.session import async_session_factory
+
+
+logger = logging.getLogger("vkmax.convert.progress")
+
+_WRITES_KEY = "vkmax_tx_has_writes"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_writes(session: Session, _flush_context) -> None:
+    session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _clear_writes(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_WRITES_KEY, None)
+
+
+async def _record(
+    session: AsyncSession,
+    operation_id: int,
+    stage: str,
+    *,
+    duration_ms: float,
+    ok: bool,
+    progress: Optional[int],
+    detail: Optional[str],
+) -> None:
+    kwargs = {"duration_ms": duration_ms, "ok": ok, "progress": progress, "detail": detail}
+    try:
+        if session.info.get(_WRITES_KEY):
+            await EventsManager(session).record_stage(operation_id, stage, **kwargs)
+            return
+        async with async_session_factory() as own:
+            await EventsManager(own).record_stage(operation_id, stage, **kwargs)
+            await own.commit()
+    except Exception as exc:  # noqa: WPS430
+        logger.warning("[progress._record] Failed to record stage=%s op=%s: %s", stage, operation_id, exc)
+
+
+@asynccontextmanager
+async def track_stage(
+    session: AsyncSession,
+    operation_id: int,
+    stage: str,
+    *,
+    progress: Optional[int] = None,
+) -> AsyncIterator[None]:
+    """Замеряет этап *stage* операции и пишет событие с длительностью и прогрессом."""
+
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        # Отмена/таймаут задачи: транзакцию откатит JobDispatcher, событие не пишем
+        raise
+    except BaseException as exc:
+        duration_ms = (time.perf_counter() - started) * 1000.0
+        await _record(session, operation_id, stage, duration_ms=duration_ms, ok=False, progress=None, detail=str(exc)[:1000])
+        raise
+    duration_ms = (time.perf_counter() - started) * 1000.0
+    logger.debug("[progress.track_stage] op=%s stage=%s %.1fms", operation_id, stage, duration_ms)
+    await _record(session, operation_id, stage, duration_ms=duration_ms, ok=True, progress=progress, detail=None)
+
+
+__all__ = ["track_stage"]
@@ -0,0 +1,176 @@
+# Руководство к файлу (CONVERT/progress_bus.py)
+# Назначение:
+# - Внутрипроцессная pub/sub-шина прогресса операций для push-доставки клиентам
+#   (SSE /operations/stream и WebSocket /operations/ws) вместо поллинга статусов.
+# - Источники событий:
+#   * operation_events (смены статуса и этапы track_stage) — публикуются после
+#     commit сессии, откатанные события наружу не уходят;
+#   * «живой» прогресс без записи в БД — счётчик страниц CrawlerOrchestrator и
+#     попытки LLM в DocumentGenerator (publish_progress из сервисов).
+# Важно:
+# - Шина локальна для процесса: при нескольких воркерах клиент получает события
+#   только операций, выполняемых в том же процессе (финальный статус всегда можно
+#   дочитать снапшотом из БД при переподключении).
+# - Медленный подписчик не тормозит издателей: очередь ограничена, старые события
+#   вытесняются новыми; ProgressBus.dropped — счётчик вытесненных событий процесса
+#   (метрика vkmax_progress_events_dropped_total).
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from BACKEND.DATABASE.CACHE_MANAGER.events import FINAL_STATUSES as _FINAL_STATUSES
+from BACKEND.DATABASE.models import OperationEvent
+
+
+logger = logging.getLogger("vkmax.convert.progress_bus")
+
+FINAL_STATUSES = frozenset(_FINAL_STATUSES)
+_PENDING_KEY = "vkmax_progress_events"
+_DEFAULT_QUEUE_SIZE = 256
+
+
+def is_final(event_data: Dict[str, Any]) -> bool:
+    return event_data.get("type") == "status" and event_data.get("status") in FINAL_STATUSES
+
+
+class Subscription:
+    """Подписка на события набора операций (ids=None — на все операции)."""
+
+    def __init__(self, bus: "ProgressBus", ids: Optional[Iterable[int]], maxsize: int = _DEFAULT_QUEUE_SIZE):
+        self._bus = bus
+        self.ids: Optional[Set[int]] = {int(i) for i in ids} if ids is not None else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, operation_id: int) -> bool:
+        return self.ids is None or operation_id in self.ids
+
+    def add(self, ids: Iterable[int]) -> None:
+        if self.ids is not None:
+            self.ids.update(int(i) for i in ids)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        if self.ids is not None:
+            self.ids.difference_update(int(i) for i in ids)
+
+    def push(self, event_data: Dict[str, Any]) -> None:
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self._bus.dropped += 1
+            except asyncio.QueueEmpty:  # pragma: no cover - гонки нет в одном потоке
+                pass
+        self.queue.put_nowait(event_data)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Следующее событие или None по таймауту."""
+
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ProgressBus:
+    def __init__(self) -> None:
+        self._subs: Set[Subscription] = set()
+        self.dropped = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self, ids: Optional[Iterable[int]] = None, *, maxsize: int = _DEFAULT_QUEUE_SIZE) -> Subscription:
+        sub = Subscription(self, ids, maxsize=maxsize)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+
+    def publish(self, event_data: Dict[str, Any]) -> None:
+        """Рассылает событие подписчикам (вызывать из потока event loop)."""
+
+        op_id = int(event_data["operation_id"])
+        for sub in list(self._subs):
+            if sub.matches(op_id):
+                sub.push(event_data)
+
+    def publish_progress(self, operation_id: int, stage: str, *, progress: Optional[int] = None, **data: Any) -> None:
+        """Промежуточный прогресс этапа без записи в БД (страницы обхода, попытки LLM)."""
+
+        if not self._subs:
+            return
+        payload: Dict[str, Any] = {
+            "operation_id": int(operation_id),
+            "type": "progress",
+            "stage": stage,
+            "progress": progress,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        payload.update(data)
+        self.publish(payload)
+
+
+progress_bus = ProgressBus()
+
+
+def event_payload(ev: OperationEvent) -> Dict[str, Any]:
+    created = ev.created_at or datetime.now(timezone.utc)
+    payload: Dict[str, Any] = {
+        "operation_id": int(ev.operation_id),
+        "type": ev.kind,
+        "progress": ev.progress,
+        "at": (created if created.tzinfo else created.replace(tzinfo=timezone.utc)).isoformat(),
+    }
+    if ev.kind == "status":
+        payload["status"] = ev.name
+        if ev.detail:
+            payload["detail"] = ev.detail
+    else:
+        payload["stage"] = ev.name
+        payload["outcome"] = ev.outcome
+        payload["duration_ms"] = round(ev.duration_ms, 2) if ev.duration_ms is not None else None
+    return payload
+
+
+@event.listens_for(OperationEvent, "after_insert")
+def _collect_operation_event(mapper, connection, target: OperationEvent) -> None:  # noqa: ANN001
+    sess = object_session(target)
+    if sess is not None:
+        sess.info.setdefault(_PENDING_KEY, []).append(event_payload(target))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    pending: List[Dict[str, Any]] = session.info.pop(_PENDING_KEY, None) or []
+    for item in pending:
+        try:
+            progress_bus.publish(item)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[progress_bus._publish_committed] publish failed: %s", exc)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+__all__ = ["ProgressBus", "Subscription", "progress_bus", "event_payload", "is_final", "FINAL_STATUSES"]
@@ -0,0 +1,183 @@
+# Руководство к файлу (CONVERT/retry_policy.py)
+# Назначение:
+# - Политика повторов задач конвертации при временных сбоях:
+#   * classify(exc) — transient (сеть, 429/5xx внешнего API, занятая SQLite, падение
+#     процесса cpu_pool / wkhtmltopdf, нехватка ресурсов ОС) или permanent (битый
+#     исходник, неподдерживаемый формат, ошибка в данных);
+#   * RetryPolicy — число попыток VKMAX_RETRY_MAX_ATTEMPTS (3), экспоненциальная пауза
+#     VKMAX_RETRY_BASE_SEC (2) × 2^(n-1), не больше VKMAX_RETRY_MAX_SEC (60), с full jitter;
+#   * note_error(exc) — сервис сообщает пойманное исключение перед тем, как пометить
+#     операцию failed: сам он ошибку не пробрасывает, а решение о повторе принимает
+#     JobDispatcher.
+# Важно:
+# - Реестр ошибок — contextvar задачи диспетчера: вне JobDispatcher.execute note_error
+#   ничего не делает.
+# - Исключения из процесса cpu_pool приходят без __cause__ (pickle), поэтому для
+#   ConversionError дополнительно смотрим на текст ошибки.
+# - OSError временна только с errno из _TRANSIENT_ERRNOS (EAGAIN, EINTR, EBUSY, ...) или по
+#   тексту (авария wkhtmltopdf приходит как IOError без errno); прочие (ENOSPC, EINVAL,
+#   битый файл) считаются постоянными.
+
+from __future__ import annotations
+
+import contextvars
+import errno
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Type
+
+import httpx
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from .cpu_pool import WorkerCrashed
+
+
+_errors: contextvars.ContextVar[Optional[List[BaseException]]] = contextvars.ContextVar("vkmax_job_errors", default=None)
+
+# Коды ответа внешних API, после которых стоит повторить запрос позже
+RETRYABLE_HTTP_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Сбои рендера/ОС, которые не зависят от исходника
+_TRANSIENT_MARKERS = (
+    "wkhtmltopdf exited with non-zero code",
+    "resource temporarily unavailable",
+    "cannot allocate memory",
+    "too many open files",
+    "database is locked",
+    "database is busy",
+)
+
+# Ошибки файловой системы, повтор которых ничего не изменит
+_PERMANENT_OS_ERRORS: Tuple[Type[BaseException], ...] = (
+    FileNotFoundError,
+    IsADirectoryError,
+    NotADirectoryError,
+    PermissionError,
+)
+
+# errno сбоев ОС и сети, которые проходят сами
+_TRANSIENT_ERRNOS = frozenset(
+    getattr(errno, name)
+    for name in (
+        "EAGAIN",
+        "EWOULDBLOCK",
+        "EINTR",
+        "EBUSY",
+        "ETIMEDOUT",
+        "ECONNRESET",
+        "ECONNREFUSED",
+        "ECONNABORTED",
+        "EPIPE",
+        "ENETDOWN",
+        "ENETUNREACH",
+        "EHOSTUNREACH",
+        "ENOBUFS",
+        "ENOMEM",
+        "EMFILE",
+        "ENFILE",
+    )
+    if hasattr(errno, name)
+)
+
+_TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    WorkerCrashed,
+    TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+    subprocess.TimeoutExpired,
+)
+
+
+def _aiohttp_transient(exc: BaseException) -> bool:
+    # aiohttp не импортируется ради классификации: если модуль ещё не загружен,
+    # его исключений в процессе быть не может
+    aiohttp = sys.modules.get("aiohttp")
+    return aiohttp is not None and isinstance(exc, (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError))
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_sec: float = 2.0
+    max_sec: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=max(1, int(_env_float("VKMAX_RETRY_MAX_ATTEMPTS", 3))),
+            base_sec=_env_float("VKMAX_RETRY_BASE_SEC", 2.0),
+            max_sec=_env_float("VKMAX_RETRY_MAX_SEC", 60.0),
+        )
+
+    def delay(self, attempt: int, rng: Optional[random.Random] = None) -> float:
+        """Пауза перед попыткой attempt + 1: случайная в [0, min(max, base × 2^(attempt-1))]."""
+
+        cap = min(self.max_sec, self.base_sec * (2 ** max(0, attempt - 1)))
+        return (rng or random).uniform(0.0, cap)
+
+
+def _chain(exc: BaseException) -> Iterator[BaseException]:
+    seen = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, _PERMANENT_OS_ERRORS):
+        return False
+    if isinstance(exc, _TRANSIENT_ERRORS) or _aiohttp_transient(exc):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_HTTP_STATUSES
+    status = getattr(exc, "status", None)
+    if type(exc).__module__.startswith("aiohttp") and isinstance(status, int):
+        return status in RETRYABLE_HTTP_STATUSES
+    if isinstance(exc, DBAPIError):
+        return bool(exc.connection_invalidated) or (isinstance(exc, OperationalError) and _has_marker(exc))
+    if isinstance(exc, sqlite3.OperationalError):
+        return _has_marker(exc)
+    if isinstance(exc, OSError) and exc.errno in _TRANSIENT_ERRNOS:
+        return True
+    # wkhtmltopdf сообщает об аварии через IOError без errno — узнаём по тексту
+    return _has_marker(exc)
+
+
+def _has_marker(exc: BaseException) -> bool:
+    text = str(exc).lower()
+    return any(marker in text for marker in _TRANSIENT_MARKERS)
+
+
+def classify(exc: BaseException) -> str:
+    """transient — повтор может помочь, permanent — операция упадёт так же."""
+
+    return "transient" if any(_is_transient(e) for e in _chain(exc)) else "permanent"
+
+
+def bind_errors(errors: List[BaseException]) -> None:
+    """Связывает текущую задачу со списком, куда note_error складывает исключения."""
+
+    _errors.set(errors)
+
+
+def note_error(exc: BaseException) -> None:
+    errors = _errors.get()
+    if errors is not None:
+        errors.append(exc)
+
+
+__all__ = ["RETRYABLE_HTTP_STATUSES", "RetryPolicy", "classify", "bind_errors", "note_error"]
@@ -0,0 +1,170 @@
+# Руководство к файлу (CONVERT/scheduler.py)
+# Назначение:
+# - FairScheduler — пул слотов исполнения с приоритетными классами и честной (fair-share)
+#   очередью между пользователями. Используется JobDispatcher: отдельный экземпляр на
+#   пул cpu / network / trivial, чтобы короткие задачи не ждали длинных.
+# Алгоритм:
+# - Классы приоритета: interactive (0) > batch (1) > background (2); строгий приоритет,
+#   но ожидающая задача повышается на класс каждые aging_sec (защита от голодания).
+# - Внутри класса — start-time fair queuing: у пользователя своё виртуальное время,
+#   задача получает start_tag = max(vtime пула, finish последней задачи пользователя),
+#   finish = start_tag + cost. Выбирается минимальный start_tag, поэтому пользователь
+#   с сотней задач не вытесняет пользователя с одной, а дорогие задачи (cost из
+#   CONVERTER_REGISTRY) расходуют долю пользователя быстрее дешёвых.
+# - user_limit — сколько слотов пула одновременно может занять один пользователь.
+# Важно:
+# - Работает в одном event loop; состояние в памяти процесса.
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Optional
+
+
+PRIORITIES: Dict[str, int] = {"interactive": 0, "batch": 1, "background": 2}
+
+
+def priority_level(name: Optional[str]) -> int:
+    return PRIORITIES.get(str(name or "batch"), PRIORITIES["batch"])
+
+
+@dataclass(eq=False)
+class Ticket:
+    user: Hashable
+    priority: int
+    cost: float
+    start_tag: float
+    seq: int
+    enqueued_at: float
+    future: asyncio.Future = field(repr=False)
+    granted_at: Optional[float] = None
+
+    @property
+    def waited(self) -> float:
+        return (self.granted_at - self.enqueued_at) if self.granted_at is not None else 0.0
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        *,
+        user_limit: Optional[int] = None,
+        aging_sec: Optional[float] = 60.0,
+    ) -> None:
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self.user_limit = user_limit if user_limit and user_limit > 0 else None
+        self.aging_sec = aging_sec if aging_sec and aging_sec > 0 else None
+        self._queues: Dict[int, Dict[Hashable, Deque[Ticket]]] = {}
+        self._finish: Dict[Hashable, float] = {}
+        self._running_by_user: Dict[Hashable, int] = {}
+        self._vtime = 0.0
+        self._seq = itertools.count()
+        self.running = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for users in self._queues.values() for q in users.values())
+
+    def stats(self) -> Dict[str, Any]:
+        by_class = {
+            name: sum(len(q) for q in self._queues.get(level, {}).values())
+            for name, level in PRIORITIES.items()
+        }
+        return {"capacity": self.capacity, "running": self.running, "queued": by_class}
+
+    def _effective_priority(self, ticket: Ticket, now: float) -> int:
+        if self.aging_sec is None or ticket.priority == 0:
+            return ticket.priority
+        return max(0, ticket.priority - int((now - ticket.enqueued_at) // self.aging_sec))
+
+    def _pick(self) -> Optional[Ticket]:
+        now = asyncio.get_running_loop().time()
+        best: Optional[Ticket] = None
+        best_key = None
+        for users in self._queues.values():
+            for user, queue in users.items():
+                if not queue:
+                    continue
+                if self.user_limit is not None and self._running_by_user.get(user, 0) >= self.user_limit:
+                    continue
+                head = queue[0]
+                key = (self._effective_priority(head, now), head.start_tag, head.seq)
+                if best_key is None or key < best_key:
+                    best, best_key = head, key
+        return best
+
+    def _unqueue(self, ticket: Ticket) -> bool:
+        users = self._queues.get(ticket.priority, {})
+        queue = users.get(ticket.user)
+        if not queue or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        if not queue:
+            del users[ticket.user]
+        return True
+
+    def _dispatch(self) -> None:
+        while self.running < self.capacity:
+            ticket = self._pick()
+            if ticket is None:
+                return
+            self._unqueue(ticket)
+            self._vtime = max(self._vtime, ticket.start_tag)
+            self.running += 1
+            self._running_by_user[ticket.user] = self._running_by_user.get(ticket.user, 0) + 1
+            ticket.granted_at = asyncio.get_running_loop().time()
+            ticket.future.set_result(None)
+
+    async def acquire(self, user: Hashable, *, priority: str = "batch", cost: float = 1.0) -> Ticket:
+        loop = asyncio.get_running_loop()
+        start_tag = max(self._vtime, self._finish.get(user, 0.0))
+        self._finish[user] = start_tag + max(0.0, float(cost))
+        ticket = Ticket(
+            user=user,
+            priority=priority_level(priority),
+            cost=float(cost),
+            start_tag=start_tag,
+            seq=next(self._seq),
+            enqueued_at=loop.time(),
+            future=loop.create_future(),
+        )
+        self._queues.setdefault(ticket.priority, {}).setdefault(user, deque()).append(ticket)
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if not self._unqueue(ticket) and ticket.granted_at is not None:
+                # Слот уже выдан, но ожидающий отменён — возвращаем слот
+                self.release(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        self.running -= 1
+        left = self._running_by_user.get(ticket.user, 1) - 1
+        if left > 0:
+            self._running_by_user[ticket.user] = left
+        else:
+            self._running_by_user.pop(ticket.user, None)
+            # Пользователь без задач не копит «долг»: его finish ≤ vtime будет поднят при следующей задаче
+            if not any(ticket.user in users for users in self._queues.values()) and self._finish.get(ticket.user, 0.0) <= self._vtime:
+                self._finish.pop(ticket.user, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user: Hashable, *, priority: str = "batch", cost: float = 1.0) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire(user, priority=priority, cost=cost)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+
+__all__ = ["FairScheduler", "Ticket", "PRIORITIES", "priority_level"]
@@ -0,0 +1,67 @@
+# Руководство к файлу (CONVERT/shared_work.py)
+# Назначение:
+# - Общая работа внутри пакета /batch-convert: sha256 исходника считается один раз,
+#   текст документа извлекается один раз на (хэш, формат) — даже если один и тот же
+#   файл пришёл в пакете несколько раз или под разными file_id.
+# - Single-flight: параллельные запросы одного ключа ждут одну и ту же задачу.
+# - Хэш, уже известный из files.sha256 (посчитан при загрузке), передаётся как known и
+#   файл не перечитывается.
+# Важно:
+# - Экземпляр живёт столько же, сколько пакет (создаётся JobDispatcher.submit_batch),
+#   память освобождается вместе с ним.
+# - Ошибка вычисления запоминается: повтор в том же пакете получит то же исключение.
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .converters import extract_plain_text
+from .cpu_pool import run_cpu
+
+
+_CHUNK = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _value(value: Any) -> Any:
+    return value
+
+
+class SharedWork:
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+
+    async def _once(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._tasks.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(factory())
+            self._tasks[key] = fut
+        else:
+            self.hits += 1
+        # shield: отмена одного ожидающего не отменяет общую задачу для остальных
+        return await asyncio.shield(fut)
+
+    async def file_digest(self, path: str, known: Optional[str] = None) -> str:
+        if known:
+            return await self._once(("sha256", path), lambda: _value(known))
+        return await self._once(("sha256", path), lambda: asyncio.to_thread(sha256_file, path))
+
+    async def content_digest(self, key: Hashable, content: Optional[bytes]) -> str:
+        return await self._once(("sha256", key), lambda: asyncio.to_thread(lambda: hashlib.sha256(content or b"").hexdigest()))
+
+    async def plain_text(self, path: str, input_format: str, max_words: int = 10_000) -> str:
+        digest = await self.file_digest(path)
+        return await self._once(("text", digest, input_format, max_words), lambda: run_cpu(extract_plain_text, path, input_format, max_words))
+
+
+__all__ = ["SharedWork", "sha256_file"]
@@ -0,0 +1,133 @@
+# Руководство к файлу (CONVERT/warmup.py)
+# Назначение:
+# - Прогрев процесса по роли: тяжёлые библиотеки импортируются лениво (при первой
+#   конвертации/обходе), warmup(roles) загружает заранее только то, что нужно роли:
+#   * api     — модули сервисов CONVERT (без тяжёлых зависимостей);
+#   * convert — библиотеки конвертеров (mammoth, pdfkit, python-docx, pdf2docx, fitz,
+#     reportlab). В режиме cpu_pool=process они нужны не этому процессу, а процессам
+#     пула: warmup запускает пул заранее (cpu_pool.prestart), и каждый процесс
+#     импортирует их сам, пока API уже отвечает;
+#   * crawl   — стек WebParser (aiohttp, tldextract, selectolax, bs4, оркестратор обхода).
+# - Роли процесса API — Settings.warmup_roles (VKMAX_WARMUP_ROLES, по умолчанию
+#   api,convert,crawl; off — без прогрева). lifespan запускает прогрев в фоновом потоке
+#   (start_background), мастер FAST_API/server.py — синхронно до fork, без запуска пула.
+# Важно:
+# - Отсутствующая библиотека не ошибка прогрева: она пишется в лог, а конвертер, которому
+#   она нужна, сообщит об ошибке при вызове, как и без прогрева.
+# - Бот в прогреве не участвует: он обращается к API только по HTTP и тяжёлых библиотек не импортирует.
+
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import cpu_pool
+
+logger = logging.getLogger("vkmax.convert.warmup")
+
+CONVERTER_MODULES: Tuple[str, ...] = (
+    "mammoth",
+    "pdfkit",
+    "docx",
+    "pdf2docx",
+    "fitz",
+    "reportlab.platypus",
+)
+
+ROLES: Dict[str, Tuple[str, ...]] = {
+    "api": (
+        "BACKEND.CONVERT.conversion_service",
+        "BACKEND.CONVERT.graph_service",
+        "BACKEND.CONVERT.webparser_service",
+    ),
+    "convert": CONVERTER_MODULES,
+    "crawl": (
+        "aiohttp",
+        "tldextract",
+        "selectolax.parser",
+        "bs4",
+        "BACKEND.WebParser.webparser.orchestrator.crawler",
+        "BACKEND.WebParser.webparser.export.site_bundle",
+        "BACKEND.WebParser.webparser.graph.exporters",
+    ),
+}
+
+
+def parse_roles(value: Optional[str]) -> Tuple[str, ...]:
+    """"api,convert" → ("api", "convert"); off / пусто — без прогрева; неизвестные роли пропускаются."""
+
+    raw = (value or "").strip().lower()
+    if raw in ("", "0", "off", "none", "false", "no"):
+        return ()
+    roles = []
+    for name in raw.split(","):
+        name = name.strip()
+        if name in ROLES and name not in roles:
+            roles.append(name)
+        elif name:
+            logger.warning("[warmup.parse_roles] unknown role %r ignored", name)
+    return tuple(roles)
+
+
+def import_modules(modules: Iterable[str]) -> Dict[str, float]:
+    """Импортирует модули, возвращает {модуль: секунды}; отсутствующие пропускаются."""
+
+    timings: Dict[str, float] = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            logger.warning("[warmup.import_modules] %s not available: %s", name, exc)
+            continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def warmup(*roles: str, prestart_pool: bool = True) -> Dict[str, float]:
+    """Прогревает процесс под роли; prestart_pool=False — только импорты в этом процессе."""
+
+    modules = []
+    for role in roles:
+        for name in ROLES.get(role, ()):
+            if name not in modules:
+                modules.append(name)
+    if "convert" in roles and cpu_pool.pool_mode() == "process":
+        # Конвертеры выполняются в процессах пула: здесь их импортировать незачем
+        modules = [name for name in modules if name not in CONVERTER_MODULES]
+        if prestart_pool:
+            started = cpu_pool.prestart(CONVERTER_MODULES)
+            logger.info("[warmup.warmup] prestarted %s cpu workers", started)
+    started_at = time.perf_counter()
+    timings = import_modules(modules)
+    logger.info(
+        "[warmup.warmup] roles=%s modules=%s in %.0f ms",
+        ",".join(roles),
+        len(timings),
+        (time.perf_counter() - started_at) * 1000,
+    )
+    return timings
+
+
+def start_background(roles: Tuple[str, ...]) -> Optional[threading.Thread]:
+    """Пул запускается сразу (в потоке вызывающего), импорты — в фоновом потоке."""
+
+    if not roles:
+        return None
+    if "convert" in roles and cpu_pool.pool_mode() == "process":
+        cpu_pool.prestart(CONVERTER_MODULES)
+    thread = threading.Thread(
+        target=warmup,
+        args=roles,
+        kwargs={"prestart_pool": False},
+        name="vkmax-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+__all__ = ["CONVERTER_MODULES", "ROLES", "import_modules", "parse_roles", "start_background", "warmup"]
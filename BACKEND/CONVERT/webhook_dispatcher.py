@@ -0,0 +1,323 @@
+# Руководство к файлу (CONVERT/webhook_dispatcher.py)
+# Назначение:
+# - Воркер исходящих вебхуков: забирает созревшие доставки из webhook_deliveries
+#   (WebhookManager.claim_due) и отправляет их POST-запросами на адреса подписчиков.
+# - Пакетирование: события одного адреса уходят одним запросом {"events": [...]}
+#   до VKMAX_WEBHOOK_BATCH_SIZE (20) штук.
+# - Подпись: заголовок X-VKMax-Signature: t=<unix>,v1=<hex HMAC-SHA256(secret, "<t>." + body)>;
+#   получатель проверяет её verify_signature (допуск по времени — защита от повторов).
+# - Ограничения: не больше max_concurrency адреса (или VKMAX_WEBHOOK_ENDPOINT_CONCURRENCY=2)
+#   одновременных запросов на адрес и VKMAX_WEBHOOK_CONCURRENCY (16) всего.
+# - Повторы: ответ 408/425/429/5xx и сетевые ошибки — пауза RetryPolicy
+#   (VKMAX_WEBHOOK_RETRY_BASE_SEC=5 × 2^(n-1), не больше VKMAX_WEBHOOK_RETRY_MAX_SEC=3600, jitter;
+#   Retry-After ответа учитывается); после VKMAX_WEBHOOK_MAX_ATTEMPTS (8) попыток или при
+#   постоянной ошибке (прочие 4xx) доставка получает статус dead.
+# Важно:
+# - Цикл start()/stop() запускает lifespan приложения (VKMAX_WEBHOOK_WORKER=off отключает);
+#   run_once() — один проход очереди (тесты, ручной запуск).
+# - Новые события будят цикл через progress_bus (финальные статусы), иначе — опрос
+#   раз в VKMAX_WEBHOOK_POLL_SEC (5 с). Очередь в БД: несколько процессов могут
+#   работать одновременно, аренда строк не даёт отправить событие дважды параллельно.
+# - Доставка «как минимум один раз»: получатель дедуплицирует по events[].id.
+# - Защита от SSRF: PublicOnlyTransport резолвит хост перед каждым запросом и соединяется
+#   с проверенным IP (Host и SNI — исходного имени), так что перепривязка DNS после
+#   регистрации не приведёт запрос на loopback/private/link-local адрес. Такой адрес —
+#   постоянная ошибка (доставка сразу dead); редиректы не выполняются.
+#   VKMAX_WEBHOOK_ALLOW_PRIVATE=1 снимает ограничение (локальный приёмник бота).
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .progress_bus import is_final, progress_bus
+from .retry_policy import RETRYABLE_HTTP_STATUSES, RetryPolicy, classify
+from BACKEND.DATABASE.CACHE_MANAGER import WebhookManager
+from BACKEND.DATABASE.session import async_session_factory
+
+
+logger = logging.getLogger("vkmax.convert.webhooks")
+
+SIGNATURE_HEADER = "X-VKMax-Signature"
+_MAX_ERROR_LEN = 500
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def sign_payload(secret: str, body: bytes, timestamp: int) -> str:
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, body: bytes, header: str, *, tolerance_sec: float = 300.0, now: Optional[float] = None) -> bool:
+    """Проверка подписи на стороне получателя: HMAC совпадает и метка не старше *tolerance_sec*."""
+
+    try:
+        parts = dict(item.split("=", 1) for item in (header or "").split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs((time.time() if now is None else now) - timestamp) > tolerance_sec:
+        return False
+    expected = sign_payload(secret, body, timestamp).split("v1=", 1)[1]
+    return hmac.compare_digest(expected, parts.get("v1", ""))
+
+
+def webhook_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=max(1, int(_env_float("VKMAX_WEBHOOK_MAX_ATTEMPTS", 8))),
+        base_sec=_env_float("VKMAX_WEBHOOK_RETRY_BASE_SEC", 5.0),
+        max_sec=_env_float("VKMAX_WEBHOOK_RETRY_MAX_SEC", 3600.0),
+    )
+
+
+class BlockedAddressError(httpx.RequestError):
+    """Хост вебхука указывает на внутренний адрес — доставка не выполняется."""
+
+
+def private_allowed() -> bool:
+    return os.getenv("VKMAX_WEBHOOK_ALLOW_PRIVATE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def is_internal_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_multicast or ip.is_reserved or ip.is_unspecified
+
+
+async def resolve_host(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+async def check_public_host(host: str, port: int) -> List[str]:
+    """Адреса хоста; BlockedAddressError — среди них есть внутренний, OSError — хост не резолвится."""
+
+    addresses = await resolve_host(host, port)
+    if not addresses:
+        raise OSError(f"{host} has no addresses")
+    blocked = sorted(a for a in addresses if is_internal_address(a))
+    if blocked and not private_allowed():
+        raise BlockedAddressError(f"{host} resolves to internal address {', '.join(blocked)}")
+    return addresses
+
+
+class PublicOnlyTransport(httpx.AsyncBaseTransport):
+    """Транспорт доставок: соединение только с проверенным публичным IP хоста."""
+
+    def __init__(self, inner: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        host = url.host
+        try:
+            addresses = await check_public_host(host, url.port or (443 if url.scheme == "https" else 80))
+        except OSError as exc:
+            raise httpx.ConnectError(f"{host} does not resolve: {exc}", request=request) from exc
+        except BlockedAddressError as exc:
+            exc.request = request
+            raise
+        # Соединяемся с проверенным адресом: повторный резолв в httpcore мог бы вернуть другой
+        request.url = url.copy_with(host=addresses[0])
+        request.headers["Host"] = url.netloc.decode("ascii")
+        if url.scheme == "https":
+            request.extensions = {**request.extensions, "sni_hostname": host}
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def _retry_after(resp: httpx.Response) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", "") or 0))
+    except ValueError:
+        return 0.0
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        *,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._session_factory = session_factory or async_session_factory
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._limits: Dict[Tuple[int, int], asyncio.Semaphore] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.failed = 0
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                transport=self._transport or PublicOnlyTransport(),
+                follow_redirects=False,
+                timeout=_env_float("VKMAX_WEBHOOK_TIMEOUT_SEC", 10.0),
+                headers={"User-Agent": "VKMax-Webhooks/1.0"},
+            )
+        return self._client
+
+    def _endpoint_limit(self, endpoint_id: int, max_concurrency: Optional[int]) -> asyncio.Semaphore:
+        size = max(1, int(max_concurrency or _env_float("VKMAX_WEBHOOK_ENDPOINT_CONCURRENCY", 2)))
+        sem = self._limits.get((endpoint_id, size))
+        if sem is None:
+            sem = self._limits[(endpoint_id, size)] = asyncio.Semaphore(size)
+        return sem
+
+    async def _post(self, url: str, secret: str, payloads: List[str]) -> httpx.Response:
+        body = ('{"events":[' + ",".join(payloads) + "]}").encode()
+        headers = {"Content-Type": "application/json", SIGNATURE_HEADER: sign_payload(secret, body, int(time.time()))}
+        return await self._http().post(url, content=body, headers=headers)
+
+    async def _deliver(self, items: List[Dict[str, Any]], policy: RetryPolicy, total: asyncio.Semaphore) -> None:
+        """Один запрос с пакетом событий одного адреса и запись результата."""
+
+        head = items[0]
+        ids = [it["id"] for it in items]
+        error: Optional[str] = None
+        transient = False
+        not_before = 0.0
+        if not head["active"]:
+            error = "endpoint disabled"
+        else:
+            try:
+                # Сначала слот адреса: медленный адрес не держит общие слоты в ожидании
+                async with self._endpoint_limit(head["endpoint_id"], head["max_concurrency"]), total:
+                    resp = await self._post(head["url"], head["secret"], [it["payload"] for it in items])
+                if resp.status_code >= 300:
+                    error = f"HTTP {resp.status_code}"
+                    transient = resp.status_code in RETRYABLE_HTTP_STATUSES
+                    not_before = _retry_after(resp)
+            except BlockedAddressError as exc:
+                error = f"blocked address: {exc}"[:_MAX_ERROR_LEN]
+            except httpx.HTTPError as exc:
+                error = f"{type(exc).__name__}: {exc}"[:_MAX_ERROR_LEN]
+                transient = classify(exc) == "transient"
+
+        async with self._session_factory() as session:
+            wm = WebhookManager(session)
+            if error is None:
+                await wm.mark_delivered(ids)
+                self.delivered += len(ids)
+            else:
+                self.failed += len(ids)
+                retry = [it["id"] for it in items if transient and it["attempts"] < policy.max_attempts]
+                dead = [i for i in ids if i not in retry]
+                if retry:
+                    delay = max(policy.delay(max(it["attempts"] for it in items)), not_before)
+                    await wm.reschedule(retry, next_attempt_at=time.time() + delay, error=error)
+                await wm.mark_dead(dead, error=error)
+                logger.warning(
+                    "[webhook_dispatcher._deliver] endpoint=%s events=%s failed: %s (retry=%s, dead=%s)",
+                    head["endpoint_id"],
+                    len(ids),
+                    error,
+                    len(retry),
+                    len(dead),
+                )
+            await session.commit()
+
+    async def run_once(self, *, limit: int = 200) -> int:
+        """Один проход: забрать созревшие доставки, отправить пачками; возвращает их число."""
+
+        lease = _env_float("VKMAX_WEBHOOK_LEASE_SEC", 60.0)
+        async with self._session_factory() as session:
+            claimed = await WebhookManager(session).claim_due(now=time.time(), limit=limit, lease_sec=lease)
+            await session.commit()
+        if not claimed:
+            return 0
+        batch_size = max(1, int(_env_float("VKMAX_WEBHOOK_BATCH_SIZE", 20)))
+        by_endpoint: Dict[int, List[Dict[str, Any]]] = {}
+        for item in claimed:
+            by_endpoint.setdefault(item["endpoint_id"], []).append(item)
+        chunks = [items[i : i + batch_size] for items in by_endpoint.values() for i in range(0, len(items), batch_size)]
+        policy = webhook_retry_policy()
+        total = asyncio.Semaphore(max(1, int(_env_float("VKMAX_WEBHOOK_CONCURRENCY", 16))))
+        results = await asyncio.gather(*(self._deliver(chunk, policy, total) for chunk in chunks), return_exceptions=True)
+        for res in results:
+            if isinstance(res, BaseException):
+                # Аренда истечёт, и доставку возьмёт следующий проход
+                logger.error("[webhook_dispatcher.run_once] delivery chunk failed: %s", res)
+        return len(claimed)
+
+    async def _sleep_until_next(self, sub: Any) -> None:
+        poll = _env_float("VKMAX_WEBHOOK_POLL_SEC", 5.0)
+        try:
+            async with self._session_factory() as session:
+                due_at = await WebhookManager(session).next_due_at()
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[webhook_dispatcher._sleep_until_next] %s", exc)
+            due_at = None
+        timeout = poll if due_at is None else min(poll, max(0.0, due_at - time.time()))
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            event = await sub.get(timeout=left)
+            if event is not None and is_final(event):
+                return
+
+    async def _loop(self) -> None:
+        logger.info("[webhook_dispatcher._loop] started")
+        with progress_bus.subscribe(None, maxsize=64) as sub:
+            while True:
+                try:
+                    processed = await self.run_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:  # noqa: WPS430
+                    logger.exception("[webhook_dispatcher._loop] pass failed: %s", exc)
+                    processed = 0
+                if processed == 0:
+                    await self._sleep_until_next(sub)
+
+    def start(self) -> None:
+        if (os.getenv("VKMAX_WEBHOOK_WORKER", "") or "on").strip().lower() in ("0", "off", "false", "no"):
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+webhook_dispatcher = WebhookDispatcher()
+
+
+__all__ = [
+    "SIGNATURE_HEADER",
+    "BlockedAddressError",
+    "PublicOnlyTransport",
+    "check_public_host",
+    "is_internal_address",
+    "private_allowed",
+    "sign_payload",
+    "verify_signature",
+    "webhook_retry_policy",
+    "WebhookDispatcher",
+    "webhook_dispatcher",
+]
@@ -5,37 +5,51 @@
 #   JSON-bundle и сохраняет его в File.content, обновляя Operation.
 # - Дополнительно строит GraphJson-представление (подграфы) из site_bundle
 #   для динамической визуализации и поиска по сайту.
+# - Страницы и рёбра bundle также пишутся в site_pages/site_edges (SiteManager):
+#   поиск с query идёт индексированным запросом (FTS5/tsvector), а разбор
+#   File.content остаётся фолбэком для bundle без нормализованных строк.
+# - Этапы crawl/db_write пишутся в operation_events через track_stage, число
+#   обработанных страниц публикуется в progress_bus по ходу обхода.
+# - Метрики обхода (METRICS): vkmax_crawl_pages_total растёт по ходу обхода (скорость —
+#   rate() в Prometheus), vkmax_crawl_fetch_errors_total и vkmax_crawl_duration_seconds
+#   пишутся по завершении (в том числе прерванного) обхода.
 
 from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Dict, Optional, List, Set
+import time
+from typing import Any, Callable, Dict, Optional, List, Set
 from pathlib import Path
 import tempfile
 
 import orjson
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager
+from .cancellation import atomic_output
+from .progress import track_stage
+from .progress_bus import progress_bus
+from .retry_policy import note_error
+from BACKEND import METRICS
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager, SiteManager
 from BACKEND.DATABASE.models import Format, File as FileModel
-from BACKEND.WebParser.webparser.core.config import CrawlConfig
-from BACKEND.WebParser.webparser.orchestrator.crawler import CrawlerOrchestrator
-from BACKEND.WebParser.webparser.graph.exporters import Exporter
-from BACKEND.WebParser.webparser.export.site_bundle import build_site_bundle
 
 
 logger = logging.getLogger("vkmax.webparser")
 
+CRAWL_PAGES = METRICS.counter("vkmax_crawl_pages_total", "Pages processed by site crawls")
+CRAWL_FETCH_ERRORS = METRICS.counter("vkmax_crawl_fetch_errors_total", "Crawl fetches that failed (network error or HTTP >= 400)")
+CRAWL_SECONDS = METRICS.histogram("vkmax_crawl_duration_seconds", "Site crawl duration", buckets=METRICS.SLOW_BUCKETS)
+
+
+async def _crawl_site_bundle(url: str, on_progress: Optional[Callable[[int, int], None]] = None) -> bytes:
+    # Стек обхода (aiohttp, bs4, selectolax, tldextract) нужен только процессу, который обходит сайты
+    from BACKEND.WebParser.webparser.core.config import CrawlConfig
+    from BACKEND.WebParser.webparser.export.site_bundle import build_site_bundle
+    from BACKEND.WebParser.webparser.graph.exporters import Exporter
+    from BACKEND.WebParser.webparser.orchestrator.crawler import CrawlerOrchestrator
 
-async def _crawl_site_bundle(url: str) -> bytes:
     logger.info("[webparser_service._crawl_site_bundle] Start crawl url=%s", url)
     with tempfile.TemporaryDirectory(prefix="vkmax_webparser_") as tmpdir:
         tmp_path = Path(tmpdir)
@@ -55,8 +69,20 @@ async def _crawl_site_bundle(url: str) -> bytes:
             content_text_only=True,
         )
 
-        orch = CrawlerOrchestrator(cfg)
-        graph = await orch.run()
+        pages = CRAWL_PAGES.labels()
+
+        def _on_page(processed: int, queued: int) -> None:
+            pages.inc()
+            if on_progress is not None:
+                on_progress(processed, queued)
+
+        orch = CrawlerOrchestrator(cfg, on_progress=_on_page)
+        started = time.perf_counter()
+        try:
+            graph = await orch.run()
+        finally:
+            CRAWL_FETCH_ERRORS.inc(orch.fetch_errors)
+            CRAWL_SECONDS.observe(time.perf_counter() - started)
 
         Exporter.write_graph_json(graph_json, list(graph.nodes()), graph.edges())
 
@@ -168,6 +194,13 @@ def _build_pdf_from_site_bundle(bundle: Dict[str, Any], out_pdf: Path) -> None:
       затем plain-text содержимое.
     """
 
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
     site_url = str(bundle.get("site_url") or "")
     pages: List[Dict[str, Any]] = list(bundle.get("pages") or [])
 
@@ -291,15 +324,18 @@ async def search_site_graph(
 
     Ожидается, что File.format указывает на формат type="site_bundle", а content
     содержит сериализованный JSON-пакет в формате build_site_bundle.
+    При непустом query и наличии строк site_pages поиск выполняется в БД
+    (FTS5/tsvector) и возвращает только совпавшие страницы и их соседей.
     """
 
-    fm = FilesManager(session)
-    obj = await fm.get_file(file_id)
-    if obj is None:
+    # Читаем только format_id: content (весь bundle) нужен лишь для фолбэка
+    res_file = await session.execute(select(FileModel.format_id).where(FileModel.id == file_id))
+    row = res_file.first()
+    if row is None:
         logger.error("[webparser_service.search_site_graph] file_id=%s not found", file_id)
         return None
 
-    fmt_id = getattr(obj, "format_id", None)
+    fmt_id = row[0]
     if fmt_id is None:
         logger.error("[webparser_service.search_site_graph] file_id=%s has no format_id", file_id)
         return None
@@ -324,6 +360,32 @@ async def search_site_graph(
         )
         return None
 
+    if query and query.strip():
+        sm = SiteManager(session)
+        if await sm.has_pages(file_id):
+            sub = await sm.search_subgraph(file_id, query)
+            graph = _build_graphjson_from_site_bundle(
+                {"site_url": await sm.root_url(file_id), "pages": sub["pages"], "edges": sub["edges"]}
+            )
+            graph["meta"]["query"] = query
+            logger.debug(
+                "[webparser_service.search_site_graph] Indexed search file_id=%s matched=%s nodes=%s",
+                file_id,
+                len(sub["matched"]),
+                len(graph["nodes"]),
+            )
+            return graph
+        logger.info(
+            "[webparser_service.search_site_graph] file_id=%s has no site_pages rows, falling back to bundle scan",
+            file_id,
+        )
+
+    fm = FilesManager(session)
+    obj = await fm.get_file(file_id)
+    if obj is None:
+        logger.error("[webparser_service.search_site_graph] file_id=%s not found", file_id)
+        return None
+
     content = getattr(obj, "content", None)
     if not content:
         logger.error("[webparser_service.search_site_graph] file_id=%s has empty content", file_id)
@@ -425,7 +487,8 @@ async def generate_site_pdf_from_bundle(
     out_path = os.path.join(storage_dir, filename)
     try:
         Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-        _build_pdf_from_site_bundle(bundle, Path(out_path))
+        with atomic_output(out_path) as tmp_path:
+            _build_pdf_from_site_bundle(bundle, Path(tmp_path))
     except Exception as exc:  # noqa: WPS430
         logger.exception(
             "[webparser_service.generate_site_pdf_from_bundle] Failed to build PDF for file_id=%s: %s",
@@ -523,16 +586,26 @@ async def enqueue_website_job(session: AsyncSession, *, operation_id: int, url:
 
     try:
         await cm.update_status(operation_id, status="processing")
-        bundle_bytes = await _crawl_site_bundle(url)
+        # Обход долгий: фиксируем статус и отпускаем write-блокировку SQLite
+        await session.commit()
+        async with track_stage(session, operation_id, "crawl", progress=70):
+            bundle_bytes = await _crawl_site_bundle(url, on_progress=_crawl_progress_publisher(operation_id))
         fm = FilesManager(session)
         filename = f"site-{operation_id}.site_bundle.json"
-        new_file = await fm.create_file(
-            user_id=op.get("user_id"),
-            format_id=int(new_format_id),
-            filename=filename,
-            mime_type="application/json",
-            content_bytes=bundle_bytes,
-            path=None,
+        async with track_stage(session, operation_id, "db_write", progress=95):
+            new_file = await fm.create_file(
+                user_id=op.get("user_id"),
+                format_id=int(new_format_id),
+                filename=filename,
+                mime_type="application/json",
+                content_bytes=bundle_bytes,
+                path=None,
+            )
+            pages_count = await SiteManager(session).replace_bundle(int(getattr(new_file, "id")), orjson.loads(bundle_bytes))
+        logger.info(
+            "[webparser_service.enqueue_website_job] Indexed %s site_pages for op=%s",
+            pages_count,
+            operation_id,
         )
         await cm.update_status(
             operation_id,
@@ -551,6 +624,7 @@ async def enqueue_website_job(session: AsyncSession, *, operation_id: int, url:
             operation_id,
             exc,
         )
+        note_error(exc)
         await cm.update_status(
             operation_id,
             status="failed",
@@ -558,6 +632,18 @@ async def enqueue_website_job(session: AsyncSession, *, operation_id: int, url:
         )
 
 
+def _crawl_progress_publisher(operation_id: int, *, max_pages: int = 2000) -> Callable[[int, int], None]:
+    """Колбэк CrawlerOrchestrator → progress_bus: первая страница и далее каждые 10."""
+
+    def _publish(processed: int, queue_size: int) -> None:
+        if processed == 1 or processed % 10 == 0:
+            # 5% (processing) → 70% (конец этапа crawl) пропорционально лимиту страниц
+            progress = 5 + int(65 * min(processed, max_pages) / max_pages)
+            progress_bus.publish_progress(operation_id, "crawl", progress=progress, pages=processed, queue=queue_size)
+
+    return _publish
+
+
 async def get_website_status(session: AsyncSession, *, operation_id: int) -> Optional[Dict[str, Any]]:
     """Возвращает статус website-операции, обёртка над ConvertManager.get_operation."""
 
@@ -8,6 +8,12 @@ from .format import FormatManager
 from .convert import ConvertManager
 from .system import SystemManager
 from .download import DownloadManager
+from .site import SiteManager
+from .events import EventsManager
+from .batch import BatchManager
+from .rate_limit import RateLimitManager
+from .webhooks import WebhookManager
+from .llm_cache import LlmCacheManager
 
 __all__ = [
     "BaseManager",
@@ -17,4 +23,10 @@ __all__ = [
     "ConvertManager",
     "SystemManager",
     "DownloadManager",
+    "SiteManager",
+    "EventsManager",
+    "BatchManager",
+    "RateLimitManager",
+    "WebhookManager",
+    "LlmCacheManager",
 ]
@@ -0,0 +1,130 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/batch.py)
+# Назначение:
+# - Менеджер пакетов операций (таблица batches, operations.batch_id) для /batch-convert:
+#   создание пакета, агрегированный статус/прогресс и фиксация завершения.
+# Важно:
+# - Сами операции пакета создаёт ConvertManager (batch_create с batch_id), выполнение —
+#   CONVERT/job_dispatcher.py.
+# - Агрегат считается по горячей таблице operations: пакет читают, пока он свежий.
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from .events import FINAL_STATUSES, EventsManager
+from .webhooks import WebhookManager
+from ..models import Batch, Operation
+
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    return (dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)).isoformat()
+
+
+class BatchManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    async def create_batch(self, *, user_id: Optional[int], total: int, max_parallel: Optional[int] = None) -> Batch:
+        return await self.create(
+            Batch,
+            {
+                "user_id": user_id,
+                "status": "running",
+                "total": int(total),
+                "max_parallel": max_parallel,
+                "created_at": datetime.now(timezone.utc),
+            },
+        )
+
+    async def get_batch(self, batch_id: int) -> Optional[Batch]:
+        return await self.get_by_id(Batch, batch_id)
+
+    async def operation_ids(self, batch_id: int) -> List[int]:
+        q = select(Operation.id).where(Operation.batch_id == batch_id).order_by(Operation.id)
+        return [int(i) for i in (await self.session.execute(q)).scalars().all()]
+
+    async def summary(self, batch_id: int) -> Optional[Dict[str, Any]]:
+        """Агрегат пакета: счётчики по статусам, средний прогресс и строки операций."""
+
+        batch = await self.get_batch(batch_id)
+        if batch is None:
+            return None
+        q = (
+            select(Operation.id, Operation.status, Operation.result_file_id, Operation.error_message)
+            .where(Operation.batch_id == batch_id)
+            .order_by(Operation.id)
+        )
+        rows = (await self.session.execute(q)).all()
+        progress = await EventsManager(self.session).progress_many({int(r[0]): str(r[1]) for r in rows})
+
+        counts: Dict[str, int] = {}
+        operations: List[Dict[str, Any]] = []
+        for op_id, status, result_file_id, error_message in rows:
+            counts[status] = counts.get(status, 0) + 1
+            operations.append(
+                {
+                    "operation_id": int(op_id),
+                    "status": status,
+                    "progress": progress.get(int(op_id), 0),
+                    "result_file_id": int(result_file_id) if result_file_id is not None else None,
+                    "error_message": error_message,
+                }
+            )
+        total = int(batch.total or len(rows))
+        done = sum(counts.get(s, 0) for s in FINAL_STATUSES)
+        return {
+            "batch_id": int(batch.id),
+            "user_id": int(batch.user_id) if batch.user_id is not None else None,
+            "status": batch.status,
+            "total": total,
+            "done": done,
+            "counts": counts,
+            "progress": int(sum(o["progress"] for o in operations) / len(operations)) if operations else 0,
+            "max_parallel": batch.max_parallel,
+            "created_at": _iso(batch.created_at),
+            "finished_at": _iso(batch.finished_at),
+            "operations": operations,
+        }
+
+    async def mark_finished(self, batch_id: int) -> Optional[str]:
+        """Итоговый статус пакета по операциям: completed / cancelled / failed / partial.
+
+        None — пакет не найден или в нём есть незавершённые операции.
+        """
+
+        statuses = (await self.session.execute(select(Operation.status).where(Operation.batch_id == batch_id))).scalars().all()
+        if any(s not in FINAL_STATUSES for s in statuses):
+            # Часть операций ещё выполняется (например, перезапущена lease_reaper в другом
+            # процессе) — итог посчитает тот, кто завершит последнюю
+            return None
+        completed = sum(1 for s in statuses if s == "completed")
+        if completed == len(statuses):
+            status = "completed"
+        elif all(s == "cancelled" for s in statuses):
+            status = "cancelled"
+        elif completed == 0:
+            status = "failed"
+        else:
+            status = "partial"
+        affected = await self.update_by_id(Batch, batch_id, {"status": status, "finished_at": datetime.now(timezone.utc)})
+        if not affected:
+            return None
+        batch = await self.get_by_id(Batch, batch_id)
+        user_id = int(batch.user_id) if batch is not None and batch.user_id is not None else None
+        counts: Dict[str, int] = {}
+        for s in statuses:
+            counts[s] = counts.get(s, 0) + 1
+        await WebhookManager(self.session).enqueue_event(
+            "batch.finished",
+            {"batch_id": int(batch_id), "status": status, "user_id": user_id, "total": len(statuses), "counts": counts},
+            user_id=user_id,
+        )
+        return status
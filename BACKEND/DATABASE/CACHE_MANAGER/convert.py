@@ -3,19 +3,50 @@
 # - Менеджер операций конвертации: создание операций, обновление статуса,
 #   получение статуса и фильтрованный список. Поддержка batch.
 # Важно:
-# - В текущей схеме OPERATIONS нет поля url. Для website‑операций используем
+# - Website‑операции помечаем через
 #   old_format_id, указывая формат "website" (см. seed форматов) и file_id=None.
+# - include_archive=True дополнительно читает operations_archive (см. DATABASE/archive.py);
+#   такие строки помечаются archived=True.
+# - Каждое создание операции и смена статуса пишутся в operation_events (EventsManager).
+# - batch_id привязывает операцию к пакету /batch-convert (таблица batches, BatchManager).
+# - finish_open — условный перевод в финальный статус (отмена/таймаут): уже завершённая
+#   операция не перезаписывается.
+# - Аренда (lease_owner / lease_expires_at): новая операция получает аренду на
+#   job_lease_sec() — за это время её должен подхватить диспетчер процесса, который её
+#   создал; дальше аренду продлевает heartbeat диспетчера (renew_leases). Операции с
+#   истёкшей арендой находит expired_leases, reclaim_lease условно забирает их
+#   (CONVERT/lease_reaper.py).
+# - website-операция хранит исходный URL в source_url (для перезапуска после падения).
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Type, TypeVar
 from datetime import datetime, timezone
 
-from sqlalchemy import select
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_class import BaseManager
-from ..models import Operation, File, Format
+from .events import FINAL_STATUSES, EventsManager
+from ..models import Base, Operation, OperationArchive, File, Format
+
+
+TModel = TypeVar("TModel", bound=Base)
+
+DEFAULT_JOB_LEASE_SEC = 60.0
+
+
+def job_lease_sec() -> float:
+    """Срок аренды операции: VKMAX_JOB_LEASE_SEC (60 с); heartbeat продлевает её втрое чаще."""
+
+    try:
+        value = float(os.getenv("VKMAX_JOB_LEASE_SEC", "") or 0)
+    except ValueError:
+        value = 0.0
+    return value if value > 0 else DEFAULT_JOB_LEASE_SEC
 
 
 def _iso(dt: Optional[datetime]) -> str:
@@ -31,6 +62,16 @@ class ConvertManager(BaseManager):
     def __init__(self, session: AsyncSession):
         super().__init__(session)
 
+    async def create(self, model: Type[TModel], data: Dict[str, Any]) -> TModel:
+        # В SQLite id операций вычисляется как max(id)+1: учитываем архив, чтобы
+        # после переноса последних операций id не переиспользовались.
+        bind = getattr(self.session, "bind", None)
+        if model is Operation and "id" not in data and getattr(getattr(bind, "dialect", None), "name", None) == "sqlite":
+            hot_max = (await self.session.execute(select(func.max(Operation.id)))).scalar() or 0
+            archive_max = (await self.session.execute(select(func.max(OperationArchive.id)))).scalar() or 0
+            data["id"] = int(max(hot_max, archive_max)) + 1
+        return await super().create(model, data)
+
     async def _get_format_id_by_ext(self, ext_key: str) -> Optional[int]:
         key = ext_key.lstrip('.')
         q = select(Format).where(Format.file_extension.in_([key, f'.{key}']))
@@ -38,7 +79,14 @@ class ConvertManager(BaseManager):
         f = res.scalars().first()
         return int(getattr(f, 'id')) if f is not None else None
 
-    async def create_file_operation(self, *, user_id: Optional[int], source_file_id: int, target_format_id: Optional[int]) -> Operation:
+    async def create_file_operation(
+        self,
+        *,
+        user_id: Optional[int],
+        source_file_id: int,
+        target_format_id: Optional[int],
+        batch_id: Optional[int] = None,
+    ) -> Operation:
         # Определяем старый формат по файлу
         src = await self.get_by_id(File, source_file_id)
         old_fmt = int(getattr(src, 'format_id')) if src and getattr(src, 'format_id') is not None else None
@@ -51,11 +99,21 @@ class ConvertManager(BaseManager):
                 'old_format_id': old_fmt,
                 'new_format_id': target_format_id,
                 'status': 'queued',
+                'batch_id': batch_id,
+                'lease_expires_at': time.time() + job_lease_sec(),
             },
         )
+        await EventsManager(self.session).record_status(int(getattr(op, 'id')), 'queued')
         return op
 
-    async def create_website_operation(self, *, user_id: Optional[int], target_format_id: Optional[int]) -> Operation:
+    async def create_website_operation(
+        self,
+        *,
+        user_id: Optional[int],
+        target_format_id: Optional[int],
+        batch_id: Optional[int] = None,
+        url: Optional[str] = None,
+    ) -> Operation:
         # Помечаем website через old_format_id = id("website") (формат .url),
         # а целевой формат (html/site_bundle/graph и т.п.) сохраняем в new_format_id.
         website_fmt_id = await self._get_format_id_by_ext('url')
@@ -68,8 +126,12 @@ class ConvertManager(BaseManager):
                 'old_format_id': website_fmt_id,
                 'new_format_id': target_format_id,
                 'status': 'queued',
+                'batch_id': batch_id,
+                'source_url': url,
+                'lease_expires_at': time.time() + job_lease_sec(),
             },
         )
+        await EventsManager(self.session).record_status(int(getattr(op, 'id')), 'queued')
         return op
 
     async def update_status(self, operation_id: int, *, status: str, error_message: Optional[str] = None, result_file_id: Optional[int] = None) -> bool:
@@ -79,12 +141,165 @@ class ConvertManager(BaseManager):
         if result_file_id is not None:
             data['result_file_id'] = result_file_id
         affected = await self.update_by_id(Operation, operation_id, data)
+        if affected > 0:
+            await EventsManager(self.session).record_status(operation_id, status, detail=error_message)
         return affected > 0
 
-    async def get_operation(self, operation_id: int) -> Optional[Dict[str, Any]]:
-        op = await self.get_by_id(Operation, operation_id)
-        if op is None:
+    async def finish_open(self, operation_id: int, *, status: str, error_message: Optional[str] = None) -> bool:
+        """Ставит финальный *status* только незавершённой операции (queued/processing)."""
+
+        q = (
+            update(Operation)
+            .where(Operation.id == operation_id, Operation.status.not_in(FINAL_STATUSES))
+            .values(status=status, error_message=error_message)
+        )
+        affected = int((await self.session.execute(q)).rowcount or 0)
+        if affected > 0:
+            await EventsManager(self.session).record_status(operation_id, status, detail=error_message)
+        return affected > 0
+
+    async def begin_attempt(self, operation_id: int, *, owner: Optional[str] = None) -> Optional[int]:
+        """Засчитывает новую попытку незавершённой операции; None — операция уже в финальном статусе.
+
+        error_message предыдущей попытки сбрасывается: он остаётся в журнале operation_events.
+        *owner* — диспетчер, выполняющий попытку: он же получает аренду операции
+        (None — и если операцию держит живая аренда другого владельца).
+        """
+
+        values: Dict[str, Any] = {'attempts': func.coalesce(Operation.attempts, 0) + 1, 'error_message': None}
+        q = update(Operation).where(Operation.id == operation_id, Operation.status.not_in(FINAL_STATUSES))
+        if owner is not None:
+            now = time.time()
+            values.update(lease_owner=owner, lease_expires_at=now + job_lease_sec())
+            # Живая аренда другого процесса: операцию уже выполняет он
+            q = q.where(
+                or_(
+                    Operation.lease_owner.is_(None),
+                    Operation.lease_owner == owner,
+                    Operation.lease_expires_at.is_(None),
+                    Operation.lease_expires_at < now,
+                )
+            )
+        q = q.values(**values)
+        if int((await self.session.execute(q)).rowcount or 0) == 0:
             return None
+        attempts = (await self.session.execute(select(Operation.attempts).where(Operation.id == operation_id))).scalar_one()
+        return int(attempts)
+
+    async def renew_leases(self, operation_ids: Sequence[int], *, owner: str, lease_sec: float) -> List[int]:
+        """Продлевает аренду незавершённых операций *owner*; возвращает id, чью аренду забрал другой процесс."""
+
+        ids = [int(i) for i in operation_ids]
+        if not ids:
+            return []
+        await self.session.execute(
+            update(Operation)
+            .where(
+                Operation.id.in_(ids),
+                Operation.status.not_in(FINAL_STATUSES),
+                or_(Operation.lease_owner.is_(None), Operation.lease_owner == owner),
+            )
+            .values(lease_owner=owner, lease_expires_at=time.time() + lease_sec)
+        )
+        rows = await self.session.execute(
+            select(Operation.id, Operation.lease_owner).where(Operation.id.in_(ids), Operation.status.not_in(FINAL_STATUSES))
+        )
+        return [int(op_id) for op_id, lease_owner in rows.all() if lease_owner != owner]
+
+    async def expired_leases(self, *, now: float, limit: int = 100) -> List[Dict[str, Any]]:
+        """Незавершённые операции, чья аренда истекла (или её нет — строки до появления аренды)."""
+
+        src_fmt = aliased(Format)
+        dst_fmt = aliased(Format)
+        q = (
+            select(
+                Operation.id,
+                Operation.status,
+                Operation.attempts,
+                Operation.user_id,
+                Operation.batch_id,
+                Operation.file_id,
+                Operation.new_format_id,
+                Operation.source_url,
+                Operation.lease_owner,
+                Operation.lease_expires_at,
+                src_fmt.type,
+                dst_fmt.type,
+            )
+            .outerjoin(src_fmt, src_fmt.id == Operation.old_format_id)
+            .outerjoin(dst_fmt, dst_fmt.id == Operation.new_format_id)
+            .where(
+                Operation.status.not_in(FINAL_STATUSES),
+                or_(Operation.lease_expires_at.is_(None), Operation.lease_expires_at < now),
+            )
+            .order_by(Operation.id)
+            .limit(limit)
+        )
+        return [
+            {
+                'operation_id': int(op_id),
+                'status': status,
+                'attempts': int(attempts or 0),
+                'user_id': int(user_id) if user_id is not None else None,
+                'batch_id': int(batch_id) if batch_id is not None else None,
+                'file_id': int(file_id) if file_id is not None else None,
+                'new_format_id': int(new_format_id) if new_format_id is not None else None,
+                'source_url': source_url,
+                'lease_owner': lease_owner,
+                'lease_expires_at': lease_expires_at,
+                'source_type': source_type,
+                'target_type': target_type,
+            }
+            for (
+                op_id,
+                status,
+                attempts,
+                user_id,
+                batch_id,
+                file_id,
+                new_format_id,
+                source_url,
+                lease_owner,
+                lease_expires_at,
+                source_type,
+                target_type,
+            ) in (await self.session.execute(q)).all()
+        ]
+
+    async def reclaim_lease(
+        self,
+        operation_id: int,
+        *,
+        expected_expires_at: Optional[float],
+        status: str,
+        owner: Optional[str],
+        lease_sec: float,
+        error_message: Optional[str] = None,
+    ) -> bool:
+        """Условно забирает операцию с истёкшей арендой: queued с арендой *owner* или финальный *status*.
+
+        Условие на прежний lease_expires_at: если владелец успел продлить аренду или операцию
+        уже забрал другой reaper, строка не меняется (False).
+        """
+
+        same_lease = Operation.lease_expires_at.is_(None) if expected_expires_at is None else Operation.lease_expires_at == expected_expires_at
+        q = (
+            update(Operation)
+            .where(Operation.id == operation_id, Operation.status.not_in(FINAL_STATUSES), same_lease)
+            .values(
+                status=status,
+                error_message=error_message,
+                lease_owner=owner,
+                lease_expires_at=time.time() + lease_sec if owner is not None else None,
+            )
+        )
+        if int((await self.session.execute(q)).rowcount or 0) == 0:
+            return False
+        await EventsManager(self.session).record_status(operation_id, status, detail=error_message)
+        return True
+
+    @staticmethod
+    def _operation_dict(op: Any) -> Dict[str, Any]:
         return {
             'operation_id': int(getattr(op, 'id')),
             'user_id': int(getattr(op, 'user_id')) if getattr(op, 'user_id') is not None else None,
@@ -95,42 +310,90 @@ class ConvertManager(BaseManager):
             'datetime': _iso(getattr(op, 'datetime')),
             'status': getattr(op, 'status'),
             'error_message': getattr(op, 'error_message'),
+            # В архиве колонки нет: пакет читают, пока операции в горячей таблице
+            'batch_id': int(getattr(op, 'batch_id')) if getattr(op, 'batch_id', None) is not None else None,
+            'attempts': int(getattr(op, 'attempts', None) or 0),
         }
 
-    async def list_operations(self, *, user_id: Optional[int] = None, status: Optional[str] = None, type_hint: Optional[str] = None) -> List[Dict[str, Any]]:
-        # type_hint: 'file' | 'website' (эвристика по old_format_id == website)
-        q = select(Operation)
-        if user_id is not None:
-            q = q.where(Operation.user_id == user_id)
-        if status is not None:
-            q = q.where(Operation.status == status)
-        res = await self.session.execute(q.order_by(Operation.datetime.desc()))
-        rows = res.scalars().all()
+    async def get_operation(self, operation_id: int, *, include_archive: bool = False) -> Optional[Dict[str, Any]]:
+        op = await self.get_by_id(Operation, operation_id)
+        if op is not None:
+            return self._operation_dict(op)
+        if include_archive:
+            archived = await self.get_by_id(OperationArchive, operation_id)
+            if archived is not None:
+                item = self._operation_dict(archived)
+                item['archived'] = True
+                return item
+        return None
+
+    async def get_statuses(self, operation_ids: List[int], *, include_archive: bool = False) -> Dict[int, Dict[str, Any]]:
+        """Статусы набора операций одним запросом по PK (для поллинга/стримов)."""
+
+        ids = list({int(i) for i in operation_ids})
+        out: Dict[int, Dict[str, Any]] = {}
+        if not ids:
+            return out
+        models = (Operation, OperationArchive) if include_archive else (Operation,)
+        for model in models:
+            missing = [i for i in ids if i not in out]
+            if not missing:
+                break
+            q = select(model.id, model.status, model.result_file_id, model.error_message).where(model.id.in_(missing))
+            for op_id, status, result_file_id, error_message in (await self.session.execute(q)).all():
+                out[int(op_id)] = {
+                    'operation_id': int(op_id),
+                    'status': status,
+                    'result_file_id': int(result_file_id) if result_file_id is not None else None,
+                    'error_message': error_message,
+                }
+        return out
+
+    async def list_operations(
+        self,
+        *,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        type_hint: Optional[str] = None,
+        include_archive: bool = False,
+    ) -> List[Dict[str, Any]]:
+        # type_hint: 'file' | 'website' (эвристика по old_format_id == id формата .url)
+        website_fmt_id = await self._get_format_id_by_ext('url')
+        models: List[Any] = [Operation, OperationArchive] if include_archive else [Operation]
         result: List[Dict[str, Any]] = []
-        for op in rows:
-            row = {
-                'operation_id': int(getattr(op, 'id')),
-                'file_id': int(getattr(op, 'file_id')) if getattr(op, 'file_id') is not None else None,
-                'status': getattr(op, 'status'),
-                'datetime': _iso(getattr(op, 'datetime')),
-                'type': 'file',
-            }
-            # определяем website по old_format, если это формат .url (см. seed)
-            try:
-                if getattr(op, 'file_id') is None and getattr(op, 'old_format_id') is not None:
-                    # Загрузить формат и проверить расширение
-                    f = await self.get_by_id(Format, int(getattr(op, 'old_format_id')))
-                    ext = (getattr(f, 'file_extension') or '').lstrip('.') if f else ''
-                    if ext == 'url':
-                        row['type'] = 'website'
-            except Exception:
-                pass
-            if type_hint and row['type'] != type_hint:
-                continue
-            result.append(row)
+        for model in models:
+            q = select(model)
+            if user_id is not None:
+                q = q.where(model.user_id == user_id)
+            if status is not None:
+                q = q.where(model.status == status)
+            res = await self.session.execute(q.order_by(model.datetime.desc()))
+            for op in res.scalars().all():
+                is_website = (
+                    getattr(op, 'file_id') is None
+                    and website_fmt_id is not None
+                    and getattr(op, 'old_format_id') == website_fmt_id
+                )
+                row = {
+                    'operation_id': int(getattr(op, 'id')),
+                    'file_id': int(getattr(op, 'file_id')) if getattr(op, 'file_id') is not None else None,
+                    'status': getattr(op, 'status'),
+                    'datetime': _iso(getattr(op, 'datetime')),
+                    'type': 'website' if is_website else 'file',
+                    # Для разбора failed/dead_letter без запроса каждой операции
+                    'error_message': getattr(op, 'error_message'),
+                    'attempts': int(getattr(op, 'attempts', None) or 0),
+                }
+                if model is OperationArchive:
+                    row['archived'] = True
+                if type_hint and row['type'] != type_hint:
+                    continue
+                result.append(row)
+        if include_archive:
+            result.sort(key=lambda r: r['datetime'], reverse=True)
         return result
 
-    async def batch_create(self, *, user_id: Optional[int], items: List[Dict[str, Any]]) -> List[int]:
+    async def batch_create(self, *, user_id: Optional[int], items: List[Dict[str, Any]], batch_id: Optional[int] = None) -> List[int]:
         """Создаёт пакет операций. item: {'source_file_id'|None,'target_format_id'|'target_ext','type':'file'|'website'}"""
         ids: List[int] = []
         for it in items:
@@ -138,10 +401,14 @@ class ConvertManager(BaseManager):
             if target_format_id is None and it.get('target_ext'):
                 target_format_id = await self._get_format_id_by_ext(str(it['target_ext']))
             if it.get('type') == 'website':
-                op = await self.create_website_operation(user_id=user_id, target_format_id=target_format_id)
+                op = await self.create_website_operation(
+                    user_id=user_id, target_format_id=target_format_id, batch_id=batch_id, url=it.get('url')
+                )
             else:
                 src_id = int(it.get('source_file_id'))
-                op = await self.create_file_operation(user_id=user_id, source_file_id=src_id, target_format_id=target_format_id)
+                op = await self.create_file_operation(
+                    user_id=user_id, source_file_id=src_id, target_format_id=target_format_id, batch_id=batch_id
+                )
             ids.append(int(getattr(op, 'id')))
         return ids
 
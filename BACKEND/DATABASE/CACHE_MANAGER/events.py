@@ -0,0 +1,259 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/events.py)
+# Назначение:
+# - Менеджер журнала операций (operation_events): смены статуса и этапы обработки
+#   с длительностями, текущий прогресс и перцентили задержек по форматам.
+# Важно:
+# - Статусные события пишет ConvertManager.update_status/create_*_operation,
+#   этапы — CONVERT/progress.track_stage из сервисов конвертации.
+# - Финальный статус ставит в очередь вебхук operation.<status> (WebhookManager).
+# - Перцентили (nearest-rank) считаются в SQL оконными функциями row_number/count —
+#   одинаково для SQLite и Postgres: в Python приходят только строки нужных рангов
+#   (не больше числа перцентилей на формат и ключ), а не все события окна.
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, and_, case, func, literal, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from .webhooks import WebhookManager
+from ..models import Format, Operation, OperationArchive, OperationEvent
+
+
+# Прогресс по статусу, если этапы ещё не писали своего значения
+STATUS_PROGRESS: Dict[str, int] = {
+    "queued": 0,
+    "processing": 5,
+    "completed": 100,
+    "failed": 100,
+    "cancelled": 100,
+    "timed_out": 100,
+    "dead_letter": 100,
+}
+
+# Финальные статусы операции: после них статус больше не меняется.
+# dead_letter — временные сбои не прошли за все попытки (разбор вручную)
+FINAL_STATUSES = ("completed", "failed", "cancelled", "timed_out", "dead_letter")
+
+
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Перцентиль методом nearest-rank (pct в диапазоне 0..100)."""
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[_nearest_rank(pct, len(ordered)) - 1]
+
+
+def _nearest_rank(pct: float, count: int) -> int:
+    # pct * count / 100, а не pct / 100 * count: для целых pct деление точное (как в SQL)
+    return min(count, max(1, math.ceil(pct * count / 100.0)))
+
+
+class EventsManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    async def _last_status_event(self, operation_id: int) -> Optional[OperationEvent]:
+        q = (
+            select(OperationEvent)
+            .where(OperationEvent.operation_id == operation_id, OperationEvent.kind == "status")
+            .order_by(OperationEvent.id.desc())
+            .limit(1)
+        )
+        return (await self.session.execute(q)).scalars().first()
+
+    async def record_status(self, operation_id: int, status: str, *, detail: Optional[str] = None) -> OperationEvent:
+        """Фиксирует переход в *status*; duration_ms — сколько операция была в прошлом статусе."""
+
+        now = datetime.now(timezone.utc)
+        prev = await self._last_status_event(operation_id)
+        duration_ms = None
+        if prev is not None and prev.created_at is not None:
+            duration_ms = max(0.0, (now - _utc(prev.created_at)).total_seconds() * 1000.0)
+        event = OperationEvent(
+            operation_id=operation_id,
+            kind="status",
+            name=status,
+            duration_ms=duration_ms,
+            progress=STATUS_PROGRESS.get(status),
+            detail=detail,
+            created_at=now,
+        )
+        self.session.add(event)
+        await self.session.flush()
+        if status in FINAL_STATUSES:
+            # Outbox вебхуков в той же транзакции: откатанный статус не уйдёт наружу
+            await WebhookManager(self.session).enqueue_operation_event(operation_id, status)
+        return event
+
+    async def record_stage(
+        self,
+        operation_id: int,
+        stage: str,
+        *,
+        duration_ms: float,
+        ok: bool = True,
+        progress: Optional[int] = None,
+        detail: Optional[str] = None,
+    ) -> OperationEvent:
+        event = OperationEvent(
+            operation_id=operation_id,
+            kind="stage",
+            name=stage,
+            outcome="ok" if ok else "error",
+            duration_ms=duration_ms,
+            progress=progress if ok else None,
+            detail=detail,
+            created_at=datetime.now(timezone.utc),
+        )
+        self.session.add(event)
+        await self.session.flush()
+        return event
+
+    async def list_events(self, operation_id: int) -> List[Dict[str, Any]]:
+        q = select(OperationEvent).where(OperationEvent.operation_id == operation_id).order_by(OperationEvent.id)
+        rows = (await self.session.execute(q)).scalars().all()
+        return [
+            {
+                "kind": e.kind,
+                "name": e.name,
+                "outcome": e.outcome,
+                "duration_ms": round(e.duration_ms, 2) if e.duration_ms is not None else None,
+                "progress": e.progress,
+                "detail": e.detail,
+                "at": _utc(e.created_at).isoformat() if e.created_at else None,
+            }
+            for e in rows
+        ]
+
+    async def progress(self, operation_id: int, status: Optional[str] = None) -> int:
+        """Прогресс 0..100: последнее событие с progress; финальные статусы — 100."""
+
+        if status in FINAL_STATUSES:
+            return 100
+        q = (
+            select(OperationEvent.progress)
+            .where(OperationEvent.operation_id == operation_id, OperationEvent.progress.is_not(None))
+            .order_by(OperationEvent.id.desc())
+            .limit(1)
+        )
+        value = (await self.session.execute(q)).scalar_one_or_none()
+        if value is None:
+            return STATUS_PROGRESS.get(status or "", 0)
+        return int(max(0, min(100, value)))
+
+    async def progress_many(self, statuses: Dict[int, str]) -> Dict[int, int]:
+        """progress() для набора операций {id: status} одним запросом."""
+
+        out: Dict[int, int] = {}
+        open_ids = []
+        for op_id, status in statuses.items():
+            if status in FINAL_STATUSES:
+                out[op_id] = 100
+            else:
+                open_ids.append(op_id)
+        if open_ids:
+            latest = (
+                select(OperationEvent.operation_id, func.max(OperationEvent.id).label("event_id"))
+                .where(OperationEvent.operation_id.in_(open_ids), OperationEvent.progress.is_not(None))
+                .group_by(OperationEvent.operation_id)
+                .subquery()
+            )
+            q = select(OperationEvent.operation_id, OperationEvent.progress).join(latest, OperationEvent.id == latest.c.event_id)
+            found = {int(op_id): int(value) for op_id, value in (await self.session.execute(q)).all()}
+            for op_id in open_ids:
+                value = found.get(op_id)
+                out[op_id] = int(max(0, min(100, value))) if value is not None else STATUS_PROGRESS.get(statuses[op_id], 0)
+        return out
+
+    async def latency_percentiles(
+        self,
+        *,
+        since: Optional[datetime] = None,
+        percentiles: Sequence[float] = (50, 90, 99),
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Перцентили длительностей по целевому формату.
+
+        Ключи второго уровня:
+          - queue_wait — время в queued до перехода в processing;
+          - run — время в processing до completed/failed;
+          - stage:<name> — длительности этапов (только успешных).
+        """
+
+        is_status = OperationEvent.kind == "status"
+        key = case(
+            (and_(is_status, OperationEvent.name == "processing"), literal("queue_wait", String)),
+            (is_status, literal("run", String)),
+            else_=literal("stage:", String) + OperationEvent.name,
+        )
+        # Целевой формат операции — из живой таблицы или из архива
+        op_formats = union_all(
+            select(Operation.id.label("id"), Operation.new_format_id.label("format_id")),
+            select(OperationArchive.id.label("id"), OperationArchive.new_format_id.label("format_id")),
+        ).subquery()
+        fmt = case(
+            (Format.id.is_(None), literal("unknown", String)),
+            (Format.type.in_(("graph", "site_bundle")), Format.type),
+            else_=func.ltrim(func.coalesce(Format.file_extension, ""), "."),
+        )
+        samples = (
+            select(fmt.label("fmt"), key.label("key"), OperationEvent.duration_ms.label("value"))
+            .select_from(OperationEvent)
+            .outerjoin(op_formats, op_formats.c.id == OperationEvent.operation_id)
+            .outerjoin(Format, Format.id == op_formats.c.format_id)
+            .where(
+                OperationEvent.duration_ms.is_not(None),
+                or_(
+                    and_(is_status, OperationEvent.name.in_(("processing", "completed", "failed"))),
+                    and_(~is_status, OperationEvent.outcome == "ok"),
+                ),
+            )
+        )
+        if since is not None:
+            samples = samples.where(OperationEvent.created_at >= since)
+        samples = samples.subquery()
+        group = (samples.c.fmt, samples.c.key)
+        ranked = select(
+            samples.c.fmt,
+            samples.c.key,
+            samples.c.value,
+            func.row_number().over(partition_by=group, order_by=samples.c.value).label("rn"),
+            func.count().over(partition_by=group).label("n"),
+        ).subquery()
+        # Строка ранга r — nearest-rank для pct, если (r - 1) * 100 < pct * n <= r * 100
+        wanted = [
+            and_((ranked.c.rn - 1) * 100 < pct * ranked.c.n, ranked.c.rn * 100 >= pct * ranked.c.n)
+            for pct in percentiles
+            if 0 < pct <= 100
+        ]
+        wanted.append(ranked.c.rn == 1)  # count для групп и pct <= 0
+        if any(pct > 100 for pct in percentiles):
+            wanted.append(ranked.c.rn == ranked.c.n)
+        rows = await self.session.execute(select(ranked.c.fmt, ranked.c.key, ranked.c.rn, ranked.c.n, ranked.c.value).where(or_(*wanted)))
+
+        by_rank: Dict[Tuple[str, str], Dict[int, float]] = {}
+        counts: Dict[Tuple[str, str], int] = {}
+        for fmt_key, sample_key, rn, n, value in rows.all():
+            by_rank.setdefault((fmt_key, sample_key), {})[int(rn)] = float(value)
+            counts[(fmt_key, sample_key)] = int(n)
+
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (fmt_key, sample_key), values in by_rank.items():
+            n = counts[(fmt_key, sample_key)]
+            stats: Dict[str, Any] = {"count": n}
+            for pct in percentiles:
+                value = values.get(_nearest_rank(pct, n))
+                stats[f"p{int(pct) if float(pct).is_integer() else pct}_ms"] = round(value, 2) if value is not None else None
+            result.setdefault(fmt_key, {})[sample_key] = stats
+        return result
@@ -10,11 +10,11 @@ import os
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_class import BaseManager
-from ..models import File
+from ..models import File, SiteEdge, SitePage
 
 
 class FilesManager(BaseManager):
@@ -30,11 +30,14 @@ class FilesManager(BaseManager):
         mime_type: Optional[str],
         content_bytes: bytes | None = None,
         path: Optional[str] = None,
+        file_size: Optional[int] = None,
+        sha256: Optional[str] = None,
     ) -> File:
-        size = None
-        if content_bytes is not None:
+        # file_size/sha256 передаёт тот, кто уже посчитал их при записи (POST /upload)
+        size = file_size
+        if size is None and content_bytes is not None:
             size = len(content_bytes)
-        elif path:
+        elif size is None and path:
             try:
                 size = os.path.getsize(path)
             except Exception:
@@ -50,6 +53,7 @@ class FilesManager(BaseManager):
                 "content": content_bytes,
                 "path": path,
                 "file_size": size,
+                "sha256": sha256,
                 "status": None,
             },
         )
@@ -84,6 +88,9 @@ class FilesManager(BaseManager):
                     os.remove(p)
                 except Exception:
                     pass
+        # SQLite не применяет ON DELETE CASCADE без PRAGMA foreign_keys — чистим явно
+        await self.session.execute(delete(SiteEdge).where(SiteEdge.file_id == file_id))
+        await self.session.execute(delete(SitePage).where(SitePage.file_id == file_id))
         affected = await self.delete_by_id(File, file_id)
         return affected > 0
 
@@ -0,0 +1,74 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/llm_cache.py)
+# Назначение:
+# - Кэш ответов LLM в таблице llm_response_cache (LLM_SERVICE/response_cache.py,
+#   VKMAX_LLM_CACHE=db): общий для всех воркеров и узлов с одной БД.
+# - get отдаёт живую запись и обновляет last_used_at; просроченная удаляется;
+#   evict удаляет просроченные и давно не использованные записи сверх лимита байт.
+# Важно:
+# - Коммит — на вызывающей стороне.
+
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from ..models import LlmCacheEntry
+
+
+class LlmCacheManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    async def get(self, key: str, *, now: float, ttl_sec: float) -> Optional[str]:
+        row = await self.session.get(LlmCacheEntry, key)
+        if row is None:
+            return None
+        if ttl_sec > 0 and now - float(row.created_at) > ttl_sec:
+            await self.session.delete(row)
+            await self.session.flush()
+            return None
+        row.last_used_at = now
+        await self.session.flush()
+        return str(row.response)
+
+    async def put(self, key: str, response: str, *, model: Optional[str], task_id: Optional[str], now: float) -> None:
+        await self.session.merge(
+            LlmCacheEntry(
+                key=key,
+                model=model,
+                task_id=task_id,
+                response=response,
+                size=len(response.encode("utf-8")),
+                created_at=now,
+                last_used_at=now,
+            )
+        )
+        await self.session.flush()
+
+    async def delete(self, key: str) -> None:
+        await self.session.execute(delete(LlmCacheEntry).where(LlmCacheEntry.key == key))
+
+    async def evict(self, *, max_bytes: int, now: float, ttl_sec: float) -> int:
+        """Удаляет просроченные записи, затем самые давно использованные, пока объём > max_bytes."""
+
+        removed = 0
+        if ttl_sec > 0:
+            res = await self.session.execute(delete(LlmCacheEntry).where(LlmCacheEntry.created_at < now - ttl_sec))
+            removed += int(res.rowcount or 0)
+        total = int((await self.session.execute(select(func.coalesce(func.sum(LlmCacheEntry.size), 0)))).scalar() or 0)
+        if total <= max_bytes:
+            return removed
+        rows = await self.session.execute(select(LlmCacheEntry.key, LlmCacheEntry.size).order_by(LlmCacheEntry.last_used_at))
+        stale = []
+        for key, size in rows.all():
+            if total <= max_bytes:
+                break
+            stale.append(key)
+            total -= int(size or 0)
+        if stale:
+            await self.session.execute(delete(LlmCacheEntry).where(LlmCacheEntry.key.in_(stale)))
+            removed += len(stale)
+        return removed
@@ -0,0 +1,76 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/rate_limit.py)
+# Назначение:
+# - Token bucket в таблице rate_limit_buckets: общий лимит запросов для нескольких
+#   воркеров/узлов (FAST_API/rate_limit.py, VKMAX_RATE_LIMIT=db).
+# - take_tokens — чистая арифметика корзины, её же использует in-memory backend.
+# Важно:
+# - Списание — один условный UPDATE: пополнение считается в SQL, строка меняется только
+#   если после пополнения токенов хватает (rowcount = 1). Так корзина атомарна на любой БД,
+#   включая SQLite, где FOR UPDATE игнорируется и чтение + запись могли бы разойтись.
+#   Отказ корзину не пишет: пополнение — функция времени, его досчитает следующий запрос.
+# - Коммит — на вызывающей стороне.
+
+from __future__ import annotations
+
+from typing import Tuple
+
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from ..models import RateLimitBucket
+
+
+def take_tokens(tokens: float, updated_at: float, now: float, *, rate: float, burst: float, cost: float) -> Tuple[float, float]:
+    """Пополняет корзину на rate·Δt (не выше burst) и списывает cost.
+
+    Возвращает (новый остаток, ожидание в секундах): ожидание > 0 — токенов не хватило,
+    остаток при этом не списывается.
+    """
+
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    wait = (cost - tokens) / rate if rate > 0 else float("inf")
+    return tokens, wait
+
+
+class RateLimitManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    async def _take_if_enough(self, key: str, *, rate: float, burst: float, cost: float, now: float) -> bool:
+        """Атомарно пополняет и списывает cost, если токенов хватает; False — не хватило или корзины нет."""
+
+        elapsed = case((RateLimitBucket.updated_at < now, literal(now) - RateLimitBucket.updated_at), else_=0.0)
+        filled = RateLimitBucket.tokens + elapsed * rate
+        refilled = case((filled > burst, literal(burst)), else_=filled)
+        q = (
+            update(RateLimitBucket)
+            .where(RateLimitBucket.key == key, refilled >= cost)
+            .values(tokens=refilled - cost, updated_at=case((RateLimitBucket.updated_at > now, RateLimitBucket.updated_at), else_=now))
+            .execution_options(synchronize_session=False)
+        )
+        return int((await self.session.execute(q)).rowcount or 0) == 1
+
+    async def take(self, key: str, *, rate: float, burst: float, cost: float, now: float) -> float:
+        """Списывает cost токенов корзины *key*; возвращает секунды до повтора (0 — разрешено)."""
+
+        if await self._take_if_enough(key, rate=rate, burst=burst, cost=cost, now=now):
+            return 0.0
+        row = (await self.session.execute(select(RateLimitBucket.tokens, RateLimitBucket.updated_at).where(RateLimitBucket.key == key))).first()
+        if row is None:
+            tokens, wait = take_tokens(burst, now, now, rate=rate, burst=burst, cost=cost)
+            try:
+                async with self.session.begin_nested():
+                    self.session.add(RateLimitBucket(key=key, tokens=tokens, updated_at=now))
+                return wait
+            except IntegrityError:
+                # Корзину параллельно создал другой воркер — списываем из неё
+                if await self._take_if_enough(key, rate=rate, burst=burst, cost=cost, now=now):
+                    return 0.0
+                row = (await self.session.execute(select(RateLimitBucket.tokens, RateLimitBucket.updated_at).where(RateLimitBucket.key == key))).one()
+        _, wait = take_tokens(float(row.tokens), min(float(row.updated_at), now), now, rate=rate, burst=burst, cost=cost)
+        # На границе float-сравнение в SQL и здесь может разойтись: без списания не пропускаем
+        return max(wait, 1e-3)
@@ -0,0 +1,203 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/site.py)
+# Назначение:
+# - Менеджер нормализованных результатов обхода сайта: таблицы site_pages / site_edges.
+# - Запись страниц и рёбер site_bundle, полнотекстовый поиск страниц и выборка соседей.
+# Важно:
+# - Postgres: to_tsvector/plainto_tsquery по GIN-индексу ix_site_pages_tsv.
+# - SQLite: MATCH по FTS5-таблице site_pages_fts (токены запроса ищутся как префиксы).
+# - Прочие диалекты: ILIKE по title/text (без индекса).
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from ..models import SiteEdge, SitePage
+
+
+_PG_DOCUMENT = "to_tsvector('simple', coalesce(site_pages.title, '') || ' ' || coalesce(site_pages.text, ''))"
+
+
+def _fts5_query(query: str) -> str:
+    """Преобразует пользовательскую строку в безопасный запрос FTS5: "tok1"* AND "tok2"*."""
+
+    tokens = [t.replace('"', '""') for t in query.split() if t.strip()]
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+class SiteManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    @property
+    def _dialect(self) -> Optional[str]:
+        bind = getattr(self.session, "bind", None)
+        return getattr(getattr(bind, "dialect", None), "name", None)
+
+    async def replace_bundle(self, file_id: int, bundle: Dict[str, Any]) -> int:
+        """Записывает страницы и рёбра site_bundle для *file_id* (старые строки удаляются).
+
+        Возвращает число записанных страниц.
+        """
+
+        await self.delete_bundle(file_id)
+
+        pages: List[Dict[str, Any]] = []
+        page_ids: Set[int] = set()
+        for p in bundle.get("pages") or []:
+            if p.get("id") is None:
+                continue
+            pid = int(p["id"])
+            if pid in page_ids:
+                continue
+            page_ids.add(pid)
+            pages.append(
+                {
+                    "file_id": file_id,
+                    "page_id": pid,
+                    "url": p.get("url"),
+                    "title": p.get("title"),
+                    "text": p.get("text"),
+                    "depth": p.get("depth"),
+                    "cluster": p.get("cluster"),
+                }
+            )
+
+        edges: Set[Tuple[int, int]] = set()
+        for e in bundle.get("edges") or []:
+            try:
+                s_id, d_id = int(e[0]), int(e[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if s_id in page_ids and d_id in page_ids:
+                edges.add((s_id, d_id))
+
+        if pages:
+            await self.session.execute(insert(SitePage), pages)
+        if edges:
+            await self.session.execute(
+                insert(SiteEdge),
+                [{"file_id": file_id, "source_page_id": s, "target_page_id": d} for s, d in sorted(edges)],
+            )
+        return len(pages)
+
+    async def delete_bundle(self, file_id: int) -> None:
+        await self.session.execute(delete(SiteEdge).where(SiteEdge.file_id == file_id))
+        await self.session.execute(delete(SitePage).where(SitePage.file_id == file_id))
+
+    async def has_pages(self, file_id: int) -> bool:
+        res = await self.session.execute(select(SitePage.id).where(SitePage.file_id == file_id).limit(1))
+        return res.first() is not None
+
+    async def root_url(self, file_id: int) -> Optional[str]:
+        stmt = (
+            select(SitePage.url)
+            .where(SitePage.file_id == file_id)
+            .order_by(SitePage.depth.asc(), SitePage.page_id.asc())
+            .limit(1)
+        )
+        return (await self.session.execute(stmt)).scalar_one_or_none()
+
+    async def search_page_ids(self, file_id: int, query: str, *, limit: int = 200) -> List[int]:
+        """Возвращает page_id страниц *file_id*, совпавших с *query*, по убыванию релевантности."""
+
+        query = (query or "").strip()
+        if not query:
+            return []
+
+        dialect = self._dialect
+        if dialect == "sqlite":
+            match = _fts5_query(query)
+            if not match:
+                return []
+            stmt = text(
+                "SELECT p.page_id FROM site_pages_fts "
+                "JOIN site_pages AS p ON p.id = site_pages_fts.rowid "
+                "WHERE site_pages_fts MATCH :match AND p.file_id = :file_id "
+                "ORDER BY site_pages_fts.rank LIMIT :limit"
+            )
+            res = await self.session.execute(stmt, {"match": match, "file_id": file_id, "limit": limit})
+            return [int(r[0]) for r in res.all()]
+
+        if dialect == "postgresql":
+            tsquery = func.plainto_tsquery("simple", query)
+            document = text(_PG_DOCUMENT)
+            stmt = (
+                select(SitePage.page_id)
+                .where(SitePage.file_id == file_id, document.op("@@")(tsquery))
+                .order_by(func.ts_rank(document, tsquery).desc())
+                .limit(limit)
+            )
+            res = await self.session.execute(stmt)
+            return [int(r[0]) for r in res.all()]
+
+        pattern = f"%{query}%"
+        stmt = (
+            select(SitePage.page_id)
+            .where(SitePage.file_id == file_id, or_(SitePage.title.ilike(pattern), SitePage.text.ilike(pattern)))
+            .order_by(SitePage.page_id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return [int(r[0]) for r in res.all()]
+
+    async def edges_touching(self, file_id: int, page_ids: Iterable[int]) -> List[Tuple[int, int]]:
+        ids = list(set(page_ids))
+        if not ids:
+            return []
+        stmt = select(SiteEdge.source_page_id, SiteEdge.target_page_id).where(
+            SiteEdge.file_id == file_id,
+            or_(SiteEdge.source_page_id.in_(ids), SiteEdge.target_page_id.in_(ids)),
+        )
+        res = await self.session.execute(stmt)
+        return [(int(s), int(d)) for s, d in res.all()]
+
+    async def edges_within(self, file_id: int, page_ids: Iterable[int]) -> List[Tuple[int, int]]:
+        ids = list(set(page_ids))
+        if not ids:
+            return []
+        stmt = select(SiteEdge.source_page_id, SiteEdge.target_page_id).where(
+            SiteEdge.file_id == file_id,
+            SiteEdge.source_page_id.in_(ids),
+            SiteEdge.target_page_id.in_(ids),
+        )
+        res = await self.session.execute(stmt)
+        return [(int(s), int(d)) for s, d in res.all()]
+
+    async def get_pages(self, file_id: int, page_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        ids = list(set(page_ids))
+        if not ids:
+            return []
+        stmt = (
+            select(SitePage)
+            .where(SitePage.file_id == file_id, SitePage.page_id.in_(ids))
+            .order_by(SitePage.page_id)
+        )
+        res = await self.session.execute(stmt)
+        return [
+            {
+                "id": int(p.page_id),
+                "url": p.url,
+                "title": p.title,
+                "text": p.text,
+                "depth": p.depth,
+                "cluster": p.cluster,
+            }
+            for p in res.scalars().all()
+        ]
+
+    async def search_subgraph(self, file_id: int, query: str, *, limit: int = 200) -> Dict[str, Any]:
+        """Совпавшие страницы + 1-hop соседи и рёбра между ними (аналог фильтра по bundle)."""
+
+        matched = await self.search_page_ids(file_id, query, limit=limit)
+        touching = await self.edges_touching(file_id, matched)
+        keep: Set[int] = set(matched)
+        for s_id, d_id in touching:
+            keep.add(s_id)
+            keep.add(d_id)
+        pages = await self.get_pages(file_id, keep)
+        edges = [[s, d] for s, d in await self.edges_within(file_id, keep)]
+        return {"pages": pages, "edges": edges, "matched": matched}
@@ -12,7 +12,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_class import BaseManager
-from ..models import User, File, Operation
+from ..models import User, File, Operation, OperationArchive
 
 
 def _now_iso() -> str:
@@ -55,14 +55,14 @@ class UserManager(BaseManager):
             for r in rows
         ]
 
-    async def list_user_operations(self, user_id: int) -> List[Dict[str, Any]]:
-        q = select(Operation).where(Operation.user_id == user_id).order_by(Operation.datetime.desc())
-        res = await self.session.execute(q)
-        rows = res.scalars().all()
+    async def list_user_operations(self, user_id: int, *, include_archive: bool = False) -> List[Dict[str, Any]]:
+        models: List[Any] = [Operation, OperationArchive] if include_archive else [Operation]
         items: List[Dict[str, Any]] = []
-        for op in rows:
-            items.append(
-                {
+        for model in models:
+            q = select(model).where(model.user_id == user_id).order_by(model.datetime.desc())
+            res = await self.session.execute(q)
+            for op in res.scalars().all():
+                item = {
                     "operation_id": int(getattr(op, "id")),
                     "file_id": int(getattr(op, "file_id")) if getattr(op, "file_id") is not None else None,
                     "old_format": int(getattr(op, "old_format_id")) if getattr(op, "old_format_id") is not None else None,
@@ -70,6 +70,9 @@ class UserManager(BaseManager):
                     "datetime": getattr(op, "datetime").isoformat() if getattr(op, "datetime") else _now_iso(),
                     "status": getattr(op, "status"),
                 }
-            )
+                if model is OperationArchive:
+                    item["archived"] = True
+                items.append(item)
+        if include_archive:
+            items.sort(key=lambda it: it["datetime"], reverse=True)
         return items
-
@@ -0,0 +1,277 @@
+# Руководство к файлу (DATABASE/CACHE_MANAGER/webhooks.py)
+# Назначение:
+# - Менеджер исходящих вебхуков: адреса (webhook_endpoints) и очередь доставки
+#   (webhook_deliveries, transactional outbox).
+# - enqueue_* пишут строки доставки в той же транзакции, что и событие: откатанный статус
+#   (например, failed перед повтором задачи) наружу не уходит.
+# - claim_due берёт созревшие доставки с арендой (next_attempt_at сдвигается на lease_sec):
+#   несколько воркеров не отправят одну строку одновременно, упавший воркер её не потеряет.
+# Важно:
+# - Доставку выполняет CONVERT/webhook_dispatcher.py; коммит — на вызывающей стороне.
+# - Типы событий: operation.<финальный статус> и batch.finished.
+
+from __future__ import annotations
+
+import fnmatch
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base_class import BaseManager
+from ..models import Format, Operation, User, WebhookDelivery, WebhookEndpoint
+
+
+EVENT_TYPES = (
+    "operation.completed",
+    "operation.failed",
+    "operation.cancelled",
+    "operation.timed_out",
+    "operation.dead_letter",
+    "batch.finished",
+)
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    return (dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)).isoformat()
+
+
+def parse_patterns(events: str) -> List[str]:
+    return [p.strip() for p in (events or "*").split(",") if p.strip()]
+
+
+def matches(patterns: Sequence[str], event_type: str) -> bool:
+    return any(fnmatch.fnmatchcase(event_type, p) for p in patterns)
+
+
+class WebhookManager(BaseManager):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    # --- адреса -------------------------------------------------------------------------
+
+    @staticmethod
+    def endpoint_dict(ep: WebhookEndpoint) -> Dict[str, Any]:
+        return {
+            "id": int(ep.id),
+            "user_id": int(ep.user_id) if ep.user_id is not None else None,
+            "url": ep.url,
+            "events": parse_patterns(ep.events),
+            "max_concurrency": ep.max_concurrency,
+            "active": bool(ep.active),
+            "created_at": _iso(ep.created_at),
+        }
+
+    async def upsert_endpoint(
+        self,
+        *,
+        user_id: Optional[int],
+        url: str,
+        secret: str,
+        events: Iterable[str],
+        max_concurrency: Optional[int] = None,
+    ) -> WebhookEndpoint:
+        """Регистрирует адрес; повторная регистрация того же (user_id, url) обновляет его."""
+
+        q = select(WebhookEndpoint).where(WebhookEndpoint.url == url)
+        q = q.where(WebhookEndpoint.user_id.is_(None) if user_id is None else WebhookEndpoint.user_id == user_id)
+        ep = (await self.session.execute(q)).scalars().first()
+        data = {
+            "secret": secret,
+            "events": ",".join(events) or "*",
+            "max_concurrency": max_concurrency,
+            "active": True,
+        }
+        if ep is None:
+            return await self.create(WebhookEndpoint, {"user_id": user_id, "url": url, **data})
+        for key, value in data.items():
+            setattr(ep, key, value)
+        await self.session.flush()
+        return ep
+
+    async def list_endpoints(self, *, user_id: Optional[int] = None) -> List[WebhookEndpoint]:
+        q = select(WebhookEndpoint).order_by(WebhookEndpoint.id)
+        if user_id is not None:
+            q = q.where(WebhookEndpoint.user_id == user_id)
+        return list((await self.session.execute(q)).scalars().all())
+
+    async def delete_endpoint(self, endpoint_id: int) -> bool:
+        await self.session.execute(delete(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id))
+        return await self.delete_by_id(WebhookEndpoint, endpoint_id) > 0
+
+    # --- постановка событий -------------------------------------------------------------
+
+    async def _active_endpoints(self) -> List[WebhookEndpoint]:
+        return list((await self.session.execute(select(WebhookEndpoint).where(WebhookEndpoint.active.is_(True)))).scalars().all())
+
+    async def enqueue_event(
+        self,
+        event_type: str,
+        data: Dict[str, Any],
+        *,
+        user_id: Optional[int],
+        endpoints: Optional[List[WebhookEndpoint]] = None,
+    ) -> int:
+        """Ставит событие в очередь всем подходящим активным адресам; возвращает число доставок."""
+
+        if endpoints is None:
+            endpoints = await self._active_endpoints()
+        targets = [
+            ep
+            for ep in endpoints
+            if (ep.user_id is None or (user_id is not None and int(ep.user_id) == int(user_id))) and matches(parse_patterns(ep.events), event_type)
+        ]
+        if not targets:
+            return 0
+        event_id = uuid.uuid4().hex
+        payload = orjson.dumps(
+            {
+                "id": event_id,
+                "type": event_type,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "data": data,
+            }
+        ).decode()
+        now = time.time()
+        self.session.add_all(
+            WebhookDelivery(endpoint_id=int(ep.id), event_id=event_id, event_type=event_type, payload=payload, status="pending", attempts=0, next_attempt_at=now)
+            for ep in targets
+        )
+        await self.session.flush()
+        return len(targets)
+
+    async def enqueue_operation_event(self, operation_id: int, status: str) -> int:
+        """Событие operation.<status> по текущей строке операции (вызывается при финальном статусе)."""
+
+        # Без зарегистрированных адресов — один лёгкий запрос на финальный статус
+        endpoints = await self._active_endpoints()
+        if not endpoints:
+            return 0
+        # Колонки, а не сущность: строку только что меняли UPDATE-ом, identity map устарел
+        row = (
+            await self.session.execute(
+                select(
+                    Operation.user_id,
+                    Operation.batch_id,
+                    Operation.result_file_id,
+                    Operation.error_message,
+                    Operation.attempts,
+                    User.max_id,
+                    Format.file_extension,
+                )
+                .outerjoin(User, User.id == Operation.user_id)
+                .outerjoin(Format, Format.id == Operation.new_format_id)
+                .where(Operation.id == operation_id)
+            )
+        ).first()
+        if row is None:
+            return 0
+        user_id, batch_id, result_file_id, error_message, attempts, max_id, target_ext = row
+        data = {
+            "operation_id": int(operation_id),
+            "status": status,
+            "user_id": int(user_id) if user_id is not None else None,
+            "max_id": max_id,
+            "batch_id": int(batch_id) if batch_id is not None else None,
+            "target_format": target_ext,
+            "result_file_id": int(result_file_id) if result_file_id is not None else None,
+            "error_message": error_message,
+            "attempts": int(attempts or 0),
+        }
+        return await self.enqueue_event(f"operation.{status}", data, user_id=data["user_id"], endpoints=endpoints)
+
+    # --- доставка -----------------------------------------------------------------------
+
+    async def claim_due(self, *, now: float, limit: int, lease_sec: float) -> List[Dict[str, Any]]:
+        """Берёт до *limit* созревших доставок в аренду на *lease_sec* (attempts + 1)."""
+
+        rows = (
+            await self.session.execute(
+                select(WebhookDelivery.id, WebhookDelivery.next_attempt_at, WebhookDelivery.attempts, WebhookDelivery.payload, WebhookEndpoint)
+                .join(WebhookEndpoint, WebhookEndpoint.id == WebhookDelivery.endpoint_id)
+                .where(WebhookDelivery.status == "pending", WebhookDelivery.next_attempt_at <= now)
+                .order_by(WebhookDelivery.id)
+                .limit(limit)
+            )
+        ).all()
+        claimed: List[Dict[str, Any]] = []
+        for delivery_id, due_at, attempts, payload, ep in rows:
+            # Условие на старый next_attempt_at: строку, взятую другим воркером, пропускаем
+            q = (
+                update(WebhookDelivery)
+                .where(WebhookDelivery.id == delivery_id, WebhookDelivery.status == "pending", WebhookDelivery.next_attempt_at == due_at)
+                .values(next_attempt_at=now + lease_sec, attempts=WebhookDelivery.attempts + 1)
+            )
+            if int((await self.session.execute(q)).rowcount or 0) == 0:
+                continue
+            claimed.append(
+                {
+                    "id": int(delivery_id),
+                    "attempts": int(attempts) + 1,
+                    "payload": payload,
+                    "endpoint_id": int(ep.id),
+                    "url": ep.url,
+                    "secret": ep.secret,
+                    "max_concurrency": ep.max_concurrency,
+                    "active": bool(ep.active),
+                }
+            )
+        return claimed
+
+    async def mark_delivered(self, delivery_ids: Sequence[int]) -> None:
+        if delivery_ids:
+            await self.session.execute(
+                update(WebhookDelivery)
+                .where(WebhookDelivery.id.in_(list(delivery_ids)))
+                .values(status="delivered", last_error=None, delivered_at=datetime.now(timezone.utc))
+            )
+
+    async def reschedule(self, delivery_ids: Sequence[int], *, next_attempt_at: float, error: str) -> None:
+        if delivery_ids:
+            await self.session.execute(
+                update(WebhookDelivery).where(WebhookDelivery.id.in_(list(delivery_ids))).values(next_attempt_at=next_attempt_at, last_error=error)
+            )
+
+    async def mark_dead(self, delivery_ids: Sequence[int], *, error: str) -> None:
+        if delivery_ids:
+            await self.session.execute(update(WebhookDelivery).where(WebhookDelivery.id.in_(list(delivery_ids))).values(status="dead", last_error=error))
+
+    async def redeliver(self, delivery_id: int) -> bool:
+        """Возвращает доставку (обычно dead) в очередь с новым счётчиком попыток."""
+
+        q = update(WebhookDelivery).where(WebhookDelivery.id == delivery_id).values(status="pending", attempts=0, next_attempt_at=time.time())
+        return int((await self.session.execute(q)).rowcount or 0) > 0
+
+    async def next_due_at(self) -> Optional[float]:
+        q = select(WebhookDelivery.next_attempt_at).where(WebhookDelivery.status == "pending").order_by(WebhookDelivery.next_attempt_at).limit(1)
+        value = (await self.session.execute(q)).scalar()
+        return float(value) if value is not None else None
+
+    async def list_deliveries(self, endpoint_id: int, *, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        q = select(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id)
+        if status is not None:
+            q = q.where(WebhookDelivery.status == status)
+        rows = (await self.session.execute(q.order_by(WebhookDelivery.id.desc()).limit(limit))).scalars().all()
+        return [
+            {
+                "id": int(d.id),
+                "event_id": d.event_id,
+                "event_type": d.event_type,
+                "status": d.status,
+                "attempts": int(d.attempts or 0),
+                "next_attempt_at": float(d.next_attempt_at) if d.status == "pending" else None,
+                "last_error": d.last_error,
+                "created_at": _iso(d.created_at),
+                "delivered_at": _iso(d.delivered_at),
+            }
+            for d in rows
+        ]
+
+
+__all__ = ["EVENT_TYPES", "WebhookManager", "parse_patterns", "matches"]
@@ -2,6 +2,8 @@
 # Назначение:
 # - Минимальная инициализация БД VKMax: создание таблиц по моделям и начальная загрузка форматов.
 # - В dev режиме заменяет полноценный Alembic до внедрения миграций.
+# - upgrade_schema() догоняет уже созданные БД: добавляет недостающие nullable-колонки
+#   (ALTER TABLE ADD COLUMN) и индексы моделей — например, operations.batch_id.
 # Использование:
 # - python -m VKMax.BACKEND.DATABASE.alembic  (создаст таблицы и загрузит базовые форматы)
 
@@ -10,18 +12,57 @@ from __future__ import annotations
 import asyncio
 from typing import Sequence
 
-from sqlalchemy import select
+import logging
+
+from sqlalchemy import inspect, select
+from sqlalchemy.schema import CreateColumn
 
 from .session import engine, async_session_factory
 from .models import Base, Format
 
 
+logger = logging.getLogger("vkmax.database.alembic")
+
+
 async def create_tables() -> None:
     async with engine.begin() as conn:
         # Важно: run_sync для create_all в async режиме
         await conn.run_sync(Base.metadata.create_all)
 
 
+def _upgrade_schema_sync(conn) -> list[str]:  # noqa: ANN001
+    insp = inspect(conn)
+    existing_tables = set(insp.get_table_names())
+    added: list[str] = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_cols = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing_cols:
+                continue
+            if not col.nullable or col.primary_key:
+                logger.warning("[alembic.upgrade_schema] Skip NOT NULL column %s.%s: needs manual migration", table.name, col.name)
+                continue
+            # FK-ограничение в ALTER TABLE не добавляем (SQLite не умеет) — колонка и индекс
+            ddl = CreateColumn(col).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            added.append(f"{table.name}.{col.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    return added
+
+
+async def upgrade_schema() -> list[str]:
+    """Добавляет в существующие таблицы колонки/индексы, появившиеся в моделях позже."""
+
+    async with engine.begin() as conn:
+        added = await conn.run_sync(_upgrade_schema_sync)
+    if added:
+        logger.info("[alembic.upgrade_schema] Added columns: %s", ", ".join(added))
+    return added
+
+
 async def seed_formats() -> None:
     async with async_session_factory() as session:
         exists = (await session.execute(select(Format.id).limit(1))).first()
@@ -41,6 +82,7 @@ async def seed_formats() -> None:
 
 async def main() -> None:
     await create_tables()
+    await upgrade_schema()
     await seed_formats()
 
 
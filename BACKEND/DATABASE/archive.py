@@ -0,0 +1,203 @@
+# Руководство к файлу (DATABASE/archive.py)
+# Назначение:
+# - Пакетная архивация операций: завершённые операции старше N дней переносятся из
+#   горячей таблицы operations в operations_archive либо в сжатые JSONL-файлы.
+# - В Postgres operations_archive секционирована помесячно по datetime; архиватор
+#   создаёт недостающие секции перед вставкой (старые секции можно DETACH/DROP целиком).
+# Использование:
+# - python -m BACKEND.DATABASE.archive --days 30 --batch-size 500
+# - python -m BACKEND.DATABASE.archive --days 90 --jsonl-dir /backups/operations
+# Важно:
+# - Каждая пачка — отдельная транзакция (INSERT в архив + DELETE из operations), поэтому
+#   джоба не держит долгих блокировок и безопасно прерывается.
+# - В режиме JSONL файл пишется до коммита удаления: при сбое строки могут продублироваться
+#   в файле (at-least-once), но не потеряются.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from .session import async_session_factory
+from .models import Operation, OperationArchive
+
+
+logger = logging.getLogger("vkmax.database.archive")
+
+DEFAULT_ARCHIVE_STATUSES: Sequence[str] = ("completed", "failed", "cancelled", "timed_out", "dead_letter")
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class ArchiveResult:
+    moved: int = 0
+    batches: int = 0
+    jsonl_files: List[str] = field(default_factory=list)
+
+
+def _month_start(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + 1, month=1) if dt.month == 12 else dt.replace(month=dt.month + 1)
+
+
+def partition_name(dt: datetime) -> str:
+    start = _month_start(dt)
+    return f"operations_archive_y{start.year:04d}m{start.month:02d}"
+
+
+async def ensure_archive_partitions(session: AsyncSession, months: Iterable[datetime]) -> None:
+    """Создаёт месячные секции operations_archive для указанных дат (только Postgres)."""
+
+    bind = getattr(session, "bind", None)
+    if getattr(getattr(bind, "dialect", None), "name", None) != "postgresql":
+        return
+    for start in sorted({_month_start(m) for m in months}):
+        end = _next_month(start)
+        await session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF operations_archive "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+
+
+def _row(op: Operation) -> Dict[str, Any]:
+    return {
+        "id": int(op.id),
+        "datetime": op.datetime,
+        "user_id": op.user_id,
+        "file_id": op.file_id,
+        "result_file_id": op.result_file_id,
+        "old_format_id": op.old_format_id,
+        "new_format_id": op.new_format_id,
+        "status": op.status,
+        "error_message": op.error_message,
+    }
+
+
+def _write_jsonl(jsonl_dir: Path, rows: List[Dict[str, Any]]) -> List[str]:
+    """Дописывает строки в operations-YYYY-MM.jsonl.gz (по месяцу datetime операции)."""
+
+    jsonl_dir.mkdir(parents=True, exist_ok=True)
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        start = _month_start(r["datetime"])
+        by_month.setdefault(f"operations-{start.year:04d}-{start.month:02d}.jsonl.gz", []).append(r)
+
+    written: List[str] = []
+    for name, items in by_month.items():
+        path = jsonl_dir / name
+        # gzip в режиме "ab" дописывает новый member — gzip.open читает файл целиком
+        with gzip.open(path, "ab") as fh:
+            fh.write(b"".join(orjson.dumps(it, option=orjson.OPT_UTC_Z) + b"\n" for it in items))
+        written.append(str(path))
+    return written
+
+
+async def archive_operations(
+    *,
+    older_than_days: int = DEFAULT_ARCHIVE_AFTER_DAYS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    statuses: Sequence[str] = DEFAULT_ARCHIVE_STATUSES,
+    jsonl_dir: Optional[str] = None,
+    max_batches: Optional[int] = None,
+    session_factory: sessionmaker = async_session_factory,
+) -> ArchiveResult:
+    """Переносит операции со статусом из *statuses* и datetime старше *older_than_days*.
+
+    - jsonl_dir=None — строки вставляются в operations_archive (доступны через include_archive);
+    - jsonl_dir задан — строки дописываются в сжатые JSONL-файлы и из БД удаляются.
+    """
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    result = ArchiveResult()
+    logger.info(
+        "[archive.archive_operations] Start cutoff=%s statuses=%s batch_size=%s target=%s",
+        cutoff.isoformat(),
+        ",".join(statuses),
+        batch_size,
+        jsonl_dir or "operations_archive",
+    )
+
+    while max_batches is None or result.batches < max_batches:
+        async with session_factory() as session:
+            q = (
+                select(Operation)
+                .where(Operation.status.in_(list(statuses)), Operation.datetime < cutoff)
+                .order_by(Operation.id)
+                .limit(batch_size)
+            )
+            if session.bind.dialect.name == "postgresql":
+                q = q.with_for_update(skip_locked=True)
+            ops = (await session.execute(q)).scalars().all()
+            if not ops:
+                break
+
+            rows = [_row(op) for op in ops]
+            if jsonl_dir:
+                files = await asyncio.to_thread(_write_jsonl, Path(jsonl_dir), rows)
+                result.jsonl_files.extend(f for f in files if f not in result.jsonl_files)
+            else:
+                await ensure_archive_partitions(session, (r["datetime"] for r in rows))
+                await session.execute(insert(OperationArchive), rows)
+
+            await session.execute(delete(Operation).where(Operation.id.in_([r["id"] for r in rows])))
+            await session.commit()
+
+        result.moved += len(rows)
+        result.batches += 1
+        logger.debug("[archive.archive_operations] Batch %s moved=%s", result.batches, len(rows))
+        if len(rows) < batch_size:
+            break
+
+    logger.info("[archive.archive_operations] Done moved=%s batches=%s", result.moved, result.batches)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Архивация завершённых операций VKMax")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=int(os.getenv("VKMAX_ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS)),
+        help="Архивировать операции старше N дней",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--status", action="append", dest="statuses", help="Статус для архивации (можно несколько)")
+    parser.add_argument("--jsonl-dir", default=None, help="Писать в gzip JSONL вместо operations_archive")
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    res = asyncio.run(
+        archive_operations(
+            older_than_days=args.days,
+            batch_size=args.batch_size,
+            statuses=args.statuses or DEFAULT_ARCHIVE_STATUSES,
+            jsonl_dir=args.jsonl_dir,
+            max_batches=args.max_batches,
+        )
+    )
+    print(f"moved={res.moved} batches={res.batches} files={','.join(res.jsonl_files)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# Руководство к файлу (DATABASE/instrumentation.py)
+# Назначение:
+# - Инструментирование SQL на уровне движка: before/after_cursor_execute считают
+#   количество запросов и суммарное время БД в рамках текущего HTTP-запроса
+#   (contextvars) и пишут медленные запросы в лог vkmax.database.sql.
+# - Агрегаты по маршрутам (requests, queries, db_ms, slow) доступны через snapshot()
+#   для /stats/db и метрик; capture_queries() — для тестов/бенчмарков (CI).
+# - Время каждого запроса пишется в гистограмму vkmax_db_query_duration_seconds{route}
+#   (METRICS, GET /metrics), медленные — в vkmax_db_slow_queries_total{route}.
+# Важно:
+# - Порог медленного запроса: VKMAX_DB_SLOW_QUERY_MS (по умолчанию 200 мс).
+# - Вне HTTP-запроса (воркеры, джобы) запросы учитываются под маршрутом "background".
+#   Задачи, созданные во время запроса, наследуют его contextvars: фоновые задачи
+#   создаются в background_context(), иначе их SQL попадал бы в счётчики запроса.
+# - slow хранит не больше _MAX_SLOW_PER_REQUEST примеров, число медленных — slow_count.
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from BACKEND import METRICS
+
+
+logger = logging.getLogger("vkmax.database.sql")
+
+BACKGROUND_ROUTE = "background"
+# HTTP-запрос без совпавшего маршрута (404): сырой путь в ключах агрегатов разрастался бы без границ
+UNMATCHED_ROUTE = "unmatched"
+_MAX_SLOW_PER_REQUEST = 20
+_MAX_STATEMENT_CHARS = 500
+
+QUERY_SECONDS = METRICS.histogram(
+    "vkmax_db_query_duration_seconds",
+    "SQL statement latency by HTTP route (background outside requests)",
+    ("route",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+SLOW_QUERIES = METRICS.counter("vkmax_db_slow_queries_total", "SQL statements slower than VKMAX_DB_SLOW_QUERY_MS", ("route",))
+
+
+def _slow_threshold_ms() -> float:
+    try:
+        return float(os.getenv("VKMAX_DB_SLOW_QUERY_MS", "") or 200.0)
+    except ValueError:
+        return 200.0
+
+
+@dataclass
+class QueryStats:
+    """Счётчики SQL одного запроса/блока capture_queries()."""
+
+    route: str = BACKGROUND_ROUTE
+    operation_id: Optional[str] = None
+    count: int = 0
+    total_ms: float = 0.0
+    slow: List[Tuple[float, str]] = field(default_factory=list)
+    slow_count: int = 0
+
+    def record(self, elapsed_ms: float, statement: str, threshold_ms: float) -> bool:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= threshold_ms:
+            self.slow_count += 1
+            if len(self.slow) < _MAX_SLOW_PER_REQUEST:
+                self.slow.append((round(elapsed_ms, 2), statement[:_MAX_STATEMENT_CHARS]))
+            return True
+        return False
+
+
+@dataclass
+class RouteAggregate:
+    requests: int = 0
+    queries: int = 0
+    db_ms: float = 0.0
+    slow_queries: int = 0
+    max_queries: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "db_ms": round(self.db_ms, 2),
+            "slow_queries": self.slow_queries,
+            "max_queries": self.max_queries,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0.0,
+        }
+
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("vkmax_query_stats", default=None)
+_lock = threading.Lock()
+_aggregates: Dict[str, RouteAggregate] = {}
+
+
+def _aggregate(stats: QueryStats, *, count_request: bool = True) -> None:
+    with _lock:
+        agg = _aggregates.setdefault(stats.route, RouteAggregate())
+        agg.requests += 1 if count_request else 0
+        agg.queries += stats.count
+        agg.db_ms += stats.total_ms
+        agg.slow_queries += stats.slow_count
+        agg.max_queries = max(agg.max_queries, stats.count)
+
+
+def begin_request(route: str = BACKGROUND_ROUTE) -> Tuple[QueryStats, contextvars.Token]:
+    stats = QueryStats(route=route)
+    return stats, _current.set(stats)
+
+
+def end_request(token: contextvars.Token) -> Optional[QueryStats]:
+    stats = _current.get()
+    _current.reset(token)
+    if stats is not None:
+        _aggregate(stats)
+    return stats
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def background_context() -> contextvars.Context:
+    """Копия текущего контекста без счётчиков запроса — для asyncio.create_task(..., context=...)."""
+
+    ctx = contextvars.copy_context()
+    ctx.run(_current.set, None)
+    return ctx
+
+
+def tag_request(route: Optional[str] = None, operation_id: Optional[Any] = None) -> None:
+    """Уточняет маршрут (шаблон пути) и operation_id для текущего запроса."""
+
+    stats = _current.get()
+    if stats is None:
+        return
+    if route:
+        stats.route = route
+    if operation_id is not None:
+        stats.operation_id = str(operation_id)
+
+
+@contextmanager
+def capture_queries(route: str = "capture") -> Iterator[QueryStats]:
+    """Считает SQL внутри блока: ``with capture_queries() as q: ...; assert q.count <= 3``."""
+
+    stats, token = begin_request(route)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {route: agg.as_dict() for route, agg in sorted(_aggregates.items())}
+
+
+def reset() -> None:
+    with _lock:
+        _aggregates.clear()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Навешивает счётчики на sync_engine (идемпотентно)."""
+
+    sync_engine = engine.sync_engine
+    if getattr(sync_engine, "_vkmax_instrumented", False):
+        return
+    sync_engine._vkmax_instrumented = True  # type: ignore[attr-defined]
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        conn.info.setdefault("vkmax_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        starts = conn.info.get("vkmax_query_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+        threshold = _slow_threshold_ms()
+        stats = _current.get()
+        if stats is None:
+            stats = QueryStats(route=BACKGROUND_ROUTE)
+            is_slow = stats.record(elapsed_ms, statement, threshold)
+            _aggregate(stats, count_request=False)
+        else:
+            is_slow = stats.record(elapsed_ms, statement, threshold)
+        QUERY_SECONDS.labels(stats.route).observe(elapsed_ms / 1000.0)
+        if is_slow:
+            SLOW_QUERIES.labels(stats.route).inc()
+            logger.warning(
+                "[instrumentation] Slow query %.1fms route=%s operation_id=%s: %s",
+                elapsed_ms,
+                stats.route,
+                stats.operation_id,
+                " ".join(statement.split())[:_MAX_STATEMENT_CHARS],
+            )
@@ -1,24 +1,38 @@
 # Руководство к файлу (DATABASE/models.py)
 # Назначение:
-# - SQLAlchemy‑модели БД VKMax: USERS, FILES, OPERATIONS, FORMATS.
+# - SQLAlchemy‑модели БД VKMax: USERS, FILES, OPERATIONS, FORMATS, SITE_PAGES, SITE_EDGES,
+#   OPERATIONS_ARCHIVE (холодная история операций, см. DATABASE/archive.py), OPERATION_EVENTS,
+#   BATCHES (пакеты /batch-convert; operations.batch_id ссылается на пакет),
+#   RATE_LIMIT_BUCKETS (token bucket лимитера запросов при VKMAX_RATE_LIMIT=db),
+#   WEBHOOK_ENDPOINTS / WEBHOOK_DELIVERIES (исходящие вебхуки и очередь их доставки),
+#   LLM_RESPONSE_CACHE (кэш ответов LLM при VKMAX_LLM_CACHE=db, LLM_SERVICE/response_cache.py).
 # - Совместимы с SQLite (dev) и Postgres (prod) без изменений моделей.
 # Важно:
 # - PK: BigInteger (в SQLite тип не строгий — допустимо).
 # - Таймстемпы по умолчанию через server_default=func.now().
+# - operations.lease_owner / lease_expires_at — аренда выполняемой операции (восстановление
+#   после падения воркера, CONVERT/lease_reaper.py).
+# - Полнотекстовый поиск по site_pages: в Postgres — GIN-индекс по to_tsvector,
+#   в SQLite — external-content таблица FTS5 site_pages_fts с триггерами синхронизации.
 
 from __future__ import annotations
 
 from sqlalchemy import (
+    DDL,
     BigInteger,
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
+    Integer,
     LargeBinary,
     String,
     Text,
     JSON,
     Index,
+    event,
+    text as sa_text,
 )
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
@@ -64,6 +78,8 @@ class File(Base):
     path = Column(String(1024), nullable=True)
     filename = Column(String(512), nullable=True)
     file_size = Column(BigInteger, nullable=True)
+    # sha256 содержимого на диске, считается при загрузке (POST /upload); None — не посчитан
+    sha256 = Column(String(64), nullable=True, index=True)
     mime_type = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     status = Column(String(50), nullable=True)
@@ -74,6 +90,100 @@ class File(Base):
     result_operations = relationship("Operation", back_populates="result_file", foreign_keys="Operation.result_file_id")
 
 
+class Batch(Base):
+    """Пакет операций /batch-convert: лимит параллелизма и итоговый статус пакета.
+
+    status: running → completed | cancelled (все отменены) | failed (ни одной успешной) | partial.
+    """
+
+    __tablename__ = "batches"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    status = Column(String(50), nullable=False, server_default="running")
+    total = Column(Integer, nullable=False, server_default="0")
+    max_parallel = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class RateLimitBucket(Base):
+    """Token bucket лимитера запросов, общий для воркеров (FAST_API/rate_limit.py, backend db).
+
+    key — "<класс>:<user:id | ip:адрес>", tokens — остаток на момент updated_at
+    (unix-время в секундах, пополнение считается при следующем запросе).
+    """
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(200), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+class LlmCacheEntry(Base):
+    """Ответ LLM, прошедший очистку и валидацию (LLM_SERVICE/response_cache.py, backend db).
+
+    key — sha256 от (модель, температура, промпт, task_id); created_at / last_used_at —
+    unix-время в секундах (TTL и вытеснение давно не использованных), size — байты ответа.
+    """
+
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String(255), nullable=True)
+    task_id = Column(String(100), nullable=True)
+    response = Column(Text, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(Float, nullable=False)
+    last_used_at = Column(Float, nullable=False, index=True)
+
+
+class WebhookEndpoint(Base):
+    """Адрес для исходящих вебхуков: пользователя (user_id) или интеграции (user_id=NULL — все события).
+
+    events — шаблоны типов событий через запятую (fnmatch: "operation.*", "batch.finished").
+    """
+
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    url = Column(String(2048), nullable=False)
+    secret = Column(String(255), nullable=False)
+    events = Column(String(1000), nullable=False, server_default="*")
+    max_concurrency = Column(Integer, nullable=True)
+    active = Column(Boolean, nullable=False, server_default="1")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class WebhookDelivery(Base):
+    """Очередь доставки (outbox): строка на пару (адрес, событие), пишется в транзакции события.
+
+    status: pending → delivered | dead. next_attempt_at (unix-секунды) — когда доставку можно
+    взять; взятая воркером строка сдвигается на время аренды, так что упавший воркер её не теряет.
+    """
+
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    endpoint_id = Column(BigInteger, ForeignKey("webhook_endpoints.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(String(64), nullable=False)
+    event_type = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON события
+    status = Column(String(16), nullable=False, server_default="pending")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(Float, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+        Index("ix_webhook_deliveries_endpoint", "endpoint_id", "id"),
+    )
+
+
 class Operation(Base):
     __tablename__ = "operations"
 
@@ -86,6 +196,15 @@ class Operation(Base):
     new_format_id = Column(BigInteger, ForeignKey("formats.id", ondelete="SET NULL"), nullable=True)
     status = Column(String(50), nullable=False, server_default="queued")
     error_message = Column(Text, nullable=True)
+    batch_id = Column(BigInteger, ForeignKey("batches.id", ondelete="SET NULL"), nullable=True, index=True)
+    # Число начатых попыток выполнения (повторы при временных сбоях, CONVERT/retry_policy.py)
+    attempts = Column(Integer, nullable=True, server_default="0")
+    # Исходный URL website-операции: нужен, чтобы перезапустить её после падения процесса
+    source_url = Column(Text, nullable=True)
+    # Аренда незавершённой операции (CONVERT/lease_reaper.py): владелец-процесс продлевает её
+    # heartbeat-ом; истёкшую аренду reaper считает признаком упавшего воркера (unix-время)
+    lease_owner = Column(String(128), nullable=True)
+    lease_expires_at = Column(Float, nullable=True)
 
     user = relationship("User", back_populates="operations")
     file = relationship("File", foreign_keys=[file_id], back_populates="source_operations")
@@ -94,8 +213,132 @@ class Operation(Base):
     new_format = relationship("Format", foreign_keys=[new_format_id])
 
 
+class OperationEvent(Base):
+    """Журнал операции: смены статуса (kind="status") и этапы обработки (kind="stage").
+
+    duration_ms у статуса — время в предыдущем статусе (например, ожидание в очереди
+    для processing), у этапа — длительность этапа по монотонным часам (perf_counter).
+    FK на operations нет: события переживают архивацию операции.
+    """
+
+    __tablename__ = "operation_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    operation_id = Column(BigInteger, nullable=False)
+    kind = Column(String(16), nullable=False)  # status | stage
+    name = Column(String(64), nullable=False)  # queued/processing/... или extract/llm/render/db_write
+    outcome = Column(String(16), nullable=True)  # для этапов: ok | error
+    duration_ms = Column(Float, nullable=True)
+    progress = Column(Integer, nullable=True)  # 0..100 после завершения этапа/статуса
+    detail = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_operation_events_operation", "operation_id", "id"),
+        Index("ix_operation_events_kind_name", "kind", "name"),
+    )
+
+
+class OperationArchive(Base):
+    """Архив завершённых операций (переносится из operations джобой DATABASE/archive.py).
+
+    В Postgres таблица секционирована по RANGE(datetime) помесячно: секции
+    operations_archive_yYYYYmMM создаёт архиватор, остальное попадает в DEFAULT.
+    Внешних ключей нет — архив переживает удаление файлов/пользователей.
+    """
+
+    __tablename__ = "operations_archive"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # Ключ секционирования обязан входить в PK секционированной таблицы
+    datetime = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    user_id = Column(BigInteger, nullable=True)
+    file_id = Column(BigInteger, nullable=True)
+    result_file_id = Column(BigInteger, nullable=True)
+    old_format_id = Column(BigInteger, nullable=True)
+    new_format_id = Column(BigInteger, nullable=True)
+    status = Column(String(50), nullable=False)
+    error_message = Column(Text, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_operations_archive_user_datetime", "user_id", "datetime"),
+        Index("ix_operations_archive_id", "id"),
+        {"postgresql_partition_by": "RANGE (datetime)"},
+    )
+
+
+event.listen(
+    OperationArchive.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS operations_archive_default PARTITION OF operations_archive DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
+
+
 # Индексы для типичных фильтров
 Index("ix_files_user_created", File.user_id, File.created_at)
 Index("ix_operations_user_datetime", Operation.user_id, Operation.datetime)
 Index("ix_operations_status", Operation.status)
+Index("ix_operations_lease", Operation.status, Operation.lease_expires_at)
+
+
+class SitePage(Base):
+    """Страница обхода сайта из site_bundle (нормализованная копия File.content)."""
+
+    __tablename__ = "site_pages"
+
+    # В SQLite Integer PRIMARY KEY = rowid, на него ссылается FTS5 (content_rowid)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    file_id = Column(BigInteger, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    page_id = Column(Integer, nullable=False)  # id страницы внутри bundle
+    url = Column(String(2048), nullable=True)
+    title = Column(String(1024), nullable=True)
+    text = Column(Text, nullable=True)
+    depth = Column(Integer, nullable=True)
+    cluster = Column(String(512), nullable=True)
+
+    __table_args__ = (
+        Index("ux_site_pages_file_page", "file_id", "page_id", unique=True),
+        Index(
+            "ix_site_pages_tsv",
+            sa_text("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(text, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
+class SiteEdge(Base):
+    """Ссылка между страницами одного site_bundle (page_id -> page_id)."""
+
+    __tablename__ = "site_edges"
+
+    file_id = Column(BigInteger, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    source_page_id = Column(Integer, primary_key=True)
+    target_page_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_site_edges_file_target", "file_id", "target_page_id"),
+    )
+
+
+# SQLite: FTS5-индекс поверх site_pages (external content) + триггеры синхронизации
+for _ddl in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS site_pages_fts USING fts5("
+    "title, text, content='site_pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS site_pages_ai AFTER INSERT ON site_pages BEGIN "
+    "INSERT INTO site_pages_fts(rowid, title, text) VALUES (new.id, new.title, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS site_pages_ad AFTER DELETE ON site_pages BEGIN "
+    "INSERT INTO site_pages_fts(site_pages_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS site_pages_au AFTER UPDATE ON site_pages BEGIN "
+    "INSERT INTO site_pages_fts(site_pages_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text); "
+    "INSERT INTO site_pages_fts(rowid, title, text) VALUES (new.id, new.title, new.text); END",
+):
+    event.listen(SitePage.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+
+event.listen(
+    SitePage.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS site_pages_fts").execute_if(dialect="sqlite"),
+)
@@ -2,24 +2,206 @@
  # Назначение:
  # - Асинхронная настройка SQLAlchemy: движок, фабрика сессий, зависимость get_db_session.
  # - По умолчанию SQLite (aiosqlite), для Docker/Postgres используется URL из окружения.
+ # - Фабрика движка create_engine_for_url учитывает диалект: для SQLite включает
+ #   WAL/synchronous=NORMAL/busy_timeout/mmap через PRAGMA на connect, для Postgres
+ #   (asyncpg) — размер пула, кэш prepared statements и серверные таймауты.
  # Важно:
  # - URL БД берётся из VKMAX_DATABASE_URL (приоритет), затем DB_URL, иначе локальный sqlite.
+ # - Параметры движка читаются из VKMAX_DB_* (см. EngineSettings.from_env).
+ # - VKMAX_DB_PROFILE=baseline отключает тюнинг (используется в бенчмарке BENCHMARKS/db_profiles.py).
+ # - get_db_read_session — зависимость для чистых чтений: без commit, с маршрутизацией на реплику
+ #   (VKMAX_DATABASE_REPLICA_URL) и защитой read-your-writes для только что изменённых сущностей.
+ # - Оба движка инструментированы (DATABASE/instrumentation.py): число запросов, время БД
+ #   и медленные запросы на HTTP-запрос; зависимости помечают маршрут и operation_id.
 
 from __future__ import annotations
 
 import os
-from typing import AsyncGenerator
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Iterable, Optional, Set, Tuple
 from pathlib import Path
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import instrumentation
 
 DEFAULT_SQLITE_PATH = Path(__file__).resolve().parent / "vkmax.sqlite3"
 DEFAULT_DB_URL = f"sqlite+aiosqlite:///{DEFAULT_SQLITE_PATH}"
 
 DB_URL = os.getenv("VKMAX_DATABASE_URL") or os.getenv("DB_URL") or DEFAULT_DB_URL
+REPLICA_DB_URL = os.getenv("VKMAX_DATABASE_REPLICA_URL") or None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    """Параметры движка БД с разбивкой по диалектам.
+
+    profile:
+      - ``tuned`` (по умолчанию) — применяет PRAGMA для SQLite и настройки пула для Postgres;
+      - ``baseline`` — поведение по умолчанию SQLAlchemy (для сравнения в бенчмарке).
+    """
+
+    profile: str = "tuned"
+
+    # SQLite
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
+
+    # Postgres / asyncpg
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 500
+    statement_timeout_ms: int = 30_000
+    lock_timeout_ms: int = 5_000
+    idle_in_transaction_timeout_ms: int = 60_000
+    application_name: str = "vkmax"
+
+    echo: bool = False
+
+    @classmethod
+    def from_env(cls) -> "EngineSettings":
+        """Собирает настройки из переменных окружения VKMAX_DB_*."""
+
+        d = cls()
+        return cls(
+            profile=(os.getenv("VKMAX_DB_PROFILE") or d.profile).strip().lower(),
+            sqlite_journal_mode=os.getenv("VKMAX_DB_SQLITE_JOURNAL_MODE") or d.sqlite_journal_mode,
+            sqlite_synchronous=os.getenv("VKMAX_DB_SQLITE_SYNCHRONOUS") or d.sqlite_synchronous,
+            sqlite_busy_timeout_ms=_env_int("VKMAX_DB_SQLITE_BUSY_TIMEOUT_MS", d.sqlite_busy_timeout_ms),
+            sqlite_mmap_size=_env_int("VKMAX_DB_SQLITE_MMAP_SIZE", d.sqlite_mmap_size),
+            sqlite_cache_size_kb=_env_int("VKMAX_DB_SQLITE_CACHE_SIZE_KB", d.sqlite_cache_size_kb),
+            pool_size=_env_int("VKMAX_DB_POOL_SIZE", d.pool_size),
+            max_overflow=_env_int("VKMAX_DB_MAX_OVERFLOW", d.max_overflow),
+            pool_timeout=_env_float("VKMAX_DB_POOL_TIMEOUT", d.pool_timeout),
+            pool_recycle=_env_int("VKMAX_DB_POOL_RECYCLE", d.pool_recycle),
+            pool_pre_ping=_env_bool("VKMAX_DB_POOL_PRE_PING", d.pool_pre_ping),
+            statement_cache_size=_env_int("VKMAX_DB_STATEMENT_CACHE_SIZE", d.statement_cache_size),
+            statement_timeout_ms=_env_int("VKMAX_DB_STATEMENT_TIMEOUT_MS", d.statement_timeout_ms),
+            lock_timeout_ms=_env_int("VKMAX_DB_LOCK_TIMEOUT_MS", d.lock_timeout_ms),
+            idle_in_transaction_timeout_ms=_env_int(
+                "VKMAX_DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", d.idle_in_transaction_timeout_ms
+            ),
+            application_name=os.getenv("VKMAX_DB_APPLICATION_NAME") or d.application_name,
+            echo=_env_bool("VKMAX_DB_ECHO", d.echo),
+        )
+
+
+def _sqlite_pragmas(settings: EngineSettings) -> Dict[str, Any]:
+    return {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        # Отрицательное значение cache_size задаёт размер в KiB, а не в страницах
+        "cache_size": -abs(settings.sqlite_cache_size_kb),
+        "temp_store": "MEMORY",
+    }
+
 
-engine = create_async_engine(DB_URL, echo=False, future=True)
+def _install_sqlite_pragmas(engine: AsyncEngine, settings: EngineSettings) -> None:
+    pragmas = _sqlite_pragmas(settings)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_conn, _record):  # noqa: ANN001
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _postgres_server_settings(settings: EngineSettings) -> Dict[str, str]:
+    server_settings: Dict[str, str] = {"application_name": settings.application_name}
+    if settings.statement_timeout_ms > 0:
+        server_settings["statement_timeout"] = str(settings.statement_timeout_ms)
+    if settings.lock_timeout_ms > 0:
+        server_settings["lock_timeout"] = str(settings.lock_timeout_ms)
+    if settings.idle_in_transaction_timeout_ms > 0:
+        server_settings["idle_in_transaction_session_timeout"] = str(settings.idle_in_transaction_timeout_ms)
+    return server_settings
+
+
+def create_engine_for_url(url: str, settings: Optional[EngineSettings] = None) -> AsyncEngine:
+    """Создаёт AsyncEngine с настройками, подходящими для диалекта *url*.
+
+    - sqlite: PRAGMA journal_mode/synchronous/busy_timeout/mmap_size/cache_size на каждом connect;
+    - postgresql: pool_size/max_overflow/pool_pre_ping/pool_recycle, кэш prepared
+      statements asyncpg и серверные таймауты через server_settings;
+    - profile=baseline: create_async_engine без дополнительных параметров.
+    """
+
+    settings = settings or EngineSettings.from_env()
+    if settings.profile == "baseline":
+        return create_async_engine(url, echo=settings.echo, future=True)
+
+    backend = make_url(url).get_backend_name()
+
+    if backend == "sqlite":
+        engine = create_async_engine(
+            url,
+            echo=settings.echo,
+            future=True,
+            # timeout драйвера sqlite3 — та же защита от "database is locked", что и busy_timeout
+            connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000.0},
+        )
+        _install_sqlite_pragmas(engine, settings)
+        return engine
+
+    if backend == "postgresql":
+        connect_args: Dict[str, Any] = {"server_settings": _postgres_server_settings(settings)}
+        if make_url(url).get_driver_name() == "asyncpg":
+            connect_args["prepared_statement_cache_size"] = settings.statement_cache_size
+        return create_async_engine(
+            url,
+            echo=settings.echo,
+            future=True,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_pre_ping=settings.pool_pre_ping,
+            connect_args=connect_args,
+        )
+
+    return create_async_engine(url, echo=settings.echo, future=True, pool_pre_ping=settings.pool_pre_ping)
+
+
+engine = create_engine_for_url(DB_URL)
+instrumentation.instrument_engine(engine)
 
 async_session_factory = sessionmaker(
     bind=engine,
@@ -30,10 +212,21 @@ async_session_factory = sessionmaker(
 )
 
 
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+def _tag_request(request: Optional[Request]) -> None:
+    if request is None:
+        return
+    route = request.scope.get("route")
+    instrumentation.tag_request(
+        route=getattr(route, "path", None),
+        operation_id=request.path_params.get("operation_id"),
+    )
+
+
+async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """Dependency function that yields an async DB session.
     Коммит/роллбек управляется здесь для простоты использования в FastAPI.
     """
+    _tag_request(request)
     async with async_session_factory() as session:
         try:
             yield session
@@ -44,3 +237,147 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+
+# --------------------------- Read replica routing ---------------------------
+
+replica_engine: Optional[AsyncEngine] = create_engine_for_url(REPLICA_DB_URL) if REPLICA_DB_URL else None
+if replica_engine is not None:
+    instrumentation.instrument_engine(replica_engine)
+
+replica_session_factory = (
+    sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+    )
+    if replica_engine is not None
+    else None
+)
+
+
+def _staleness_window_sec() -> float:
+    try:
+        return float(os.getenv("VKMAX_DB_REPLICA_STALENESS_SEC", "") or 5.0)
+    except ValueError:
+        return 5.0
+
+
+class RecentWrites:
+    """Журнал недавно закоммиченных сущностей (таблица, id) в пределах процесса.
+
+    Используется как защита read-your-writes: пока запись моложе окна
+    устаревания реплики, чтения по этой сущности идут в primary.
+    """
+
+    # Колонки-ссылки, по которым запись "затрагивает" родительскую сущность:
+    # новая операция по file_id=5 должна быть видна в GET /graph/5 и /users/{id}/operations.
+    REFERENCE_COLUMNS = {"file_id": "files", "user_id": "users"}
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], float] = {}
+        self._max_entries = max_entries
+
+    @classmethod
+    def keys_for(cls, obj: Any) -> Set[Tuple[str, str]]:
+        keys: Set[Tuple[str, str]] = set()
+        table = getattr(obj, "__tablename__", None)
+        if table is None:
+            return keys
+        pk = getattr(obj, "id", None)
+        if pk is not None:
+            keys.add((table, str(pk)))
+        for column, ref_table in cls.REFERENCE_COLUMNS.items():
+            value = getattr(obj, column, None)
+            if value is not None:
+                keys.add((ref_table, str(value)))
+        return keys
+
+    def mark(self, keys: Iterable[Tuple[str, str]]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._entries[key] = now
+            if len(self._entries) > self._max_entries:
+                self._prune(now)
+
+    def is_recent(self, table: str, pk: Any, window_sec: Optional[float] = None) -> bool:
+        window = _staleness_window_sec() if window_sec is None else window_sec
+        with self._lock:
+            ts = self._entries.get((table, str(pk)))
+        return ts is not None and (time.monotonic() - ts) < window
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _prune(self, now: float) -> None:
+        window = _staleness_window_sec()
+        for key in [k for k, ts in self._entries.items() if now - ts >= window]:
+            self._entries.pop(key, None)
+
+
+recent_writes = RecentWrites()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_keys(session: Session, _flush_context) -> None:  # noqa: ANN001
+    pending = session.info.setdefault("vkmax_written_keys", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        pending.update(RecentWrites.keys_for(obj))
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_written_keys(session: Session) -> None:
+    pending = session.info.pop("vkmax_written_keys", None)
+    if pending:
+        recent_writes.mark(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_written_keys(session: Session) -> None:
+    session.info.pop("vkmax_written_keys", None)
+
+
+# Параметры пути/запроса, по которым определяется сущность для проверки свежести
+_READ_ROUTING_PARAMS = {"operation_id": "operations", "file_id": "files", "user_id": "users"}
+
+
+def _needs_primary(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    if request.headers.get("x-consistency", "").lower() == "strong":
+        return True
+    for source in (request.path_params, request.query_params):
+        for param, table in _READ_ROUTING_PARAMS.items():
+            value = source.get(param)
+            if value is not None and recent_writes.is_recent(table, value):
+                return True
+    return False
+
+
+def select_read_session_factory(request: Optional[Request] = None) -> sessionmaker:
+    """Фабрика сессий для чтения: реплика, если она настроена и данные не "свежие"."""
+
+    if replica_session_factory is None or _needs_primary(request):
+        return async_session_factory
+    return replica_session_factory
+
+
+async def get_db_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency для read-only эндпоинтов (GET).
+
+    - commit не выполняется: транзакция откатывается при закрытии сессии;
+    - при заданном VKMAX_DATABASE_REPLICA_URL чтения идут в реплику, кроме сущностей,
+      изменённых в этом процессе за последние VKMAX_DB_REPLICA_STALENESS_SEC секунд,
+      и запросов с заголовком ``X-Consistency: strong``.
+    """
+    _tag_request(request)
+    factory = select_read_session_factory(request)
+    async with factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
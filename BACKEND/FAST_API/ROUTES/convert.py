@@ -4,32 +4,56 @@
 # - Очередь/воркер не реализованы: создаём операции в статусе queued.
 # - Также содержит эндпоинт поиска графа /search/graph, который проксирует запрос
 #   в сервисы CONVERT (search_site_graph) и возвращает GraphJson.
+# - Дешёвый поллинг: GET /operations/status?ids=... (пачка статусов одним запросом по PK)
+#   и long-poll GET /operations/{id}/wait?timeout=30 (ответ при смене статуса или по таймауту).
+# - Push-прогресс вместо поллинга: SSE GET /operations/stream?ids=... и WebSocket
+#   /operations/ws (события из CONVERT.progress_bus, первым приходит снапшот из БД).
+# - Пакеты: POST /batch-convert создаёт строку batches и операции, выполнение идёт
+#   в фоне через CONVERT.job_dispatcher (лимиты параллелизма, дедуп исходников);
+#   агрегат — GET /batches/{id}, ожидание завершения — GET /batches/{id}/wait.
+# - /convert и /convert/website выполняются в запросе, но в слоте диспетчера с классом
+#   interactive: под нагрузкой пакетов они обгоняют batch/background задачи.
+# - POST /operations/{id}/cancel отменяет операцию (статус cancelled); задачи с истёкшим
+#   дедлайном (VKMAX_JOB_TIMEOUT_<KIND>_SEC) получают статус timed_out.
+# - Тяжёлые POST проходят admit() (FAST_API/rate_limit.py): при перегрузке очереди или
+#   превышении лимита пользователя — 429 с Retry-After.
 
 from __future__ import annotations
 
+import asyncio
+import os
 from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 import logging
 
-from fastapi import APIRouter, HTTPException, Query, Depends
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
+from ..http_cache import invalidate_on_commit
+from ..rate_limit import admit
 from ..schemas import (
     ConvertRequest,
     ConvertWebsiteRequest,
     BatchConvertRequest,
+    BatchConvertResponse,
+    BatchStatusResponse,
     OperationResponse,
     OperationStatusResponse,
+    OperationStatusItem,
+    OperationsStatusResponse,
+    OperationWaitResponse,
     WebsiteStatusResponse,
     WebsitePreviewRequest,
     WebsitePreviewResponse,
     GraphSearchRequest,
     GraphSearchResponse,
 )
-from BACKEND.DATABASE.session import get_db_session
-from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+from BACKEND.DATABASE.session import async_session_factory, get_db_session, get_db_read_session
+from BACKEND.DATABASE.CACHE_MANAGER import BatchManager, ConvertManager, EventsManager
 from BACKEND.DATABASE.models import Format, File as FileModel
 from BACKEND.CONVERT import (
     run_file_conversion,
@@ -38,12 +62,22 @@ from BACKEND.CONVERT import (
     get_website_status,
     build_website_preview,
     search_site_graph,
+    eta_estimator,
+    progress_bus,
+    JobSpec,
+    job_dispatcher,
 )
+from BACKEND.CONVERT.progress_bus import FINAL_STATUSES, is_final
 
 logger = logging.getLogger("vkmax.fastapi.convert")
 
 router = APIRouter(tags=["convert"])
 
+_MAX_STREAM_IDS = 100
+_MAX_STATUS_IDS = 500
+_MAX_WAIT_SEC = 60.0
+_STREAM_HEARTBEAT_SEC = 15.0
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -81,16 +115,19 @@ async def _resolve_format_id(session: AsyncSession, fmt: Optional[str]) -> Optio
         )
         session.add(f)
         await session.flush()
+        invalidate_on_commit(session, "formats")
 
     return int(getattr(f, "id")) if f is not None else None
 
 
 @router.post("/convert", response_model=OperationResponse)
-async def convert(payload: ConvertRequest, session: AsyncSession = Depends(get_db_session)):
+async def convert(payload: ConvertRequest, request: Request, session: AsyncSession = Depends(get_db_session)):
     if not payload.source_file_id and not payload.url:
         raise HTTPException(400, "Either source_file_id or url is required")
     if payload.source_file_id and payload.url:
         raise HTTPException(400, "Provide only one of source_file_id or url")
+    limit_class = "website" if payload.url else ("graph" if payload.target_format == "graph" else "convert")
+    await admit(request, limit_class, payload.user_id)
 
     cm = ConvertManager(session)
     target_fmt_id = await _resolve_format_id(session, payload.target_format)
@@ -105,75 +142,459 @@ async def convert(payload: ConvertRequest, session: AsyncSession = Depends(get_d
         except Exception:
             logger.error("[/convert] Bad source_file_id=%s", payload.source_file_id)
             raise HTTPException(400, "Bad source_file_id")
-        op = await cm.create_file_operation(user_id=int(payload.user_id) if payload.user_id else None, source_file_id=fid, target_format_id=target_fmt_id)
+        user_id = int(payload.user_id) if payload.user_id else None
+        op = await cm.create_file_operation(user_id=user_id, source_file_id=fid, target_format_id=target_fmt_id)
+        # id читаем до диспетчера: его commit/rollback истекают объект op, ленивая загрузка
+        # атрибута вне greenlet падает с MissingGreenlet
+        op_id = int(getattr(op, "id"))
+        eta = await eta_estimator.estimate(session, op_id)
+        # Операция видна как queued (и её можно отменить), пока ждёт слот
+        await session.commit()
+        spec = JobSpec(
+            operation_id=op_id,
+            kind="graph" if payload.target_format == "graph" else "file",
+            user_id=user_id,
+            source_file_id=fid,
+            target_format_id=target_fmt_id,
+            priority="interactive",
+        )
 
-        # Сразу пытаемся выполнить файловую конвертацию (MVP без очереди)
+        # Выполняем в запросе, но через диспетчер: слот interactive, дедлайн, отмена через /cancel
         try:
             if payload.target_format in {"docx", "pdf"}:
-                await run_file_conversion(session, operation_id=int(getattr(op, "id")), storage_dir=settings.storage_dir)
+                await job_dispatcher.execute(
+                    session,
+                    spec,
+                    lambda: run_file_conversion(session, operation_id=spec.operation_id, storage_dir=settings.storage_dir),
+                )
             elif payload.target_format == "graph":
-                await generate_graph_for_operation(session, operation_id=int(getattr(op, "id")), storage_dir=settings.storage_dir)
+                await job_dispatcher.execute(
+                    session,
+                    spec,
+                    lambda: generate_graph_for_operation(session, operation_id=spec.operation_id, storage_dir=settings.storage_dir),
+                )
         except Exception as exc:  # noqa: WPS430
-            logger.exception("[/convert] Failed to process operation_id=%s: %s", getattr(op, "id"), exc)
+            logger.exception("[/convert] Failed to process operation_id=%s: %s", op_id, exc)
     else:
-        op = await cm.create_website_operation(user_id=int(payload.user_id) if payload.user_id else None, target_format_id=target_fmt_id)
-        # Website-операции пока только логируем и оставляем в статусе queued
+        user_id = int(payload.user_id) if payload.user_id else None
+        op = await cm.create_website_operation(user_id=user_id, target_format_id=target_fmt_id, url=payload.url)
+        op_id = int(getattr(op, "id"))
+        eta = await eta_estimator.estimate(session, op_id)
+        # Операция видна как queued (и её можно отменить), пока ждёт слот
+        await session.commit()
+        spec = JobSpec(operation_id=op_id, kind="website", user_id=user_id, url=payload.url, priority="interactive")
         try:
-            await enqueue_website_job(session, operation_id=int(getattr(op, "id")), url=payload.url)
+            await job_dispatcher.execute(session, spec, lambda: enqueue_website_job(session, operation_id=spec.operation_id, url=payload.url))
         except Exception as exc:  # noqa: WPS430
-            logger.exception("[/convert] Failed to enqueue website operation_id=%s: %s", getattr(op, "id"), exc)
+            logger.exception("[/convert] Failed to enqueue website operation_id=%s: %s", op_id, exc)
 
-    return OperationResponse(operation_id=str(getattr(op, 'id')), status='queued', estimated_time=5.0, queue_position=None)
+    return OperationResponse(
+        operation_id=str(op_id),
+        status='queued',
+        estimated_time=eta.estimated_time,
+        queue_position=eta.queue_position,
+    )
 
 
 @router.post("/convert/website", response_model=OperationResponse)
-async def convert_website(payload: ConvertWebsiteRequest, session: AsyncSession = Depends(get_db_session)):
+async def convert_website(payload: ConvertWebsiteRequest, request: Request, session: AsyncSession = Depends(get_db_session)):
+    await admit(request, "website", payload.user_id)
     cm = ConvertManager(session)
     target_fmt_id = await _resolve_format_id(session, payload.target_format)
 
     logger.info("[/convert/website] create website operation user_id=%s target_format=%s", payload.user_id, payload.target_format)
 
-    op = await cm.create_website_operation(user_id=int(payload.user_id) if payload.user_id else None, target_format_id=target_fmt_id)
+    user_id = int(payload.user_id) if payload.user_id else None
+    op = await cm.create_website_operation(user_id=user_id, target_format_id=target_fmt_id, url=payload.url)
+    # id читаем до диспетчера: после его commit/rollback op истекает (см. /convert)
+    op_id = int(getattr(op, "id"))
+    eta = await eta_estimator.estimate(session, op_id)
+    # Операция видна как queued (и её можно отменить), пока ждёт слот
+    await session.commit()
+    spec = JobSpec(operation_id=op_id, kind="website", user_id=user_id, url=payload.url, priority="interactive")
     try:
-        await enqueue_website_job(session, operation_id=int(getattr(op, "id")), url=payload.url)
+        await job_dispatcher.execute(session, spec, lambda: enqueue_website_job(session, operation_id=spec.operation_id, url=payload.url))
     except Exception as exc:  # noqa: WPS430
-        logger.exception("[/convert/website] Failed to enqueue website operation_id=%s: %s", getattr(op, "id"), exc)
+        logger.exception("[/convert/website] Failed to enqueue website operation_id=%s: %s", op_id, exc)
 
-    return OperationResponse(operation_id=str(getattr(op, 'id')), status='queued', estimated_time=5.0, queue_position=None)
+    return OperationResponse(
+        operation_id=str(op_id),
+        status='queued',
+        estimated_time=eta.estimated_time,
+        queue_position=eta.queue_position,
+    )
 
 
-@router.post("/batch-convert")
-async def batch_convert(payload: BatchConvertRequest, session: AsyncSession = Depends(get_db_session)):
+@router.post("/batch-convert", response_model=BatchConvertResponse)
+async def batch_convert(payload: BatchConvertRequest, request: Request, session: AsyncSession = Depends(get_db_session)):
+    if not payload.operations:
+        raise HTTPException(400, "operations is required")
+    try:
+        user_id = int(payload.user_id) if payload.user_id else None
+    except Exception:
+        raise HTTPException(400, "Bad user id")
+    await admit(request, "convert", user_id, cost=len(payload.operations))
+
+    format_ids: Dict[str, Optional[int]] = {}
     items: List[Dict[str, Any]] = []
     for it in payload.operations:
-        entry: Dict[str, Any] = {}
+        target_key = str(it.target_format).lower()
+        if target_key not in format_ids:
+            format_ids[target_key] = await _resolve_format_id(session, target_key)
+        if format_ids[target_key] is None:
+            raise HTTPException(422, f"Unsupported target_format: {it.target_format}")
+        entry: Dict[str, Any] = {"target_format_id": format_ids[target_key]}
         if it.source_file_id:
             try:
                 entry["source_file_id"] = int(it.source_file_id)
             except Exception:
                 raise HTTPException(400, "Bad source_file_id in batch")
             entry["type"] = "file"
+            entry["kind"] = "graph" if target_key in {"graph", "graph_json"} else "file"
         elif it.url:
             entry["type"] = "website"
+            entry["kind"] = "website"
+            entry["url"] = it.url
         else:
             raise HTTPException(400, "Operation requires source_file_id or url")
-        entry["target_ext"] = it.target_format
         items.append(entry)
+
+    batch = await BatchManager(session).create_batch(user_id=user_id, total=len(items), max_parallel=payload.max_parallel)
+    batch_id = int(getattr(batch, "id"))
     cm = ConvertManager(session)
-    ids = await cm.batch_create(user_id=int(payload.user_id) if payload.user_id else None, items=items)
-    return {"batch_id": None, "operations": [{"operation_id": str(i), "status": "queued", "estimated_time": 5.0} for i in ids]}
+    ids = await cm.batch_create(user_id=user_id, items=items, batch_id=batch_id)
+    etas = await eta_estimator.estimate_many(session, ids)
+    # Задачи читают операции из своих сессий — строки должны быть видны до запуска
+    await session.commit()
+
+    specs = [
+        JobSpec(
+            operation_id=int(op_id),
+            kind=entry["kind"],
+            user_id=user_id,
+            batch_id=batch_id,
+            url=entry.get("url"),
+            source_file_id=entry.get("source_file_id"),
+            target_format_id=entry["target_format_id"],
+            priority=payload.priority,
+        )
+        for op_id, entry in zip(ids, items)
+    ]
+    job_dispatcher.submit_batch(batch_id, specs, storage_dir=settings.storage_dir, max_parallel=payload.max_parallel)
+    logger.info("[/batch-convert] batch_id=%s user_id=%s items=%s priority=%s", batch_id, user_id, len(ids), payload.priority)
+
+    return BatchConvertResponse(
+        batch_id=str(batch_id),
+        operations=[
+            OperationResponse(
+                operation_id=str(i),
+                status="queued",
+                estimated_time=etas[int(i)].estimated_time,
+                queue_position=etas[int(i)].queue_position,
+            )
+            for i in ids
+        ],
+    )
+
+
+def _batch_response(summary: Dict[str, Any]) -> BatchStatusResponse:
+    return BatchStatusResponse(
+        batch_id=str(summary["batch_id"]),
+        status=summary["status"],
+        total=summary["total"],
+        done=summary["done"],
+        progress=summary["progress"],
+        counts=summary["counts"],
+        max_parallel=summary["max_parallel"],
+        created_at=summary["created_at"],
+        finished_at=summary["finished_at"],
+        operations=[OperationStatusItem(**_status_item(o["operation_id"], o)) for o in summary["operations"]],
+    )
+
+
+def _parse_batch_id(batch_id: str) -> int:
+    try:
+        return int(batch_id)
+    except Exception:
+        raise HTTPException(400, "Bad batch id")
+
+
+@router.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch(batch_id: str, session: AsyncSession = Depends(get_db_read_session)):
+    """Агрегированный статус пакета: счётчики по статусам, средний прогресс, операции."""
+
+    summary = await BatchManager(session).summary(_parse_batch_id(batch_id))
+    if summary is None:
+        raise HTTPException(404, "Batch not found")
+    return _batch_response(summary)
+
+
+@router.get("/batches/{batch_id}/wait", response_model=BatchStatusResponse)
+async def wait_batch(
+    batch_id: str,
+    timeout: float = Query(30.0, ge=0, le=_MAX_WAIT_SEC),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    """Long-poll: отвечает, когда все операции пакета завершены, или по таймауту (текущий агрегат)."""
+
+    bid = _parse_batch_id(batch_id)
+    bm = BatchManager(session)
+
+    async def _current() -> Optional[Dict[str, Any]]:
+        summary = await bm.summary(bid)
+        await session.rollback()
+        return summary
+
+    summary = await _current()
+    if summary is None:
+        raise HTTPException(404, "Batch not found")
+    if summary["done"] >= summary["total"]:
+        return _batch_response(summary)
+
+    with progress_bus.subscribe([o["operation_id"] for o in summary["operations"]]) as sub:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        poll_sec = _wait_poll_sec()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event_data = await sub.get(timeout=min(remaining, poll_sec))
+            if event_data is not None and not is_final(event_data):
+                continue
+            summary = await _current() or summary
+            if summary["done"] >= summary["total"]:
+                break
+    return _batch_response(summary)
+
+
+# --------------------------- Push-прогресс (SSE / WebSocket) ---------------------------
+
+
+def _wait_poll_sec() -> float:
+    """Период перечитывания БД в long-poll (события других процессов не видны через шину)."""
+
+    try:
+        return max(0.1, float(os.getenv("VKMAX_OPERATION_WAIT_POLL_SEC", "") or 2.0))
+    except ValueError:
+        return 2.0
+
+
+def _parse_ids(raw: Optional[str], *, max_ids: int = _MAX_STREAM_IDS) -> List[int]:
+    """'1,2,3' → [1, 2, 3]; ValueError при мусоре или слишком длинном списке."""
+
+    ids: List[int] = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            ids.append(int(part))
+    if len(ids) > max_ids:
+        raise ValueError(f"too many ids (max {max_ids})")
+    return list(dict.fromkeys(ids))
+
+
+async def _load_statuses(session: AsyncSession, ids: List[int], *, include_archive: bool = True) -> Dict[int, Dict[str, Any]]:
+    """{id: status/progress/result_file_id/error_message} — два запроса на любую пачку id."""
+
+    rows = await ConvertManager(session).get_statuses(ids, include_archive=include_archive)
+    progress = await EventsManager(session).progress_many({i: str(r["status"]) for i, r in rows.items()})
+    for op_id, row in rows.items():
+        row["progress"] = progress.get(op_id, 0)
+    return rows
+
+
+def _status_item(op_id: int, row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if row is None:
+        return {"operation_id": str(op_id), "status": None}
+    return {
+        "operation_id": str(op_id),
+        "status": row["status"],
+        "progress": row["progress"],
+        "result_file_id": str(row["result_file_id"]) if row["result_file_id"] is not None else None,
+        "error_message": row["error_message"],
+    }
+
+
+async def _status_snapshot(session: AsyncSession, ids: List[int]) -> List[Dict[str, Any]]:
+    """Текущие статусы операций в формате событий шины (первое сообщение стрима)."""
+
+    rows = await _load_statuses(session, ids)
+    out: List[Dict[str, Any]] = []
+    for op_id in ids:
+        row = rows.get(op_id)
+        if row is None:
+            out.append({"operation_id": op_id, "type": "error", "error": "Operation not found"})
+            continue
+        out.append(
+            {
+                "operation_id": op_id,
+                "type": "status",
+                "status": row["status"],
+                "progress": row["progress"],
+                "result_file_id": row["result_file_id"],
+                "snapshot": True,
+            }
+        )
+    return out
+
+
+@router.get("/operations/status", response_model=OperationsStatusResponse)
+async def operations_status(
+    ids: str = Query(..., description="ID операций через запятую"),
+    include_archive: bool = Query(False),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    """Статусы пачки операций одним запросом (вместо N вызовов GET /operations/{id})."""
+
+    try:
+        op_ids = _parse_ids(ids, max_ids=_MAX_STATUS_IDS)
+    except ValueError as exc:
+        raise HTTPException(400, f"Bad ids: {exc}")
+    rows = await _load_statuses(session, op_ids, include_archive=include_archive)
+    return OperationsStatusResponse(operations=[OperationStatusItem(**_status_item(i, rows.get(i))) for i in op_ids])
+
+
+def _wire(event_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {**event_data, "operation_id": str(event_data["operation_id"])}
+
+
+def _sse(event_data: Dict[str, Any]) -> bytes:
+    return b"event: " + str(event_data.get("type", "message")).encode() + b"\ndata: " + orjson.dumps(_wire(event_data)) + b"\n\n"
+
+
+@router.get("/operations/stream")
+async def stream_operations(
+    request: Request,
+    ids: str = Query(..., description="ID операций через запятую"),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    """SSE-поток статусов/прогресса операций; закрывается, когда все операции завершены."""
+
+    try:
+        op_ids = _parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(400, f"Bad ids: {exc}")
+    if not op_ids:
+        raise HTTPException(400, "ids is required")
+
+    # Подписка до снапшота: событие между чтением БД и подпиской не потеряется
+    sub = progress_bus.subscribe(op_ids)
+    try:
+        snapshot = await _status_snapshot(session, op_ids)
+        # Стрим живёт долго: отпускаем соединение, не держим транзакцию открытой
+        await session.rollback()
+    except Exception:
+        sub.close()
+        raise
+    pending = {e["operation_id"] for e in snapshot if e["type"] == "status" and e["status"] not in FINAL_STATUSES}
+
+    async def _recheck() -> List[Dict[str, Any]]:
+        # Финал из другого процесса в шину не придёт: перечитываем статусы из БД
+        async with async_session_factory() as own:
+            rows = await _status_snapshot(own, sorted(pending))
+        return [item for item in rows if item["type"] == "status" and item["status"] in FINAL_STATUSES]
+
+    async def _events():
+        loop = asyncio.get_running_loop()
+        poll_sec = min(_STREAM_HEARTBEAT_SEC, _wait_poll_sec())
+        with sub:
+            for item in snapshot:
+                yield _sse(item)
+            last_sent = loop.time()
+            while pending:
+                event_data = await sub.get(timeout=poll_sec)
+                if event_data is None:
+                    if await request.is_disconnected():
+                        return
+                    for item in await _recheck():
+                        pending.discard(item["operation_id"])
+                        yield _sse(item)
+                        last_sent = loop.time()
+                    if pending and loop.time() - last_sent >= _STREAM_HEARTBEAT_SEC:
+                        yield b": ping\n\n"
+                        last_sent = loop.time()
+                    continue
+                yield _sse(event_data)
+                last_sent = loop.time()
+                if is_final(event_data):
+                    pending.discard(int(event_data["operation_id"]))
+
+    logger.debug("[/operations/stream] subscribe ids=%s pending=%s", op_ids, len(pending))
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/operations/ws")
+async def operations_ws(websocket: WebSocket):
+    """WebSocket-вариант стрима.
+
+    Подписка: ?ids=1,2 и/или сообщения {"subscribe": [ids]} / {"unsubscribe": [ids]}.
+    """
+
+    await websocket.accept()
+    sub = progress_bus.subscribe([])
+
+    async def _subscribe(raw_ids: Any) -> None:
+        new_ids = _parse_ids(",".join(str(i) for i in raw_ids) if isinstance(raw_ids, list) else str(raw_ids or ""))
+        sub.add(new_ids)
+        async with async_session_factory() as session:
+            snapshot = await _status_snapshot(session, new_ids)
+        for item in snapshot:
+            await websocket.send_json(_wire(item))
+
+    async def _reader() -> None:
+        while True:
+            msg = await websocket.receive_json()
+            try:
+                if isinstance(msg, dict) and "subscribe" in msg:
+                    await _subscribe(msg["subscribe"])
+                if isinstance(msg, dict) and "unsubscribe" in msg:
+                    sub.remove(_parse_ids(",".join(str(i) for i in msg["unsubscribe"] or [])))
+            except (ValueError, TypeError) as exc:
+                await websocket.send_json({"type": "error", "error": f"Bad ids: {exc}"})
+
+    reader: Optional[asyncio.Task] = None
+    try:
+        if websocket.query_params.get("ids"):
+            await _subscribe(websocket.query_params["ids"])
+        reader = asyncio.create_task(_reader())
+        while True:
+            getter = asyncio.ensure_future(sub.get(timeout=_STREAM_HEARTBEAT_SEC))
+            done, _ = await asyncio.wait({reader, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if reader in done:
+                getter.cancel()
+                reader.result()
+                return
+            event_data = getter.result()
+            await websocket.send_json(_wire(event_data) if event_data is not None else {"type": "ping"})
+    except ValueError as exc:
+        await websocket.close(code=1008, reason=str(exc)[:100])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sub.close()
+        if reader is not None and not reader.done():
+            reader.cancel()
 
 
 @router.get("/operations/{operation_id}", response_model=OperationStatusResponse)
-async def get_operation(operation_id: str, session: AsyncSession = Depends(get_db_session)):
+async def get_operation(
+    operation_id: str,
+    include_archive: bool = Query(False),
+    session: AsyncSession = Depends(get_db_read_session),
+):
     try:
         oid = int(operation_id)
     except Exception:
         raise HTTPException(400, "Bad operation id")
     cm = ConvertManager(session)
-    op = await cm.get_operation(oid)
+    op = await cm.get_operation(oid, include_archive=include_archive)
     if op is None:
         raise HTTPException(404, "Operation not found")
+    progress = await EventsManager(session).progress(oid, str(op.get("status")))
     return OperationStatusResponse(
         operation_id=str(op.get("operation_id")),
         user_id=str(op.get("user_id")) if op.get("user_id") is not None else None,
@@ -183,13 +604,115 @@ async def get_operation(operation_id: str, session: AsyncSession = Depends(get_d
         new_format=str(op.get("new_format_id")) if op.get("new_format_id") is not None else None,
         datetime=str(op.get("datetime")),
         status=str(op.get("status")),
-        progress=0,
+        progress=progress,
         result_file_id=str(op.get("result_file_id")) if op.get("result_file_id") is not None else None,
+        error_message=op.get("error_message"),
+        attempts=int(op.get("attempts") or 0),
     )
 
 
+@router.get("/operations/{operation_id}/events")
+async def get_operation_events(operation_id: str, session: AsyncSession = Depends(get_db_read_session)):
+    """Журнал операции: смены статуса и этапы с длительностями (operation_events)."""
+
+    try:
+        oid = int(operation_id)
+    except Exception:
+        raise HTTPException(400, "Bad operation id")
+    events = await EventsManager(session).list_events(oid)
+    if not events:
+        raise HTTPException(404, "Operation not found")
+    return {"operation_id": str(oid), "events": events}
+
+
+@router.get("/operations/{operation_id}/wait", response_model=OperationWaitResponse)
+async def wait_operation(
+    operation_id: str,
+    timeout: float = Query(30.0, ge=0, le=_MAX_WAIT_SEC),
+    status: Optional[str] = Query(None, description="Последний известный клиенту статус"),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    """Long-poll: отвечает, когда статус отличается от *status* (по умолчанию — от текущего), или по таймауту.
+
+    Смена статуса в этом процессе приходит из progress_bus сразу; смены из других процессов
+    подхватываются перечитыванием строки раз в VKMAX_OPERATION_WAIT_POLL_SEC (по умолчанию 2 с).
+    """
+
+    try:
+        oid = int(operation_id)
+    except Exception:
+        raise HTTPException(400, "Bad operation id")
+
+    async def _current() -> Optional[Dict[str, Any]]:
+        row = (await _load_statuses(session, [oid])).get(oid)
+        # Между проверками соединение не держим
+        await session.rollback()
+        return row
+
+    poll_sec = _wait_poll_sec()
+
+    with progress_bus.subscribe([oid]) as sub:
+        row = await _current()
+        if row is None:
+            raise HTTPException(404, "Operation not found")
+        known = status or row["status"]
+        if row["status"] != known or (status is None and row["status"] in FINAL_STATUSES):
+            return OperationWaitResponse(**_status_item(oid, row), changed=row["status"] != known)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event_data = await sub.get(timeout=min(remaining, poll_sec))
+            if event_data is not None and not (event_data.get("type") == "status" and event_data.get("status") != known):
+                continue
+            row = await _current() or row
+            if row["status"] != known:
+                return OperationWaitResponse(**_status_item(oid, row), changed=True)
+
+    return OperationWaitResponse(**_status_item(oid, row), changed=False)
+
+
+@router.post("/operations/{operation_id}/cancel", response_model=OperationStatusItem)
+async def cancel_operation(operation_id: str, session: AsyncSession = Depends(get_db_session)):
+    """Отмена операции: выполняемая задача прерывается (cpu-процесс завершается, файлы удаляются).
+
+    Незавершённая операция без задачи в этом процессе (ждёт в пакете, выполняется другим
+    воркером) сразу помечается cancelled; уже завершённая — 409.
+    """
+
+    try:
+        oid = int(operation_id)
+    except Exception:
+        raise HTTPException(400, "Bad operation id")
+
+    if not await job_dispatcher.cancel(oid):
+        cm = ConvertManager(session)
+        row = (await cm.get_statuses([oid])).get(oid)
+        if row is None:
+            raise HTTPException(404, "Operation not found")
+        if row["status"] in FINAL_STATUSES:
+            raise HTTPException(409, f"Operation already {row['status']}")
+        await cm.finish_open(oid, status="cancelled", error_message="cancelled by request")
+        await session.commit()
+
+    row = (await _load_statuses(session, [oid], include_archive=False)).get(oid)
+    if row is None:
+        raise HTTPException(404, "Operation not found")
+    logger.info("[/operations/cancel] op=%s status=%s", oid, row["status"])
+    return OperationStatusItem(**_status_item(oid, row))
+
+
 @router.get("/operations")
-async def list_operations(user_id: Optional[str] = Query(None), status: Optional[str] = Query(None), type: Optional[str] = Query(None), session: AsyncSession = Depends(get_db_session)):
+async def list_operations(
+    user_id: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    include_archive: bool = Query(False),
+    session: AsyncSession = Depends(get_db_read_session),
+):
     uid = None
     if user_id is not None:
         try:
@@ -197,7 +720,7 @@ async def list_operations(user_id: Optional[str] = Query(None), status: Optional
         except Exception:
             raise HTTPException(400, "Bad user id")
     cm = ConvertManager(session)
-    rows = await cm.list_operations(user_id=uid, status=status, type_hint=type)
+    rows = await cm.list_operations(user_id=uid, status=status, type_hint=type, include_archive=include_archive)
     # добавить url="" для совместимости схемы
     out = []
     for r in rows:
@@ -212,7 +735,7 @@ async def list_operations(user_id: Optional[str] = Query(None), status: Optional
 # --------------------------- Website specific ---------------------------
 
 @router.get("/websites/{operation_id}/status", response_model=WebsiteStatusResponse)
-async def website_status(operation_id: str, session: AsyncSession = Depends(get_db_session)):
+async def website_status(operation_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         oid = int(operation_id)
     except Exception:
@@ -222,11 +745,12 @@ async def website_status(operation_id: str, session: AsyncSession = Depends(get_
     op = await get_website_status(session, operation_id=oid)
     if op is None:
         raise HTTPException(404, "Website operation not found")
+    progress = await EventsManager(session).progress(oid, str(op.get("status")))
     return WebsiteStatusResponse(
         operation_id=str(op.get("operation_id")),
         url="",
         status=str(op.get("status")),
-        progress=0,
+        progress=progress,
         result_file_id=str(op.get("result_file_id")) if op.get("result_file_id") is not None else None,
     )
 
@@ -243,7 +767,11 @@ async def website_preview(payload: WebsitePreviewRequest):
 
 
 @router.get("/websites/history")
-async def website_history(user_id: Optional[str] = Query(None), session: AsyncSession = Depends(get_db_session)):
+async def website_history(
+    user_id: Optional[str] = Query(None),
+    include_archive: bool = Query(False),
+    session: AsyncSession = Depends(get_db_read_session),
+):
     uid = None
     if user_id is not None:
         try:
@@ -251,7 +779,7 @@ async def website_history(user_id: Optional[str] = Query(None), session: AsyncSe
         except Exception:
             raise HTTPException(400, "Bad user id")
     cm = ConvertManager(session)
-    rows = await cm.list_operations(user_id=uid, type_hint='website')
+    rows = await cm.list_operations(user_id=uid, type_hint='website', include_archive=include_archive)
     # Возвращаем url="" для совместимости
     return [
         {
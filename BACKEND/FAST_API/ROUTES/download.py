@@ -10,14 +10,14 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from BACKEND.DATABASE.session import get_db_session
+from BACKEND.DATABASE.session import get_db_read_session
 from BACKEND.DATABASE.CACHE_MANAGER import DownloadManager
 
 
 router = APIRouter(tags=["download"])
 
 @router.get("/download/{file_id}")
-async def download_file(file_id: str, session: AsyncSession = Depends(get_db_session)):
+async def download_file(file_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         fid = int(file_id)
     except Exception:
@@ -31,7 +31,7 @@ async def download_file(file_id: str, session: AsyncSession = Depends(get_db_ses
 
 
 @router.get("/download/{file_id}/preview")
-async def preview_file(file_id: str, session: AsyncSession = Depends(get_db_session)):
+async def preview_file(file_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         fid = int(file_id)
     except Exception:
@@ -2,27 +2,31 @@
 # Назначение:
 # - Управление файлами поверх БД: загрузка, получение, обновление, удаление, список.
 # - Эндпоинты: POST /upload, POST /upload/website, GET/PATCH/DELETE /files/{id}, GET /files
-# - Хранение контента на диске (storage_dir) с лимитом 40 МБ.
+# - Хранение контента на диске (storage_dir) с лимитом 40 МБ; запись загрузки — FAST_API/uploads.py
+#   (в потоке, с подсчётом размера и sha256), строка files создаётся одним INSERT.
+# - POST /upload/website проходит admit() (FAST_API/rate_limit.py, класс website): 429 при перегрузке.
 
 from __future__ import annotations
 
+import asyncio
 import base64
-import os
 from datetime import datetime, timezone
-from pathlib import Path
 from typing import Optional
 import logging
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Query, Depends
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Query, Depends, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
+from ..rate_limit import admit
 from ..schemas import FileUploadWebsiteRequest, FileUploadResponse, FilesPage
-from BACKEND.DATABASE.session import get_db_session
+from ..uploads import save_upload, storage_key
+from BACKEND.DATABASE.session import get_db_session, get_db_read_session
 from BACKEND.DATABASE.CACHE_MANAGER import FilesManager, ConvertManager
-from BACKEND.DATABASE.models import Format, File as FileModel
-from BACKEND.CONVERT import enqueue_website_job
+from BACKEND.DATABASE.models import Format
+from BACKEND.CONVERT import JobSpec, enqueue_website_job, eta_estimator, job_dispatcher
+from BACKEND.CONVERT.cancellation import remove_artifacts
 
 
 logger = logging.getLogger("vkmax.fastapi.files")
@@ -34,31 +38,6 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _safe_join(*parts: str) -> str:
-    return str(Path(*parts).resolve())
-
-
-async def _save_upload_stream(upload: UploadFile, dst_path: str, max_bytes: int) -> int:
-    size = 0
-    with open(dst_path, "wb") as out:
-        while True:
-            chunk = await upload.read(1024 * 1024)
-            if not chunk:
-                break
-            size += len(chunk)
-            if size > max_bytes:
-                try:
-                    out.close()
-                finally:
-                    try:
-                        os.remove(dst_path)
-                    except Exception:
-                        pass
-                raise HTTPException(413, "File too large (limit 40MB)")
-            out.write(chunk)
-    return size
-
-
 async def _resolve_format_id(session: AsyncSession, value: Optional[str], fallback_filename: Optional[str]) -> Optional[int]:
     key = (value or (fallback_filename.split(".")[-1] if fallback_filename and "." in fallback_filename else None) or "").lower().lstrip(".")
     if not key:
@@ -86,62 +65,66 @@ async def upload_file(
 ):
     max_bytes = int(settings.max_upload_mb) * 1024 * 1024
     filename = file.filename or "upload"
-    dst = _safe_join(settings.storage_dir, f"{filename}")
-    size = await _save_upload_stream(file, dst, max_bytes)
+    # Ключ хранения уникален до записи: после INSERT файл не переименовывается
+    stored = await save_upload(file, storage_key(settings.storage_dir, filename), max_bytes)
 
     fmt_id = await _resolve_format_id(session, original_format, filename)
     mgr = FilesManager(session)
-    obj = await mgr.create_file(
-        user_id=int(user_id) if user_id is not None else None,
-        format_id=fmt_id,
-        filename=filename,
-        mime_type=getattr(file, "content_type", None),
-        content_bytes=None,
-        path=dst,
-    )
-    # Переименуем файл с префиксом id, чтобы избежать коллизий
     try:
-        file_id_str = str(getattr(obj, "id"))
-        new_dst = _safe_join(settings.storage_dir, f"{file_id_str}__{filename}")
-        if dst != new_dst:
-            try:
-                os.replace(dst, new_dst)
-            except Exception:
-                os.rename(dst, new_dst)
-            await mgr.update_by_id(FileModel, int(getattr(obj, "id")), {"path": new_dst, "file_size": size})
-            dst = new_dst
-    except Exception:
-        pass
+        obj = await mgr.create_file(
+            user_id=int(user_id) if user_id is not None else None,
+            format_id=fmt_id,
+            filename=filename,
+            mime_type=getattr(file, "content_type", None),
+            content_bytes=None,
+            path=stored.path,
+            file_size=stored.size,
+            sha256=stored.sha256,
+        )
+    except BaseException:
+        # Файл без строки в БД никто не удалит
+        await asyncio.to_thread(remove_artifacts, [stored.path])
+        raise
+    logger.debug("[/upload] stored file_id=%s size=%s sha256=%s", getattr(obj, "id"), stored.size, stored.sha256[:12])
     created_at = getattr(obj, "created_at")
     return FileUploadResponse(
         file_id=str(getattr(obj, "id")),
         filename=filename,
-        size=size,
+        size=stored.size,
         upload_date=(created_at.isoformat() if created_at else _now_iso()),
     ).model_dump()
 
 
 @router.post("/upload/website")
-async def upload_website(payload: FileUploadWebsiteRequest, session: AsyncSession = Depends(get_db_session)):
-    # Создаём website-операцию (без хранения URL в БД)
+async def upload_website(payload: FileUploadWebsiteRequest, request: Request, session: AsyncSession = Depends(get_db_session)):
+    await admit(request, "website", payload.user_id)
+    # Создаём website-операцию (URL хранится в source_url для перезапуска после падения)
     target_fmt_id = await _resolve_format_id(session, payload.format, None)
     cm = ConvertManager(session)
     logger.info("[/upload/website] create website operation user_id=%s format=%s url=%s", payload.user_id, payload.format, payload.url)
-    op = await cm.create_website_operation(user_id=int(payload.user_id) if payload.user_id else None, target_format_id=target_fmt_id)
+    user_id = int(payload.user_id) if payload.user_id else None
+    op = await cm.create_website_operation(user_id=user_id, target_format_id=target_fmt_id, url=payload.url)
+    # id читаем до диспетчера: после его commit/rollback op истекает
+    op_id = int(getattr(op, "id"))
+    eta = await eta_estimator.estimate(session, op_id)
+    # Операция видна как queued (и её можно отменить), пока ждёт слот
+    await session.commit()
+    spec = JobSpec(operation_id=op_id, kind="website", user_id=user_id, url=payload.url, priority="interactive")
     try:
-        await enqueue_website_job(session, operation_id=int(getattr(op, "id")), url=payload.url)
+        await job_dispatcher.execute(session, spec, lambda: enqueue_website_job(session, operation_id=spec.operation_id, url=payload.url))
     except Exception as exc:  # noqa: WPS430
-        logger.exception("[/upload/website] Failed to enqueue website operation_id=%s: %s", getattr(op, "id"), exc)
+        logger.exception("[/upload/website] Failed to enqueue website operation_id=%s: %s", op_id, exc)
     return {
         "file_id": None,
-        "operation_id": int(getattr(op, "id")),
+        "operation_id": op_id,
         "status": "queued",
-        "estimated_time": 5.0,
+        "estimated_time": eta.estimated_time,
+        "queue_position": eta.queue_position,
     }
 
 
 @router.get("/files/{file_id}")
-async def get_file(file_id: str, session: AsyncSession = Depends(get_db_session)):
+async def get_file(file_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         fid = int(file_id)
     except Exception:
@@ -214,7 +197,7 @@ async def delete_file(file_id: str, session: AsyncSession = Depends(get_db_sessi
 
 
 @router.get("/files", response_model=FilesPage)
-async def list_files(user_id: Optional[str] = Query(None), page: int = 1, limit: int = 20, session: AsyncSession = Depends(get_db_session)):
+async def list_files(user_id: Optional[str] = Query(None), page: int = 1, limit: int = 20, session: AsyncSession = Depends(get_db_read_session)):
     mgr = FilesManager(session)
     uid = None
     if user_id is not None:
@@ -2,14 +2,19 @@
 # Назначение:
 # - Эндпоинты форматов и матрицы конвертаций поверх БД (SQLAlchemy async).
 # - Реализует: GET /formats, /formats/input, /formats/output, /supported-conversions
+# - Ответы — справочник: кэшируются в процессе (FAST_API/http_cache.py, политика formats)
+#   с ETag/Last-Modified и Cache-Control; в БД запрос идёт только при промахе кэша.
+#   Код, меняющий таблицу formats, вызывает invalidate_on_commit(session, "formats").
 
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Query, Depends
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..http_cache import cached_json
 from ..schemas import FormatItem
-from BACKEND.DATABASE.session import get_db_session
+from BACKEND.DATABASE.session import get_db_read_session
 from BACKEND.DATABASE.CACHE_MANAGER import FormatManager
 
 
@@ -17,33 +22,43 @@ router = APIRouter(tags=["formats"])
 
 
 @router.get("/formats")
-async def list_formats(session: AsyncSession = Depends(get_db_session)):
-    mgr = FormatManager(session)
-    items = await mgr.list_all()
-    # адаптация: привести format_id к str
-    return [FormatItem(**{**i, "format_id": str(i.get("format_id"))}).model_dump() for i in items]
+async def list_formats(request: Request, session: AsyncSession = Depends(get_db_read_session)) -> Response:
+    async def load() -> bytes:
+        items = await FormatManager(session).list_all()
+        # адаптация: привести format_id к str
+        return orjson.dumps([FormatItem(**{**i, "format_id": str(i.get("format_id"))}).model_dump() for i in items])
+
+    return await cached_json(request, "formats", "all", load)
 
 
 @router.get("/formats/input")
-async def list_input_formats(session: AsyncSession = Depends(get_db_session)):
-    mgr = FormatManager(session)
-    items = await mgr.list_input()
-    return [{**i, "format_id": str(i.get("format_id"))} for i in items]
+async def list_input_formats(request: Request, session: AsyncSession = Depends(get_db_read_session)) -> Response:
+    async def load() -> bytes:
+        items = await FormatManager(session).list_input()
+        return orjson.dumps([{**i, "format_id": str(i.get("format_id"))} for i in items])
+
+    return await cached_json(request, "formats", "input", load)
 
 
 @router.get("/formats/output")
-async def list_output_formats(input_format: str = Query(..., alias="input_format"), session: AsyncSession = Depends(get_db_session)):
+async def list_output_formats(request: Request, input_format: str = Query(..., alias="input_format"), session: AsyncSession = Depends(get_db_read_session)) -> Response:
     key = (input_format or "").lower()
     if key in ("url",):
         input_format = "website"
-    mgr = FormatManager(session)
-    items = await mgr.list_output_for_input(input_format)
-    if not items:
-        raise HTTPException(404, "Unsupported input format")
-    return [{**i, "format_id": str(i.get("format_id"))} for i in items]
+
+    async def load() -> bytes:
+        items = await FormatManager(session).list_output_for_input(input_format)
+        if not items:
+            # Исключение не кэшируется: запись появится только для поддерживаемого входа
+            raise HTTPException(404, "Unsupported input format")
+        return orjson.dumps([{**i, "format_id": str(i.get("format_id"))} for i in items])
+
+    return await cached_json(request, "formats", ("output", input_format.lower().lstrip(".")), load)
 
 
 @router.get("/supported-conversions")
-async def supported_conversions(session: AsyncSession = Depends(get_db_session)):
-    mgr = FormatManager(session)
-    return await mgr.supported_matrix()
+async def supported_conversions(request: Request, session: AsyncSession = Depends(get_db_read_session)) -> Response:
+    async def load() -> bytes:
+        return orjson.dumps(await FormatManager(session).supported_matrix())
+
+    return await cached_json(request, "formats", "matrix", load)
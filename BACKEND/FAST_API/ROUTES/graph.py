@@ -2,24 +2,48 @@
 # Назначение:
 # - HTTP-роуты для работы с JSON-графами по файлам.
 # - Делегируют всю бизнес-логику в BACKEND.SEVICES.graph_service.
+# - POST /graph/{file_id} (LLM) проходит admit() (FAST_API/rate_limit.py, класс graph) и
+#   выполняется через job_dispatcher (graph_service.generate_graph_payload); задача,
+#   прерванная отменой или по аренде, — 409, по дедлайну — 504.
+# - Граф отдаётся байтами файла без пересериализации: конверт {"file_id": ..., "graph": ...}
+#   склеивается из готового JSON и сжимается по Accept-Encoding (FAST_API/compression.py).
+#   Файл проверяется orjson.loads один раз при заполнении записи кэша: пустой, обрезанный
+#   или битый файл даёт "graph": null, а не невалидный JSON со статусом 200.
+# - GET кэшируется (FAST_API/http_cache.py, политика graph): ETag и ключ записи строятся из
+#   id и mtime файла результата, поэтому условный GET получает 304 без чтения файла, а
+#   новый граф (POST или /convert) сразу даёт новый ETag; POST сбрасывает записи файла.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..compression import json_bytes_response
 from ..config import settings
-from BACKEND.DATABASE.session import get_db_session
+from ..http_cache import POLICIES, cached_body_response, is_not_modified, not_modified_response, response_cache
+from ..rate_limit import admit
+from BACKEND.DATABASE.session import get_db_session, get_db_read_session
 from BACKEND.SEVICES import graph_service
 
 
 router = APIRouter(tags=["graph"])
+logger = logging.getLogger("vkmax.fastapi.graph")
+
+
+def _envelope(file_id: str, graph: bytes) -> bytes:
+    # graph — уже валидный JSON (файл пишет CONVERT/graph_service), вставляется как есть
+    return b'{"file_id":' + orjson.dumps(file_id) + b',"graph":' + graph + b"}"
+
+
+async def _no_graph(request: Request, file_id: str) -> Response:
+    return await json_bytes_response(request, _envelope(file_id, b"null"), headers={"Cache-Control": "no-cache"})
 
 
 @router.get("/graph/{file_id}")
-async def get_graph(file_id: str, session: AsyncSession = Depends(get_db_session)) -> Dict[str, Any]:
+async def get_graph(file_id: str, request: Request, session: AsyncSession = Depends(get_db_read_session)) -> Response:
     """Вернуть уже сгенерированный JSON-граф для файла.
 
     Если граф не найден, возвращаем `{ "file_id": ..., "graph": None }`
@@ -31,12 +55,38 @@ async def get_graph(file_id: str, session: AsyncSession = Depends(get_db_session
     except Exception:
         raise HTTPException(400, "Bad file id")
 
-    graph: Optional[Dict[str, Any]] = await graph_service.get_graph_for_file(session, source_file_id=fid)
-    return {"file_id": file_id, "graph": graph}
+    ref = await graph_service.locate_graph(session, source_file_id=fid)
+    if ref is None:
+        return await _no_graph(request, file_id)
+
+    etag = f'"g{ref.result_file_id}-{ref.mtime_ns:x}"'
+    last_modified = ref.mtime_ns / 1e9
+    key = (file_id, ref.result_file_id, ref.mtime_ns)
+    entry = response_cache.get("graph", key)
+    if entry is None:
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response("graph", etag, last_modified)
+        payload = await graph_service.read_graph(ref)
+        if payload is None:
+            return await _no_graph(request, file_id)
+        try:
+            orjson.loads(payload.body)
+        except orjson.JSONDecodeError as exc:
+            logger.error("[/graph] Invalid graph JSON result_file_id=%s (%s bytes): %s", ref.result_file_id, len(payload.body), exc)
+            return await _no_graph(request, file_id)
+        entry = response_cache.put(
+            "graph",
+            key,
+            _envelope(file_id, payload.body),
+            ttl_sec=POLICIES["graph"].ttl_sec,
+            etag=etag,
+            last_modified=last_modified,
+        )
+    return await cached_body_response(request, "graph", entry)
 
 
 @router.post("/graph/{file_id}")
-async def generate_graph(file_id: str, session: AsyncSession = Depends(get_db_session)) -> Dict[str, Any]:
+async def generate_graph(file_id: str, request: Request, session: AsyncSession = Depends(get_db_session)) -> Response:
     """Сгенерировать JSON-граф для файла и вернуть его.
 
     - Создаёт Operation c target_format=graph через сервисный слой.
@@ -48,14 +98,20 @@ async def generate_graph(file_id: str, session: AsyncSession = Depends(get_db_se
         fid = int(file_id)
     except Exception:
         raise HTTPException(400, "Bad file id")
+    # Генерация идёт через LLM: лимит класса graph по IP клиента (user_id здесь нет)
+    await admit(request, "graph")
 
     # user_id сейчас можно не привязывать (MVP). При необходимости сюда
     # можно пробрасывать реальный VKMax user_id из авторизации.
-    graph = await graph_service.generate_graph_for_file(
-        session,
-        source_file_id=fid,
-        user_id=None,
-        storage_dir=settings.storage_dir,
-    )
-
-    return {"file_id": file_id, "graph": graph}
+    try:
+        payload = await graph_service.generate_graph_payload(
+            session,
+            source_file_id=fid,
+            user_id=None,
+            storage_dir=settings.storage_dir,
+        )
+    except graph_service.GraphGenerationAborted as exc:
+        raise HTTPException(504 if exc.reason == "timed_out" else 409, str(exc))
+    response_cache.invalidate("graph", (file_id,))
+
+    return await json_bytes_response(request, _envelope(file_id, payload.body), headers={"Cache-Control": "no-store"})
@@ -2,18 +2,24 @@
 # Назначение:
 # - Системные эндпоинты VKMax: /health, /stats, /webhook/conversion-complete поверх БД.
 # - /stats агрегирует метрики из БД, /webhook обновляет статус операции в БД.
+# - /stats/db — агрегаты SQL по маршрутам (число запросов, время БД, медленные запросы).
+# - /stats/latency — перцентили ожидания в очереди, выполнения и этапов по форматам (operation_events).
+# - /metrics — метрики процесса в текстовом формате Prometheus (BACKEND/METRICS); как и /stats,
+#   закрыт VKMAX_ADMIN_TOKEN, если он задан (scrape_config: authorization / bearer_token).
 
 from __future__ import annotations
 
 import os
-from datetime import datetime, timezone
-from fastapi import APIRouter, Header, HTTPException, Depends
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Header, HTTPException, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
 from ..schemas import HealthResponse, StatsResponse, WebhookConversionComplete
-from BACKEND.DATABASE.session import get_db_session
-from BACKEND.DATABASE.CACHE_MANAGER import SystemManager, ConvertManager
+from BACKEND.DATABASE.session import get_db_session, get_db_read_session
+from BACKEND.DATABASE.CACHE_MANAGER import SystemManager, ConvertManager, EventsManager
+from BACKEND.DATABASE import instrumentation as db_instrumentation
+from BACKEND import METRICS
 
 
 router = APIRouter(tags=["system"])
@@ -28,13 +34,17 @@ async def health():
     return HealthResponse(status="ok", timestamp=_now_iso(), version=settings.version)
 
 
-@router.get("/stats", response_model=StatsResponse)
-async def stats(authorization: str | None = Header(None), session: AsyncSession = Depends(get_db_session)):
+def _check_admin_token(authorization: str | None) -> None:
     required = os.getenv("VKMAX_ADMIN_TOKEN", "")
     if required:
         token = (authorization or "").replace("Bearer ", "").strip()
         if token != required:
             raise HTTPException(401, "Unauthorized")
+
+
+@router.get("/stats", response_model=StatsResponse)
+async def stats(authorization: str | None = Header(None), session: AsyncSession = Depends(get_db_read_session)):
+    _check_admin_token(authorization)
     mgr = SystemManager(session)
     s = await mgr.stats()
     return StatsResponse(
@@ -46,6 +56,29 @@ async def stats(authorization: str | None = Header(None), session: AsyncSession
     )
 
 
+@router.get("/stats/db")
+async def db_stats(authorization: str | None = Header(None)):
+    _check_admin_token(authorization)
+    return {"routes": db_instrumentation.snapshot()}
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str | None = Header(None)):
+    _check_admin_token(authorization)
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/stats/latency")
+async def latency_stats(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    _check_admin_token(authorization)
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return {"since": since.isoformat(), "formats": await EventsManager(session).latency_percentiles(since=since)}
+
+
 @router.post("/webhook/conversion-complete")
 async def webhook_conversion_complete(payload: WebhookConversionComplete, session: AsyncSession = Depends(get_db_session)):
     try:
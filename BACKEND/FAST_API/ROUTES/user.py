@@ -9,11 +9,11 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..schemas import UserCreateRequest, UserResponse
-from BACKEND.DATABASE.session import get_db_session
+from BACKEND.DATABASE.session import get_db_session, get_db_read_session
 from BACKEND.DATABASE.CACHE_MANAGER import UserManager
 
 
@@ -38,7 +38,7 @@ async def create_user(payload: UserCreateRequest, session: AsyncSession = Depend
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, session: AsyncSession = Depends(get_db_session)):
+async def get_user(user_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         uid = int(user_id)
     except Exception:
@@ -70,7 +70,7 @@ async def delete_user(user_id: str, session: AsyncSession = Depends(get_db_sessi
 
 
 @router.get("/{user_id}/files")
-async def list_user_files(user_id: str, session: AsyncSession = Depends(get_db_session)):
+async def list_user_files(user_id: str, session: AsyncSession = Depends(get_db_read_session)):
     try:
         uid = int(user_id)
     except Exception:
@@ -80,10 +80,14 @@ async def list_user_files(user_id: str, session: AsyncSession = Depends(get_db_s
 
 
 @router.get("/{user_id}/operations")
-async def list_user_operations(user_id: str, session: AsyncSession = Depends(get_db_session)):
+async def list_user_operations(
+    user_id: str,
+    include_archive: bool = Query(False),
+    session: AsyncSession = Depends(get_db_read_session),
+):
     try:
         uid = int(user_id)
     except Exception:
         raise HTTPException(400, "Bad user id")
     mgr = UserManager(session)
-    return await mgr.list_user_operations(uid)
+    return await mgr.list_user_operations(uid, include_archive=include_archive)
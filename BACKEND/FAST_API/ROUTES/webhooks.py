@@ -0,0 +1,192 @@
+# Руководство к файлу (ROUTES/webhooks.py)
+# Назначение:
+# - Регистрация исходящих вебхуков: POST/GET/DELETE /webhooks, журнал доставок
+#   GET /webhooks/{id}/deliveries и повторная постановка POST /webhooks/deliveries/{id}/redeliver.
+# - События (operation.<финальный статус>, batch.finished) доставляет CONVERT/webhook_dispatcher.py,
+#   подписывая тело HMAC-SHA256 секретом адреса (заголовок X-VKMax-Signature).
+# Важно:
+# - Адрес без user_id получает события всех пользователей (интеграции, бот) — только
+#   с VKMAX_ADMIN_TOKEN, как и список всех адресов.
+# - Удаление, журнал доставок и redeliver — владельцу (?user_id= совпадает с адресом)
+#   или с VKMAX_ADMIN_TOKEN; чужой адрес для владельца — 404.
+# - Хост адреса при регистрации резолвится: нерезолвящийся хост и loopback/private/
+#   link-local и прочие внутренние адреса отклоняются (400), последние — если не задан
+#   VKMAX_WEBHOOK_ALLOW_PRIVATE=1. При доставке адрес проверяется заново
+#   (CONVERT/webhook_dispatcher.py, PublicOnlyTransport).
+# - Секрет возвращается один раз, в ответе на регистрацию.
+
+from __future__ import annotations
+
+import logging
+import secrets
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas import WebhookDeliveryItem, WebhookEndpointRequest, WebhookEndpointResponse
+from .system import _check_admin_token
+from BACKEND.CONVERT.webhook_dispatcher import BlockedAddressError, check_public_host
+from BACKEND.DATABASE.CACHE_MANAGER import WebhookManager
+from BACKEND.DATABASE.CACHE_MANAGER.webhooks import EVENT_TYPES, matches
+from BACKEND.DATABASE.models import User, WebhookDelivery, WebhookEndpoint
+from BACKEND.DATABASE.session import get_db_read_session, get_db_session
+
+
+logger = logging.getLogger("vkmax.routes.webhooks")
+
+router = APIRouter(tags=["webhooks"])
+
+
+def _parse_id(value: str, what: str) -> int:
+    try:
+        return int(value)
+    except Exception:
+        raise HTTPException(400, f"Bad {what} id")
+
+
+async def _check_public_host(host: str, port: int) -> None:
+    """400, если хост вебхука не резолвится или указывает на внутренний адрес (защита от SSRF)."""
+
+    try:
+        await check_public_host(host, port)
+    except BlockedAddressError as exc:
+        logger.warning("[webhooks._check_public_host] rejected: %s", exc)
+        raise HTTPException(400, "Webhook url must not point to a loopback, private or link-local address")
+    except OSError as exc:
+        logger.info("[webhooks._check_public_host] host=%s does not resolve: %s", host, exc)
+        raise HTTPException(400, "Webhook host does not resolve")
+
+
+async def _owned_endpoint(
+    session: AsyncSession,
+    webhook_id: int,
+    user_id: Optional[str],
+    authorization: Optional[str],
+) -> WebhookEndpoint:
+    """Адрес вебхука, если запрос от его владельца (?user_id=) или с админ-токеном."""
+
+    if user_id is None:
+        _check_admin_token(authorization)
+    ep = await session.get(WebhookEndpoint, webhook_id)
+    if ep is None or (user_id is not None and ep.user_id != _parse_id(user_id, "user")):
+        raise HTTPException(404, "Webhook not found")
+    return ep
+
+
+def _endpoint_item(ep: WebhookEndpoint, *, secret: Optional[str] = None) -> WebhookEndpointResponse:
+    data = WebhookManager.endpoint_dict(ep)
+    return WebhookEndpointResponse(
+        id=str(data["id"]),
+        user_id=str(data["user_id"]) if data["user_id"] is not None else None,
+        url=data["url"],
+        events=data["events"],
+        max_concurrency=data["max_concurrency"],
+        active=data["active"],
+        created_at=data["created_at"],
+        secret=secret,
+    )
+
+
+@router.post("/webhooks", response_model=WebhookEndpointResponse)
+async def register_webhook(
+    payload: WebhookEndpointRequest,
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_session),
+):
+    parsed = urlparse(payload.url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        raise HTTPException(400, "Webhook url must be http(s)")
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        raise HTTPException(400, "Bad webhook url port")
+    await _check_public_host(parsed.hostname or "", port)
+    patterns = [p.strip() for p in payload.events if p.strip()] or ["*"]
+    unknown = [p for p in patterns if not any(matches([p], t) for t in EVENT_TYPES)]
+    if unknown:
+        raise HTTPException(400, f"Unknown event types: {', '.join(unknown)}")
+    if payload.user_id is None:
+        _check_admin_token(authorization)
+        user_id = None
+    else:
+        user_id = _parse_id(payload.user_id, "user")
+        if await session.get(User, user_id) is None:
+            raise HTTPException(404, "User not found")
+    secret = payload.secret or secrets.token_hex(32)
+    ep = await WebhookManager(session).upsert_endpoint(
+        user_id=user_id,
+        url=payload.url,
+        secret=secret,
+        events=patterns,
+        max_concurrency=payload.max_concurrency,
+    )
+    await session.commit()
+    await session.refresh(ep)
+    return _endpoint_item(ep, secret=secret)
+
+
+@router.get("/webhooks", response_model=List[WebhookEndpointResponse])
+async def list_webhooks(
+    user_id: Optional[str] = Query(None),
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    if user_id is None:
+        _check_admin_token(authorization)
+    uid = _parse_id(user_id, "user") if user_id is not None else None
+    return [_endpoint_item(ep) for ep in await WebhookManager(session).list_endpoints(user_id=uid)]
+
+
+@router.delete("/webhooks/{webhook_id}")
+async def delete_webhook(
+    webhook_id: str,
+    user_id: Optional[str] = Query(None),
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_session),
+):
+    wid = _parse_id(webhook_id, "webhook")
+    await _owned_endpoint(session, wid, user_id, authorization)
+    if not await WebhookManager(session).delete_endpoint(wid):
+        raise HTTPException(404, "Webhook not found")
+    await session.commit()
+    return {"ok": True}
+
+
+@router.get("/webhooks/{webhook_id}/deliveries", response_model=List[WebhookDeliveryItem])
+async def list_webhook_deliveries(
+    webhook_id: str,
+    status: Optional[str] = Query(None, pattern="^(pending|delivered|dead)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    user_id: Optional[str] = Query(None),
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+    wid = _parse_id(webhook_id, "webhook")
+    await _owned_endpoint(session, wid, user_id, authorization)
+    rows = await WebhookManager(session).list_deliveries(wid, status=status, limit=limit)
+    return [WebhookDeliveryItem(**{**row, "id": str(row["id"])}) for row in rows]
+
+
+@router.post("/webhooks/deliveries/{delivery_id}/redeliver")
+async def redeliver_webhook(
+    delivery_id: str,
+    user_id: Optional[str] = Query(None),
+    authorization: str | None = Header(None),
+    session: AsyncSession = Depends(get_db_session),
+):
+    did = _parse_id(delivery_id, "delivery")
+    delivery = await session.get(WebhookDelivery, did)
+    if delivery is None:
+        raise HTTPException(404, "Delivery not found")
+    try:
+        await _owned_endpoint(session, int(delivery.endpoint_id), user_id, authorization)
+    except HTTPException as exc:
+        if exc.status_code == 404:
+            raise HTTPException(404, "Delivery not found")
+        raise
+    if not await WebhookManager(session).redeliver(did):
+        raise HTTPException(404, "Delivery not found")
+    await session.commit()
+    return {"ok": True}
@@ -0,0 +1,150 @@
+# Руководство к файлу (FAST_API/compression.py)
+# Назначение:
+# - Ответ из готовых JSON-байтов (json_bytes_response): тело не разбирается и не
+#   сериализуется заново, только сжимается по Accept-Encoding — br, если установлен
+#   необязательный пакет brotli, иначе gzip; без поддержки клиента — как есть.
+# - Сжатые тела кэшируются в LRU по ключу версии данных (cache_key), общий объём —
+#   VKMAX_COMPRESS_CACHE_MB (32 МБ): повторный GET того же графа не сжимает его заново.
+# Важно:
+# - Тела меньше VKMAX_COMPRESS_MIN_BYTES (1024) не сжимаются; большие (от 256 КБ)
+#   сжимаются в потоке, чтобы не держать event loop.
+# - Ответ всегда несёт Vary: Accept-Encoding — прокси не отдадут gzip клиенту без gzip.
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+from collections import OrderedDict
+from typing import Hashable, Mapping, Optional, Tuple
+
+from fastapi import Request, Response
+
+try:  # brotli — необязательная зависимость
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+
+_THREAD_THRESHOLD = 256 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Кодировки в порядке предпочтения сервера."""
+
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Выбрать кодировку по заголовку Accept-Encoding (q=0 — запрет, * — любая)."""
+
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best: Optional[str] = None
+    best_q = 0.0
+    for enc in supported_encodings():
+        q = weights.get(enc, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=5)
+    # mtime=0: одно и то же тело даёт одни и те же байты
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class _CompressedCache:
+    """LRU сжатых тел с ограничением по суммарному размеру."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._items[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._size = 0
+
+
+compressed_cache = _CompressedCache(_env_int("VKMAX_COMPRESS_CACHE_MB", 32) * 1024 * 1024)
+
+
+async def json_bytes_response(
+    request: Request,
+    body: bytes,
+    *,
+    cache_key: Optional[Hashable] = None,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """Ответ application/json из готовых байтов, сжатый, если клиент это принимает.
+
+    cache_key должен меняться вместе с body (например, id и mtime файла); None — не кэшировать.
+    """
+
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = None
+    if len(body) >= _env_int("VKMAX_COMPRESS_MIN_BYTES", 1024):
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        key = (cache_key, encoding) if cache_key is not None else None
+        packed = compressed_cache.get(key) if key is not None else None
+        if packed is None:
+            if len(body) >= _THREAD_THRESHOLD:
+                packed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                packed = compress(body, encoding)
+            if key is not None:
+                compressed_cache.put(key, packed)
+        body = packed
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+__all__ = ["choose_encoding", "compress", "compressed_cache", "json_bytes_response", "supported_encodings"]
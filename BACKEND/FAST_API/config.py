@@ -6,6 +6,8 @@
 # - Директории storage/tmp/logs создаются автоматически.
 # - Лимит загрузки файлов по умолчанию 40 МБ.
 # - Все значения можно переопределить через переменные окружения.
+# - server_* / job_drain_timeout_sec — параметры продакшн-запуска (FAST_API/server.py):
+#   VKMAX_SERVER_WORKERS, VKMAX_SERVER_LOOP и т.д.; warmup_roles (VKMAX_WARMUP_ROLES) — CONVERT/warmup.py.
 
 from __future__ import annotations
 
@@ -45,6 +47,23 @@ class Settings(BaseSettings):
     # CORS
     cors_origins: str = Field(default="http://localhost:3000,http://127.0.0.1:3000", description="Разрешённые Origin")
 
+    # Режим отладки: диагностические заголовки ответа (X-DB-*)
+    debug: bool = Field(default=False, description="Отладочный режим API")
+
+    # Продакшн-сервер (FAST_API/server.py)
+    server_host: str = Field(default="0.0.0.0", description="Адрес прослушивания")
+    server_port: int = Field(default=8000, description="Порт")
+    server_workers: int = Field(default=0, description="Число процессов-воркеров (0 — по числу ядер)")
+    server_loop: str = Field(default="auto", description="Event loop: auto | uvloop | asyncio")
+    server_http: str = Field(default="auto", description="HTTP-парсер: auto | httptools | h11")
+    server_preload: bool = Field(default=True, description="Импортировать приложение в мастере до fork")
+    server_backlog: int = Field(default=2048, description="Очередь входящих соединений сокета")
+    server_keepalive_sec: int = Field(default=5, description="Keep-alive простаивающего соединения")
+    server_graceful_timeout_sec: int = Field(default=30, description="Ожидание незавершённых HTTP-запросов при остановке")
+    job_drain_timeout_sec: int = Field(default=60, description="Ожидание фоновых задач диспетчера при остановке")
+    # Прогрев по ролям процесса (CONVERT/warmup.py): api, convert, crawl; off — без прогрева
+    warmup_roles: str = Field(default="api,convert,crawl", description="Роли прогрева процесса")
+
     # Провайдер LLM (для будущей интеграции)
     llm_provider: str = Field(default="gemini")
 
@@ -4,24 +4,49 @@
 # - Подключение всех роутеров и базовая инфраструктура (CORS, логирование, ошибки).
 # Важно:
 # - Конфиг и in-memory store берутся из FAST_API/config.py.
-# - Централизованное логирование настраивается через CONVERT/logging_config.setup_logging().
+# - Централизованное логирование настраивается через CONVERT/logging_config.setup_logging()
+#   (уровень VKMAX_LOG_LEVEL, вывод через очередь в отдельном потоке); журнал запросов —
+#   RequestLoggingMiddleware с выборкой и ограниченным захватом тела (FAST_API/request_logging.py).
 # - Ручка /health реализована в ROUTES/system.py, здесь не дублируется.
+# - Middleware db_query_stats считает SQL на запрос (DATABASE/instrumentation.py);
+#   при VKMAX_DEBUG=1 добавляет заголовки X-DB-Query-Count / X-DB-Time-Ms / X-DB-Slow-Queries.
+#   Маршрут в агрегатах — шаблон (/graph/{file_id}); пока маршрут не найден — "unmatched",
+#   как в MetricsMiddleware, чтобы пути 404 не копились ключами.
+# - Обработчик HTTPException сохраняет заголовки исключения (Retry-After у 429 из FAST_API/rate_limit.py).
+# - lifespan запускает и останавливает воркер исходящих вебхуков (CONVERT/webhook_dispatcher.py)
+#   и reaper операций с истёкшей арендой (CONVERT/lease_reaper.py); при остановке сначала
+#   ждёт фоновые задачи диспетчера до VKMAX_JOB_DRAIN_TIMEOUT_SEC (остальные заберёт reaper).
+#   Там же создаётся и после дренажа закрывается общий HTTP-клиент LLM (LLM_SERVICE/http_client.py).
+# - Продакшн-запуск (воркеры, uvloop, httptools) — FAST_API/server.py.
+# - Тяжёлые библиотеки конвертеров и обхода импортируются лениво; lifespan прогревает их
+#   в фоне по ролям VKMAX_WARMUP_ROLES (CONVERT/warmup.py), не задерживая старт.
+# - Ответы по умолчанию сериализуются orjson (default_response_class=ORJSONResponse).
+# - MetricsMiddleware (FAST_API/metrics.py) пишет гистограмму длительности запросов
+#   по шаблону маршрута; экспозиция Prometheus — GET /metrics (ROUTES/system.py).
 
 from __future__ import annotations
 
-import json
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from dotenv import load_dotenv
 
 from .config import settings
+from .metrics import MetricsMiddleware
+from .request_logging import RequestLoggingMiddleware
+from BACKEND.CONVERT.job_dispatcher import job_dispatcher
+from BACKEND.CONVERT.lease_reaper import lease_reaper
 from BACKEND.CONVERT.logging_config import setup_logging
+from BACKEND.CONVERT import warmup
+from BACKEND.CONVERT.webhook_dispatcher import webhook_dispatcher
+from BACKEND.DATABASE import instrumentation as db_instrumentation
+from BACKEND.LLM_SERVICE import http_client as llm_http
 
 # Загружаем переменные окружения из BACKEND/.env до инициализации сервисов
 _BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,9 +58,30 @@ if _DOTENV_PATH.exists():  # безопасно для продакшена: в
 setup_logging()
 
 logger = logging.getLogger("vkmax.fastapi")
-logger.setLevel(logging.DEBUG)
 
-app = FastAPI(title=settings.app_name, version=settings.version)
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    warmup.start_background(warmup.parse_roles(settings.warmup_roles))
+    webhook_dispatcher.start()
+    lease_reaper.start(storage_dir=settings.storage_dir)
+    await llm_http.startup()
+    try:
+        yield
+    finally:
+        if not await job_dispatcher.wait_idle(settings.job_drain_timeout_sec):
+            logger.warning("[fast_api.lifespan] jobs still running after drain timeout, leaving them to lease recovery")
+        await lease_reaper.stop()
+        await webhook_dispatcher.stop()
+        await llm_http.aclose()
+
+
+app = FastAPI(
+    title=settings.app_name,
+    version=settings.version,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # CORS
 allow_origins = [o.strip() for o in (settings.cors_origins or "").split(",") if o.strip()]
@@ -47,32 +93,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.debug(f"Request: {request.method} {request.url}")
-    ctype = request.headers.get("content-type", "")
-    if ctype.startswith("application/json"):
-        try:
-            body = await request.json()
-            logger.debug(f"Request body: {json.dumps(body, ensure_ascii=False)[:1000]}")
-        except Exception:
-            pass
-    elif "multipart/form-data" in ctype or "application/octet-stream" in ctype:
-        logger.debug("Request body: <multipart/binary skipped>")
-
-    response = await call_next(request)
+async def db_query_stats(request: Request, call_next):
+    stats, token = db_instrumentation.begin_request(route=db_instrumentation.UNMATCHED_ROUTE)
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            stats.route = route.path
+        db_instrumentation.end_request(token)
+    if settings.debug:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.2f}"
+        response.headers["X-DB-Slow-Queries"] = str(stats.slow_count)
     return response
 
 # Exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    logger.error(f"Validation error: {exc.errors()} for request: {request.url}")
-    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+    logger.error("Validation error: %s for request: %s", exc.errors(), request.url.path)
+    return ORJSONResponse(status_code=422, content={"detail": exc.errors()})
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exc):
-    logger.error(f"HTTP error: {exc.detail} for request: {request.url}, status: {exc.status_code}")
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    logger.error("HTTP error: %s for request: %s, status: %s", exc.detail, request.url.path, exc.status_code)
+    # headers нужны, например, для Retry-After у 429 (FAST_API/rate_limit.py)
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=getattr(exc, "headers", None))
 
 # Routers
 from .ROUTES import user as user_router  # noqa: E402
@@ -83,6 +134,7 @@ from .ROUTES import download as download_router  # noqa: E402
 from .ROUTES import convert as convert_router  # noqa: E402
 from .ROUTES import auth as auth_router  # noqa: E402
 from .ROUTES import graph as graph_router  # noqa: E402
+from .ROUTES import webhooks as webhooks_router  # noqa: E402
 
 app.include_router(user_router.router)
 app.include_router(system_router.router)
@@ -92,6 +144,7 @@ app.include_router(download_router.router)
 app.include_router(convert_router.router)
 app.include_router(auth_router.router)
 app.include_router(graph_router.router)
+app.include_router(webhooks_router.router)
 
 @app.get("/")
 async def root():
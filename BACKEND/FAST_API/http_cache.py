@@ -0,0 +1,240 @@
+# Руководство к файлу (FAST_API/http_cache.py)
+# Назначение:
+# - HTTP-кэширование справочных и неизменяемых ответов: ETag / Last-Modified, ответ
+#   304 на If-None-Match / If-Modified-Since и Cache-Control по политике пространства.
+# - In-process TTL-кэш готовых JSON-байтов (ResponseCache): /formats* и
+#   /supported-conversions не ходят в БД, пока запись жива; сгенерированный граф не
+#   читается с диска повторно.
+# - Политики (POLICIES):
+#   - formats — "public, max-age=<ttl>", TTL VKMAX_FORMATS_CACHE_TTL_SEC (300 с);
+#   - graph — "private, no-cache": клиент всегда перепроверяет (граф файла можно
+#     сгенерировать заново), но по ETag получает 304 без тела; TTL VKMAX_GRAPH_CACHE_TTL_SEC (600 с).
+# Важно:
+# - Кэш процесса: код, меняющий таблицу formats (ROUTES/convert.py), вызывает
+#   invalidate_on_commit(session, "formats") — запись сбрасывается после commit сессии
+#   (до commit параллельный GET закэшировал бы старый список снова, после rollback
+#   сбрасывать нечего); invalidate("graph", (file_id,)) — POST /graph; другие процессы
+#   видят изменение форматов по истечении TTL. Ключ графа содержит id и mtime файла
+#   результата, поэтому новый граф никогда не отдаётся из старой записи.
+# - Объём ограничен VKMAX_RESPONSE_CACHE_MB (32 МБ), вытесняются давно не читанные записи.
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .compression import json_bytes_response
+
+_PENDING_KEY = "vkmax_http_cache_invalidate"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Политика пространства кэша: заголовок Cache-Control и TTL записи в процессе."""
+
+    cache_control: str
+    ttl_sec: float
+
+
+def _formats_policy() -> CachePolicy:
+    ttl = max(0.0, _env_float("VKMAX_FORMATS_CACHE_TTL_SEC", 300.0))
+    return CachePolicy(cache_control=f"public, max-age={int(ttl)}", ttl_sec=ttl)
+
+
+POLICIES: Dict[str, CachePolicy] = {
+    "formats": _formats_policy(),
+    "graph": CachePolicy(cache_control="private, no-cache", ttl_sec=max(0.0, _env_float("VKMAX_GRAPH_CACHE_TTL_SEC", 600.0))),
+}
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    last_modified: float
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ResponseCache:
+    """TTL + LRU кэш тел ответов по (пространство, ключ) с ограничением по объёму."""
+
+    def __init__(self, max_bytes: int, clock: Callable[[], float] = time.time) -> None:
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._items: "OrderedDict[Tuple[str, Hashable], CachedBody]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, full_key: Tuple[str, Hashable]) -> None:
+        entry = self._items.pop(full_key, None)
+        if entry is not None:
+            self._size -= len(entry.body)
+
+    def get(self, namespace: str, key: Hashable) -> Optional[CachedBody]:
+        full_key = (namespace, key)
+        entry = self._items.get(full_key)
+        if entry is not None and entry.expires_at <= self._clock():
+            self._drop(full_key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(full_key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        namespace: str,
+        key: Hashable,
+        body: bytes,
+        *,
+        ttl_sec: float,
+        etag: Optional[str] = None,
+        last_modified: Optional[float] = None,
+    ) -> CachedBody:
+        now = self._clock()
+        entry = CachedBody(
+            body=body,
+            etag=etag or make_etag(body),
+            last_modified=now if last_modified is None else last_modified,
+            expires_at=now + ttl_sec,
+        )
+        full_key = (namespace, key)
+        self._drop(full_key)
+        if ttl_sec <= 0 or len(body) > self.max_bytes:
+            return entry
+        self._items[full_key] = entry
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self._size -= len(old.body)
+        return entry
+
+    def invalidate(self, namespace: str, prefix: Tuple[Hashable, ...] = ()) -> int:
+        """Удалить записи пространства (только ключи-кортежи, начинающиеся с prefix)."""
+
+        doomed = [
+            full_key
+            for full_key in self._items
+            if full_key[0] == namespace
+            and (not prefix or (isinstance(full_key[1], tuple) and full_key[1][: len(prefix)] == prefix))
+        ]
+        for full_key in doomed:
+            self._drop(full_key)
+        return len(doomed)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._size = 0
+
+
+response_cache = ResponseCache(int(_env_float("VKMAX_RESPONSE_CACHE_MB", 32) * 1024 * 1024))
+
+
+def invalidate_on_commit(session: AsyncSession, namespace: str, prefix: Tuple[Hashable, ...] = ()) -> None:
+    """Сбросить записи пространства после commit *session* (при rollback — ничего)."""
+
+    session.info.setdefault(_PENDING_KEY, set()).add((namespace, prefix))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for namespace, prefix in session.info.pop(_PENDING_KEY, None) or ():
+        response_cache.invalidate(namespace, prefix)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Условный GET: If-None-Match (приоритетный) или If-Modified-Since."""
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def validator_headers(policy: CachePolicy, etag: str, last_modified: float) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": policy.cache_control,
+    }
+
+
+def not_modified_response(namespace: str, etag: str, last_modified: float) -> Response:
+    headers = validator_headers(POLICIES[namespace], etag, last_modified)
+    return Response(status_code=304, headers={**headers, "Vary": "Accept-Encoding"})
+
+
+async def cached_body_response(request: Request, namespace: str, entry: CachedBody) -> Response:
+    """304 по валидаторам запроса либо тело записи (сжатое по Accept-Encoding)."""
+
+    if is_not_modified(request, entry.etag, entry.last_modified):
+        return not_modified_response(namespace, entry.etag, entry.last_modified)
+    headers = validator_headers(POLICIES[namespace], entry.etag, entry.last_modified)
+    return await json_bytes_response(request, entry.body, cache_key=(namespace, entry.etag), headers=headers)
+
+
+async def cached_json(
+    request: Request,
+    namespace: str,
+    key: Hashable,
+    load: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """Ответ из TTL-кэша; при промахе load() строит JSON-байты и они кладутся в кэш."""
+
+    entry = response_cache.get(namespace, key)
+    if entry is None:
+        entry = response_cache.put(namespace, key, await load(), ttl_sec=POLICIES[namespace].ttl_sec)
+    return await cached_body_response(request, namespace, entry)
+
+
+__all__ = [
+    "CachePolicy",
+    "CachedBody",
+    "POLICIES",
+    "ResponseCache",
+    "cached_body_response",
+    "cached_json",
+    "invalidate_on_commit",
+    "is_not_modified",
+    "make_etag",
+    "not_modified_response",
+    "response_cache",
+    "validator_headers",
+]
@@ -0,0 +1,131 @@
+# Руководство к файлу (FAST_API/metrics.py)
+# Назначение:
+# - MetricsMiddleware (чистый ASGI): гистограмма длительности HTTP-запросов
+#   vkmax_http_request_duration_seconds{route, method, status}; route — шаблон пути
+#   FastAPI (/graph/{file_id}), для запросов без маршрута — "unmatched".
+# - Метрики процесса, которые уже считают подсистемы, снимаются при скрейпе
+#   (CallbackMetric): очереди и пулы диспетчера, попадания кэшей ответов и сжатия,
+#   доставки вебхуков, операции lease_reaper, потерянные аренды, выброшенные события
+#   progress_bus, убитые процессы cpu_pool.
+# - GET /metrics (ROUTES/system.py) отдаёт METRICS.render().
+# Важно:
+# - Для потоковых ответов (SSE, WebSocket не считается) длительность — время жизни потока.
+
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Dict, MutableMapping, Tuple
+
+from .config import settings
+from .compression import compressed_cache
+from .http_cache import response_cache
+from BACKEND import METRICS
+from BACKEND.CONVERT import cpu_pool
+from BACKEND.CONVERT.job_dispatcher import job_dispatcher
+from BACKEND.CONVERT.lease_reaper import lease_reaper
+from BACKEND.CONVERT.progress_bus import progress_bus
+from BACKEND.CONVERT.webhook_dispatcher import webhook_dispatcher
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+
+REQUEST_SECONDS = METRICS.histogram(
+    "vkmax_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ("route", "method", "status"),
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+        # (route, method, status) -> дочерний объект гистограммы: без разбора меток на запрос
+        self._children: Dict[Tuple[str, str, int], Any] = {}
+
+    async def __call__(self, scope: Scope, receive: Callable[[], Awaitable[Message]], send: Callable[[Message], Awaitable[None]]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_tap(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tap)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            key = (route, scope.get("method", ""), status)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = REQUEST_SECONDS.labels(*key)
+            child.observe(time.perf_counter() - started)
+
+
+def _cache_stats() -> Dict[str, Tuple[int, int]]:
+    return {
+        "response": (response_cache.hits, response_cache.misses),
+        "compressed": (compressed_cache.hits, compressed_cache.misses),
+    }
+
+
+def _hit_ratio() -> Dict[Tuple[str, ...], float]:
+    out = {}
+    for name, (hits, misses) in _cache_stats().items():
+        total = hits + misses
+        out[(name,)] = hits / total if total else 0.0
+    return out
+
+
+def _queue_depth() -> Dict[Tuple[str, ...], float]:
+    return {
+        (pool, priority): depth
+        for pool, stats in job_dispatcher.stats().items()
+        for priority, depth in stats["queued"].items()
+    }
+
+
+METRICS.gauge("vkmax_build_info", "Application version", ("version",)).labels(settings.version).set(1)
+METRICS.callback("vkmax_job_queue_depth", "Jobs waiting for a pool slot by pool and priority class", "gauge", ("pool", "priority"), _queue_depth)
+METRICS.callback(
+    "vkmax_job_pool_running",
+    "Jobs holding a pool slot",
+    "gauge",
+    ("pool",),
+    lambda: {(pool,): stats["running"] for pool, stats in job_dispatcher.stats().items()},
+)
+METRICS.callback(
+    "vkmax_job_pool_capacity",
+    "Pool slot capacity",
+    "gauge",
+    ("pool",),
+    lambda: {(pool,): stats["capacity"] for pool, stats in job_dispatcher.stats().items()},
+)
+METRICS.callback("vkmax_jobs_in_flight", "Jobs accepted by this process by kind (waiting or running)", "gauge", ("kind",), lambda: {(k,): n for k, n in job_dispatcher.jobs_by_kind().items()})
+METRICS.callback("vkmax_job_leases_lost_total", "Jobs stopped because another worker took over their lease", "counter", (), lambda: {(): job_dispatcher.leases_lost})
+METRICS.callback("vkmax_cache_hits_total", "In-process cache hits", "counter", ("cache",), lambda: {(n,): h for n, (h, _) in _cache_stats().items()})
+METRICS.callback("vkmax_cache_misses_total", "In-process cache misses", "counter", ("cache",), lambda: {(n,): m for n, (_, m) in _cache_stats().items()})
+METRICS.callback("vkmax_cache_hit_ratio", "Hit ratio since start", "gauge", ("cache",), _hit_ratio)
+METRICS.callback(
+    "vkmax_webhook_deliveries_total",
+    "Outbound webhook delivery attempts by outcome",
+    "counter",
+    ("outcome",),
+    lambda: {("delivered",): webhook_dispatcher.delivered, ("failed",): webhook_dispatcher.failed},
+)
+METRICS.callback(
+    "vkmax_lease_reaper_operations_total",
+    "Operations recovered from expired leases by outcome",
+    "counter",
+    ("outcome",),
+    lambda: {("requeued",): lease_reaper.requeued, ("dead_letter",): lease_reaper.dead},
+)
+METRICS.callback("vkmax_progress_events_dropped_total", "Progress events dropped for slow subscribers", "counter", (), lambda: {(): progress_bus.dropped})
+METRICS.callback("vkmax_cpu_pool_killed_total", "CPU pool worker processes killed on cancel or timeout", "counter", (), lambda: {(): cpu_pool.killed_workers()})
+
+
+__all__ = ["MetricsMiddleware", "REQUEST_SECONDS"]
@@ -0,0 +1,236 @@
+# Руководство к файлу (FAST_API/rate_limit.py)
+# Назначение:
+# - Защита от всплесков тяжёлых запросов (/convert, /convert/website, /upload/website,
+#   POST /graph/{id}, /batch-convert): 429 Too Many Requests с заголовком Retry-After.
+# - Два уровня проверки в admit():
+#   * admission control — глобальная нагрузка: глубина очереди операций (queued + processing)
+#     и оценка секунд до её разбора (eta_estimator.backlog); пороги
+#     VKMAX_ADMISSION_MAX_QUEUE (500) и VKMAX_ADMISSION_MAX_BACKLOG_SEC (1800), 0 — без порога;
+#     снимок кэшируется на VKMAX_ADMISSION_CACHE_SEC (2 с);
+#   * token bucket на пользователя (user_id, без него — IP клиента) и класс эндпоинта:
+#     convert / website / graph, скорость VKMAX_RATE_<CLASS>_PER_MIN и запас VKMAX_RATE_<CLASS>_BURST.
+# - Хранилище корзин — VKMAX_RATE_LIMIT: memory (по умолчанию, в памяти процесса) | db
+#   (таблица rate_limit_buckets, общий лимит для нескольких воркеров) | off.
+# Важно:
+# - Ошибка хранилища лимитера не блокирует API: запрос пропускается, ошибка логируется.
+# - user_id берётся из тела запроса (авторизации в API пока нет) — лимит защищает от
+#   перегрузки, а не от злонамеренного клиента.
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from BACKEND.CONVERT import eta_estimator
+from BACKEND.DATABASE.CACHE_MANAGER import RateLimitManager
+from BACKEND.DATABASE.CACHE_MANAGER.rate_limit import take_tokens
+from BACKEND.DATABASE.session import async_session_factory
+
+
+logger = logging.getLogger("vkmax.fastapi.rate_limit")
+
+# Классы эндпоинтов: (запросов в минуту, запас на всплеск)
+LIMIT_CLASSES: Dict[str, Tuple[float, float]] = {
+    "convert": (60.0, 20.0),
+    "website": (10.0, 5.0),
+    "graph": (10.0, 5.0),
+}
+
+_MAX_RETRY_AFTER_SEC = 300
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "")
+    if raw == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class LimitRule:
+    per_min: float
+    burst: float
+
+    @property
+    def rate(self) -> float:
+        return self.per_min / 60.0
+
+
+def limit_rule(limit_class: str) -> LimitRule:
+    per_min, burst = LIMIT_CLASSES.get(limit_class, LIMIT_CLASSES["convert"])
+    name = limit_class.upper()
+    return LimitRule(
+        per_min=max(0.0, _env_float(f"VKMAX_RATE_{name}_PER_MIN", per_min)),
+        burst=max(1.0, _env_float(f"VKMAX_RATE_{name}_BURST", burst)),
+    )
+
+
+class MemoryBackend:
+    """Корзины в памяти процесса; полные неактивные корзины вычищаются при росте словаря."""
+
+    def __init__(self, max_keys: int = 10_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}  # key → tokens, updated, rate, burst
+
+    async def take(self, key: str, *, rate: float, burst: float, cost: float, now: float) -> float:
+        tokens, updated, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+        tokens, wait = take_tokens(tokens, updated, now, rate=rate, burst=burst, cost=cost)
+        self._buckets[key] = (tokens, now, rate, burst)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return wait
+
+    def _prune(self, now: float) -> None:
+        full = [k for k, (tokens, updated, rate, burst) in self._buckets.items() if tokens + (now - updated) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+class DatabaseBackend:
+    """Корзины в таблице rate_limit_buckets: один лимит на все воркеры с общей БД."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        self._session_factory = session_factory or async_session_factory
+
+    async def take(self, key: str, *, rate: float, burst: float, cost: float, now: float) -> float:
+        async with self._session_factory() as session:
+            wait = await RateLimitManager(session).take(key, rate=rate, burst=burst, cost=cost, now=now)
+            await session.commit()
+        return wait
+
+
+def _limit_mode() -> str:
+    mode = (os.getenv("VKMAX_RATE_LIMIT", "") or "memory").strip().lower()
+    return mode if mode in ("memory", "db", "off") else "memory"
+
+
+class RateLimiter:
+    def __init__(self) -> None:
+        self._backend: Any = None
+        self._mode: Optional[str] = None
+
+    def backend(self) -> Any:
+        mode = _limit_mode()
+        if self._backend is None or mode != self._mode:
+            self._backend = DatabaseBackend() if mode == "db" else MemoryBackend()
+            self._mode = mode
+        return self._backend
+
+    def reset(self) -> None:
+        self._backend = None
+        self._mode = None
+
+    async def check(self, limit_class: str, client_key: str, *, cost: float = 1.0) -> float:
+        """Секунды до повтора для *client_key* в классе *limit_class* (0 — запрос разрешён)."""
+
+        if _limit_mode() == "off":
+            return 0.0
+        rule = limit_rule(limit_class)
+        try:
+            return await self.backend().take(
+                f"{limit_class}:{client_key}",
+                rate=rule.rate,
+                burst=rule.burst,
+                # Пакет дороже одного запроса, но не больше запаса — иначе не пройдёт никогда
+                cost=min(max(1.0, float(cost)), rule.burst),
+                now=time.time(),
+            )
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[rate_limit.RateLimiter.check] backend error, request allowed: %s", exc)
+            return 0.0
+
+
+class AdmissionController:
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        self._session_factory = session_factory or async_session_factory
+        self._snapshot: Optional[Tuple[float, int, float]] = None  # monotonic, depth, backlog_sec
+
+    def reset(self) -> None:
+        self._snapshot = None
+
+    async def load(self) -> Tuple[int, float]:
+        """(глубина очереди, секунды до её разбора), не чаще раза в VKMAX_ADMISSION_CACHE_SEC."""
+
+        now = time.monotonic()
+        ttl = _env_float("VKMAX_ADMISSION_CACHE_SEC", 2.0)
+        if self._snapshot is not None and now - self._snapshot[0] < ttl:
+            return self._snapshot[1], self._snapshot[2]
+        async with self._session_factory() as session:
+            depth, backlog_sec = await eta_estimator.backlog(session)
+        self._snapshot = (now, depth, backlog_sec)
+        return depth, backlog_sec
+
+    async def check(self) -> float:
+        """Секунды до повтора, если сервер перегружен (0 — запрос принимается)."""
+
+        max_queue = _env_float("VKMAX_ADMISSION_MAX_QUEUE", 500)
+        max_backlog = _env_float("VKMAX_ADMISSION_MAX_BACKLOG_SEC", 1800)
+        if max_queue <= 0 and max_backlog <= 0:
+            return 0.0
+        try:
+            depth, backlog_sec = await self.load()
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[rate_limit.AdmissionController.check] backlog unavailable, request allowed: %s", exc)
+            return 0.0
+        wait = 0.0
+        if max_queue > 0 and depth >= max_queue:
+            # Время, за которое очередь опустится ниже порога при текущей скорости разбора
+            per_op = backlog_sec / depth if depth else 0.0
+            wait = max(wait, per_op * (depth - max_queue + 1), 1.0)
+        if max_backlog > 0 and backlog_sec >= max_backlog:
+            wait = max(wait, backlog_sec - max_backlog, 1.0)
+        return wait
+
+
+rate_limiter = RateLimiter()
+admission = AdmissionController()
+
+
+def client_key(request: Request, user_id: Optional[Any]) -> str:
+    try:
+        if user_id is not None and str(user_id) != "":
+            return f"user:{int(user_id)}"
+    except (TypeError, ValueError):
+        pass
+    host = request.client.host if request.client is not None else "unknown"
+    return f"ip:{host}"
+
+
+async def admit(request: Request, limit_class: str, user_id: Optional[Any] = None, *, cost: float = 1.0) -> None:
+    """Пропускает запрос или отвечает 429 с Retry-After (перегрузка сервера или лимит клиента)."""
+
+    wait = await admission.check()
+    reason = "Server is overloaded, retry later"
+    if wait <= 0:
+        key = client_key(request, user_id)
+        wait = await rate_limiter.check(limit_class, key, cost=cost)
+        reason = f"Rate limit exceeded for {limit_class} requests"
+    if wait <= 0:
+        return
+    retry_after = max(1, math.ceil(min(wait, _MAX_RETRY_AFTER_SEC)))
+    logger.info("[rate_limit.admit] 429 %s class=%s user_id=%s retry_after=%s", request.url.path, limit_class, user_id, retry_after)
+    raise HTTPException(429, reason, headers={"Retry-After": str(retry_after)})
+
+
+__all__ = [
+    "LIMIT_CLASSES",
+    "LimitRule",
+    "limit_rule",
+    "MemoryBackend",
+    "DatabaseBackend",
+    "RateLimiter",
+    "AdmissionController",
+    "rate_limiter",
+    "admission",
+    "client_key",
+    "admit",
+]
@@ -0,0 +1,119 @@
+# Руководство к файлу (FAST_API/request_logging.py)
+# Назначение:
+# - ASGI-middleware журнала запросов вместо прежнего log_requests: строка
+#   "METHOD path -> status in N ms" в логгер vkmax.fastapi.requests.
+# - Выборка: пишется доля VKMAX_LOG_SAMPLE_RATE (0.1) запросов; ошибки 5xx (ERROR) и
+#   медленные запросы дольше VKMAX_LOG_SLOW_MS (1000 мс, WARNING) пишутся всегда.
+# - Тело запроса (только JSON/текст/form) пишется на DEBUG для попавших в выборку
+#   запросов: первые VKMAX_LOG_BODY_MAX_BYTES (1024) байт копируются по мере того, как
+#   приложение само читает тело, — без повторного request.json() и json.dumps.
+# Важно:
+# - Форматирование ленивое (аргументы %s). При выключенном INFO выборка не делается
+#   (с VKMAX_LOG_LEVEL=WARNING пишутся только 5xx и медленные запросы), а при выключенном
+#   WARNING middleware сразу передаёт запрос дальше.
+# - Query string не пишется: в ней бывают токены.
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+
+logger = logging.getLogger("vkmax.fastapi.requests")
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+_TEXT_TYPES = ("application/json", "text/", "application/x-www-form-urlencoded")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class RequestLogConfig:
+    sample_rate: float = 0.1
+    slow_ms: float = 1000.0
+    body_max_bytes: int = 1024
+
+    @classmethod
+    def from_env(cls) -> "RequestLogConfig":
+        return cls(
+            sample_rate=min(1.0, max(0.0, _env_float("VKMAX_LOG_SAMPLE_RATE", cls.sample_rate))),
+            slow_ms=max(0.0, _env_float("VKMAX_LOG_SLOW_MS", cls.slow_ms)),
+            body_max_bytes=max(0, int(_env_float("VKMAX_LOG_BODY_MAX_BYTES", cls.body_max_bytes))),
+        )
+
+
+def _content_type(scope: Scope) -> str:
+    for key, value in scope.get("headers") or ():
+        if key == b"content-type":
+            return value.decode("latin-1").lower()
+    return ""
+
+
+class RequestLoggingMiddleware:
+    def __init__(self, app: Callable[..., Awaitable[None]], config: RequestLogConfig | None = None, rng: Callable[[], float] = random.random) -> None:
+        self.app = app
+        self.config = config or RequestLogConfig.from_env()
+        self._rng = rng
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not logger.isEnabledFor(logging.WARNING):
+            await self.app(scope, receive, send)
+            return
+
+        cfg = self.config
+        started = time.perf_counter()
+        sampled = cfg.sample_rate > 0 and logger.isEnabledFor(logging.INFO) and self._rng() < cfg.sample_rate
+        capture = (
+            sampled
+            and cfg.body_max_bytes > 0
+            and logger.isEnabledFor(logging.DEBUG)
+            and _content_type(scope).startswith(_TEXT_TYPES)
+        )
+        state: Dict[str, Any] = {"status": 500, "body": bytearray(), "size": 0}
+
+        async def receive_tap() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                state["size"] += len(chunk)
+                room = cfg.body_max_bytes - len(state["body"])
+                if room > 0:
+                    state["body"].extend(chunk[:room])
+            return message
+
+        async def send_tap(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_tap if capture else receive, send_tap)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            status = state["status"]
+            if status >= 500:
+                level = logging.ERROR
+            elif elapsed_ms >= cfg.slow_ms:
+                level = logging.WARNING
+            else:
+                level = logging.INFO if sampled else 0
+            if level:
+                logger.log(level, "%s %s -> %s in %.1fms", scope.get("method"), scope.get("path"), status, elapsed_ms)
+            if capture and state["size"]:
+                truncated = "" if state["size"] <= cfg.body_max_bytes else ", truncated"
+                logger.debug("request body (%s bytes%s): %s", state["size"], truncated, bytes(state["body"]).decode("utf-8", "replace"))
+
+
+__all__ = ["RequestLogConfig", "RequestLoggingMiddleware"]
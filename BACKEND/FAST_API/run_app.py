@@ -1,13 +1,23 @@
 # Руководство к файлу (FAST_API/run_app.py)
 # Назначение:
-# - Локальный запуск приложения VKMax FastAPI через uvicorn.
-# Использование:
-# - python -m VKMax.BACKEND.FAST_API.run_app
-# - или: uvicorn VKMax.BACKEND.FAST_API.fast_api:app --reload
+# - Локальный запуск приложения VKMax FastAPI через uvicorn с автоперезагрузкой.
+# Использование (из корня репозитория):
+# - python -m BACKEND.FAST_API.run_app
+# - или: uvicorn BACKEND.FAST_API.fast_api:app --reload
+# Важно:
+# - Только для разработки (один процесс, reload). Продакшн — python -m BACKEND.FAST_API.server.
 
 from __future__ import annotations
 
+import os
+
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("VKMax.BACKEND.FAST_API.fast_api:app", host="127.0.0.1", port=8010, reload=True, log_level="debug")
\ No newline at end of file
+    uvicorn.run(
+        "BACKEND.FAST_API.fast_api:app",
+        host=os.getenv("VKMAX_SERVER_HOST", "127.0.0.1"),
+        port=int(os.getenv("VKMAX_SERVER_PORT", "8010")),
+        reload=True,
+        log_level=os.getenv("VKMAX_LOG_LEVEL", "info").lower(),
+    )
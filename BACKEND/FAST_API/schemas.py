@@ -6,7 +6,7 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -90,6 +90,10 @@ class BatchOperation(BaseModel):
 class BatchConvertRequest(BaseModel):
     operations: List[BatchOperation]
     user_id: str
+    # Сколько операций пакета выполнять одновременно (по умолчанию VKMAX_BATCH_MAX_PARALLEL)
+    max_parallel: Optional[int] = Field(None, ge=1, le=64)
+    # Класс приоритета в планировщике; interactive зарезервирован за /convert
+    priority: Literal["batch", "background"] = "batch"
 
 
 class OperationResponse(BaseModel):
@@ -110,6 +114,24 @@ class OperationStatusResponse(BaseModel):
     status: str
     progress: int = 0
     result_file_id: Optional[str] = None
+    error_message: Optional[str] = None
+    attempts: int = 0  # начатые попытки выполнения (повторы при временных сбоях)
+
+
+class OperationStatusItem(BaseModel):
+    operation_id: str
+    status: Optional[str] = None  # None — операция не найдена
+    progress: int = 0
+    result_file_id: Optional[str] = None
+    error_message: Optional[str] = None
+
+
+class OperationsStatusResponse(BaseModel):
+    operations: List[OperationStatusItem]
+
+
+class OperationWaitResponse(OperationStatusItem):
+    changed: bool = False
 
 
 class BatchConvertResponse(BaseModel):
@@ -117,6 +139,19 @@ class BatchConvertResponse(BaseModel):
     operations: List[OperationResponse]
 
 
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str  # running | completed | cancelled | failed | partial
+    total: int
+    done: int
+    progress: int = 0
+    counts: Dict[str, int] = Field(default_factory=dict)
+    max_parallel: Optional[int] = None
+    created_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    operations: List[OperationStatusItem] = Field(default_factory=list)
+
+
 # --------------------------- Websites ---------------------------
 
 class WebsiteStatusResponse(BaseModel):
@@ -201,6 +236,37 @@ class WebhookConversionComplete(BaseModel):
     type: Optional[str] = None
 
 
+class WebhookEndpointRequest(BaseModel):
+    url: str = Field(..., min_length=8, max_length=2048)
+    user_id: Optional[str] = None  # None — интеграция: все события (нужен VKMAX_ADMIN_TOKEN)
+    events: List[str] = Field(default_factory=lambda: ["*"])  # шаблоны fnmatch: operation.*, batch.finished
+    secret: Optional[str] = Field(None, min_length=16, max_length=255)  # None — сгенерировать
+    max_concurrency: Optional[int] = Field(None, ge=1, le=32)
+
+
+class WebhookEndpointResponse(BaseModel):
+    id: str
+    user_id: Optional[str] = None
+    url: str
+    events: List[str]
+    max_concurrency: Optional[int] = None
+    active: bool
+    created_at: Optional[str] = None
+    secret: Optional[str] = None  # только в ответе на регистрацию
+
+
+class WebhookDeliveryItem(BaseModel):
+    id: str
+    event_id: str
+    event_type: str
+    status: str  # pending | delivered | dead
+    attempts: int
+    next_attempt_at: Optional[float] = None
+    last_error: Optional[str] = None
+    created_at: Optional[str] = None
+    delivered_at: Optional[str] = None
+
+
 # --------------------------- MAX WebApp Auth ---------------------------
 
 
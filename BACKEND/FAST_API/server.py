@@ -0,0 +1,242 @@
+# Руководство к файлу (FAST_API/server.py)
+# Назначение:
+# - Продакшн-запуск VKMax API: N процессов-воркеров uvicorn на общем сокете,
+#   event loop uvloop и HTTP-парсер httptools (при наличии пакетов; иначе asyncio / h11).
+# - Предзагрузка (server_preload, по умолчанию включена): мастер импортирует приложение и
+#   открывает сокет до fork — воркеры стартуют без повторного импорта и делят страницы
+#   памяти с мастером (copy-on-write). Без предзагрузки — штатный uvicorn --workers (spawn).
+#   Там же мастер прогревает импорты ролей VKMAX_WARMUP_ROLES (CONVERT/warmup.py); пул
+#   cpu_pool каждый воркер запускает сам в lifespan.
+# - Мастер перезапускает упавший воркер; SIGTERM/SIGINT — плавная остановка: воркеры
+#   перестают принимать соединения, дожидаются запросов (server_graceful_timeout_sec), затем
+#   lifespan дожидается фоновых задач диспетчера (job_drain_timeout_sec); после общего
+#   срока оставшиеся воркеры получают SIGKILL.
+# Использование:
+# - python -m BACKEND.FAST_API.server [--workers 4] [--host 0.0.0.0] [--port 8000]
+# - Настройки — Settings (FAST_API/config.py), переменные VKMAX_SERVER_* и VKMAX_JOB_DRAIN_TIMEOUT_SEC.
+# Важно:
+# - Для разработки с автоперезагрузкой — FAST_API/run_app.py.
+# - Состояние в памяти процесса при N воркерах делится на N: лимитер запросов в памяти
+#   пропускал бы N× лимит, поэтому при workers > 1 VKMAX_RATE_LIMIT=memory (по умолчанию)
+#   заменяется на db с предупреждением (share_rate_limit). Метрики /metrics — на воркер:
+#   скрейп попадает в случайный воркер (см. METRICS/INSTRUCTIONS.MD).
+# - До fork в мастере не должно быть потоков и event loop: поток слушателя логов
+#   останавливается перед fork и запускается заново в каждом процессе.
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from .config import settings
+from BACKEND.CONVERT.logging_config import setup_logging, shutdown_logging
+from BACKEND.CONVERT.warmup import parse_roles, warmup
+
+APP_PATH = "BACKEND.FAST_API.fast_api:app"
+
+logger = logging.getLogger("vkmax.fastapi.server")
+
+
+def resolve_loop(name: str) -> str:
+    """auto → uvloop, если установлен; иначе asyncio."""
+
+    name = (name or "auto").strip().lower()
+    if name == "auto":
+        return "uvloop" if importlib.util.find_spec("uvloop") is not None else "asyncio"
+    return name
+
+
+def resolve_http(name: str) -> str:
+    """auto → httptools, если установлен; иначе h11."""
+
+    name = (name or "auto").strip().lower()
+    if name == "auto":
+        return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+    return name
+
+
+def worker_count(requested: int) -> int:
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def build_config(app: object, *, host: str, port: int, workers: int) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=resolve_loop(settings.server_loop),
+        http=resolve_http(settings.server_http),
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_sec,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_sec,
+        lifespan="on",
+        # Журнал запросов ведёт RequestLoggingMiddleware, логирование — setup_logging()
+        access_log=False,
+        log_config=None,
+        proxy_headers=True,
+    )
+
+
+class Supervisor:
+    """Мастер prefork: держит сокет, форкает воркеров, перезапускает упавших."""
+
+    def __init__(self, config: uvicorn.Config, workers: int) -> None:
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, float] = {}  # pid -> время запуска
+        self.stopping = False
+        self._sock: Optional[socket.socket] = None
+
+    def _spawn(self) -> None:
+        assert self._sock is not None
+        shutdown_logging()  # не форкать с живым потоком слушателя и захваченной очередью
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # uvicorn ставит свои обработчики на время работы и по выходу повторяет
+                # пойманный сигнал с прежним обработчиком: SIG_IGN даёт дописать логи
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                setup_logging()
+                uvicorn.Server(self.config).run(sockets=[self._sock])
+            except BaseException:  # noqa: WPS424
+                logging.getLogger("vkmax.fastapi.server").exception("[server.worker] pid=%s crashed", os.getpid())
+                code = 1
+            finally:
+                shutdown_logging()
+                os._exit(code)
+        setup_logging()
+        self.children[pid] = time.monotonic()
+        logger.info("[server.Supervisor] worker pid=%s started", pid)
+
+    def _on_signal(self, signum: int, _frame: object) -> None:
+        self.stopping = True
+
+    def _reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            if not self.stopping:
+                logger.error("[server.Supervisor] worker pid=%s exited (status=%s), restarting", pid, status)
+                # Воркер, падающий сразу при старте, не должен раскручивать fork в цикле
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)
+
+    def run(self) -> None:
+        self.config.load()  # импорт приложения в мастере: воркеры получат его через fork
+        # Процессы пула конвертеров мастер не запускает: их Pipe принадлежали бы не тому воркеру
+        warmup(*parse_roles(settings.warmup_roles), prestart_pool=False)
+        self._sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        logger.info(
+            "[server.Supervisor] preloaded %s, %s workers on %s:%s (loop=%s, http=%s)",
+            APP_PATH,
+            self.workers,
+            self.config.host,
+            self.config.port,
+            self.config.loop,
+            self.config.http,
+        )
+        try:
+            while not self.stopping:
+                while len(self.children) < self.workers and not self.stopping:
+                    self._spawn()
+                time.sleep(0.2)
+                self._reap()
+            self._terminate()
+        finally:
+            self._sock.close()
+
+    def _terminate(self) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        deadline = time.monotonic() + settings.server_graceful_timeout_sec + settings.job_drain_timeout_sec + 5
+        while self.children and time.monotonic() < deadline:
+            time.sleep(0.2)
+            self._reap()
+        for pid in list(self.children):
+            logger.warning("[server.Supervisor] worker pid=%s did not stop in time, killing", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+        logger.info("[server.Supervisor] all workers stopped")
+
+
+def share_rate_limit(workers: int) -> None:
+    """При нескольких воркерах переводит лимитер запросов на общие корзины в БД."""
+
+    if workers <= 1:
+        return
+    mode = (os.getenv("VKMAX_RATE_LIMIT", "") or "memory").strip().lower()
+    if mode in ("db", "off"):
+        return
+    logger.warning(
+        "[server.share_rate_limit] %s workers: VKMAX_RATE_LIMIT=%s would give each worker its own limits, using db",
+        workers,
+        mode,
+    )
+    # Окружение наследуют воркеры (fork и spawn)
+    os.environ["VKMAX_RATE_LIMIT"] = "db"
+
+
+def serve(*, host: str, port: int, workers: int, preload: bool) -> None:
+    share_rate_limit(workers)
+    if workers <= 1:
+        from .fast_api import app
+
+        uvicorn.Server(build_config(app, host=host, port=port, workers=1)).run()
+        return
+    if preload and hasattr(os, "fork"):
+        from .fast_api import app
+
+        Supervisor(build_config(app, host=host, port=port, workers=workers), workers).run()
+        return
+    # Без fork (или без предзагрузки): uvicorn сам запускает воркеров, каждый импортирует приложение
+    config = build_config(APP_PATH, host=host, port=port, workers=workers)
+    server = uvicorn.Server(config)
+    sock = config.bind_socket()
+    Multiprocess(config, target=server.run, sockets=[sock]).run()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Продакшн-запуск VKMax API")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="0 — по числу ядер")
+    parser.add_argument("--no-preload", action="store_true", help="не импортировать приложение до fork")
+    args = parser.parse_args(argv)
+    setup_logging()
+    serve(host=args.host, port=args.port, workers=worker_count(args.workers), preload=settings.server_preload and not args.no_preload)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+
+
+__all__ = ["Supervisor", "build_config", "main", "resolve_http", "resolve_loop", "serve", "share_rate_limit", "worker_count"]
@@ -0,0 +1,114 @@
+# Руководство к файлу (FAST_API/uploads.py)
+# Назначение:
+# - Запись загружаемого файла (POST /upload) на диск без блокировки event loop:
+#   open/write/hash/close выполняются в потоке, чтение следующего куска из запроса идёт
+#   параллельно с записью предыдущего. В памяти не больше двух кусков по 1 МБ.
+# - Размер и sha256 считаются по ходу записи — повторно файл не читается; sha256 сохраняется
+#   в files.sha256 и используется диспетчером пакетов вместо пересчёта хэша.
+# - Ключ хранения (storage_key) выбирается до записи: строка files создаётся одним INSERT
+#   с окончательными path/file_size/sha256, без переименования и второго UPDATE.
+# Важно:
+# - Запись идёт во временный файл (cancellation.partial_path) и встаёт на место ключа
+#   целиком; недописанный файл после падения процесса удаляет lease_reaper (sweep_partials).
+# - Превышение лимита — HTTPException(413), временный файл удаляется.
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+
+from BACKEND.CONVERT.cancellation import partial_path
+
+
+_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+def storage_key(storage_dir: str, filename: str) -> str:
+    """Окончательный путь загрузки: уникальный префикс + имя файла без каталогов клиента."""
+
+    name = os.path.basename((filename or "").replace("\\", "/")) or "upload"
+    return str(Path(storage_dir, f"{uuid.uuid4().hex}__{name}").resolve())
+
+
+class _Sink:
+    """Файл и хэш загрузки; методы вызываются из потока, lock не даёт закрыть файл посреди write."""
+
+    def __init__(self, tmp_path: str) -> None:
+        self.tmp_path = tmp_path
+        self.digest = hashlib.sha256()
+        self._lock = threading.Lock()
+        self._out: Optional[BinaryIO] = None
+
+    def open(self) -> None:
+        self._out = open(self.tmp_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        with self._lock:
+            assert self._out is not None
+            self.digest.update(chunk)
+            self._out.write(chunk)
+
+    def commit(self, dst_path: str) -> None:
+        with self._lock:
+            assert self._out is not None
+            self._out.close()
+            os.replace(self.tmp_path, dst_path)
+
+    def discard(self) -> None:
+        with self._lock:
+            try:
+                if self._out is not None:
+                    self._out.close()
+            finally:
+                try:
+                    os.remove(self.tmp_path)
+                except OSError:
+                    pass
+
+
+async def save_upload(upload: UploadFile, dst_path: str, max_bytes: int, *, chunk_size: int = _CHUNK) -> StoredUpload:
+    """Пишет поток загрузки в *dst_path*; возвращает путь, размер и sha256 записанного."""
+
+    sink = _Sink(partial_path(dst_path))
+    pending: Optional[asyncio.Future] = None
+    size = 0
+    try:
+        await asyncio.to_thread(sink.open)
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(413, "File too large (limit 40MB)")
+            # Не больше одной записи в полёте: буфер ограничен, ошибка диска всплывает сразу
+            if pending is not None:
+                await pending
+            pending = asyncio.ensure_future(asyncio.to_thread(sink.write, chunk))
+        if pending is not None:
+            await pending
+        await asyncio.to_thread(sink.commit, dst_path)
+    except BaseException:
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        await asyncio.to_thread(sink.discard)
+        raise
+    return StoredUpload(path=dst_path, size=size, sha256=sink.digest.hexdigest())
+
+
+__all__ = ["StoredUpload", "save_upload", "storage_key"]
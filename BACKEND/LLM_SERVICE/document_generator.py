@@ -2,22 +2,35 @@
 # Назначение:
 # - Высокоуровневый оркестратор LLM-задач (DocumentGenerator) для VKMax.
 # - Координирует генерацию, чистку и валидацию с поддержкой повторных попыток.
+# - on_progress(event, data) — необязательный колбэк о ходе задачи (attempt/success/retry)
+#   для push-прогресса операций; ошибки колбэка игнорируются.
+# - Неудачные попытки считаются в vkmax_llm_retries_total{task, outcome} (METRICS):
+#   retried — будет следующая попытка, exhausted — попытки кончились.
+# - cache (LLM_SERVICE/response_cache.py) — необязательный кэш ответов: ключ строится по
+#   базовому промпту задачи (без истории ошибок), сохраняется сырой ответ удачной попытки;
+#   из кэша ответ снова проходит очистку и валидацию, непрошедший удаляется. Провайдер
+#   mock не кэшируется.
 
 from __future__ import annotations
 
 import logging
 from time import perf_counter
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from pydantic import BaseModel
 
+from BACKEND import METRICS
+
 from .llm_service import LlmService
 from .cleaner import CleanerService
+from .response_cache import LlmResponseCache, cache_key
 from .validator import ValidatorService
 
 
 logger = logging.getLogger(__name__)
 
+LLM_RETRIES = METRICS.counter("vkmax_llm_retries_total", "Failed LLM task attempts (generate/clean/validate)", ("task", "outcome"))
+
 
 class DocumentGenerator:
     """Высокоуровневый оркестратор создания документов/ответов LLM.
@@ -41,12 +54,16 @@ class DocumentGenerator:
         *,
         registry: Optional[Dict[str, Dict[str, Any]]] = None,
         max_attempts: int = 3,
+        on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        cache: Optional[LlmResponseCache] = None,
     ) -> None:
         self.llm = llm_service
         self.cleaner = cleaner_service
         self.validator = validator_service
         self.max_attempts = max_attempts
         self.registry: Dict[str, Dict[str, Any]] = registry or {}
+        self.on_progress = on_progress
+        self.cache = cache if getattr(llm_service, "provider", None) != "mock" else None
 
     # ------------------------------------------------------------------
     # Публичный API
@@ -95,10 +112,18 @@ class DocumentGenerator:
         except Exception:
             pass
 
+        key: Optional[str] = None
+        if self.cache is not None:
+            key = cache_key(getattr(self.llm, "model_name", None), getattr(self.llm, "temperature", None), base_prompt, task_id)
+            cached = await self._from_cache(key, task_id, doc_type)
+            if cached is not None:
+                return cached
+
         error_history: List[str] = []
 
         for attempt in range(1, self.max_attempts + 1):
             logger.info("[DocumentGenerator.worker_work] Попытка %s/%s для '%s'", attempt, self.max_attempts, task_id)
+            self._notify("attempt", task_id=task_id, attempt=attempt, max_attempts=self.max_attempts)
 
             # Сначала базовый промпт, затем (при наличии) контекст предыдущих ошибок.
             current_prompt = f"{base_prompt}{self._format_error_history(error_history)}"
@@ -142,6 +167,9 @@ class DocumentGenerator:
                     val_dt,
                     iter_dt,
                 )
+                self._notify("success", task_id=task_id, attempt=attempt, generate_s=round(gen_dt, 3))
+                if key is not None:
+                    await self.cache.put(key, raw_output, model=getattr(self.llm, "model_name", None), task_id=task_id)
                 return validated
             except Exception as exc:  # noqa: WPS430
                 logger.warning(
@@ -151,7 +179,9 @@ class DocumentGenerator:
                     exc,
                 )
                 error_history.append(str(exc))
+                self._notify("retry", task_id=task_id, attempt=attempt, error=str(exc)[:200])
 
+                LLM_RETRIES.labels(task_id, "exhausted" if attempt == self.max_attempts else "retried").inc()
                 if attempt == self.max_attempts:
                     logger.error("[DocumentGenerator.worker_work] Достигнут лимит попыток для '%s'", task_id)
                     raise
@@ -163,6 +193,34 @@ class DocumentGenerator:
     # Вспомогательные функции
     # ------------------------------------------------------------------
 
+    async def _from_cache(self, key: str, task_id: str, doc_type: str) -> Optional[Any]:
+        """Результат из кэша или None; ответ, не прошедший очистку/валидацию, удаляется."""
+
+        raw_output = await self.cache.get(key)
+        if raw_output is None:
+            return None
+        try:
+            cleaned_output = await self.cleaner.clean(raw_output, doc_type)
+            try:
+                validated: Any = await self.validator.validate(cleaned_output, doc_type, task_id)
+            except ValueError:
+                validated = cleaned_output
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[DocumentGenerator._from_cache] cached response for '%s' rejected: %s", task_id, exc)
+            await self.cache.delete(key)
+            return None
+        logger.info("[DocumentGenerator.worker_work] cache hit for '%s'", task_id)
+        self._notify("success", task_id=task_id, attempt=0, cached=True)
+        return validated
+
+    def _notify(self, event: str, **data: Any) -> None:
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(event, data)
+        except Exception:  # noqa: WPS430
+            logger.debug("[DocumentGenerator._notify] on_progress failed for event=%s", event)
+
     def _format_error_history(self, errors: List[str]) -> str:
         """Формирует секцию с предыдущими ошибками для few-shot feedback."""
 
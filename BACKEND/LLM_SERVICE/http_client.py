@@ -0,0 +1,108 @@
+# Руководство к файлу (LLM_SERVICE/http_client.py)
+# Назначение:
+# - Общий на процесс httpx.AsyncClient для запросов к LLM-провайдеру: keep-alive пул
+#   соединений и HTTP/2 (несколько запросов в одном TLS-соединении), без DNS/TCP/TLS на
+#   каждый вызов LlmService.
+# - Настройки из окружения:
+#   * VKMAX_LLM_HTTP2 — auto (по умолчанию: HTTP/2, если установлен пакет h2) | on | off;
+#   * VKMAX_LLM_MAX_CONNECTIONS (20), VKMAX_LLM_MAX_KEEPALIVE (10),
+#     VKMAX_LLM_KEEPALIVE_EXPIRY_SEC (30) — лимиты пула;
+#   * VKMAX_LLM_CONNECT_TIMEOUT_SEC (10), VKMAX_LLM_READ_TIMEOUT_SEC (60),
+#     VKMAX_LLM_WRITE_TIMEOUT_SEC (10), VKMAX_LLM_POOL_TIMEOUT_SEC (10) — таймауты по фазам.
+# - Жизненный цикл: startup() / aclose() вызывает lifespan FAST_API; без lifespan (тесты,
+#   скрипты) клиент создаётся при первом get_client().
+# Важно:
+# - Клиент привязан к event loop, в котором создан: из другого loop (другой asyncio.run,
+#   воркер после fork) get_client() создаёт новый, старый в чужом loop не закрывается.
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def http2_enabled() -> bool:
+    """auto → HTTP/2 при установленном h2; on без h2 — откат на HTTP/1.1 с предупреждением."""
+
+    mode = (os.getenv("VKMAX_LLM_HTTP2", "auto") or "auto").strip().lower()
+    if mode in ("0", "off", "false", "no"):
+        return False
+    available = importlib.util.find_spec("h2") is not None
+    if not available and mode in ("1", "on", "true", "yes"):
+        logger.warning("[http_client.http2_enabled] VKMAX_LLM_HTTP2=%s but h2 is not installed, using HTTP/1.1", mode)
+    return available
+
+
+def build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=_env_int("VKMAX_LLM_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=_env_int("VKMAX_LLM_MAX_KEEPALIVE", 10),
+        keepalive_expiry=_env_float("VKMAX_LLM_KEEPALIVE_EXPIRY_SEC", 30.0),
+    )
+    timeout = httpx.Timeout(
+        connect=_env_float("VKMAX_LLM_CONNECT_TIMEOUT_SEC", 10.0),
+        read=_env_float("VKMAX_LLM_READ_TIMEOUT_SEC", 60.0),
+        write=_env_float("VKMAX_LLM_WRITE_TIMEOUT_SEC", 10.0),
+        pool=_env_float("VKMAX_LLM_POOL_TIMEOUT_SEC", 10.0),
+    )
+    http2 = http2_enabled()
+    logger.info(
+        "[http_client.build_client] shared LLM client http2=%s max_connections=%s read_timeout=%s",
+        http2,
+        limits.max_connections,
+        timeout.read,
+    )
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Общий клиент текущего event loop (создаётся при первом обращении)."""
+
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = build_client()
+        _client_loop = loop
+    return _client
+
+
+async def startup() -> None:
+    get_client()
+
+
+async def aclose() -> None:
+    """Закрывает общий клиент (соединения пула), если он создан в текущем loop."""
+
+    global _client, _client_loop
+    client, loop = _client, _client_loop
+    _client, _client_loop = None, None
+    if client is not None and not client.is_closed and loop is asyncio.get_running_loop():
+        await client.aclose()
+
+
+__all__ = ["aclose", "build_client", "get_client", "http2_enabled", "startup"]
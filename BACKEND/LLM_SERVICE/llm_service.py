@@ -2,18 +2,33 @@
 # Назначение:
 # - Низкоуровневый клиент для общения с LLM-провайдером DeepSeek через OpenRouter.
 # - Предоставляет метод LlmService.generate(prompt) → str без пост-обработки.
+# - HTTP-запросы идут через общий клиент процесса (http_client.get_client): keep-alive,
+#   HTTP/2, лимиты пула и таймауты по фазам — там же.
+# - Метрики (METRICS): vkmax_llm_request_duration_seconds{provider, outcome} и
+#   vkmax_llm_tokens_total{model, kind} по полю usage ответа OpenRouter.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+from time import perf_counter
 from typing import Optional
 
-import httpx
+from BACKEND import METRICS
+from . import http_client
 
 
 logger = logging.getLogger(__name__)
 
+LLM_SECONDS = METRICS.histogram(
+    "vkmax_llm_request_duration_seconds",
+    "LLM completion latency by provider and outcome",
+    ("provider", "outcome"),
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_TOKENS = METRICS.counter("vkmax_llm_tokens_total", "LLM tokens reported by the provider", ("model", "kind"))
+
 
 class LlmService:
     """Простой исполнитель для общения с LLM (DeepSeek через OpenRouter / mock).
@@ -88,9 +103,25 @@ class LlmService:
     # Публичный метод
     # ------------------------------------------------------------------
 
-    async def generate(self, prompt: str) -> str:
-        """Асинхронно отправляет *prompt* в LLM и возвращает ответ без пост-обработки."""
+    async def generate(self, prompt: str, *, temperature: Optional[float] = None) -> str:
+        """Асинхронно отправляет *prompt* в LLM и возвращает ответ без пост-обработки.
+
+        *temperature* переопределяет температуру только для этого вызова.
+        """
 
+        started = perf_counter()
+        outcome = "error"
+        try:
+            text = await self._generate(prompt, self.temperature if temperature is None else float(temperature))
+            outcome = "ok"
+            return text
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_SECONDS.labels(self.provider, outcome).observe(perf_counter() - started)
+
+    async def _generate(self, prompt: str, temperature: float) -> str:
         if self.provider == "mock":
             # Простой режим для локальной отладки без внешнего API
             preview = (prompt[:80] + "…") if len(prompt) > 80 else prompt
@@ -98,7 +129,7 @@ class LlmService:
             return f"MOCK_LLM_OUTPUT: {preview}"
 
         if self.provider == "deepseek":
-            return await self._generate_deepseek(prompt)
+            return await self._generate_deepseek(prompt, temperature)
 
         raise RuntimeError(f"Unsupported LLM provider: {self.provider}")
 
@@ -106,7 +137,7 @@ class LlmService:
     # Внутренняя реализация DeepSeek через OpenRouter
     # ------------------------------------------------------------------
 
-    async def _generate_deepseek(self, prompt: str) -> str:
+    async def _generate_deepseek(self, prompt: str, temperature: float) -> str:
         assert self.api_key, "OpenRouter API key must be configured"
 
         url = f"{self.base_url.rstrip('/')}/chat/completions"
@@ -122,7 +153,7 @@ class LlmService:
             "messages": [
                 {"role": "user", "content": prompt},
             ],
-            "temperature": self.temperature,
+            "temperature": temperature,
         }
 
         try:
@@ -135,18 +166,22 @@ class LlmService:
         except Exception:
             pass
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                resp = await client.post(url, headers=headers, json=payload)
-            except Exception as exc:  # pragma: no cover – сетевые сбои
-                logger.error("OpenRouter HTTP error (DeepSeek model): %s", exc, exc_info=True)
-                raise
+        try:
+            resp = await http_client.get_client().post(url, headers=headers, json=payload)
+        except Exception as exc:  # pragma: no cover – сетевые сбои
+            logger.error("OpenRouter HTTP error (DeepSeek model): %s", exc, exc_info=True)
+            raise
 
         if resp.status_code != 200:
             logger.error("OpenRouter API error (DeepSeek model): status=%s body=%s", resp.status_code, resp.text)
             resp.raise_for_status()
 
         data = resp.json()
+        usage = data.get("usage") or {}
+        for kind in ("prompt", "completion"):
+            tokens = usage.get(f"{kind}_tokens")
+            if isinstance(tokens, int) and tokens > 0:
+                LLM_TOKENS.labels(self.model_name, kind).inc(tokens)
         try:
             choices = data["choices"]
             if not choices:
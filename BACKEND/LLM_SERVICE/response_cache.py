@@ -0,0 +1,260 @@
+# Руководство к файлу (LLM_SERVICE/response_cache.py)
+# Назначение:
+# - Кэш ответов LLM для DocumentGenerator: ключ — sha256 от (модель, температура, промпт,
+#   task_id); повторная генерация графа по тому же тексту (перегенерация, повторная
+#   загрузка файла, тесты) отдаётся из кэша без запроса к провайдеру и без трат токенов.
+# - Кэшируется только сырой ответ, прошедший очистку и валидацию; при чтении он снова
+#   проходит CleanerService/ValidatorService (схема могла измениться).
+# - Хранилище — VKMAX_LLM_CACHE: disk (по умолчанию, файлы в VKMAX_LLM_CACHE_DIR,
+#   по умолчанию <storage_dir>/llm_cache) | db (таблица llm_response_cache, общая для узлов) | off.
+# - VKMAX_LLM_CACHE_TTL_SEC (7 дней, 0 — без срока), VKMAX_LLM_CACHE_MAX_MB (256) — объём,
+#   сверх которого вытесняются давно не использованные записи (LRU).
+# - Метрики: vkmax_llm_cache_requests_total{backend, result=hit|miss|error},
+#   vkmax_llm_cache_evictions_total{backend}.
+# Важно:
+# - Ошибка кэша не прерывает генерацию: она пишется в лог, запрос идёт в LLM.
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from BACKEND import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = METRICS.counter("vkmax_llm_cache_requests_total", "LLM response cache lookups", ("backend", "result"))
+CACHE_EVICTIONS = METRICS.counter("vkmax_llm_cache_evictions_total", "LLM response cache entries removed (expired or LRU)", ("backend",))
+
+_DEFAULT_STORAGE = Path(__file__).resolve().parent.parent / "storage"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def cache_key(model_name: Optional[str], temperature: Optional[float], prompt: str, task_id: Optional[str]) -> str:
+    payload = json.dumps(
+        [model_name, None if temperature is None else float(temperature), prompt, task_id],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskBackend:
+    """Файл на запись (<dir>/<2 символа ключа>/<ключ>.json); mtime — время последнего использования."""
+
+    name = "disk"
+
+    def __init__(self, directory: str, *, max_bytes: int, ttl_sec: float) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self._approx_bytes: Optional[int] = None  # оценка объёма; точный пересчёт — при вытеснении
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                entry = json.loads(fh.read())
+        except FileNotFoundError:
+            return None
+        if self.ttl_sec > 0 and time.time() - float(entry.get("created_at", 0)) > self.ttl_sec:
+            self._remove(path)
+            CACHE_EVICTIONS.labels(self.name).inc()
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("response")
+
+    def _put(self, key: str, response: str, model: Optional[str], task_id: Optional[str]) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(
+            {"model": model, "task_id": task_id, "created_at": time.time(), "response": response},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        # Запись целиком через временный файл: параллельный читатель не увидит половину
+        tmp = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        if self._approx_bytes is None:
+            self._approx_bytes = self._scan_size()
+        else:
+            self._approx_bytes += len(data)
+        if self._approx_bytes > self.max_bytes:
+            return self._evict()
+        return 0
+
+    def _entries(self) -> list:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> int:
+        """Удаляет самые давно использованные файлы, пока объём не станет ≤ max_bytes."""
+
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+            total -= size
+        self._approx_bytes = total
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, response: str, *, model: Optional[str], task_id: Optional[str]) -> int:
+        return await asyncio.to_thread(self._put, key, response, model, task_id)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._remove, self._path(key))
+
+
+class DatabaseBackend:
+    """Записи в таблице llm_response_cache: один кэш на все воркеры с общей БД."""
+
+    name = "db"
+
+    def __init__(self, *, max_bytes: int, ttl_sec: float, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        # DATABASE импортируется только при выборе этого backend: LLM_SERVICE без БД работает как раньше
+        from BACKEND.DATABASE.CACHE_MANAGER import LlmCacheManager
+        from BACKEND.DATABASE.session import async_session_factory
+
+        self._manager = LlmCacheManager
+        self._session_factory = session_factory or async_session_factory
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+
+    async def get(self, key: str) -> Optional[str]:
+        async with self._session_factory() as session:
+            value = await self._manager(session).get(key, now=time.time(), ttl_sec=self.ttl_sec)
+            await session.commit()
+        return value
+
+    async def put(self, key: str, response: str, *, model: Optional[str], task_id: Optional[str]) -> int:
+        now = time.time()
+        async with self._session_factory() as session:
+            manager = self._manager(session)
+            await manager.put(key, response, model=model, task_id=task_id, now=now)
+            removed = await manager.evict(max_bytes=self.max_bytes, now=now, ttl_sec=self.ttl_sec)
+            await session.commit()
+        return removed
+
+    async def delete(self, key: str) -> None:
+        async with self._session_factory() as session:
+            await self._manager(session).delete(key)
+            await session.commit()
+
+
+class LlmResponseCache:
+    """Кэш поверх backend (DiskBackend / DatabaseBackend) с метриками и без падений на ошибках хранилища."""
+
+    def __init__(self, backend: Any) -> None:
+        self.backend = backend
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[response_cache.get] %s backend error, cache skipped: %s", self.backend.name, exc)
+            CACHE_REQUESTS.labels(self.backend.name, "error").inc()
+            return None
+        CACHE_REQUESTS.labels(self.backend.name, "hit" if value is not None else "miss").inc()
+        return value
+
+    async def put(self, key: str, response: str, *, model: Optional[str] = None, task_id: Optional[str] = None) -> None:
+        try:
+            removed = await self.backend.put(key, response, model=model, task_id=task_id)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[response_cache.put] %s backend error, response not cached: %s", self.backend.name, exc)
+            return
+        if removed:
+            CACHE_EVICTIONS.labels(self.backend.name).inc(removed)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.backend.delete(key)
+        except Exception as exc:  # noqa: WPS430
+            logger.warning("[response_cache.delete] %s backend error: %s", self.backend.name, exc)
+
+
+def _cache_mode() -> str:
+    mode = (os.getenv("VKMAX_LLM_CACHE", "") or "disk").strip().lower()
+    return mode if mode in ("disk", "db", "off") else "disk"
+
+
+_default: Optional[LlmResponseCache] = None
+_default_mode: Optional[str] = None
+
+
+def default_cache() -> Optional[LlmResponseCache]:
+    """Кэш процесса по VKMAX_LLM_CACHE; None — кэш выключен."""
+
+    global _default, _default_mode
+    mode = _cache_mode()
+    if mode == "off":
+        return None
+    if _default is None or mode != _default_mode:
+        max_bytes = int(_env_float("VKMAX_LLM_CACHE_MAX_MB", 256) * 1024 * 1024)
+        ttl_sec = _env_float("VKMAX_LLM_CACHE_TTL_SEC", 7 * 24 * 3600)
+        if mode == "db":
+            backend: Any = DatabaseBackend(max_bytes=max_bytes, ttl_sec=ttl_sec)
+        else:
+            storage = os.getenv("VKMAX_STORAGE_DIR") or str(_DEFAULT_STORAGE)
+            directory = os.getenv("VKMAX_LLM_CACHE_DIR") or os.path.join(storage, "llm_cache")
+            backend = DiskBackend(directory, max_bytes=max_bytes, ttl_sec=ttl_sec)
+        _default, _default_mode = LlmResponseCache(backend), mode
+    return _default
+
+
+__all__ = ["DatabaseBackend", "DiskBackend", "LlmResponseCache", "cache_key", "default_cache"]
@@ -100,14 +100,11 @@ class LLMRouter:
             parts.append(f"{role}: {content}")
 
         prompt = "\n\n".join(parts)
+        logger.debug("[LLMRouter.send] provider=%s len(prompt)=%s", self.provider, len(prompt))
         if temperature is not None:
-            # Локальная настройка температуры не меняет глобальное состояние –
-            # просто создаём временный экземпляр клиента.
-            client = LlmService(model_name=self.llm.model_name, temperature=temperature)
+            # Температура только для этого вызова: общий экземпляр и его HTTP-клиент не меняются
+            text = await self.llm.generate(prompt, temperature=temperature)
         else:
-            client = self.llm
-
-        logger.debug("[LLMRouter.send] provider=%s len(prompt)=%s", self.provider, len(prompt))
-        text = await client.generate(prompt)
+            text = await self.llm.generate(prompt)
         return ProviderResponse(text=text, blocked=False, block_reason=None, tool_calls=None)
 
@@ -0,0 +1,35 @@
+# Руководство к файлу (METRICS/__init__.py)
+# Назначение:
+# - Объявляет пакет VKMax.BACKEND.METRICS — реестр метрик для GET /metrics.
+# - Пакет не зависит от остального бэкенда: его импортируют DATABASE, CONVERT,
+#   LLM_SERVICE и FAST_API, не нарушая слоёв.
+
+from __future__ import annotations
+
+from .registry import (
+    DEFAULT_BUCKETS,
+    SLOW_BUCKETS,
+    CallbackMetric,
+    Metric,
+    Registry,
+    callback,
+    counter,
+    gauge,
+    histogram,
+    registry,
+    render,
+)
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "SLOW_BUCKETS",
+    "CallbackMetric",
+    "Metric",
+    "Registry",
+    "callback",
+    "counter",
+    "gauge",
+    "histogram",
+    "registry",
+    "render",
+]
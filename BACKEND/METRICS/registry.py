@@ -0,0 +1,224 @@
+# Руководство к файлу (METRICS/registry.py)
+# Назначение:
+# - Минимальный реестр метрик в формате Prometheus (text exposition 0.0.4) без внешних
+#   зависимостей: Counter, Gauge, Histogram с метками и CallbackMetric — значения,
+#   которые уже считает подсистема (очереди диспетчера, счётчики вебхуков), снимаются
+#   при скрейпе, а не дублируются на горячем пути.
+# - render() собирает текст для GET /metrics.
+# Важно:
+# - Горячий путь без блокировок: labels(...) один раз создаёт дочерний объект (его стоит
+#   держать в переменной), дальше inc()/observe() — арифметика над полями со __slots__.
+#   Метрики пишутся из потока event loop; редкая запись из другого потока может потерять
+#   инкремент — для метрик это допустимо, блокировка на каждый запрос — нет.
+# - Повторная регистрация имени с тем же типом и метками возвращает существующую метрику.
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Границы по умолчанию (секунды): от 5 мс до 10 с
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Длинные задачи (конвертации, обход сайтов, LLM): от 100 мс до 30 мин
+SLOW_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя корзина — +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        # bisect_left: значение, равное границе, попадает в её корзину (le)
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+Child = Union[CounterChild, GaugeChild, HistogramChild]
+
+
+class Metric:
+    """Метрика с фиксированным набором имён меток; значения — в дочерних объектах."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind  # counter | gauge | histogram
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS)) if kind == "histogram" else ()
+        self._children: Dict[LabelValues, Child] = {}
+
+    def _new_child(self) -> Child:
+        if self.kind == "counter":
+            return CounterChild()
+        if self.kind == "gauge":
+            return GaugeChild()
+        return HistogramChild(self.buckets)
+
+    def labels(self, *values: object) -> Child:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    # Метрика без меток ведёт себя как её единственный дочерний объект
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)  # type: ignore[union-attr]
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)  # type: ignore[union-attr]
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)  # type: ignore[union-attr]
+
+    def clear(self) -> None:
+        self._children.clear()
+
+    def samples(self) -> Iterable[Tuple[LabelValues, Child]]:
+        return list(self._children.items())
+
+    def render(self, out: List[str]) -> None:
+        for key, child in sorted(self.samples()):
+            if isinstance(child, HistogramChild):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (math.inf,), child.counts):
+                    cumulative += n
+                    le = 'le="' + _format_value(bound) + '"'
+                    out.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+                labels = _label_str(self.labelnames, key)
+                out.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+                out.append(f"{self.name}_count{labels} {cumulative}")
+            else:
+                out.append(f"{self.name}{_label_str(self.labelnames, key)} {_format_value(child.value)}")
+
+
+class CallbackMetric(Metric):
+    """Counter/Gauge, значения которого при скрейпе возвращает функция: {метки: значение}."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str], read: Callable[[], Dict[LabelValues, float]]) -> None:
+        super().__init__(name, documentation, kind, labelnames)
+        self._read = read
+
+    def samples(self) -> Iterable[Tuple[LabelValues, Child]]:
+        out = []
+        for key, value in self._read().items():
+            child = GaugeChild()
+            child.value = float(value)
+            out.append((tuple(str(v) for v in key), child))
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if (existing.kind, existing.labelnames) != (metric.kind, metric.labelnames):
+                raise ValueError(f"metric {metric.name} already registered with another type or labels")
+            if isinstance(metric, CallbackMetric):
+                self._metrics[metric.name] = metric  # новый источник (например, после перезапуска подсистемы)
+                return metric
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        out: List[str] = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            out.append(f"# HELP {name} {metric.documentation}")
+            out.append(f"# TYPE {name} {metric.kind}")
+            try:
+                metric.render(out)
+            except Exception as exc:  # noqa: WPS430
+                # Сломанный источник не должен ронять весь скрейп
+                out.append(f"# {name} collection failed: {type(exc).__name__}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+    return registry.register(Metric(name, documentation, "counter", labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+    return registry.register(Metric(name, documentation, "gauge", labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> Metric:
+    return registry.register(Metric(name, documentation, "histogram", labelnames, buckets))
+
+
+def callback(name: str, documentation: str, kind: str, labelnames: Sequence[str], read: Callable[[], Dict[LabelValues, float]]) -> Metric:
+    return registry.register(CallbackMetric(name, documentation, kind, labelnames, read))
+
+
+def render() -> str:
+    return registry.render()
@@ -4,20 +4,31 @@
 - Умеет находить уже сгенерированный граф по исходному file_id и запускать
   генерацию нового графа через BACKEND.CONVERT.graph_service.
 - Не зависит от FastAPI, принимает AsyncSession и параметры как аргументы.
+- load_graph_payload возвращает сырые байты файла графа без разбора: роут отдаёт их
+  как есть (граф уже лежит в JSON); get_graph_for_file — разобранный dict.
+- locate_graph находит файл графа и его версию (id, mtime) без чтения: по ней роут
+  отвечает 304 на условный GET и берёт тело из кэша ответов.
+- generate_graph_payload выполняет генерацию через job_dispatcher (как /convert): слот
+  interactive, heartbeat аренды, дедлайн, повтор временных сбоев, отмена через /cancel.
+  Прерванная задача (cancelled / timed_out / lease_lost) — GraphGenerationAborted.
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
+import os
+from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
+import orjson
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
 from BACKEND.DATABASE.models import File as FileModel, Format, Operation
-from BACKEND.CONVERT import generate_graph_for_operation
+from BACKEND.CONVERT import JobSpec, generate_graph_for_operation, job_dispatcher
 
 
 logger = logging.getLogger("vkmax.services.graph")
@@ -31,15 +42,47 @@ async def _get_graph_format_id(session: AsyncSession) -> Optional[int]:
     return int(getattr(fmt, "id")) if fmt is not None else None
 
 
-async def get_graph_for_file(session: AsyncSession, *, source_file_id: int) -> Optional[Dict[str, Any]]:
-    """Вернуть последний сгенерированный JSON-граф для исходного файла.
+class GraphGenerationAborted(RuntimeError):
+    """Диспетчер прервал генерацию графа: reason — cancelled | timed_out | lease_lost."""
+
+    def __init__(self, operation_id: int, reason: str) -> None:
+        super().__init__(f"Graph generation {reason} (operation_id={operation_id})")
+        self.operation_id = operation_id
+        self.reason = reason
+
+
+@dataclass(frozen=True)
+class GraphRef:
+    """Файл последнего графа исходного файла и его версия (без содержимого)."""
+
+    result_file_id: int
+    path: str
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class GraphPayload:
+    """Граф в том виде, как он лежит на диске: JSON-байты и версия файла."""
+
+    result_file_id: int
+    body: bytes
+    mtime_ns: int
+
+
+def _read_graph(path: str) -> tuple[bytes, int]:
+    with open(path, "rb") as f:
+        return f.read(), os.fstat(f.fileno()).st_mtime_ns
+
+
+async def locate_graph(session: AsyncSession, *, source_file_id: int) -> Optional[GraphRef]:
+    """Найти последний сгенерированный JSON-граф исходного файла, не читая его.
 
     Логика:
     - находим последнюю Operation со статусом completed, у которой:
       - Operation.file_id == source_file_id;
       - Operation.new_format_id указывает на формат типа "graph";
       - Operation.result_file_id не NULL;
-    - читаем связанный File и возвращаем graph JSON из его path (если это JSON).
+    - берём path связанного File и mtime файла (stat).
     """
 
     # Ищем операции + файл результата + формат
@@ -52,7 +95,7 @@ async def get_graph_for_file(session: AsyncSession, *, source_file_id: int) -> O
             Operation.status == "completed",
             Format.type == "graph",
         )
-        .order_by(Operation.datetime.desc())
+        .order_by(Operation.datetime.desc(), Operation.id.desc())
     )
 
     res = await session.execute(q)
@@ -64,52 +107,89 @@ async def get_graph_for_file(session: AsyncSession, *, source_file_id: int) -> O
     path = getattr(file_obj, "path", None)
     if not path:
         logger.error(
-            "[graph_service.get_graph_for_file] result_file_id=%s has no path",
+            "[graph_service.locate_graph] result_file_id=%s has no path",
             getattr(file_obj, "id", None),
         )
         return None
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as exc:  # noqa: WPS430
-        logger.exception(
-            "[graph_service.get_graph_for_file] Failed to read JSON from %s: %s",
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError as exc:
+        logger.error(
+            "[graph_service.locate_graph] op_id=%s result file %s is unavailable: %s",
+            getattr(op, "id", None),
             path,
             exc,
         )
         return None
+    return GraphRef(result_file_id=int(getattr(file_obj, "id")), path=path, mtime_ns=mtime_ns)
 
-    logger.info(
-        "[graph_service.get_graph_for_file] Loaded graph for file_id=%s from op_id=%s result_file_id=%s",
-        source_file_id,
-        getattr(op, "id", None),
-        getattr(file_obj, "id", None),
+
+async def read_graph(ref: GraphRef) -> Optional[GraphPayload]:
+    """Прочитать байты файла графа (в потоке, без разбора JSON)."""
+
+    try:
+        body, mtime_ns = await asyncio.to_thread(_read_graph, ref.path)
+    except OSError as exc:
+        logger.exception(
+            "[graph_service.read_graph] Failed to read JSON from %s: %s",
+            ref.path,
+            exc,
+        )
+        return None
+
+    logger.debug(
+        "[graph_service.read_graph] Loaded graph result_file_id=%s (%s bytes)",
+        ref.result_file_id,
+        len(body),
     )
+    return GraphPayload(result_file_id=ref.result_file_id, body=body, mtime_ns=mtime_ns)
 
-    # Ожидаем, что data уже имеет структуру GraphJson (nodes/edges/meta).
-    return data
 
+async def load_graph_payload(session: AsyncSession, *, source_file_id: int) -> Optional[GraphPayload]:
+    """Вернуть последний сгенерированный JSON-граф исходного файла как сырые байты."""
 
-async def generate_graph_for_file(
+    ref = await locate_graph(session, source_file_id=source_file_id)
+    return await read_graph(ref) if ref is not None else None
+
+
+async def get_graph_for_file(session: AsyncSession, *, source_file_id: int) -> Optional[Dict[str, Any]]:
+    """Вернуть последний сгенерированный JSON-граф для исходного файла (разобранный)."""
+
+    payload = await load_graph_payload(session, source_file_id=source_file_id)
+    if payload is None:
+        return None
+    try:
+        # Ожидаем, что data уже имеет структуру GraphJson (nodes/edges/meta).
+        return orjson.loads(payload.body)
+    except orjson.JSONDecodeError as exc:
+        logger.error(
+            "[graph_service.get_graph_for_file] result_file_id=%s is not JSON: %s",
+            payload.result_file_id,
+            exc,
+        )
+        return None
+
+
+async def generate_graph_payload(
     session: AsyncSession,
     *,
     source_file_id: int,
     user_id: Optional[int],
     storage_dir: str,
-) -> Dict[str, Any]:
+) -> GraphPayload:
     """Создать операцию и сгенерировать JSON-граф для исходного файла.
 
     Шаги:
     1. Находим формат graph в таблице formats.
     2. Через ConvertManager.create_file_operation создаём Operation
        c new_format_id=graph_format_id.
-    3. Вызываем generate_graph_for_operation из BACKEND.CONVERT, который:
+    3. Через job_dispatcher.execute вызываем generate_graph_for_operation из BACKEND.CONVERT, который:
        - извлекает текст;
        - вызывает LLM;
        - сохраняет graph JSON как новый File с format.type="graph";
        - помечает Operation.status и result_file_id.
-    4. Через get_graph_for_file возвращаем итоговый graph JSON.
+    4. Через load_graph_payload возвращаем байты итогового graph JSON.
     """
 
     graph_format_id = await _get_graph_format_id(session)
@@ -130,14 +210,32 @@ async def generate_graph_for_file(
         op_id,
     )
 
-    await generate_graph_for_operation(
-        session,
+    # Операция видна как queued (и её можно отменить), пока ждёт слот
+    await session.commit()
+    spec = JobSpec(
         operation_id=op_id,
-        storage_dir=storage_dir,
+        kind="graph",
+        user_id=user_id,
+        source_file_id=source_file_id,
+        target_format_id=graph_format_id,
+        priority="interactive",
+    )
+    outcome = await job_dispatcher.execute(
+        session,
+        spec,
+        lambda: generate_graph_for_operation(session, operation_id=op_id, storage_dir=storage_dir),
     )
+    if outcome is not None:
+        logger.warning(
+            "[graph_service.generate_graph_for_file] Generation for file_id=%s operation_id=%s stopped: %s",
+            source_file_id,
+            op_id,
+            outcome,
+        )
+        raise GraphGenerationAborted(op_id, outcome)
 
-    graph = await get_graph_for_file(session, source_file_id=source_file_id)
-    if graph is None:
+    payload = await load_graph_payload(session, source_file_id=source_file_id)
+    if payload is None:
         raise RuntimeError("Graph generation failed: result JSON not found")
 
     logger.info(
@@ -146,4 +244,22 @@ async def generate_graph_for_file(
         op_id,
     )
 
-    return graph
+    return payload
+
+
+async def generate_graph_for_file(
+    session: AsyncSession,
+    *,
+    source_file_id: int,
+    user_id: Optional[int],
+    storage_dir: str,
+) -> Dict[str, Any]:
+    """То же, что generate_graph_payload, но возвращает разобранный graph JSON."""
+
+    payload = await generate_graph_payload(
+        session,
+        source_file_id=source_file_id,
+        user_id=user_id,
+        storage_dir=storage_dir,
+    )
+    return orjson.loads(payload.body)
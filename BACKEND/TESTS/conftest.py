@@ -6,6 +6,7 @@
 from __future__ import annotations
 
 import asyncio
+import os
 from pathlib import Path
 
 import pytest
@@ -25,8 +26,11 @@ if load_dotenv is not None:
     if env_path.exists():
         load_dotenv(env_path)  # type: ignore[arg-type]
 
+# Лимитер запросов общий для всего прогона (клиент один) — включают только его тесты
+os.environ.setdefault("VKMAX_RATE_LIMIT", "off")
+
 from BACKEND.FAST_API.fast_api import app
-from BACKEND.DATABASE.alembic import create_tables, seed_formats
+from BACKEND.DATABASE.alembic import create_tables, seed_formats, upgrade_schema
 
 
 @pytest.fixture(scope="session")
@@ -45,6 +49,7 @@ async def init_db():
     """Инициализирует тестовую БД: создаёт таблицы и базовые форматы."""
 
     await create_tables()
+    await upgrade_schema()
     await seed_formats()
 
 
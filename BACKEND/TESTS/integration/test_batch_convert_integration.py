@@ -0,0 +1,163 @@
+# Руководство к файлу (TESTS/integration/test_batch_convert_integration.py)
+# Назначение:
+# - Интеграционные тесты пакетной конвертации: POST /batch-convert с persisted batch_id,
+#   фоновое выполнение через CONVERT.job_dispatcher, дедуп одинаковых исходников,
+#   лимит параллелизма пакета и агрегаты GET /batches/{id} и /batches/{id}/wait.
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import uuid
+
+import pytest
+
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+# Атрибут пакета BACKEND.CONVERT.job_dispatcher — экземпляр диспетчера, модуль берём явно
+dispatcher_module = importlib.import_module("BACKEND.CONVERT.job_dispatcher")
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"batch-user-{uuid.uuid4()}", "name": "Batch User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+async def _upload_pdf(http_client, user_id: str, name: str, body: bytes) -> str:
+    files = {"file": (name, body, "application/pdf")}
+    resp = await http_client.post("/upload", files=files, data={"user_id": user_id, "original_format": "pdf"})
+    assert resp.status_code == 200
+    return resp.json()["file_id"]
+
+
+@pytest.mark.asyncio
+async def test_batch_convert_runs_items_and_dedups_identical_sources(http_client):
+    user_id = await _create_user(http_client)
+    same = b"%PDF-1.4\n%VKMAX BATCH SAME\n%%EOF\n"
+    src_a = await _upload_pdf(http_client, user_id, "batch-a.pdf", same)
+    src_b = await _upload_pdf(http_client, user_id, "batch-b.pdf", same)  # тот же контент под другим file_id
+    src_c = await _upload_pdf(http_client, user_id, "batch-c.pdf", b"%PDF-1.4\n%VKMAX BATCH OTHER\n%%EOF\n")
+
+    payload = {
+        "user_id": user_id,
+        "max_parallel": 2,
+        "operations": [
+            {"source_file_id": src_a, "target_format": "pdf"},
+            {"source_file_id": src_b, "target_format": "pdf"},
+            {"source_file_id": src_c, "target_format": "pdf"},
+        ],
+    }
+    resp = await http_client.post("/batch-convert", json=payload)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["batch_id"] is not None
+    assert [op["status"] for op in data["operations"]] == ["queued"] * 3
+    batch_id = data["batch_id"]
+
+    resp_wait = await http_client.get(f"/batches/{batch_id}/wait", params={"timeout": 30})
+    assert resp_wait.status_code == 200
+    waited = resp_wait.json()
+    assert waited["done"] == waited["total"] == 3
+
+    await job_dispatcher.drain()
+    resp_batch = await http_client.get(f"/batches/{batch_id}")
+    assert resp_batch.status_code == 200
+    batch = resp_batch.json()
+    assert batch["status"] == "completed"
+    assert batch["counts"] == {"completed": 3}
+    assert batch["progress"] == 100
+    assert batch["finished_at"] is not None
+    assert batch["max_parallel"] == 2
+
+    ops = {op["operation_id"]: op for op in batch["operations"]}
+    first, second, third = (ops[op["operation_id"]] for op in data["operations"])
+    # Одинаковые исходники конвертируются один раз: дубликат получает тот же результат
+    assert first["result_file_id"] is not None
+    assert second["result_file_id"] == first["result_file_id"]
+    assert third["result_file_id"] not in (None, first["result_file_id"])
+
+    resp_op = await http_client.get(f"/operations/{first['operation_id']}")
+    assert resp_op.status_code == 200
+    assert resp_op.json()["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_batch_convert_respects_max_parallel(http_client, monkeypatch):
+    state = {"running": 0, "peak": 0, "calls": []}
+
+    async def fake_enqueue_website_job(session, *, operation_id: int, url=None) -> None:
+        cm = ConvertManager(session)
+        await cm.update_status(operation_id, status="processing")
+        await session.commit()
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        state["calls"].append(url)
+        await asyncio.sleep(0.05)
+        state["running"] -= 1
+        if url and "broken" in url:
+            await cm.update_status(operation_id, status="failed", error_message="crawl failed")
+        else:
+            await cm.update_status(operation_id, status="completed")
+
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", fake_enqueue_website_job)
+
+    user_id = await _create_user(http_client)
+    urls = [f"https://site{i}.example.com/" for i in range(5)] + ["https://site0.example.com/", "https://broken.example.com/"]
+    payload = {
+        "user_id": user_id,
+        "max_parallel": 2,
+        "operations": [{"url": u, "target_format": "site_bundle"} for u in urls],
+    }
+    resp = await http_client.post("/batch-convert", json=payload)
+    assert resp.status_code == 200
+    batch_id = resp.json()["batch_id"]
+
+    await job_dispatcher.drain()
+
+    assert state["peak"] == 2
+    # Повторный url в пакете обходится один раз
+    assert sorted(state["calls"]) == sorted(set(urls))
+
+    resp_batch = await http_client.get(f"/batches/{batch_id}")
+    assert resp_batch.status_code == 200
+    batch = resp_batch.json()
+    assert batch["status"] == "partial"
+    assert batch["counts"] == {"completed": 6, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_batch_convert_validation_and_missing_batch(http_client):
+    user_id = await _create_user(http_client)
+
+    resp = await http_client.post("/batch-convert", json={"user_id": user_id, "operations": []})
+    assert resp.status_code == 400
+
+    resp = await http_client.post(
+        "/batch-convert",
+        json={"user_id": user_id, "operations": [{"url": "https://example.com/", "target_format": "xlsx"}]},
+    )
+    assert resp.status_code == 422
+
+    assert (await http_client.get("/batches/999999999")).status_code == 404
+    assert (await http_client.get("/batches/abc")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_profiles_follow_converter_registry(http_client):
+    from BACKEND.CONVERT import JobSpec
+    from BACKEND.DATABASE.session import async_session_factory
+
+    user_id = await _create_user(http_client)
+    src = int(await _upload_pdf(http_client, user_id, "profile.pdf", b"%PDF-1.4\n%VKMAX PROFILE\n%%EOF\n"))
+
+    async with async_session_factory() as session:
+        copy = await job_dispatcher.profile(session, JobSpec(operation_id=0, kind="file", source_file_id=src, target_format_id=1))
+        heavy = await job_dispatcher.profile(session, JobSpec(operation_id=0, kind="file", source_file_id=src, target_format_id=2))
+        site = await job_dispatcher.profile(session, JobSpec(operation_id=0, kind="website", url="https://example.com/"))
+
+    # pdf→pdf — копирование, pdf→docx — pdf2docx в CPU-пуле, обход сайта — сетевой пул
+    assert copy.pool == "trivial"
+    assert heavy.pool == "cpu" and heavy.cost > copy.cost
+    assert site.pool == "network"
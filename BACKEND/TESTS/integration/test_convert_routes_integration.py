@@ -173,7 +173,7 @@ async def test_convert_website_to_site_bundle_integration(http_client, monkeypat
     """
 
     # Заглушаем низкоуровневый обход, чтобы не ходить в сеть в тестах
-    async def fake_crawl_site_bundle(url: str) -> bytes:  # type: ignore[override]
+    async def fake_crawl_site_bundle(url: str, on_progress=None) -> bytes:  # type: ignore[override]
         data = {
             "site_url": url,
             "crawled_at": "2025-01-01T00:00:00Z",
@@ -0,0 +1,73 @@
+# Руководство к файлу (TESTS/integration/test_eta_estimator_integration.py)
+# Назначение:
+# - Интеграционные тесты CONVERT/eta_estimator.py: обучение по завершённым операциям
+#   из operation_events, позиция в очереди и ETA с учётом операций впереди,
+#   заполнение estimated_time/queue_position в ответе /convert/website.
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from BACKEND.CONVERT.eta_estimator import EtaEstimator, bucket_key
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.models import OperationEvent
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+
+async def _create_user(http_client) -> int:
+    resp = await http_client.post(
+        "/users",
+        json={"max_id": f"eta-user-{uuid.uuid4()}", "name": "ETA User", "metadata": {}},
+    )
+    assert resp.status_code == 200
+    return int(resp.json()["id"])
+
+
+@pytest.mark.asyncio
+async def test_estimator_learns_durations_and_counts_queue(http_client):
+    user_id = await _create_user(http_client)
+
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        done_ids = []
+        for _ in range(3):
+            op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+            await cm.update_status(int(op.id), status="processing")
+            await cm.update_status(int(op.id), status="completed")
+            done_ids.append(int(op.id))
+        for op_id, duration_ms in zip(done_ids, (2000.0, 4000.0, 6000.0)):
+            await session.execute(
+                update(OperationEvent)
+                .where(OperationEvent.operation_id == op_id, OperationEvent.name == "completed")
+                .values(duration_ms=duration_ms)
+            )
+        first = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+        second = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+        await session.commit()
+
+        est = EtaEstimator()
+        assert await est.refresh(session, force=True) >= 3
+        assert est.run_quantiles(bucket_key("url", None, None, None))[0] == pytest.approx(4.0)
+
+        etas = await est.estimate_many(session, [int(first.id), int(second.id)])
+
+    a, b = etas[int(first.id)], etas[int(second.id)]
+    assert a.run_p50 == pytest.approx(4.0)
+    assert b.queue_position == a.queue_position + 1
+    assert b.estimated_time == pytest.approx(a.estimated_time + 4.0, abs=0.2)
+
+
+@pytest.mark.asyncio
+async def test_convert_website_returns_estimate(http_client):
+    user_id = await _create_user(http_client)
+    resp = await http_client.post(
+        "/convert/website",
+        json={"url": "https://example.com", "target_format": "html", "user_id": str(user_id)},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["estimated_time"] is not None and data["estimated_time"] > 0
+    assert isinstance(data["queue_position"], int)
@@ -5,10 +5,14 @@
 
 from __future__ import annotations
 
+import hashlib
 from io import BytesIO
 
 import pytest
 
+from BACKEND.DATABASE.models import File
+from BACKEND.DATABASE.session import async_session_factory
+
 
 @pytest.mark.asyncio
 async def test_files_upload_list_get_delete(http_client):
@@ -34,6 +38,14 @@ async def test_files_upload_list_get_delete(http_client):
     meta = resp_get.json()
     assert meta["file_id"] == file_id
     assert meta["path"]
+    # Путь выбран до записи и не менялся после INSERT; sha256 посчитан по ходу загрузки
+    assert meta["path"].endswith("__test.txt")
+    with open(meta["path"], "rb") as fh:
+        assert fh.read() == file_content
+    async with async_session_factory() as session:
+        row = await session.get(File, int(file_id))
+        assert row.sha256 == hashlib.sha256(file_content).hexdigest()
+        assert row.file_size == len(file_content)
 
     # Список файлов должен содержать наш файл
     resp_list = await http_client.get("/files")
@@ -1,7 +1,9 @@
 # Руководство к файлу (TESTS/integration/test_format_routes_integration.py)
 # Назначение:
 # - Интеграционные тесты для роутера форматов `/formats` и `/supported-conversions`.
-# - Проверяют наличие базовых форматов и матрицу конвертаций html->graph.
+# - Проверяют наличие базовых форматов и матрицу конвертаций html->graph,
+#   кэш справочника с ETag/Last-Modified и ответ 304 (FAST_API/http_cache.py);
+#   сброс кэша форматов только после commit изменившей их сессии.
 
 from __future__ import annotations
 
@@ -44,3 +46,63 @@ async def test_formats_and_output_html_to_graph(http_client):
     assert resp_matrix.status_code == 200
     matrix = resp_matrix.json()
     assert set(matrix.keys()) >= {"pdf", "docx", "website", "html"}
+
+
+@pytest.mark.asyncio
+async def test_formats_are_cached_with_validators(http_client, monkeypatch):
+    """Справочник отдаётся из кэша процесса с ETag/Cache-Control, условный GET получает 304."""
+
+    from BACKEND.FAST_API.config import settings
+    from BACKEND.FAST_API.http_cache import response_cache
+
+    monkeypatch.setattr(settings, "debug", True)  # X-DB-Query-Count в ответах
+    response_cache.invalidate("formats")
+    first = await http_client.get("/formats")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert "last-modified" in first.headers
+
+    assert int(first.headers["X-DB-Query-Count"]) >= 1
+
+    again = await http_client.get("/formats")
+    assert again.json() == first.json()
+    assert again.headers["etag"] == etag
+    assert again.headers["X-DB-Query-Count"] == "0"
+
+    not_modified = await http_client.get("/formats", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    since = await http_client.get("/formats", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+    # Сброс (изменились форматы) — запись строится заново из БД, тело и ETag те же
+    response_cache.invalidate("formats")
+    rebuilt = await http_client.get("/formats", headers={"If-None-Match": etag})
+    assert rebuilt.status_code == 304
+    assert int(rebuilt.headers["X-DB-Query-Count"]) >= 1
+
+    missing = await http_client.get("/formats/output", params={"input_format": "xyz"})
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_formats_cache_is_invalidated_after_commit(http_client):
+    from BACKEND.DATABASE.session import async_session_factory
+    from BACKEND.FAST_API.http_cache import invalidate_on_commit, response_cache
+
+    assert (await http_client.get("/formats")).status_code == 200
+    assert response_cache.get("formats", "all") is not None
+
+    async with async_session_factory() as session:
+        invalidate_on_commit(session, "formats")
+        # До commit параллельный GET видел бы старые форматы — запись остаётся
+        assert response_cache.get("formats", "all") is not None
+        await session.rollback()
+        assert response_cache.get("formats", "all") is not None
+
+        invalidate_on_commit(session, "formats")
+        await session.commit()
+    assert response_cache.get("formats", "all") is None
@@ -0,0 +1,187 @@
+# Руководство к файлу (TESTS/integration/test_graph_routes_integration.py)
+# Назначение:
+# - Интеграционные тесты GET /graph/{file_id}: граф отдаётся байтами файла без
+#   повторной сериализации и сжимается gzip по Accept-Encoding; битый файл — "graph": null;
+#   ETag по версии файла результата, 304 на условный GET, новый ETag у нового графа.
+# - POST /graph/{file_id} выполняется через job_dispatcher (аренда под heartbeat),
+#   дедлайн задачи — 504.
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, FilesManager
+from BACKEND.DATABASE.models import Format
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.FAST_API.http_cache import response_cache
+from BACKEND.SEVICES import graph_service
+
+
+async def _source_file(http_client) -> int:
+    resp_user = await http_client.post("/users", json={"max_id": f"graph-route-{uuid.uuid4()}", "name": "Graph Route"})
+    assert resp_user.status_code == 200
+    files = {"file": ("graph-route.pdf", b"%PDF-1.4\n%%EOF\n", "application/pdf")}
+    resp = await http_client.post("/upload", files=files, data={"user_id": resp_user.json()["id"], "original_format": "pdf"})
+    assert resp.status_code == 200
+    return int(resp.json()["file_id"])
+
+
+async def _store_graph(source_file_id: int, path) -> None:
+    async with async_session_factory() as session:
+        graph_fmt = (await session.execute(select(Format).where(Format.type == "graph"))).scalars().first()
+        cm = ConvertManager(session)
+        op = await cm.create_file_operation(user_id=None, source_file_id=source_file_id, target_format_id=int(graph_fmt.id))
+        result = await FilesManager(session).create_file(
+            user_id=None,
+            format_id=int(graph_fmt.id),
+            filename=path.name,
+            mime_type="application/json",
+            content_bytes=None,
+            path=str(path),
+        )
+        await cm.update_status(int(op.id), status="completed", error_message=None, result_file_id=int(result.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_graph_is_served_as_stored_bytes(http_client, tmp_path):
+    fid = await _source_file(http_client)
+
+    resp = await http_client.get(f"/graph/{fid}")
+    assert resp.status_code == 200
+    assert resp.json() == {"file_id": str(fid), "graph": None}
+
+    # Необычные пробелы: если бы роут разбирал и сериализовал граф заново, они бы пропали
+    raw = b'{"nodes" :  [{"id": "n1", "label": "\xd0\x93\xd1\x80\xd0\xb0\xd1\x84"}], "edges": [], "meta": {}}'
+    path = tmp_path / "stored.graph.json"
+    path.write_bytes(raw)
+    await _store_graph(fid, path)
+
+    resp = await http_client.get(f"/graph/{fid}", headers={"Accept-Encoding": "identity"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert "content-encoding" not in resp.headers
+    assert resp.content == b'{"file_id":"' + str(fid).encode() + b'","graph":' + raw + b"}"
+    assert resp.json()["graph"]["nodes"][0]["label"] == "Граф"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw", [b"", b'{"nodes": [{"id": "n1"', b"\x00\x01garbage"])
+async def test_corrupt_graph_file_is_served_as_no_graph(http_client, tmp_path, raw):
+    fid = await _source_file(http_client)
+    path = tmp_path / "broken.graph.json"
+    path.write_bytes(raw)
+    await _store_graph(fid, path)
+
+    resp = await http_client.get(f"/graph/{fid}")
+    assert resp.status_code == 200
+    assert resp.json() == {"file_id": str(fid), "graph": None}
+    assert "etag" not in resp.headers
+
+
+@pytest.mark.asyncio
+async def test_large_graph_is_gzipped_when_accepted(http_client, tmp_path):
+    fid = await _source_file(http_client)
+    graph = {"nodes": [{"id": f"n{i}", "label": f"node {i}"} for i in range(500)], "edges": [], "meta": {}}
+    path = tmp_path / "large.graph.json"
+    path.write_bytes(orjson.dumps(graph))
+    await _store_graph(fid, path)
+
+    resp = await http_client.get(f"/graph/{fid}", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.json() == {"file_id": str(fid), "graph": graph}
+
+    # Повтор берёт сжатое тело из кэша — байты те же
+    again = await http_client.get(f"/graph/{fid}", headers={"Accept-Encoding": "gzip"})
+    assert again.content == resp.content
+    assert int(again.headers["content-length"]) < len(path.read_bytes())
+
+    plain = await http_client.get(f"/graph/{fid}", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json()["graph"] == graph
+
+
+@pytest.mark.asyncio
+async def test_graph_etag_revalidation_and_regeneration(http_client, tmp_path):
+    fid = await _source_file(http_client)
+    path = tmp_path / "v1.graph.json"
+    path.write_bytes(b'{"nodes":[],"edges":[],"meta":{"v":1}}')
+    await _store_graph(fid, path)
+
+    first = await http_client.get(f"/graph/{fid}")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    revalidated = await http_client.get(f"/graph/{fid}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    # Без записи в кэше процесса 304 отдаётся по id и mtime файла, без чтения тела
+    response_cache.invalidate("graph")
+    revalidated = await http_client.get(f"/graph/{fid}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+    # Новый граф (другой файл результата) — новый ETag и новое тело
+    path2 = tmp_path / "v2.graph.json"
+    path2.write_bytes(b'{"nodes":[],"edges":[],"meta":{"v":2}}')
+    await _store_graph(fid, path2)
+    fresh = await http_client.get(f"/graph/{fid}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()["graph"]["meta"] == {"v": 2}
+
+    not_modified = await http_client.get(f"/graph/{fid}", headers={"If-None-Match": fresh.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+@pytest.mark.asyncio
+async def test_graph_generation_runs_through_dispatcher(http_client, monkeypatch, tmp_path):
+    fid = await _source_file(http_client)
+    seen = {}
+
+    async def fake_generate(session, *, operation_id, storage_dir, **_):
+        # Задача под диспетчером: зарегистрирована и её аренда продлевается heartbeat
+        seen["running"] = job_dispatcher.is_running(operation_id)
+        seen["held"] = operation_id in job_dispatcher._held
+        graph_fmt = (await session.execute(select(Format).where(Format.type == "graph"))).scalars().first()
+        path = tmp_path / "generated.graph.json"
+        path.write_bytes(b'{"nodes":[],"edges":[],"meta":{"generated":true}}')
+        result = await FilesManager(session).create_file(
+            user_id=None,
+            format_id=int(graph_fmt.id),
+            filename=path.name,
+            mime_type="application/json",
+            content_bytes=None,
+            path=str(path),
+        )
+        await ConvertManager(session).update_status(operation_id, status="completed", error_message=None, result_file_id=int(result.id))
+        await session.commit()
+
+    monkeypatch.setattr(graph_service, "generate_graph_for_operation", fake_generate)
+    resp = await http_client.post(f"/graph/{fid}")
+    assert resp.status_code == 200
+    assert resp.json()["graph"]["meta"] == {"generated": True}
+    assert seen == {"running": True, "held": True}
+
+
+@pytest.mark.asyncio
+async def test_graph_generation_deadline_returns_504(http_client, monkeypatch):
+    fid = await _source_file(http_client)
+    monkeypatch.setenv("VKMAX_JOB_TIMEOUT_GRAPH_SEC", "0.2")
+
+    async def slow_generate(session, *, operation_id, storage_dir, **_):
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(graph_service, "generate_graph_for_operation", slow_generate)
+    resp = await http_client.post(f"/graph/{fid}")
+    assert resp.status_code == 504
+    assert "timed_out" in resp.json()["detail"]
@@ -0,0 +1,165 @@
+# Руководство к файлу (TESTS/integration/test_job_retry_integration.py)
+# Назначение:
+# - Интеграционные тесты повторов JobDispatcher: временный сбой повторяется до успеха
+#   (operations.attempts), постоянная ошибка не повторяется, исчерпанные попытки
+#   переводят операцию в dead_letter (видна в GET /operations?status=dead_letter),
+#   отмена во время паузы перед повтором.
+# - Задача в запросе (/convert, /convert/website) упала или ушла в dead_letter — ответ
+#   всё равно 200 с id операции (объект op после commit/rollback диспетчера не читается).
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import uuid
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.CONVERT.retry_policy import note_error
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+# Атрибут пакета BACKEND.CONVERT.job_dispatcher — экземпляр диспетчера, модуль берём явно
+dispatcher_module = importlib.import_module("BACKEND.CONVERT.job_dispatcher")
+convert_routes = importlib.import_module("BACKEND.FAST_API.ROUTES.convert")
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"retry-user-{uuid.uuid4()}", "name": "Retry User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+def _flaky_website_job(failures: Dict[str, List[BaseException]], calls: Dict[str, int]):
+    """Как enqueue_website_job: ошибку ловит сам, сообщает note_error и ставит failed."""
+
+    async def fake_enqueue_website_job(session, *, operation_id: int, url=None) -> None:
+        cm = ConvertManager(session)
+        await cm.update_status(operation_id, status="processing")
+        await session.commit()
+        calls[url] = calls.get(url, 0) + 1
+        try:
+            planned = failures.get(url) or []
+            if planned:
+                raise planned.pop(0)
+        except Exception as exc:  # noqa: WPS430
+            note_error(exc)
+            await cm.update_status(operation_id, status="failed", error_message=str(exc))
+            return
+        await cm.update_status(operation_id, status="completed")
+
+    return fake_enqueue_website_job
+
+
+def _server_error() -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://retry.example.com/")
+    return httpx.HTTPStatusError("503 Service Unavailable", request=request, response=httpx.Response(503, request=request))
+
+
+async def _run_batch(http_client, urls: List[str]) -> Dict[str, dict]:
+    user_id = await _create_user(http_client)
+    payload = {"user_id": user_id, "max_parallel": 2, "operations": [{"url": u, "target_format": "site_bundle"} for u in urls]}
+    resp = await http_client.post("/batch-convert", json=payload)
+    assert resp.status_code == 200
+    await job_dispatcher.drain()
+    out = {}
+    for url, op in zip(urls, resp.json()["operations"]):
+        out[url] = (await http_client.get(f"/operations/{op['operation_id']}")).json()
+    return out
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried_until_success_or_dead_letter(http_client, monkeypatch):
+    monkeypatch.setenv("VKMAX_RETRY_BASE_SEC", "0.01")
+    monkeypatch.setenv("VKMAX_RETRY_MAX_ATTEMPTS", "3")
+    flaky, broken, poison = (f"https://{name}-{uuid.uuid4().hex[:8]}.example.com/" for name in ("flaky", "broken", "poison"))
+    failures = {
+        flaky: [ConnectionError("connection reset"), _server_error()],
+        broken: [ValueError("malformed site bundle")],
+        poison: [TimeoutError("upstream timeout") for _ in range(5)],
+    }
+    calls: Dict[str, int] = {}
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _flaky_website_job(failures, calls))
+
+    ops = await _run_batch(http_client, [flaky, broken, poison])
+
+    # Два временных сбоя, третья попытка успешна; сообщение о повторе сброшено
+    assert calls[flaky] == 3
+    assert ops[flaky]["status"] == "completed"
+    assert ops[flaky]["attempts"] == 3
+    assert ops[flaky]["error_message"] is None
+
+    # Постоянная ошибка не повторяется
+    assert calls[broken] == 1
+    assert ops[broken]["status"] == "failed"
+    assert ops[broken]["attempts"] == 1
+    assert ops[broken]["error_message"] == "malformed site bundle"
+
+    # Временный сбой на каждой попытке — dead_letter после VKMAX_RETRY_MAX_ATTEMPTS
+    assert calls[poison] == 3
+    assert ops[poison]["status"] == "dead_letter"
+    assert ops[poison]["attempts"] == 3
+    assert ops[poison]["error_message"] == "gave up after 3 attempts: upstream timeout"
+    assert ops[poison]["progress"] == 100
+
+    listed = (await http_client.get("/operations", params={"status": "dead_letter"})).json()
+    poison_id = ops[poison]["operation_id"]
+    assert any(row["operation_id"] == poison_id and row["attempts"] == 3 for row in listed)
+
+    # Журнал хранит причину каждого повтора
+    events = (await http_client.get(f"/operations/{ops[flaky]['operation_id']}/events")).json()
+    retries = [e for e in events["events"] if e["kind"] == "status" and e["name"] == "queued" and e.get("detail")]
+    assert [e["detail"].split(" failed")[0] for e in retries] == ["attempt 1/3", "attempt 2/3"]
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_retry_backoff(http_client, monkeypatch):
+    monkeypatch.setenv("VKMAX_RETRY_BASE_SEC", "30")
+    monkeypatch.setenv("VKMAX_RETRY_MAX_SEC", "30")
+    url = f"https://backoff-{uuid.uuid4().hex[:8]}.example.com/"
+    calls: Dict[str, int] = {}
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _flaky_website_job({url: [ConnectionError("reset")]}, calls))
+    # Пауза гарантированно длинная: jitter выбирает верхнюю границу окна
+    monkeypatch.setattr(dispatcher_module.RetryPolicy, "delay", lambda self, attempt, rng=None: self.max_sec)
+
+    user_id = await _create_user(http_client)
+    resp = await http_client.post("/batch-convert", json={"user_id": user_id, "operations": [{"url": url, "target_format": "site_bundle"}]})
+    op_id = resp.json()["operations"][0]["operation_id"]
+
+    for _ in range(200):
+        op = (await http_client.get(f"/operations/{op_id}")).json()
+        if op["status"] == "queued" and op["attempts"] == 1 and op["error_message"]:
+            break
+        await asyncio.sleep(0.02)
+    assert op["error_message"].startswith("attempt 1/3 failed, retrying in 30.0s")
+
+    resp = await http_client.post(f"/operations/{op_id}/cancel")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "cancelled"
+    await asyncio.wait_for(job_dispatcher.drain(), 10)
+    assert calls[url] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/convert", "/convert/website"])
+@pytest.mark.parametrize("error", [ValueError("malformed site bundle"), TimeoutError("upstream timeout")], ids=["failed", "dead_letter"])
+async def test_in_request_job_failure_still_returns_operation(http_client, monkeypatch, path, error):
+    monkeypatch.setenv("VKMAX_RETRY_BASE_SEC", "0.01")
+    monkeypatch.setenv("VKMAX_RETRY_MAX_ATTEMPTS", "2")
+    url = f"https://in-request-{uuid.uuid4().hex[:8]}.example.com/"
+    calls: Dict[str, int] = {}
+    failures = {url: [error, error]}
+    monkeypatch.setattr(convert_routes, "enqueue_website_job", _flaky_website_job(failures, calls))
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _flaky_website_job(failures, calls))
+
+    user_id = await _create_user(http_client)
+    resp = await http_client.post(path, json={"user_id": user_id, "url": url, "target_format": "site_bundle"})
+    assert resp.status_code == 200
+    op_id = resp.json()["operation_id"]
+    assert op_id
+
+    await asyncio.wait_for(job_dispatcher.drain(), 10)
+    op = (await http_client.get(f"/operations/{op_id}")).json()
+    assert op["status"] == ("failed" if isinstance(error, ValueError) else "dead_letter")
@@ -0,0 +1,139 @@
+# Руководство к файлу (TESTS/integration/test_lease_recovery_integration.py)
+# Назначение:
+# - Интеграционные тесты восстановления после падения воркера: операции пакета с истёкшей
+#   арендой (имитация упавшего процесса) reaper перезапускает до completed и закрывает пакет;
+#   исчерпавшая попытки операция уходит в dead_letter, website без URL — в failed;
+#   живую аренду reaper не трогает.
+# - Fencing: если аренду выполняемой задачи забрал другой процесс, heartbeat прерывает её
+#   здесь без смены статуса, а begin_attempt не начинает чужую арендованную операцию.
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import time
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.CONVERT.lease_reaper import LeaseReaper
+from BACKEND.DATABASE.CACHE_MANAGER import BatchManager, ConvertManager
+from BACKEND.DATABASE.models import Operation
+from BACKEND.DATABASE.session import async_session_factory
+
+dispatcher_module = importlib.import_module("BACKEND.CONVERT.job_dispatcher")
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"lease-user-{uuid.uuid4()}", "name": "Lease User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+async def _completing_website_job(session, *, operation_id: int, url=None) -> None:
+    cm = ConvertManager(session)
+    await cm.update_status(operation_id, status="processing")
+    await session.commit()
+    await cm.update_status(operation_id, status="completed")
+
+
+async def _orphan_batch(user_id: int, urls, *, status: str, attempts: int, owner: str = "dead-host:1:0000") -> tuple[int, list[int]]:
+    """Пакет, который выполнял упавший процесс: аренда *owner* истекла секунду назад."""
+
+    async with async_session_factory() as session:
+        batch = await BatchManager(session).create_batch(user_id=user_id, total=len(urls), max_parallel=2)
+        items = [{"type": "website", "url": u, "target_ext": "site_bundle"} for u in urls]
+        ids = await ConvertManager(session).batch_create(user_id=user_id, items=items, batch_id=int(batch.id))
+        await session.execute(
+            update(Operation)
+            .where(Operation.id.in_(ids))
+            .values(status=status, attempts=attempts, lease_owner=owner, lease_expires_at=time.time() - 1)
+        )
+        await session.commit()
+    return int(batch.id), ids
+
+
+@pytest.mark.asyncio
+async def test_reaper_requeues_orphaned_operations(http_client, monkeypatch, tmp_path):
+    monkeypatch.setenv("VKMAX_RETRY_MAX_ATTEMPTS", "3")
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _completing_website_job)
+    user_id = int(await _create_user(http_client))
+    batch_id, (crashed, never_started) = await _orphan_batch(
+        user_id, [f"https://lease-{i}-{uuid.uuid4().hex[:6]}.example.com/" for i in range(2)], status="processing", attempts=1
+    )
+    async with async_session_factory() as session:
+        await ConvertManager(session).update_status(never_started, status="queued")
+        await session.execute(update(Operation).where(Operation.id == never_started).values(attempts=0))
+        await session.commit()
+    _, (poison,) = await _orphan_batch(user_id, ["https://poison-lease.example.com/"], status="processing", attempts=3)
+    _, (no_url,) = await _orphan_batch(user_id, ["https://x.example.com/"], status="processing", attempts=1)
+    _, (alive,) = await _orphan_batch(user_id, ["https://alive.example.com/"], status="processing", attempts=1, owner="live:2:1111")
+    async with async_session_factory() as session:
+        await session.execute(update(Operation).where(Operation.id == no_url).values(source_url=None))
+        await session.execute(update(Operation).where(Operation.id == alive).values(lease_expires_at=time.time() + 60))
+        await session.commit()
+
+    reaper = LeaseReaper(job_dispatcher)
+    outcome = await reaper.run_once(storage_dir=str(tmp_path))
+    assert outcome["requeued"] >= 2 and outcome["dead_letter"] >= 1 and outcome["failed"] >= 1
+    await job_dispatcher.drain()
+
+    ops = {oid: (await http_client.get(f"/operations/{oid}")).json() for oid in (crashed, never_started, poison, no_url, alive)}
+    assert ops[crashed]["status"] == "completed" and ops[crashed]["attempts"] == 2
+    assert ops[never_started]["status"] == "completed" and ops[never_started]["attempts"] == 1
+    assert ops[poison]["status"] == "dead_letter"
+    assert ops[poison]["error_message"].startswith("worker lost after 3 attempts (lease of dead-host:1:0000 expired")
+    assert ops[no_url]["status"] == "failed" and "source is missing" in ops[no_url]["error_message"]
+    assert ops[alive]["status"] == "processing"
+
+    # Журнал хранит причину перезапуска; пакет закрыт, когда завершилась последняя операция
+    events = (await http_client.get(f"/operations/{crashed}/events")).json()["events"]
+    requeue = [e for e in events if e["kind"] == "status" and e["name"] == "queued" and e.get("detail")]
+    assert requeue[-1]["detail"] == "lease of dead-host:1:0000 expired in processing, requeued"
+    batch = (await http_client.get(f"/batches/{batch_id}")).json()
+    assert batch["status"] == "completed"
+
+    # Повторный проход ничего не находит: аренды новые или операции завершены
+    again = await reaper.run_once(storage_dir=str(tmp_path))
+    assert again["requeued"] == again["dead_letter"] == again["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_local_job_without_touching_status(http_client, monkeypatch):
+    started: asyncio.Queue = asyncio.Queue()
+
+    async def hanging_website_job(session, *, operation_id: int, url=None) -> None:
+        cm = ConvertManager(session)
+        await cm.update_status(operation_id, status="processing")
+        await session.commit()
+        await started.put(operation_id)
+        await asyncio.sleep(30)
+        await cm.update_status(operation_id, status="completed")
+
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", hanging_website_job)
+    user_id = await _create_user(http_client)
+    resp = await http_client.post(
+        "/batch-convert",
+        json={"user_id": user_id, "operations": [{"url": "https://hang.example.com/", "target_format": "site_bundle"}]},
+    )
+    op_id = int(resp.json()["operations"][0]["operation_id"])
+    assert await asyncio.wait_for(started.get(), 5) == op_id
+    assert job_dispatcher.is_running(op_id)
+
+    # Процесс завис, reaper другого процесса забрал операцию себе
+    async with async_session_factory() as session:
+        await session.execute(update(Operation).where(Operation.id == op_id).values(lease_owner="other:3:2222", lease_expires_at=time.time() + 60))
+        await session.commit()
+        # Чужую живую аренду нельзя перехватить новой попыткой
+        assert await ConvertManager(session).begin_attempt(op_id, owner=job_dispatcher.owner) is None
+        await session.rollback()
+
+    assert await job_dispatcher.renew_leases() == [op_id]
+    await asyncio.wait_for(job_dispatcher.drain(), 5)
+    op = (await http_client.get(f"/operations/{op_id}")).json()
+    assert op["status"] == "processing"  # статус ведёт новый владелец
+    assert not job_dispatcher.is_running(op_id)
+    # Пакет не закрыт: его операцию ещё выполняет другой процесс
+    assert (await http_client.get(f"/batches/{resp.json()['batch_id']}")).json()["status"] != "completed"
@@ -0,0 +1,142 @@
+# Руководство к файлу (TESTS/integration/test_operation_cancel_integration.py)
+# Назначение:
+# - Интеграционные тесты отмены и жёстких таймаутов: POST /operations/{id}/cancel для
+#   выполняемой и ожидающей операции пакета и интерактивного /convert/website,
+#   статус timed_out по дедлайну задачи, удаление выходных файлов прерванной задачи,
+#   ошибки 400/404/409.
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import uuid
+
+import pytest
+
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.CONVERT.cancellation import track_artifact
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+# Атрибут пакета BACKEND.CONVERT.job_dispatcher — экземпляр диспетчера, модуль берём явно
+dispatcher_module = importlib.import_module("BACKEND.CONVERT.job_dispatcher")
+convert_routes = importlib.import_module("BACKEND.FAST_API.ROUTES.convert")
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"cancel-user-{uuid.uuid4()}", "name": "Cancel User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+def _slow_website_job(started: asyncio.Queue, artifact_dir=None):
+    async def fake_enqueue_website_job(session, *, operation_id: int, url=None) -> None:
+        cm = ConvertManager(session)
+        await cm.update_status(operation_id, status="processing")
+        await session.commit()
+        if artifact_dir is not None:
+            path = artifact_dir / f"partial-{operation_id}.bin"
+            path.write_bytes(b"partial")
+            track_artifact(str(path))
+        await started.put(operation_id)
+        await asyncio.sleep(30)
+        await cm.update_status(operation_id, status="completed")
+
+    return fake_enqueue_website_job
+
+
+async def _start_batch(http_client, urls, *, max_parallel: int = 1) -> dict:
+    user_id = await _create_user(http_client)
+    payload = {
+        "user_id": user_id,
+        "max_parallel": max_parallel,
+        "operations": [{"url": u, "target_format": "site_bundle"} for u in urls],
+    }
+    resp = await http_client.post("/batch-convert", json=payload)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_waiting_batch_operations(http_client, monkeypatch, tmp_path):
+    started: asyncio.Queue = asyncio.Queue()
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _slow_website_job(started, tmp_path))
+
+    data = await _start_batch(http_client, ["https://cancel-a.example.com/", "https://cancel-b.example.com/"])
+    running_id, waiting_id = (int(op["operation_id"]) for op in data["operations"])
+    assert await asyncio.wait_for(started.get(), 10) == running_id
+    assert (tmp_path / f"partial-{running_id}.bin").exists()
+
+    # Вторая операция ждёт слот пакета (max_parallel=1): отменяется сразу в БД
+    resp = await http_client.post(f"/operations/{waiting_id}/cancel")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "cancelled"
+
+    resp = await http_client.post(f"/operations/{running_id}/cancel")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "cancelled"
+    assert body["error_message"] == "cancelled by request"
+    assert body["progress"] == 100
+    assert not (tmp_path / f"partial-{running_id}.bin").exists()
+
+    await job_dispatcher.drain()
+    # Отменённая в очереди операция так и не стартовала
+    assert started.empty()
+    batch = (await http_client.get(f"/batches/{data['batch_id']}")).json()
+    assert batch["status"] == "cancelled"
+    assert batch["counts"] == {"cancelled": 2}
+    assert batch["done"] == 2
+
+    # Повторная отмена завершённой операции — конфликт
+    resp = await http_client.post(f"/operations/{running_id}/cancel")
+    assert resp.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_job_deadline_marks_operation_timed_out(http_client, monkeypatch, tmp_path):
+    started: asyncio.Queue = asyncio.Queue()
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _slow_website_job(started, tmp_path))
+    monkeypatch.setenv("VKMAX_JOB_TIMEOUT_WEBSITE_SEC", "0.3")
+
+    data = await _start_batch(http_client, ["https://slow.example.com/"])
+    op_id = int(data["operations"][0]["operation_id"])
+
+    resp = await http_client.get(f"/batches/{data['batch_id']}/wait", params={"timeout": 10})
+    assert resp.status_code == 200
+    await job_dispatcher.drain()
+
+    resp = await http_client.get("/operations/status", params={"ids": str(op_id)})
+    item = resp.json()["operations"][0]
+    assert item["status"] == "timed_out"
+    assert "timed out after 0.3s" in item["error_message"]
+    assert not (tmp_path / f"partial-{op_id}.bin").exists()
+    assert (await http_client.get(f"/batches/{data['batch_id']}")).json()["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_cancel_interactive_convert_request(http_client, monkeypatch):
+    started: asyncio.Queue = asyncio.Queue()
+    monkeypatch.setattr(convert_routes, "enqueue_website_job", _slow_website_job(started))
+
+    user_id = await _create_user(http_client)
+    request = asyncio.create_task(
+        http_client.post("/convert/website", json={"user_id": user_id, "url": "https://interactive.example.com/", "target_format": "site_bundle"})
+    )
+    op_id = await asyncio.wait_for(started.get(), 10)
+    assert job_dispatcher.is_running(op_id)
+
+    resp = await http_client.post(f"/operations/{op_id}/cancel")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "cancelled"
+
+    # Запрос /convert/website завершается штатно, операция остаётся отменённой
+    resp_convert = await asyncio.wait_for(request, 10)
+    assert resp_convert.status_code == 200
+    assert not job_dispatcher.is_running(op_id)
+    assert (await http_client.get(f"/operations/{op_id}")).json()["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_cancel_validation(http_client):
+    assert (await http_client.post("/operations/abc/cancel")).status_code == 400
+    assert (await http_client.post("/operations/999999999/cancel")).status_code == 404
@@ -0,0 +1,156 @@
+# Руководство к файлу (TESTS/integration/test_operation_events_integration.py)
+# Назначение:
+# - Интеграционные тесты журнала операций (operation_events): статусные события из
+#   ConvertManager, этапы из track_stage, реальный progress в /operations/{id},
+#   /operations/{id}/events и перцентили задержек /stats/latency (считаются в SQL).
+# - Событие этапа фиксируется и публикуется в progress_bus сразу, до commit задачи;
+#   при записях в транзакции задачи — уходит вместе с её commit.
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+from BACKEND.CONVERT.progress import track_stage
+from BACKEND.CONVERT.progress_bus import progress_bus
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, EventsManager
+from BACKEND.DATABASE.CACHE_MANAGER.events import percentile
+
+
+async def _create_user(http_client) -> int:
+    resp = await http_client.post(
+        "/users",
+        json={"max_id": f"events-user-{uuid.uuid4()}", "name": "Events User", "metadata": {}},
+    )
+    assert resp.status_code == 200
+    return int(resp.json()["id"])
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([7.0], 90) == 7.0
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_status_and_stage_events_drive_progress(http_client):
+    user_id = await _create_user(http_client)
+
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+        oid = int(op.id)
+        await cm.update_status(oid, status="processing")
+        async with track_stage(session, oid, "crawl", progress=70):
+            pass
+        with pytest.raises(RuntimeError):
+            async with track_stage(session, oid, "db_write", progress=95):
+                raise RuntimeError("disk full")
+        await session.commit()
+
+    resp = await http_client.get(f"/operations/{oid}")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "processing"
+    assert resp.json()["progress"] == 70
+
+    resp = await http_client.get(f"/operations/{oid}/events")
+    assert resp.status_code == 200
+    events = resp.json()["events"]
+    assert [(e["kind"], e["name"]) for e in events] == [
+        ("status", "queued"),
+        ("status", "processing"),
+        ("stage", "crawl"),
+        ("stage", "db_write"),
+    ]
+    assert events[0]["duration_ms"] is None
+    assert events[1]["duration_ms"] is not None
+    assert events[3]["outcome"] == "error"
+    assert events[3]["detail"] == "disk full"
+
+    async with async_session_factory() as session:
+        await ConvertManager(session).update_status(oid, status="completed")
+        await session.commit()
+
+    resp = await http_client.get(f"/operations/{oid}")
+    assert resp.json()["progress"] == 100
+
+
+@pytest.mark.asyncio
+async def test_latency_percentiles_by_format(http_client):
+    user_id = await _create_user(http_client)
+
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        ev = EventsManager(session)
+        for duration in (10.0, 20.0, 30.0):
+            op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+            await cm.update_status(int(op.id), status="processing")
+            await ev.record_stage(int(op.id), "crawl", duration_ms=duration)
+            await cm.update_status(int(op.id), status="completed")
+        await session.commit()
+
+    resp = await http_client.get("/stats/latency?hours=1")
+    assert resp.status_code == 200
+    # website-операции без целевого формата попадают в "unknown"
+    by_key = resp.json()["formats"]["unknown"]
+    assert by_key["stage:crawl"]["count"] >= 3
+    assert by_key["stage:crawl"]["p50_ms"] is not None
+    assert by_key["queue_wait"]["count"] >= 3
+    assert by_key["run"]["count"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_sql_percentiles_match_nearest_rank(http_client):
+    user_id = await _create_user(http_client)
+    stage = f"pct-{uuid.uuid4().hex[:8]}"
+    values = [float(v) for v in (7, 3, 41, 19, 3, 88, 12, 55, 30, 64, 2)]
+
+    async with async_session_factory() as session:
+        op = await ConvertManager(session).create_website_operation(user_id=user_id, target_format_id=None)
+        ev = EventsManager(session)
+        for duration in values:
+            await ev.record_stage(int(op.id), stage, duration_ms=duration)
+        await ev.record_stage(int(op.id), stage, duration_ms=999.0, ok=False)  # неуспешные не считаются
+        await session.commit()
+
+        stats = (await ev.latency_percentiles(percentiles=(0, 7, 50, 90, 99, 100)))["unknown"][f"stage:{stage}"]
+
+    assert stats["count"] == len(values)
+    for pct in (0, 7, 50, 90, 99, 100):
+        assert stats[f"p{pct}_ms"] == percentile(values, pct)
+
+
+@pytest.mark.asyncio
+async def test_stage_event_is_committed_before_job_commit(http_client):
+    user_id = await _create_user(http_client)
+    async with async_session_factory() as session:
+        op = await ConvertManager(session).create_website_operation(user_id=user_id, target_format_id=None)
+        oid = int(op.id)
+        await session.commit()
+
+    with progress_bus.subscribe([oid]) as sub:
+        async with async_session_factory() as job_session:
+            # Транзакция задачи без записей: событие фиксируется отдельной сессией
+            async with track_stage(job_session, oid, "extract", progress=20):
+                pass
+            event = await sub.get(timeout=1.0)
+            assert event is not None and (event["stage"], event["progress"]) == ("extract", 20)
+            resp = await http_client.get(f"/operations/{oid}")
+            assert resp.json()["progress"] == 20
+
+            # После flush в транзакции задачи событие уходит с её commit
+            await ConvertManager(job_session).update_status(oid, status="processing")
+            async with track_stage(job_session, oid, "llm", progress=75):
+                pass
+            while (event := await sub.get(timeout=0.1)) is not None:
+                assert event.get("stage") != "llm"
+            await job_session.commit()
+
+        stages = []
+        while (event := await sub.get(timeout=0.1)) is not None:
+            stages.append(event.get("stage"))
+        assert "llm" in stages
@@ -0,0 +1,106 @@
+# Руководство к файлу (TESTS/integration/test_operations_archive_integration.py)
+# Назначение:
+# - Интеграционные тесты архивации операций (DATABASE/archive.py): перенос старых
+#   завершённых операций в operations_archive/JSONL и чтение через include_archive.
+
+from __future__ import annotations
+
+import gzip
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+from sqlalchemy import select, update
+
+from BACKEND.DATABASE.archive import archive_operations
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.models import Operation, OperationArchive
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+
+async def _create_user(http_client) -> int:
+    resp = await http_client.post(
+        "/users",
+        json={"max_id": f"archive-user-{uuid.uuid4()}", "name": "Archive User", "metadata": {}},
+    )
+    assert resp.status_code == 200
+    return int(resp.json()["id"])
+
+
+async def _create_operations(user_id: int, *, statuses: list[str], age_days: int) -> list[int]:
+    old = datetime.now(timezone.utc) - timedelta(days=age_days)
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        ids = []
+        for st in statuses:
+            op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+            await cm.update_status(int(op.id), status=st)
+            ids.append(int(op.id))
+        await session.execute(update(Operation).where(Operation.id.in_(ids)).values(datetime=old))
+        await session.commit()
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_finished_operations(http_client):
+    user_id = await _create_user(http_client)
+    old_done, old_failed, old_queued = await _create_operations(
+        user_id, statuses=["completed", "failed", "queued"], age_days=60
+    )
+
+    result = await archive_operations(older_than_days=30, batch_size=1)
+    assert result.moved >= 2
+
+    async with async_session_factory() as session:
+        hot = (await session.execute(select(Operation.id).where(Operation.user_id == user_id))).scalars().all()
+        archived = (
+            await session.execute(select(OperationArchive.id).where(OperationArchive.user_id == user_id))
+        ).scalars().all()
+    assert set(hot) == {old_queued}
+    assert set(archived) == {old_done, old_failed}
+
+    # Горячий список не видит архив, include_archive — видит
+    resp = await http_client.get(f"/operations?user_id={user_id}")
+    assert {int(r["operation_id"]) for r in resp.json()} == {old_queued}
+    resp = await http_client.get(f"/operations?user_id={user_id}&include_archive=true")
+    rows = resp.json()
+    assert {int(r["operation_id"]) for r in rows} == {old_done, old_failed, old_queued}
+    assert all(r.get("archived") for r in rows if int(r["operation_id"]) != old_queued)
+
+    resp = await http_client.get(f"/websites/history?user_id={user_id}&include_archive=true")
+    assert {int(r["operation_id"]) for r in resp.json()} == {old_done, old_failed, old_queued}
+
+    resp = await http_client.get(f"/users/{user_id}/operations?include_archive=true")
+    assert {int(r["operation_id"]) for r in resp.json()} == {old_done, old_failed, old_queued}
+
+    assert (await http_client.get(f"/operations/{old_done}")).status_code == 404
+    resp = await http_client.get(f"/operations/{old_done}?include_archive=true")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "completed"
+
+    # Новые операции не переиспользуют id из архива
+    async with async_session_factory() as session:
+        op = await ConvertManager(session).create_website_operation(user_id=user_id, target_format_id=None)
+        await session.commit()
+        assert int(op.id) > max(old_done, old_failed, old_queued)
+
+
+@pytest.mark.asyncio
+async def test_archive_to_jsonl(http_client, tmp_path):
+    user_id = await _create_user(http_client)
+    (op_id,) = await _create_operations(user_id, statuses=["completed"], age_days=400)
+
+    result = await archive_operations(older_than_days=365, jsonl_dir=str(tmp_path))
+    assert result.moved >= 1
+    assert result.jsonl_files
+
+    lines = []
+    for path in result.jsonl_files:
+        with gzip.open(path, "rb") as fh:
+            lines.extend(orjson.loads(line) for line in fh if line.strip())
+    assert op_id in {row["id"] for row in lines}
+
+    async with async_session_factory() as session:
+        assert (await session.execute(select(Operation).where(Operation.id == op_id))).first() is None
+        assert (await session.execute(select(OperationArchive).where(OperationArchive.id == op_id))).first() is None
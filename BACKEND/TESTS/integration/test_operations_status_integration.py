@@ -0,0 +1,99 @@
+# Руководство к файлу (TESTS/integration/test_operations_status_integration.py)
+# Назначение:
+# - Интеграционные тесты дешёвого поллинга: пачка статусов GET /operations/status?ids=...
+#   и long-poll GET /operations/{id}/wait (смена статуса, таймаут, устаревший status).
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from BACKEND.DATABASE import instrumentation
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+
+async def _create_user(http_client) -> int:
+    resp = await http_client.post(
+        "/users",
+        json={"max_id": f"status-user-{uuid.uuid4()}", "name": "Status User", "metadata": {}},
+    )
+    assert resp.status_code == 200
+    return int(resp.json()["id"])
+
+
+async def _create_operation(user_id: int, *statuses: str) -> int:
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+        for st in statuses:
+            await cm.update_status(int(op.id), status=st)
+        await session.commit()
+    return int(op.id)
+
+
+async def _set_status(op_id: int, status: str) -> None:
+    async with async_session_factory() as session:
+        await ConvertManager(session).update_status(op_id, status=status)
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_bulk_status_in_one_request(http_client):
+    user_id = await _create_user(http_client)
+    queued = await _create_operation(user_id)
+    done = await _create_operation(user_id, "processing", "completed")
+
+    resp = await http_client.get("/operations/status", params={"ids": f"{done},{queued},999999999"})
+    assert resp.status_code == 200
+    items = resp.json()["operations"]
+    assert [i["operation_id"] for i in items] == [str(done), str(queued), "999999999"]
+    assert items[0]["status"] == "completed" and items[0]["progress"] == 100
+    assert items[1]["status"] == "queued" and items[1]["progress"] == 0
+    assert items[2]["status"] is None
+
+    assert (await http_client.get("/operations/status", params={"ids": "1,x"})).status_code == 400
+
+    async with async_session_factory() as session:
+        with instrumentation.capture_queries() as stats:
+            rows = await ConvertManager(session).get_statuses([done, queued])
+    assert set(rows) == {done, queued}
+    assert stats.count == 1
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_on_status_change(http_client):
+    user_id = await _create_user(http_client)
+    op_id = await _create_operation(user_id)
+
+    started = time.monotonic()
+    request = asyncio.create_task(http_client.get(f"/operations/{op_id}/wait", params={"timeout": 10, "status": "queued"}))
+    await asyncio.sleep(0.1)
+    await _set_status(op_id, "processing")
+    resp = await asyncio.wait_for(request, timeout=5.0)
+
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "processing"
+    assert resp.json()["changed"] is True
+    assert time.monotonic() - started < 5.0
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_and_stale_status(http_client):
+    user_id = await _create_user(http_client)
+    op_id = await _create_operation(user_id, "processing")
+
+    resp = await http_client.get(f"/operations/{op_id}/wait", params={"timeout": 0.2})
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "processing"
+    assert resp.json()["changed"] is False
+
+    # Клиент знает устаревший статус — ответ сразу
+    resp = await http_client.get(f"/operations/{op_id}/wait", params={"timeout": 30, "status": "queued"})
+    assert resp.json()["changed"] is True
+    assert resp.json()["status"] == "processing"
+
+    assert (await http_client.get("/operations/999999999/wait", params={"timeout": 0})).status_code == 404
@@ -0,0 +1,161 @@
+# Руководство к файлу (TESTS/integration/test_operations_stream_integration.py)
+# Назначение:
+# - Интеграционные тесты push-прогресса: публикация operation_events в progress_bus
+#   после commit (и не после rollback), SSE /operations/stream (снапшот + живые события)
+#   и WebSocket /operations/ws; SSE закрывается и по финалу, прочитанному из БД
+#   (смена статуса в другом процессе в шину не попадает).
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from BACKEND.CONVERT.progress_bus import progress_bus
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+
+async def _create_user(http_client) -> int:
+    resp = await http_client.post(
+        "/users",
+        json={"max_id": f"stream-user-{uuid.uuid4()}", "name": "Stream User", "metadata": {}},
+    )
+    assert resp.status_code == 200
+    return int(resp.json()["id"])
+
+
+async def _create_operation(user_id: int, *statuses: str) -> int:
+    async with async_session_factory() as session:
+        cm = ConvertManager(session)
+        op = await cm.create_website_operation(user_id=user_id, target_format_id=None)
+        for st in statuses:
+            await cm.update_status(int(op.id), status=st)
+        await session.commit()
+    return int(op.id)
+
+
+def _parse_sse(body: str) -> list[dict]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        data = [line[len("data: "):] for line in block.splitlines() if line.startswith("data: ")]
+        if data:
+            events.append(json.loads(data[0]))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_committed_events_are_published_rolled_back_are_not(http_client):
+    user_id = await _create_user(http_client)
+    op_id = await _create_operation(user_id)
+
+    with progress_bus.subscribe([op_id]) as sub:
+        async with async_session_factory() as session:
+            await ConvertManager(session).update_status(op_id, status="processing")
+            assert sub.queue.empty()  # до commit наружу ничего не уходит
+            await session.rollback()
+        assert await sub.get(timeout=0.05) is None
+
+        async with async_session_factory() as session:
+            await ConvertManager(session).update_status(op_id, status="processing")
+            await session.commit()
+        event = await sub.get(timeout=1.0)
+    assert event["type"] == "status" and event["status"] == "processing"
+    assert event["operation_id"] == op_id
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_snapshot_and_live_completion(http_client):
+    user_id = await _create_user(http_client)
+    done_id = await _create_operation(user_id, "completed")
+    live_id = await _create_operation(user_id, "processing")
+
+    resp = await http_client.get("/operations/stream", params={"ids": "abc"})
+    assert resp.status_code == 400
+
+    # Все операции уже завершены — поток отдаёт снапшот и закрывается
+    resp = await http_client.get("/operations/stream", params={"ids": f"{done_id},999999999"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    assert events[0] == {
+        "operation_id": str(done_id),
+        "type": "status",
+        "status": "completed",
+        "progress": 100,
+        "result_file_id": None,
+        "snapshot": True,
+    }
+    assert events[1]["type"] == "error"
+
+    before = progress_bus.subscribers
+    request = asyncio.create_task(http_client.get("/operations/stream", params={"ids": str(live_id)}))
+    for _ in range(100):
+        if progress_bus.subscribers > before:
+            break
+        await asyncio.sleep(0.01)
+    progress_bus.publish_progress(live_id, "crawl", progress=40, pages=10)
+    async with async_session_factory() as session:
+        await ConvertManager(session).update_status(live_id, status="completed")
+        await session.commit()
+
+    resp = await asyncio.wait_for(request, timeout=5.0)
+    events = _parse_sse(resp.text)
+    assert [(e["type"], e.get("status") or e.get("stage")) for e in events] == [
+        ("status", "processing"),
+        ("progress", "crawl"),
+        ("status", "completed"),
+    ]
+    assert events[1]["pages"] == 10
+
+
+def test_websocket_subscribe_and_snapshot():
+    from starlette.testclient import TestClient
+
+    from BACKEND.FAST_API.fast_api import app
+
+    with TestClient(app) as client:
+        user = client.post("/users", json={"max_id": f"ws-user-{uuid.uuid4()}", "name": "WS User", "metadata": {}})
+        resp = client.post(
+            "/convert/website",
+            json={"url": "https://example.com", "target_format": "html", "user_id": str(user.json()["id"])},
+        )
+        op_id = resp.json()["operation_id"]
+
+        with client.websocket_connect(f"/operations/ws?ids={op_id}") as ws:
+            first = ws.receive_json()
+            assert first["operation_id"] == op_id
+            assert first["type"] == "status" and first["snapshot"] is True
+
+            ws.send_json({"subscribe": [999999999]})
+            assert ws.receive_json() == {"operation_id": "999999999", "type": "error", "error": "Operation not found"}
+
+            ws.send_json({"subscribe": ["bad"]})
+            assert ws.receive_json()["type"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_closes_on_final_status_missed_by_bus(http_client, monkeypatch):
+    monkeypatch.setenv("VKMAX_OPERATION_WAIT_POLL_SEC", "0.1")
+    user_id = await _create_user(http_client)
+    op_id = await _create_operation(user_id, "processing")
+
+    before = progress_bus.subscribers
+    request = asyncio.create_task(http_client.get("/operations/stream", params={"ids": str(op_id)}))
+    for _ in range(100):
+        if progress_bus.subscribers > before:
+            break
+        await asyncio.sleep(0.01)
+
+    # Финал записан «другим процессом»: commit без публикации в шину этого процесса
+    async with async_session_factory() as session:
+        await ConvertManager(session).update_status(op_id, status="completed")
+        await session.flush()
+        session.info.pop("vkmax_progress_events", None)
+        await session.commit()
+
+    resp = await asyncio.wait_for(request, timeout=5.0)
+    events = _parse_sse(resp.text)
+    assert [(e["type"], e["status"]) for e in events] == [("status", "processing"), ("status", "completed")]
@@ -0,0 +1,117 @@
+# Руководство к файлу (TESTS/integration/test_rate_limit_integration.py)
+# Назначение:
+# - Интеграционные тесты 429 с Retry-After: лимит пользователя на класс эндпоинта
+#   (in-memory и общий через таблицу rate_limit_buckets) и admission control по глубине очереди.
+# - Корзина в БД атомарна при параллельных списаниях из разных сессий (SQLite без FOR UPDATE).
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import uuid
+
+import pytest
+
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager, RateLimitManager
+from BACKEND.DATABASE.models import RateLimitBucket
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.FAST_API.rate_limit import admission, rate_limiter
+
+convert_routes = importlib.import_module("BACKEND.FAST_API.ROUTES.convert")
+
+
+async def _noop_website_job(session, *, operation_id: int, url=None) -> None:
+    await ConvertManager(session).update_status(operation_id, status="completed")
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(convert_routes, "enqueue_website_job", _noop_website_job)
+    monkeypatch.setenv("VKMAX_RATE_WEBSITE_PER_MIN", "1")
+    monkeypatch.setenv("VKMAX_RATE_WEBSITE_BURST", "2")
+    rate_limiter.reset()
+    admission.reset()
+    yield monkeypatch
+    rate_limiter.reset()
+    admission.reset()
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"rl-user-{uuid.uuid4()}", "name": "RL User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+async def _convert_website(http_client, user_id: str):
+    return await http_client.post("/convert/website", json={"user_id": user_id, "url": "https://rl.example.com/", "target_format": "site_bundle"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "db"])
+async def test_user_bucket_returns_429_with_retry_after(http_client, limited, backend):
+    limited.setenv("VKMAX_RATE_LIMIT", backend)
+    user_a = await _create_user(http_client)
+    user_b = await _create_user(http_client)
+
+    assert (await _convert_website(http_client, user_a)).status_code == 200
+    assert (await _convert_website(http_client, user_a)).status_code == 200
+    resp = await _convert_website(http_client, user_a)
+    assert resp.status_code == 429
+    # 1 запрос в минуту: следующий токен — примерно через минуту
+    assert 50 <= int(resp.headers["Retry-After"]) <= 60
+
+    # Корзины раздельные по пользователям
+    assert (await _convert_website(http_client, user_b)).status_code == 200
+
+    if backend == "db":
+        async with async_session_factory() as session:
+            row = await session.get(RateLimitBucket, f"website:user:{int(user_a)}")
+        assert row is not None and row.tokens < 1
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_when_queue_is_full(http_client, limited):
+    user_id = await _create_user(http_client)
+    # Порог — ровно на одну операцию выше текущей очереди (в БД могут быть операции других тестов)
+    depth, _ = await admission.load()
+    limited.setenv("VKMAX_ADMISSION_MAX_QUEUE", str(depth + 1))
+    async with async_session_factory() as session:
+        op = await ConvertManager(session).create_website_operation(user_id=int(user_id), target_format_id=None)
+        await session.commit()
+        op_id = int(op.id)
+    admission.reset()
+
+    try:
+        resp = await _convert_website(http_client, user_id)
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+        assert "overloaded" in resp.json()["detail"]
+    finally:
+        async with async_session_factory() as session:
+            await ConvertManager(session).update_status(op_id, status="failed", error_message="test cleanup")
+            await session.commit()
+        admission.reset()
+
+    assert (await _convert_website(http_client, user_id)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_db_bucket_is_atomic_under_concurrent_takes(http_client):
+    key = f"unit:user:{uuid.uuid4().hex}"
+    async with async_session_factory() as session:
+        assert await RateLimitManager(session).take(key, rate=0.001, burst=5, cost=1, now=1000.0) == 0.0
+        await session.commit()
+
+    async def _take() -> float:
+        async with async_session_factory() as session:
+            wait = await RateLimitManager(session).take(key, rate=0.001, burst=5, cost=1, now=1000.0)
+            await session.commit()
+            return wait
+
+    waits = await asyncio.gather(*(_take() for _ in range(12)))
+    # В корзине осталось 4 токена: пропущено ровно 4 запроса, остальным — ожидание
+    assert sum(1 for w in waits if w == 0.0) == 4
+    assert all(w > 0 for w in waits if w != 0.0)
+    async with async_session_factory() as session:
+        row = await session.get(RateLimitBucket, key)
+        assert row.tokens == pytest.approx(0.0)
@@ -0,0 +1,88 @@
+# Руководство к файлу (TESTS/integration/test_site_search_integration.py)
+# Назначение:
+# - Интеграционные тесты нормализованного хранения обхода сайта (site_pages/site_edges)
+#   и индексированного поиска /search/graph (FTS5 в SQLite) с фолбэком на разбор bundle.
+
+from __future__ import annotations
+
+import json
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.DATABASE.models import Operation, SiteEdge, SitePage
+from BACKEND.DATABASE.CACHE_MANAGER import SiteManager
+import BACKEND.CONVERT.webparser_service as webparser_module
+
+
+def _bundle(url: str) -> dict:
+    pages = [
+        {"id": 0, "url": url, "title": "Главная", "text": "Добро пожаловать", "depth": 0, "cluster": "/"},
+        {"id": 1, "url": url + "pricing", "title": "Тарифы", "text": "Стоимость подписки и оплата", "depth": 1, "cluster": "/pricing"},
+        {"id": 2, "url": url + "docs", "title": "Документация", "text": "Установка и настройка", "depth": 1, "cluster": "/docs"},
+        {"id": 3, "url": url + "docs/api", "title": "API", "text": "Методы и оплата через API", "depth": 2, "cluster": "/docs"},
+        {"id": 4, "url": url + "blog", "title": "Блог", "text": "Новости", "depth": 1, "cluster": "/blog"},
+    ]
+    edges = [[0, 1], [0, 2], [0, 4], [2, 3], [1, 0]]
+    return {"site_url": url, "crawled_at": "2025-01-01T00:00:00Z", "pages": pages, "edges": edges}
+
+
+async def _create_site_bundle(http_client, monkeypatch) -> str:
+    async def fake_crawl_site_bundle(url: str, on_progress=None) -> bytes:
+        return json.dumps(_bundle(url), ensure_ascii=False).encode("utf-8")
+
+    monkeypatch.setattr(webparser_module, "_crawl_site_bundle", fake_crawl_site_bundle)
+
+    resp_user = await http_client.post(
+        "/users",
+        json={"max_id": f"site-search-user-{uuid.uuid4()}", "name": "Site Search User", "metadata": {}},
+    )
+    user_id = resp_user.json()["id"]
+    resp_conv = await http_client.post(
+        "/convert/website",
+        json={"url": "https://example.com/", "target_format": "site_bundle", "user_id": user_id},
+    )
+    assert resp_conv.status_code == 200
+    operation_id = int(resp_conv.json()["operation_id"])
+
+    async with async_session_factory() as session:
+        op = (await session.execute(select(Operation).where(Operation.id == operation_id))).scalars().first()
+        assert op.status == "completed"
+        return str(op.result_file_id)
+
+
+@pytest.mark.asyncio
+async def test_site_bundle_is_normalized_and_searched_by_index(http_client, monkeypatch):
+    file_id = await _create_site_bundle(http_client, monkeypatch)
+
+    async with async_session_factory() as session:
+        pages = (await session.execute(select(SitePage).where(SitePage.file_id == int(file_id)))).scalars().all()
+        edges = (await session.execute(select(SiteEdge).where(SiteEdge.file_id == int(file_id)))).scalars().all()
+    assert len(pages) == 5
+    assert len(edges) == 5
+
+    resp = await http_client.post("/search/graph", json={"file_id": file_id, "query": "оплат"})
+    assert resp.status_code == 200
+    graph = resp.json()["graph"]
+
+    # Совпали страницы 1 и 3 (префикс "оплат"), плюс соседи 0 и 2; блог (4) не попадает
+    assert {n["id"] for n in graph["nodes"]} == {"0", "1", "2", "3"}
+    assert {e["id"] for e in graph["edges"]} == {"0->1", "1->0", "0->2", "2->3"}
+    assert graph["meta"]["query"] == "оплат"
+    assert graph["meta"]["site_url"] == "https://example.com/"
+
+
+@pytest.mark.asyncio
+async def test_site_search_falls_back_to_bundle_without_rows(http_client, monkeypatch):
+    file_id = await _create_site_bundle(http_client, monkeypatch)
+
+    async with async_session_factory() as session:
+        await SiteManager(session).delete_bundle(int(file_id))
+        await session.commit()
+
+    resp = await http_client.post("/search/graph", json={"file_id": file_id, "query": "Новости"})
+    assert resp.status_code == 200
+    graph = resp.json()["graph"]
+    assert {n["id"] for n in graph["nodes"]} == {"0", "4"}
@@ -90,3 +90,73 @@ async def test_webhook_conversion_complete_updates_status(http_client):
         op = res.scalars().first()
         assert op is not None
         assert getattr(op, "status") == "completed"
+
+
+@pytest.mark.asyncio
+async def test_db_query_stats_headers_and_aggregates(http_client, monkeypatch):
+    """В debug-режиме ответы несут X-DB-* заголовки, агрегаты доступны в /stats/db."""
+
+    from BACKEND.FAST_API.config import settings
+    from BACKEND.FAST_API.http_cache import response_cache
+
+    monkeypatch.delenv("VKMAX_ADMIN_TOKEN", raising=False)
+    monkeypatch.setattr(settings, "debug", True)
+    # /formats кэшируется в процессе — сбрасываем, чтобы запрос дошёл до БД
+    response_cache.invalidate("formats")
+
+    resp = await http_client.get("/formats")
+    assert resp.status_code == 200
+    assert int(resp.headers["X-DB-Query-Count"]) >= 1
+    assert float(resp.headers["X-DB-Time-Ms"]) >= 0.0
+    assert resp.headers["X-DB-Slow-Queries"] == "0"
+
+    resp_stats = await http_client.get("/stats/db")
+    assert resp_stats.status_code == 200
+    routes = resp_stats.json()["routes"]
+    assert routes["/formats"]["requests"] >= 1
+    assert routes["/formats"]["queries"] >= 1
+
+    monkeypatch.setattr(settings, "debug", False)
+    resp = await http_client.get("/formats")
+    assert "X-DB-Query-Count" not in resp.headers
+
+    # Пути без маршрута не становятся ключами агрегатов
+    resp = await http_client.get("/no-such-route-7f3a")
+    assert resp.status_code == 404
+    routes = (await http_client.get("/stats/db")).json()["routes"]
+    assert "/no-such-route-7f3a" not in routes
+    assert routes["unmatched"]["requests"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_exposition(http_client, monkeypatch):
+    """/metrics отдаёт текст Prometheus: латентность по шаблону маршрута, SQL, очереди, кэши."""
+
+    monkeypatch.delenv("VKMAX_ADMIN_TOKEN", raising=False)
+
+    assert (await http_client.get("/formats")).status_code == 200
+    assert (await http_client.get("/graph/999999")).status_code in (200, 404)
+
+    resp = await http_client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert 'vkmax_http_request_duration_seconds_bucket{route="/formats",method="GET",status="200",le="+Inf"}' in text
+    # Метка route — шаблон пути, а не конкретный id
+    assert 'route="/graph/{file_id}"' in text
+    assert "/graph/999999" not in text
+    for name in (
+        "# TYPE vkmax_db_query_duration_seconds histogram",
+        "# TYPE vkmax_job_queue_depth gauge",
+        "# TYPE vkmax_cache_hit_ratio gauge",
+        "# TYPE vkmax_conversion_duration_seconds histogram",
+        "# TYPE vkmax_llm_request_duration_seconds histogram",
+        "# TYPE vkmax_progress_events_dropped_total counter",
+    ):
+        assert name in text
+    assert any(line.startswith("vkmax_progress_events_dropped_total ") for line in text.splitlines())
+
+    monkeypatch.setenv("VKMAX_ADMIN_TOKEN", "secret-token")
+    assert (await http_client.get("/metrics")).status_code == 401
+    ok = await http_client.get("/metrics", headers={"Authorization": "Bearer secret-token"})
+    assert ok.status_code == 200
@@ -0,0 +1,297 @@
+# Руководство к файлу (TESTS/integration/test_webhooks_integration.py)
+# Назначение:
+# - Интеграционные тесты исходящих вебхуков: регистрация адреса (POST /webhooks),
+#   постановка событий operation.<статус>/batch.finished при завершении пакета,
+#   доставка WebhookDispatcher пачкой с подписью X-VKMax-Signature, повтор на 503
+#   и статус dead после исчерпания попыток, повторная постановка redeliver.
+# - Доступ к адресу (удаление, журнал, redeliver) — владельцу или с админ-токеном;
+#   нерезолвящиеся адреса и адреса во внутренних сетях при регистрации отклоняются,
+#   перепривязанный на внутренний адрес хост при доставке — доставка dead.
+# - DNS подменён: *.example.com резолвится в публичный адрес (resolve_host).
+# - HTTP-получатели подменены httpx.MockTransport; цикл воркера не запускается
+#   (ASGITransport не выполняет lifespan), проходы очереди — run_once().
+
+from __future__ import annotations
+
+import importlib
+import json
+import uuid
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from BACKEND.CONVERT import job_dispatcher
+from BACKEND.CONVERT.webhook_dispatcher import SIGNATURE_HEADER, PublicOnlyTransport, WebhookDispatcher, verify_signature
+from BACKEND.DATABASE.CACHE_MANAGER import ConvertManager
+
+dispatcher_module = importlib.import_module("BACKEND.CONVERT.job_dispatcher")
+webhook_module = importlib.import_module("BACKEND.CONVERT.webhook_dispatcher")
+
+_PUBLIC_IP = "93.184.215.14"
+
+
+@pytest.fixture(autouse=True)
+def fake_dns(monkeypatch):
+    """*.example.com → публичный адрес; остальные имена резолвятся как обычно."""
+
+    real = webhook_module.resolve_host
+    overrides: Dict[str, List[str]] = {}
+
+    async def _resolve(host: str, port: int) -> List[str]:
+        if host in overrides:
+            return overrides[host]
+        if host.endswith(".example.com"):
+            return [_PUBLIC_IP]
+        return await real(host, port)
+
+    monkeypatch.setattr(webhook_module, "resolve_host", _resolve)
+    return overrides
+
+
+async def _create_user(http_client) -> str:
+    resp = await http_client.post("/users", json={"max_id": f"hook-user-{uuid.uuid4()}", "name": "Hook User"})
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+async def _completing_website_job(session, *, operation_id: int, url=None) -> None:
+    await ConvertManager(session).update_status(operation_id, status="completed")
+
+
+class _Receiver:
+    """Получатель вебхуков: записывает запросы и отвечает заданными кодами по очереди."""
+
+    def __init__(self, statuses: List[int] | None = None) -> None:
+        self.statuses = list(statuses or [])
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(self.statuses.pop(0) if self.statuses else 200)
+
+    def events(self) -> List[dict]:
+        return [e for r in self.requests for e in json.loads(r.content)["events"]]
+
+
+def _router(receivers: Dict[str, _Receiver]) -> httpx.MockTransport:
+    return httpx.MockTransport(lambda request: receivers[request.url.host](request))
+
+
+@pytest.mark.asyncio
+async def test_batch_completion_is_pushed_signed_and_batched(http_client, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _completing_website_job)
+    user_id = await _create_user(http_client)
+    other_id = await _create_user(http_client)
+
+    resp = await http_client.post(
+        "/webhooks",
+        json={"url": "https://mine.example.com/hook", "user_id": user_id, "secret": "s" * 32},
+    )
+    assert resp.status_code == 200
+    hook = resp.json()
+    assert hook["secret"] == "s" * 32 and hook["events"] == ["*"]
+    # Адрес другого пользователя с фильтром: чужие события сюда не попадают
+    resp = await http_client.post(
+        "/webhooks",
+        json={"url": "https://other.example.com/hook", "user_id": other_id, "events": ["operation.*"]},
+    )
+    other_hook = resp.json()
+    assert len(other_hook["secret"]) == 64
+
+    urls = [f"https://hook-{i}-{uuid.uuid4().hex[:6]}.example.com/" for i in range(3)]
+    resp = await http_client.post(
+        "/batch-convert",
+        json={"user_id": user_id, "operations": [{"url": u, "target_format": "site_bundle"} for u in urls]},
+    )
+    assert resp.status_code == 200
+    batch_id = resp.json()["batch_id"]
+    op_ids = {op["operation_id"] for op in resp.json()["operations"]}
+    await job_dispatcher.drain()
+
+    receivers = {"mine.example.com": _Receiver(), "other.example.com": _Receiver()}
+    try:
+        assert await WebhookDispatcher(transport=_router(receivers)).run_once() == 4
+
+        mine = receivers["mine.example.com"]
+        assert len(mine.requests) == 1  # три операции и пакет — одним запросом
+        request = mine.requests[0]
+        assert verify_signature("s" * 32, request.content, request.headers[SIGNATURE_HEADER])
+        assert not verify_signature("wrong-secret-value", request.content, request.headers[SIGNATURE_HEADER])
+        events = mine.events()
+        ops = [e for e in events if e["type"] == "operation.completed"]
+        assert {str(e["data"]["operation_id"]) for e in ops} == op_ids
+        assert all(str(e["data"]["user_id"]) == user_id and e["data"]["max_id"].startswith("hook-user-") for e in ops)
+        finished = [e for e in events if e["type"] == "batch.finished"]
+        assert len(finished) == 1 and str(finished[0]["data"]["batch_id"]) == batch_id
+        assert finished[0]["data"]["counts"] == {"completed": 3}
+        assert len({e["id"] for e in events}) == 4
+
+        assert receivers["other.example.com"].requests == []
+
+        deliveries = (await http_client.get(f"/webhooks/{hook['id']}/deliveries")).json()
+        assert len(deliveries) == 4 and all(d["status"] == "delivered" and d["attempts"] == 1 for d in deliveries)
+        # Повторный проход ничего не отправляет
+        assert await WebhookDispatcher(transport=_router(receivers)).run_once() == 0
+    finally:
+        for h in (hook, other_hook):
+            await http_client.delete(f"/webhooks/{h['id']}")
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_then_dead_and_redelivered(http_client, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _completing_website_job)
+    monkeypatch.setenv("VKMAX_WEBHOOK_MAX_ATTEMPTS", "2")
+    # Пауза перед повтором нулевая: следующий проход сразу берёт доставку
+    monkeypatch.setattr("BACKEND.CONVERT.retry_policy.RetryPolicy.delay", lambda self, attempt, rng=None: 0.0)
+    user_id = await _create_user(http_client)
+    hook = (
+        await http_client.post(
+            "/webhooks",
+            json={"url": "https://flaky.example.com/hook", "user_id": user_id, "events": ["batch.finished"]},
+        )
+    ).json()
+    try:
+        resp = await http_client.post(
+            "/batch-convert",
+            json={"user_id": user_id, "operations": [{"url": "https://flaky-site.example.com/", "target_format": "site_bundle"}]},
+        )
+        assert resp.status_code == 200
+        await job_dispatcher.drain()
+
+        receiver = _Receiver([503, 503, 200])
+        dispatcher = WebhookDispatcher(transport=_router({"flaky.example.com": receiver}))
+        assert await dispatcher.run_once() == 1
+        [delivery] = (await http_client.get(f"/webhooks/{hook['id']}/deliveries")).json()
+        assert delivery["status"] == "pending" and delivery["attempts"] == 1 and delivery["last_error"] == "HTTP 503"
+
+        assert await dispatcher.run_once() == 1
+        [delivery] = (await http_client.get(f"/webhooks/{hook['id']}/deliveries", params={"status": "dead"})).json()
+        assert delivery["attempts"] == 2
+        assert await dispatcher.run_once() == 0
+
+        resp = await http_client.post(f"/webhooks/deliveries/{delivery['id']}/redeliver")
+        assert resp.status_code == 200
+        assert await dispatcher.run_once() == 1
+        [delivery] = (await http_client.get(f"/webhooks/{hook['id']}/deliveries")).json()
+        assert delivery["status"] == "delivered"
+        assert len(receiver.requests) == 3
+        assert dispatcher.delivered == 1 and dispatcher.failed == 2
+    finally:
+        await http_client.delete(f"/webhooks/{hook['id']}")
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_and_registration_rules(http_client, monkeypatch):
+    user_id = await _create_user(http_client)
+
+    assert (await http_client.post("/webhooks", json={"url": "ftp://x.example.com/", "user_id": user_id})).status_code == 400
+    resp = await http_client.post("/webhooks", json={"url": "https://x.example.com/", "user_id": user_id, "events": ["file.*"]})
+    assert resp.status_code == 400
+    assert (await http_client.post("/webhooks", json={"url": "https://x.example.com/", "user_id": "999999999"})).status_code == 404
+
+    # Адрес для всех пользователей — только с админ-токеном
+    monkeypatch.setenv("VKMAX_ADMIN_TOKEN", "hook-admin")
+    assert (await http_client.post("/webhooks", json={"url": "https://all.example.com/"})).status_code == 401
+    assert (await http_client.get("/webhooks")).status_code == 401
+    resp = await http_client.post("/webhooks", json={"url": "https://all.example.com/"}, headers={"Authorization": "Bearer hook-admin"})
+    assert resp.status_code == 200
+    global_hook = resp.json()
+    assert global_hook["user_id"] is None
+    listed = (await http_client.get("/webhooks", headers={"Authorization": "Bearer hook-admin"})).json()
+    assert global_hook["id"] in {h["id"] for h in listed}
+    assert (await http_client.delete(f"/webhooks/{global_hook['id']}")).status_code == 401
+    resp = await http_client.delete(f"/webhooks/{global_hook['id']}", headers={"Authorization": "Bearer hook-admin"})
+    assert resp.status_code == 200
+
+    # Повторная регистрация того же адреса обновляет его, а не дублирует
+    first = (await http_client.post("/webhooks", json={"url": "https://gone.example.com/", "user_id": user_id})).json()
+    second = (await http_client.post("/webhooks", json={"url": "https://gone.example.com/", "user_id": user_id, "events": ["operation.*"]})).json()
+    assert first["id"] == second["id"] and second["events"] == ["operation.*"]
+    assert len((await http_client.get("/webhooks", params={"user_id": user_id})).json()) == 1
+
+    try:
+        monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _completing_website_job)
+        await http_client.post(
+            "/batch-convert",
+            json={"user_id": user_id, "operations": [{"url": "https://gone-site.example.com/", "target_format": "site_bundle"}]},
+        )
+        await job_dispatcher.drain()
+        # 410 Gone — постоянная ошибка, доставка сразу dead
+        receiver = _Receiver([410])
+        assert await WebhookDispatcher(transport=_router({"gone.example.com": receiver})).run_once() == 1
+        owner = {"user_id": user_id}
+        [delivery] = (await http_client.get(f"/webhooks/{second['id']}/deliveries", params=owner)).json()
+        assert delivery["status"] == "dead" and delivery["last_error"] == "HTTP 410"
+    finally:
+        assert (await http_client.delete(f"/webhooks/{second['id']}", params={"user_id": user_id})).status_code == 200
+    assert (await http_client.delete(f"/webhooks/{second['id']}", params={"user_id": user_id})).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_endpoint_access_is_limited_to_owner_or_admin(http_client, monkeypatch):
+    monkeypatch.setenv("VKMAX_ADMIN_TOKEN", "hook-admin")
+    owner_id = await _create_user(http_client)
+    stranger_id = await _create_user(http_client)
+    hook = (await http_client.post("/webhooks", json={"url": "https://owned.example.com/", "user_id": owner_id})).json()
+    admin = {"Authorization": "Bearer hook-admin"}
+    try:
+        assert (await http_client.get(f"/webhooks/{hook['id']}/deliveries")).status_code == 401
+        assert (await http_client.get(f"/webhooks/{hook['id']}/deliveries", params={"user_id": stranger_id})).status_code == 404
+        assert (await http_client.get(f"/webhooks/{hook['id']}/deliveries", params={"user_id": owner_id})).status_code == 200
+        assert (await http_client.get(f"/webhooks/{hook['id']}/deliveries", headers=admin)).status_code == 200
+        assert (await http_client.post("/webhooks/deliveries/999999999/redeliver", headers=admin)).status_code == 404
+        assert (await http_client.delete(f"/webhooks/{hook['id']}")).status_code == 401
+        assert (await http_client.delete(f"/webhooks/{hook['id']}", params={"user_id": stranger_id})).status_code == 404
+    finally:
+        assert (await http_client.delete(f"/webhooks/{hook['id']}", params={"user_id": owner_id})).status_code == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "url",
+    ["http://127.0.0.1:8000/hook", "http://localhost/hook", "http://10.1.2.3/hook", "http://169.254.169.254/latest", "http://[::1]/hook"],
+)
+async def test_registration_rejects_internal_addresses(http_client, monkeypatch, url):
+    user_id = await _create_user(http_client)
+    resp = await http_client.post("/webhooks", json={"url": url, "user_id": user_id})
+    assert resp.status_code == 400
+
+    # Явное разрешение для локальной разработки
+    monkeypatch.setenv("VKMAX_WEBHOOK_ALLOW_PRIVATE", "1")
+    resp = await http_client.post("/webhooks", json={"url": url, "user_id": user_id})
+    assert resp.status_code == 200
+    await http_client.delete(f"/webhooks/{resp.json()['id']}", params={"user_id": user_id})
+
+
+@pytest.mark.asyncio
+async def test_registration_rejects_unresolvable_host(http_client):
+    user_id = await _create_user(http_client)
+    resp = await http_client.post("/webhooks", json={"url": "https://no-such-host.invalid/hook", "user_id": user_id})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Webhook host does not resolve"
+
+
+@pytest.mark.asyncio
+async def test_rebound_host_is_blocked_at_delivery(http_client, monkeypatch, fake_dns):
+    monkeypatch.setattr(dispatcher_module, "enqueue_website_job", _completing_website_job)
+    user_id = await _create_user(http_client)
+    hook = (await http_client.post("/webhooks", json={"url": "https://rebind.example.com/hook", "user_id": user_id, "events": ["batch.finished"]})).json()
+    try:
+        await http_client.post(
+            "/batch-convert",
+            json={"user_id": user_id, "operations": [{"url": "https://rebind-site.example.com/", "target_format": "site_bundle"}]},
+        )
+        await job_dispatcher.drain()
+
+        # После регистрации имя перепривязано на адрес метаданных облака
+        fake_dns["rebind.example.com"] = ["169.254.169.254"]
+        receiver = _Receiver()
+        transport = PublicOnlyTransport(httpx.MockTransport(receiver))
+        assert await WebhookDispatcher(transport=transport).run_once() == 1
+        assert receiver.requests == []
+        [delivery] = (await http_client.get(f"/webhooks/{hook['id']}/deliveries", params={"user_id": user_id})).json()
+        # Постоянная ошибка: без повторов
+        assert delivery["status"] == "dead" and delivery["last_error"].startswith("blocked address")
+    finally:
+        await http_client.delete(f"/webhooks/{hook['id']}", params={"user_id": user_id})
@@ -0,0 +1,64 @@
+# Руководство к файлу (TESTS/unit/test_atomic_output_unit.py)
+# Назначение:
+# - Unit-тесты идемпотентной записи результатов (CONVERT/cancellation.py): atomic_output
+#   ставит файл на место только целиком, sweep_partials убирает старые временные файлы;
+#   сборка задачи перезапуска по строке операции (CONVERT/lease_reaper.spec_from_row).
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from BACKEND.CONVERT.cancellation import atomic_output, bind_artifacts, partial_path, sweep_partials
+from BACKEND.CONVERT.lease_reaper import spec_from_row
+
+
+def test_atomic_output_promotes_whole_file(tmp_path) -> None:
+    dst = tmp_path / "report.pdf"
+    artifacts: list = []
+    bind_artifacts(artifacts)
+    try:
+        with atomic_output(str(dst)) as tmp:
+            assert tmp.endswith(".pdf") and ".part-" in tmp
+            with open(tmp, "wb") as fh:
+                fh.write(b"v1")
+            assert not dst.exists()
+        assert dst.read_bytes() == b"v1"
+        assert artifacts == [str(dst)]
+
+        # Повтор: ошибка посреди записи не портит готовый файл
+        with pytest.raises(RuntimeError):
+            with atomic_output(str(dst)) as tmp:
+                with open(tmp, "wb") as fh:
+                    fh.write(b"half")
+                raise RuntimeError("worker died")
+        assert dst.read_bytes() == b"v1"
+        assert sorted(os.listdir(tmp_path)) == ["report.pdf"]
+    finally:
+        bind_artifacts(None)  # type: ignore[arg-type]
+
+
+def test_sweep_partials_removes_only_stale_temp_files(tmp_path) -> None:
+    stale = partial_path(str(tmp_path / "a.graph.json"))
+    fresh = partial_path(str(tmp_path / "b.docx"))
+    for path in (stale, fresh, str(tmp_path / "c.pdf")):
+        open(path, "wb").close()
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+    os.utime(tmp_path / "c.pdf", (old, old))
+    assert sweep_partials(str(tmp_path), older_than_sec=600) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(fresh), "c.pdf"])
+    assert sweep_partials(str(tmp_path / "missing"), older_than_sec=1) == 0
+
+
+def test_spec_from_row() -> None:
+    base = {"operation_id": 1, "user_id": 2, "batch_id": None, "file_id": None, "new_format_id": 6, "source_url": None, "source_type": None, "target_type": None}
+    site = spec_from_row({**base, "source_type": "website", "source_url": "https://a.example.com/"})
+    assert site is not None and site.kind == "website" and site.url == "https://a.example.com/"
+    assert spec_from_row({**base, "source_type": "website"}) is None
+    graph = spec_from_row({**base, "file_id": 5, "target_type": "graph"})
+    assert graph is not None and graph.kind == "graph" and graph.source_file_id == 5
+    assert spec_from_row({**base, "file_id": 5, "target_type": "document"}).kind == "file"
+    assert spec_from_row(base) is None
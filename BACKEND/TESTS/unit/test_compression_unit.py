@@ -0,0 +1,45 @@
+# Руководство к файлу (TESTS/unit/test_compression_unit.py)
+# Назначение:
+# - Unit-тесты FAST_API/compression.py: выбор кодировки по Accept-Encoding и LRU сжатых тел.
+
+from __future__ import annotations
+
+import gzip
+
+from BACKEND.FAST_API import compression
+from BACKEND.FAST_API.compression import _CompressedCache, choose_encoding, compress
+
+
+def test_choose_encoding_respects_q_values(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("deflate") is None
+    assert choose_encoding("") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding("*, gzip;q=0") is None
+    assert choose_encoding("br") is None  # brotli не установлен
+
+
+def test_choose_encoding_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_gzip_output_is_deterministic():
+    body = b'{"nodes": []}' * 100
+    assert compress(body, "gzip") == compress(body, "gzip")
+    assert gzip.decompress(compress(body, "gzip")) == body
+
+
+def test_compressed_cache_evicts_by_size():
+    cache = _CompressedCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # a стал самым свежим
+    cache.put("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
@@ -0,0 +1,67 @@
+# Руководство к файлу (TESTS/unit/test_cpu_pool_unit.py)
+# Назначение:
+# - Unit-тесты CONVERT/cpu_pool.py: результат и исключения из дочернего процесса,
+#   завершение процесса при отмене ожидающей задачи (join вне event loop) и замена его новым.
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from BACKEND.CONVERT.cpu_pool import _ProcessPool
+
+
+@pytest.mark.asyncio
+async def test_process_pool_returns_results_and_errors():
+    pool = _ProcessPool(1)
+    try:
+        assert await pool.run(pow, (2, 10)) == 1024
+        with pytest.raises(ValueError):
+            await pool.run(int, ("not a number",))
+        # Исключение в функции не убивает процесс
+        assert pool.killed == 0
+        assert len(pool._all) == 1
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancel_terminates_worker_process():
+    pool = _ProcessPool(1)
+    try:
+        task = asyncio.create_task(pool.run(time.sleep, (30,)))
+        await asyncio.sleep(0.5)
+        (worker,) = pool._all
+        assert worker.alive()
+        join_threads = []
+        join = worker.process.join
+        worker.process.join = lambda timeout=None: join_threads.append(threading.current_thread()) or join(timeout)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.gather(*pool._reaping)
+        assert not worker.alive()
+        assert join_threads and threading.main_thread() not in join_threads
+        assert pool.killed == 1
+        # Слот свободен, следующий вызов поднимает новый процесс
+        assert await asyncio.wait_for(pool.run(pow, (3, 3)), 30) == 27
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_prestart_spawns_warm_workers_up_to_size():
+    pool = _ProcessPool(2)
+    try:
+        # Отсутствующий модуль прогрева не роняет процесс
+        assert pool.prestart(("json", "vkmax_missing_module")) == 2
+        assert pool.prestart(("json",)) == 0
+        assert await pool.run(pow, (3, 3)) == 27
+        assert len(pool._all) == 2
+    finally:
+        pool.shutdown()
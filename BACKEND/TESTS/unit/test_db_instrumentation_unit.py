@@ -0,0 +1,98 @@
+# Руководство к файлу (TESTS/unit/test_db_instrumentation_unit.py)
+# Назначение:
+# - Unit-тесты для DATABASE/instrumentation.py: подсчёт запросов через capture_queries,
+#   журнал медленных запросов и агрегаты по маршрутам; slow_count без ограничения
+#   примеров; фоновая задача из запроса не пишет в его счётчики.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from BACKEND.DATABASE import instrumentation
+
+
+@pytest.mark.asyncio
+async def test_capture_queries_counts_statements(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'instr.sqlite3'}")
+    instrumentation.instrument_engine(engine)
+    try:
+        with instrumentation.capture_queries() as stats:
+            async with engine.connect() as conn:
+                for _ in range(3):
+                    await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    assert stats.count == 3
+    assert stats.total_ms >= 0.0
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_and_aggregated(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("VKMAX_DB_SLOW_QUERY_MS", "0")
+    instrumentation.reset()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'slow.sqlite3'}")
+    instrumentation.instrument_engine(engine)
+    try:
+        stats, token = instrumentation.begin_request(route="/unit")
+        instrumentation.tag_request(operation_id=42)
+        with caplog.at_level(logging.WARNING, logger="vkmax.database.sql"):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        instrumentation.end_request(token)
+    finally:
+        await engine.dispose()
+
+    assert len(stats.slow) == 1
+    assert "operation_id=42" in caplog.text
+    agg = instrumentation.snapshot()["/unit"]
+    assert agg["requests"] == 1
+    assert agg["queries"] == 1
+    assert agg["slow_queries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_count_is_not_capped_by_examples(tmp_path, monkeypatch):
+    monkeypatch.setenv("VKMAX_DB_SLOW_QUERY_MS", "0")
+    instrumentation.reset()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'many.sqlite3'}")
+    instrumentation.instrument_engine(engine)
+    total = instrumentation._MAX_SLOW_PER_REQUEST + 5
+    try:
+        stats, token = instrumentation.begin_request(route="/many")
+        async with engine.connect() as conn:
+            for _ in range(total):
+                await conn.execute(text("SELECT 1"))
+        instrumentation.end_request(token)
+    finally:
+        await engine.dispose()
+
+    assert len(stats.slow) == instrumentation._MAX_SLOW_PER_REQUEST
+    assert stats.slow_count == total
+    assert instrumentation.snapshot()["/many"]["slow_queries"] == total
+
+
+@pytest.mark.asyncio
+async def test_background_task_does_not_inherit_request_stats(tmp_path):
+    instrumentation.reset()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bg.sqlite3'}")
+    instrumentation.instrument_engine(engine)
+
+    async def _job() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+
+    try:
+        with instrumentation.capture_queries() as stats:
+            await asyncio.create_task(_job(), context=instrumentation.background_context())
+    finally:
+        await engine.dispose()
+
+    assert stats.count == 0
+    assert instrumentation.snapshot()["background"]["queries"] >= 2
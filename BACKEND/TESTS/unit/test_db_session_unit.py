@@ -0,0 +1,92 @@
+# Руководство к файлу (TESTS/unit/test_db_session_unit.py)
+# Назначение:
+# - Unit-тесты для DATABASE/session.py: чтение EngineSettings из окружения и
+#   применение PRAGMA SQLite фабрикой create_engine_for_url.
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+from BACKEND.DATABASE.session import EngineSettings, create_engine_for_url
+
+
+def test_engine_settings_from_env(monkeypatch):
+    monkeypatch.setenv("VKMAX_DB_POOL_SIZE", "3")
+    monkeypatch.setenv("VKMAX_DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("VKMAX_DB_STATEMENT_TIMEOUT_MS", "not-a-number")
+
+    settings = EngineSettings.from_env()
+
+    assert settings.pool_size == 3
+    assert settings.pool_pre_ping is False
+    # Некорректное значение не ломает запуск, берётся значение по умолчанию
+    assert settings.statement_timeout_ms == EngineSettings().statement_timeout_ms
+
+
+@pytest.mark.asyncio
+async def test_sqlite_engine_applies_pragmas(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pragmas.sqlite3'}"
+    engine = create_engine_for_url(url, EngineSettings(sqlite_busy_timeout_ms=1234))
+    try:
+        async with engine.connect() as conn:
+            journal = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            synchronous = (await conn.execute(text("PRAGMA synchronous"))).scalar()
+            busy = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+    finally:
+        await engine.dispose()
+
+    assert str(journal).lower() == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy == 1234
+
+
+@pytest.mark.asyncio
+async def test_baseline_profile_keeps_sqlite_defaults(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'baseline.sqlite3'}"
+    engine = create_engine_for_url(url, EngineSettings(profile="baseline"))
+    try:
+        async with engine.connect() as conn:
+            journal = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+    finally:
+        await engine.dispose()
+
+    assert str(journal).lower() == "delete"
+
+
+def test_recent_writes_window_and_reference_keys():
+    from types import SimpleNamespace
+
+    from BACKEND.DATABASE.session import RecentWrites
+
+    journal = RecentWrites()
+    op = SimpleNamespace(__tablename__="operations", id=7, file_id=3, user_id=None)
+    journal.mark(RecentWrites.keys_for(op))
+
+    assert journal.is_recent("operations", "7", window_sec=60)
+    assert journal.is_recent("files", 3, window_sec=60)
+    assert not journal.is_recent("users", "None", window_sec=60)
+    assert not journal.is_recent("operations", 7, window_sec=0)
+
+
+def test_read_session_routes_fresh_entities_to_primary(monkeypatch):
+    from types import SimpleNamespace
+
+    from BACKEND.DATABASE import session as db_session
+
+    replica_factory = object()
+    monkeypatch.setattr(db_session, "replica_session_factory", replica_factory)
+    db_session.recent_writes.clear()
+
+    def make_request(path_params=None, headers=None):
+        return SimpleNamespace(path_params=path_params or {}, query_params={}, headers=headers or {})
+
+    assert db_session.select_read_session_factory(make_request({"operation_id": "42"})) is replica_factory
+
+    db_session.recent_writes.mark({("operations", "42")})
+    assert db_session.select_read_session_factory(make_request({"operation_id": "42"})) is db_session.async_session_factory
+    assert (
+        db_session.select_read_session_factory(make_request(headers={"x-consistency": "strong"}))
+        is db_session.async_session_factory
+    )
+    db_session.recent_writes.clear()
@@ -0,0 +1,57 @@
+# Руководство к файлу (TESTS/unit/test_eta_estimator_unit.py)
+# Назначение:
+# - Unit-тесты для CONVERT/eta_estimator.py: точность потокового квантиля P²,
+#   корзины размера/страниц и откат на грубые корзины при малой истории.
+
+from __future__ import annotations
+
+import random
+
+from BACKEND.CONVERT.eta_estimator import EtaEstimator, P2Quantile, bucket_key
+
+
+def test_p2_quantile_tracks_exact_quantiles():
+    rnd = random.Random(42)
+    values = [rnd.expovariate(1 / 10.0) for _ in range(5000)]
+    p50, p90 = P2Quantile(0.5), P2Quantile(0.9)
+    for v in values:
+        p50.add(v)
+        p90.add(v)
+
+    ordered = sorted(values)
+    exact50 = ordered[len(ordered) // 2]
+    exact90 = ordered[int(len(ordered) * 0.9)]
+    assert abs(p50.value() - exact50) / exact50 < 0.05
+    assert abs(p90.value() - exact90) / exact90 < 0.05
+
+
+def test_p2_quantile_small_samples_are_exact():
+    q = P2Quantile(0.5)
+    assert q.value() is None
+    for v in (3.0, 1.0, 2.0):
+        q.add(v)
+    assert q.value() == 2.0
+
+
+def test_bucket_key_sizes_and_pages():
+    assert bucket_key("pdf", "docx", 10 * 1024, None) == ("pdf", "docx", "<64K", "na")
+    assert bucket_key("pdf", "docx", 50 * 1024 * 1024, None)[2] == ">=16M"
+    assert bucket_key("site_bundle", "pdf", None, 1500) == ("site_bundle", "pdf", "na", ">1000")
+    assert bucket_key(None, None, None, None) == ("na", "na", "na", "na")
+
+
+def test_run_quantiles_fall_back_to_coarser_buckets(monkeypatch):
+    monkeypatch.setenv("VKMAX_ETA_DEFAULT_SEC", "7")
+    est = EtaEstimator()
+    assert est.run_quantiles(bucket_key("pdf", "docx", 1000, None)) == (7.0, 7.0)
+
+    for seconds in (1.0, 2.0, 3.0):
+        est.observe(bucket_key("pdf", "docx", 1000, None), seconds)
+    # Точная корзина
+    assert est.run_quantiles(bucket_key("pdf", "docx", 1000, None))[0] == 2.0
+    # Другой размер — откат на (pdf, docx, *, *)
+    assert est.run_quantiles(bucket_key("pdf", "docx", 10 * 1024 * 1024, None))[0] == 2.0
+    # Другой источник — откат на (*, docx, *, *)
+    assert est.run_quantiles(bucket_key("docx", "docx", 1000, None))[0] == 2.0
+    # Другой целевой формат — значение по умолчанию
+    assert est.run_quantiles(bucket_key("pdf", "graph", 1000, None))[0] == 7.0
@@ -0,0 +1,62 @@
+# Руководство к файлу (TESTS/unit/test_http_cache_unit.py)
+# Назначение:
+# - Unit-тесты FAST_API/http_cache.py: TTL и объём ResponseCache, сброс по пространству
+#   и префиксу ключа, разбор If-None-Match / If-Modified-Since.
+
+from __future__ import annotations
+
+from email.utils import formatdate
+
+from starlette.requests import Request
+
+from BACKEND.FAST_API.http_cache import ResponseCache, is_not_modified, make_etag
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _request(**headers: str) -> Request:
+    raw = [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = ResponseCache(max_bytes=1024, clock=clock)
+    entry = cache.put("formats", "all", b"[1]", ttl_sec=10)
+    assert entry.etag == make_etag(b"[1]")
+    assert cache.get("formats", "all") is entry
+    clock.now += 10
+    assert cache.get("formats", "all") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_size_budget_and_prefix_invalidation():
+    cache = ResponseCache(max_bytes=8)
+    cache.put("graph", ("1", 10, 1), b"aaaa", ttl_sec=60)
+    cache.put("graph", ("2", 11, 1), b"bbbb", ttl_sec=60)
+    cache.put("formats", "all", b"cc", ttl_sec=60)
+    assert cache.get("graph", ("1", 10, 1)) is None  # вытеснена по объёму
+    assert cache.invalidate("graph", ("2",)) == 1
+    assert cache.get("formats", "all") is not None
+    assert cache.invalidate("formats") == 1
+    cache.put("formats", "all", b"x" * 9, ttl_sec=60)  # больше бюджета — не кэшируется
+    assert cache.get("formats", "all") is None
+
+
+def test_conditional_headers():
+    etag = '"abc"'
+    assert is_not_modified(_request(if_none_match='"x", W/"abc"'), etag, 0.0)
+    assert is_not_modified(_request(if_none_match="*"), etag, 0.0)
+    assert not is_not_modified(_request(if_none_match='"x"'), etag, 0.0)
+    # If-None-Match важнее If-Modified-Since
+    assert not is_not_modified(_request(if_none_match='"x"', if_modified_since=formatdate(2000.0, usegmt=True)), etag, 1000.0)
+    assert is_not_modified(_request(if_modified_since=formatdate(1000.0, usegmt=True)), etag, 1000.5)
+    assert not is_not_modified(_request(if_modified_since=formatdate(999.0, usegmt=True)), etag, 1000.0)
+    assert not is_not_modified(_request(if_modified_since="garbage"), etag, 1000.0)
+    assert not is_not_modified(_request(), etag, 1000.0)
@@ -0,0 +1,142 @@
+# Руководство к файлу (TESTS/unit/test_llm_response_cache_unit.py)
+# Назначение:
+# - Unit-тесты кэша ответов LLM (LLM_SERVICE/response_cache.py): ключ по модели,
+#   температуре, промпту и task_id; disk backend (TTL, LRU по объёму), db backend
+#   (таблица llm_response_cache); DocumentGenerator не вызывает LLM при попадании и
+#   удаляет закэшированный ответ, не прошедший валидацию.
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, List
+
+import pytest
+from sqlalchemy import delete
+
+from BACKEND.DATABASE.models import LlmCacheEntry
+from BACKEND.DATABASE.session import async_session_factory
+from BACKEND.LLM_SERVICE.document_generator import DocumentGenerator
+from BACKEND.LLM_SERVICE.response_cache import (
+    CACHE_REQUESTS,
+    DatabaseBackend,
+    DiskBackend,
+    LlmResponseCache,
+    cache_key,
+)
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Llm:
+    provider = "deepseek"
+    model_name = "test/model"
+    temperature = 0.2
+
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+
+    async def generate(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return f'{{"answer": "{len(self.prompts)}"}}'
+
+
+class _Cleaner:
+    async def clean(self, text: str, doc_type: str) -> str:
+        return text
+
+
+class _Validator:
+    def __init__(self) -> None:
+        self.reject = False
+
+    async def validate(self, data: Any, doc_type: str, prompt_id: str, rules: Any | None = None) -> Any:
+        if self.reject:
+            raise RuntimeError("schema changed")
+        return data
+
+
+def _generator(llm: _Llm, validator: _Validator, cache: LlmResponseCache) -> DocumentGenerator:
+    registry = {"graph": {"prompt_template": "Text: {text}", "doc_type": "json"}}
+    return DocumentGenerator(llm, _Cleaner(), validator, registry=registry, cache=cache)  # type: ignore[arg-type]
+
+
+async def test_cache_key_covers_model_temperature_prompt_and_task() -> None:
+    base = cache_key("m", 0.2, "prompt", "graph")
+    assert base == cache_key("m", 0.2, "prompt", "graph")
+    assert len({base, cache_key("m2", 0.2, "prompt", "graph"), cache_key("m", 0.7, "prompt", "graph"),
+                cache_key("m", 0.2, "prompt!", "graph"), cache_key("m", 0.2, "prompt", "other")}) == 5
+
+
+async def test_disk_backend_ttl_and_lru(tmp_path) -> None:
+    backend = DiskBackend(str(tmp_path), max_bytes=10 * 1024, ttl_sec=3600)
+    for i in range(3):
+        await backend.put(f"{i:064d}", "x" * 3000, model="m", task_id="t")
+    assert await backend.get(f"{0:064d}") == "x" * 3000
+
+    # Использование обновляет mtime: при вытеснении уходит самая давно использованная запись
+    now = time.time()
+    for i, age in enumerate((10, 300, 200)):
+        os.utime(backend._path(f"{i:064d}"), (now - age, now - age))
+    await backend.put(f"{3:064d}", "y" * 3000, model="m", task_id="t")
+    assert await backend.get(f"{1:064d}") is None
+    assert await backend.get(f"{0:064d}") is not None
+    assert await backend.get(f"{3:064d}") == "y" * 3000
+
+    expired = DiskBackend(str(tmp_path), max_bytes=10 * 1024, ttl_sec=0.01)
+    time.sleep(0.05)
+    assert await expired.get(f"{3:064d}") is None
+    assert not os.path.exists(backend._path(f"{3:064d}"))
+
+
+async def test_db_backend_roundtrip_and_eviction() -> None:
+    async with async_session_factory() as session:
+        await session.execute(delete(LlmCacheEntry))
+        await session.commit()
+    backend = DatabaseBackend(max_bytes=5000, ttl_sec=3600)
+    await backend.put("a" * 64, "1" * 2000, model="m", task_id="t")
+    await backend.put("b" * 64, "2" * 2000, model="m", task_id="t")
+    assert await backend.get("a" * 64) == "1" * 2000  # a теперь использован позже b
+    removed = await backend.put("c" * 64, "3" * 2000, model="m", task_id="t")
+    assert removed == 1
+    assert await backend.get("b" * 64) is None
+    assert await backend.get("a" * 64) == "1" * 2000
+    await backend.delete("a" * 64)
+    assert await backend.get("a" * 64) is None
+
+
+async def test_document_generator_serves_repeat_from_cache(tmp_path) -> None:
+    cache = LlmResponseCache(DiskBackend(str(tmp_path), max_bytes=1 << 20, ttl_sec=3600))
+    llm, validator = _Llm(), _Validator()
+    hits = CACHE_REQUESTS.labels("disk", "hit")
+    hits_before = hits.value
+
+    first = await _generator(llm, validator, cache).worker_work("graph", text="doc")
+    second = await _generator(llm, validator, cache).worker_work("graph", text="doc")
+    assert first == second
+    assert len(llm.prompts) == 1
+    assert hits.value == hits_before + 1
+
+    # Другой текст — другой ключ
+    await _generator(llm, validator, cache).worker_work("graph", text="other")
+    assert len(llm.prompts) == 2
+
+    # Закэшированный ответ, не прошедший валидацию, удаляется и генерируется заново
+    validator.reject = True
+    with pytest.raises(RuntimeError):
+        await _generator(llm, validator, cache).worker_work("graph", text="doc")
+    validator.reject = False
+    key = cache_key(llm.model_name, llm.temperature, "Text: doc", "graph")
+    assert await cache.get(key) is None
+
+
+async def test_mock_provider_is_not_cached(tmp_path) -> None:
+    llm = _Llm()
+    llm.provider = "mock"
+    cache = LlmResponseCache(DiskBackend(str(tmp_path), max_bytes=1 << 20, ttl_sec=3600))
+    gen = _generator(llm, _Validator(), cache)
+    await gen.worker_work("graph", text="doc")
+    await gen.worker_work("graph", text="doc")
+    assert len(llm.prompts) == 2
+    assert os.listdir(tmp_path) == []
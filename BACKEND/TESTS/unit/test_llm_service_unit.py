@@ -2,14 +2,22 @@
 # Назначение:
 # - Unit-тесты для BACKEND.LLM_SERVICE.llm_service.LlmService.
 # - Проверяют mock-провайдер и поведение при некорректной конфигурации окружения.
+# - Общий HTTP-клиент (LLM_SERVICE/http_client.py): один клиент на event loop для всех
+#   вызовов, температура на вызов без нового LlmService, таймауты и HTTP/2 из окружения.
 
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import json
 import os
 
+import httpx
 import pytest
 
+from BACKEND.LLM_SERVICE import http_client
 from BACKEND.LLM_SERVICE.llm_service import LlmService
+from BACKEND.LLM_SERVICE.router import LLMRouter
 
 
 pytestmark = pytest.mark.asyncio
@@ -63,3 +71,77 @@ async def test_llm_service_deepseek_without_api_key_raises_on_init(monkeypatch:
 
     with pytest.raises(RuntimeError):
         LlmService(api_key=None)
+
+
+async def test_deepseek_calls_share_one_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Все вызовы идут через один клиент; температура роутера уходит в payload только этого вызова."""
+
+    monkeypatch.setenv("VKMAX_LLM_PROVIDER", "deepseek")
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, json={"choices": [{"message": {"content": " ok "}}]})
+
+    built = []
+
+    def build() -> httpx.AsyncClient:
+        built.append(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return built[-1]
+
+    monkeypatch.setattr(http_client, "build_client", build)
+    await http_client.aclose()
+    try:
+        service = LlmService(api_key="test-key", base_url="https://llm.test/api/v1", temperature=0.2)
+        router = LLMRouter(llm_service=service)
+        assert await service.generate("a") == "ok"
+        await asyncio.gather(service.generate("b"), router.send([{"role": "user", "content": "c"}], temperature=0.9))
+
+        assert len(built) == 1
+        assert sorted(p["temperature"] for p in seen) == [0.2, 0.2, 0.9]
+        assert service.temperature == 0.2
+    finally:
+        await http_client.aclose()
+    assert built[0].is_closed
+
+
+async def test_shared_client_is_per_event_loop() -> None:
+    """Клиент из другого event loop не переиспользуется (другой asyncio.run, воркер после fork)."""
+
+    await http_client.aclose()
+    first = http_client.get_client()
+    assert http_client.get_client() is first
+
+    other = await asyncio.to_thread(lambda: asyncio.run(_client_in_new_loop()))
+    assert other is not first
+    # Общий клиент теперь принадлежит другому loop: здесь создаётся свой
+    again = http_client.get_client()
+    assert again is not first and again is not other
+    await http_client.aclose()
+    assert again.is_closed
+    await first.aclose()
+
+
+async def _client_in_new_loop() -> httpx.AsyncClient:
+    client = http_client.get_client()
+    await client.aclose()
+    return client
+
+
+async def test_client_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("VKMAX_LLM_CONNECT_TIMEOUT_SEC", "3")
+    monkeypatch.setenv("VKMAX_LLM_READ_TIMEOUT_SEC", "45")
+    monkeypatch.setenv("VKMAX_LLM_POOL_TIMEOUT_SEC", "2")
+    monkeypatch.setenv("VKMAX_LLM_HTTP2", "off")
+
+    client = http_client.build_client()
+    try:
+        assert client.timeout.connect == 3.0
+        assert client.timeout.read == 45.0
+        assert client.timeout.pool == 2.0
+    finally:
+        await client.aclose()
+    assert http_client.http2_enabled() is False
+
+    monkeypatch.setenv("VKMAX_LLM_HTTP2", "auto")
+    assert http_client.http2_enabled() is (importlib.util.find_spec("h2") is not None)
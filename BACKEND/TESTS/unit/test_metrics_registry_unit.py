@@ -0,0 +1,58 @@
+# Руководство к файлу (TESTS/unit/test_metrics_registry_unit.py)
+# Назначение:
+# - Unit-тесты METRICS/registry.py: накопительные корзины гистограммы, экранирование
+#   меток, CallbackMetric, повторная регистрация и изоляция сломанного источника.
+
+from __future__ import annotations
+
+import pytest
+
+from BACKEND.METRICS import Registry
+from BACKEND.METRICS.registry import CallbackMetric, Metric
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    hist = reg.register(Metric("t_seconds", "test", "histogram", ("route",), buckets=(0.1, 1.0)))
+    child = hist.labels("/a")
+    for value in (0.05, 0.1, 0.5, 2.0):
+        child.observe(value)
+
+    lines = reg.render().splitlines()
+    assert 't_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 't_seconds_count{route="/a"} 4' in lines
+    assert 't_seconds_sum{route="/a"} 2.65' in lines
+    assert "# TYPE t_seconds histogram" in lines
+
+
+def test_counter_labels_are_escaped_and_checked():
+    reg = Registry()
+    total = reg.register(Metric("t_total", "test", "counter", ("path",)))
+    total.labels('a"b\\c\nd').inc(3)
+
+    assert 't_total{path="a\\"b\\\\c\\nd"} 3' in reg.render().splitlines()
+    with pytest.raises(ValueError):
+        total.labels("x", "y")
+
+
+def test_duplicate_registration_returns_existing_metric():
+    reg = Registry()
+    first = reg.register(Metric("t_total", "test", "counter"))
+    assert reg.register(Metric("t_total", "test", "counter")) is first
+    with pytest.raises(ValueError):
+        reg.register(Metric("t_total", "test", "gauge"))
+
+
+def test_callback_metric_is_read_at_scrape_time_and_failures_are_isolated():
+    reg = Registry()
+    depth = {"convert": 2}
+    reg.register(CallbackMetric("t_depth", "test", "gauge", ("pool",), lambda: {(k,): v for k, v in depth.items()}))
+    reg.register(CallbackMetric("t_broken", "test", "gauge", (), lambda: 1 / 0))
+
+    assert 't_depth{pool="convert"} 2' in reg.render().splitlines()
+    depth["convert"] = 5
+    text = reg.render()
+    assert 't_depth{pool="convert"} 5' in text.splitlines()
+    assert "# t_broken collection failed: ZeroDivisionError" in text
@@ -0,0 +1,47 @@
+# Руководство к файлу (TESTS/unit/test_progress_bus_unit.py)
+# Назначение:
+# - Unit-тесты для CONVERT/progress_bus.py: фильтрация подписок по operation_id,
+#   вытеснение старых событий у медленного подписчика, publish_progress.
+
+from __future__ import annotations
+
+import pytest
+
+from BACKEND.CONVERT.progress_bus import ProgressBus, is_final
+
+
+@pytest.mark.asyncio
+async def test_subscription_receives_only_its_operations():
+    bus = ProgressBus()
+    with bus.subscribe([1, 2]) as sub, bus.subscribe() as all_sub:
+        bus.publish({"operation_id": 1, "type": "status", "status": "processing"})
+        bus.publish({"operation_id": 3, "type": "status", "status": "processing"})
+        sub.add([3])
+        sub.remove([1])
+        bus.publish({"operation_id": 1, "type": "status", "status": "completed"})
+        bus.publish({"operation_id": 3, "type": "status", "status": "completed"})
+
+        got = [await sub.get(timeout=0.1) for _ in range(2)]
+        assert [(e["operation_id"], e["status"]) for e in got] == [(1, "processing"), (3, "completed")]
+        assert await sub.get(timeout=0.01) is None
+        assert all_sub.queue.qsize() == 4
+    assert bus.subscribers == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_events():
+    bus = ProgressBus()
+    with bus.subscribe([7], maxsize=2) as sub:
+        for pages in (1, 2, 3):
+            bus.publish_progress(7, "crawl", progress=pages, pages=pages)
+        assert sub.dropped == 1
+        assert bus.dropped == 1
+        first = await sub.get(timeout=0.1)
+        assert first["type"] == "progress" and first["stage"] == "crawl" and first["pages"] == 2
+
+
+def test_is_final():
+    assert is_final({"type": "status", "status": "completed"})
+    assert is_final({"type": "status", "status": "failed"})
+    assert not is_final({"type": "status", "status": "processing"})
+    assert not is_final({"type": "stage", "status": "completed"})
@@ -0,0 +1,42 @@
+# Руководство к файлу (TESTS/unit/test_rate_limit_unit.py)
+# Назначение:
+# - Unit-тесты token bucket: арифметика take_tokens (DATABASE/CACHE_MANAGER/rate_limit.py),
+#   in-memory корзины и правила классов из окружения (FAST_API/rate_limit.py).
+
+from __future__ import annotations
+
+import pytest
+
+from BACKEND.DATABASE.CACHE_MANAGER.rate_limit import take_tokens
+from BACKEND.FAST_API.rate_limit import MemoryBackend, limit_rule
+
+
+def test_take_tokens_refills_and_reports_wait():
+    # Полная корзина: списываем
+    assert take_tokens(2.0, 0.0, 0.0, rate=1.0, burst=2.0, cost=1.0) == (1.0, 0.0)
+    # Пусто: ждать ровно недостающее / rate, остаток не списывается
+    tokens, wait = take_tokens(0.0, 10.0, 10.5, rate=1.0, burst=2.0, cost=1.0)
+    assert tokens == pytest.approx(0.5) and wait == pytest.approx(0.5)
+    # Пополнение не выше burst
+    assert take_tokens(0.0, 0.0, 100.0, rate=1.0, burst=2.0, cost=1.0) == (1.0, 0.0)
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_burst_then_throttle_and_prune():
+    backend = MemoryBackend(max_keys=1)
+    waits = [await backend.take("convert:user:1", rate=0.5, burst=2, cost=1, now=0.0) for _ in range(3)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(2.0)
+    assert await backend.take("convert:user:1", rate=0.5, burst=2, cost=1, now=2.0) == 0.0
+
+    # Вторая корзина переполняет словарь: полная (неактивная) первая вычищается
+    await backend.take("convert:user:2", rate=0.5, burst=2, cost=1, now=100.0)
+    assert list(backend._buckets) == ["convert:user:2"]
+
+
+def test_limit_rule_reads_env(monkeypatch):
+    monkeypatch.setenv("VKMAX_RATE_WEBSITE_PER_MIN", "30")
+    monkeypatch.setenv("VKMAX_RATE_WEBSITE_BURST", "0")
+    rule = limit_rule("website")
+    assert rule.rate == pytest.approx(0.5)
+    assert rule.burst == 1.0  # запас не меньше одного запроса
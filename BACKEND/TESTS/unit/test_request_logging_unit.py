@@ -0,0 +1,141 @@
+# Руководство к файлу (TESTS/unit/test_request_logging_unit.py)
+# Назначение:
+# - Unit-тесты журнала запросов (FAST_API/request_logging.py): выборка, обязательная
+#   запись 5xx и медленных запросов, захват тела с ограничением размера без повторного
+#   чтения, 5xx и медленные при WARNING, пропуск при выключенном уровне; вывод логов через очередь
+#   (CONVERT/logging_config.setup_logging / shutdown_logging).
+
+from __future__ import annotations
+
+import io
+import logging
+import logging.handlers
+
+import pytest
+
+from BACKEND.CONVERT import logging_config
+from BACKEND.FAST_API.request_logging import RequestLogConfig, RequestLoggingMiddleware
+
+LOGGER = "vkmax.fastapi.requests"
+
+
+def _echo_app(status: int = 200):
+    """ASGI-приложение, читающее тело целиком (как FastAPI) и отвечающее *status*."""
+
+    received = {}
+
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        received["body"] = body
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app, received
+
+
+async def _call(middleware, body: bytes, content_type: bytes = b"application/json") -> None:
+    scope = {"type": "http", "method": "POST", "path": "/convert", "query_string": b"token=secret", "headers": [(b"content-type", content_type)]}
+    chunks = [body[:10], body[10:]]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        return None
+
+    await middleware(scope, receive, send)
+
+
+@pytest.mark.asyncio
+async def test_sampled_request_logs_line_and_truncated_body(caplog):
+    caplog.set_level(logging.DEBUG, logger=LOGGER)
+    app, received = _echo_app()
+    mw = RequestLoggingMiddleware(app, RequestLogConfig(sample_rate=0.5, body_max_bytes=16), rng=lambda: 0.1)
+    body = b'{"user_id": "1", "target_format": "pdf"}'
+    await _call(mw, body)
+
+    assert received["body"] == body  # приложение получило тело целиком
+    messages = [r.getMessage() for r in caplog.records if r.name == LOGGER]
+    assert messages[0].startswith("POST /convert -> 200 in ")
+    assert "token=secret" not in messages[0]
+    assert messages[1] == f'request body ({len(body)} bytes, truncated): {body[:16].decode()}'
+
+
+@pytest.mark.asyncio
+async def test_unsampled_requests_skip_except_errors_and_slow(caplog):
+    caplog.set_level(logging.DEBUG, logger=LOGGER)
+    cfg = RequestLogConfig(sample_rate=0.1, slow_ms=10_000)
+    await _call(RequestLoggingMiddleware(_echo_app()[0], cfg, rng=lambda: 0.9), b"{}")
+    assert [r for r in caplog.records if r.name == LOGGER] == []
+
+    await _call(RequestLoggingMiddleware(_echo_app(503)[0], cfg, rng=lambda: 0.9), b"{}")
+    await _call(RequestLoggingMiddleware(_echo_app()[0], RequestLogConfig(sample_rate=0.0, slow_ms=0), rng=lambda: 0.9), b"{}")
+    records = [r for r in caplog.records if r.name == LOGGER]
+    assert [(r.levelno, r.getMessage().split(" in ")[0]) for r in records] == [
+        (logging.ERROR, "POST /convert -> 503"),
+        (logging.WARNING, "POST /convert -> 200"),
+    ]
+
+    # Бинарное тело не захватывается даже в выборке
+    caplog.clear()
+    await _call(RequestLoggingMiddleware(_echo_app()[0], RequestLogConfig(sample_rate=1.0), rng=lambda: 0.0), b"\x00" * 32, b"application/octet-stream")
+    assert [r.getMessage().split(" in ")[0] for r in caplog.records if r.name == LOGGER] == ["POST /convert -> 200"]
+
+
+@pytest.mark.asyncio
+async def test_disabled_level_passes_through(caplog):
+    caplog.set_level(logging.ERROR, logger=LOGGER)
+    app, received = _echo_app()
+    calls = []
+    mw = RequestLoggingMiddleware(app, RequestLogConfig(sample_rate=1.0), rng=lambda: calls.append(1) or 0.0)
+    await _call(mw, b'{"a": 1}')
+    assert received["body"] == b'{"a": 1}'
+    assert calls == [] and [r for r in caplog.records if r.name == LOGGER] == []
+
+
+@pytest.mark.asyncio
+async def test_warning_level_keeps_errors_and_slow_without_sampling(caplog):
+    caplog.set_level(logging.WARNING, logger=LOGGER)
+    calls = []
+    rng = lambda: calls.append(1) or 0.0  # noqa: E731
+    cfg = RequestLogConfig(sample_rate=1.0, slow_ms=10_000)
+    await _call(RequestLoggingMiddleware(_echo_app()[0], cfg, rng=rng), b"{}")
+    await _call(RequestLoggingMiddleware(_echo_app(503)[0], cfg, rng=rng), b"{}")
+    await _call(RequestLoggingMiddleware(_echo_app()[0], RequestLogConfig(sample_rate=1.0, slow_ms=0), rng=rng), b"{}")
+    records = [r for r in caplog.records if r.name == LOGGER]
+    assert calls == []  # выборка не делается, INFO-строки нет
+    assert [(r.levelno, r.getMessage().split(" in ")[0]) for r in records] == [
+        (logging.ERROR, "POST /convert -> 503"),
+        (logging.WARNING, "POST /convert -> 200"),
+    ]
+
+
+def test_setup_logging_writes_through_queue_listener(monkeypatch):
+    stream = io.StringIO()
+
+    def handler(formatter):
+        h = logging.StreamHandler(stream)
+        h.setFormatter(formatter)
+        return h
+
+    monkeypatch.setattr(logging_config, "_configure_handler", handler)
+    monkeypatch.setenv("VKMAX_LOG_LEVEL", "warning")
+    root = logging.getLogger()
+    try:
+        logging_config.setup_logging()
+        assert root.level == logging.WARNING
+        assert any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers)
+        logging.getLogger("vkmax.convert").info("hidden %s", "info")
+        logging.getLogger("vkmax.convert").warning("queued %s", "warning")
+        logging_config.shutdown_logging()  # дописывает очередь
+        assert "queued warning" in stream.getvalue()
+        assert "hidden" not in stream.getvalue()
+    finally:
+        monkeypatch.undo()
+        logging_config.setup_logging()
@@ -0,0 +1,104 @@
+# Руководство к файлу (TESTS/unit/test_retry_policy_unit.py)
+# Назначение:
+# - Unit-тесты CONVERT/retry_policy.py: классификация временных и постоянных ошибок
+#   (в том числе по цепочке __cause__), пауза с экспоненциальным ростом и jitter,
+#   настройки из окружения.
+
+from __future__ import annotations
+
+import contextvars
+import errno
+import random
+import sqlite3
+
+import httpx
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from BACKEND.CONVERT.converters import ConversionError
+from BACKEND.CONVERT.cpu_pool import WorkerCrashed
+from BACKEND.CONVERT.retry_policy import RetryPolicy, bind_errors, classify, note_error
+
+
+def _http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://llm.example.com/v1/chat")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+def _wrapped(cause: BaseException, message: str = "Failed to convert PDF to DOCX") -> ConversionError:
+    try:
+        raise ConversionError(message) from cause
+    except ConversionError as exc:
+        return exc
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        httpx.ConnectTimeout("timeout"),
+        _http_error(429),
+        _http_error(503),
+        TimeoutError(),
+        WorkerCrashed("cpu worker died (exitcode=-9)"),
+        OperationalError("UPDATE operations", {}, sqlite3.OperationalError("database is locked")),
+        _wrapped(OSError("wkhtmltopdf exited with non-zero code -11")),
+        _wrapped(OSError(errno.EAGAIN, "Resource temporarily unavailable")),
+        OSError(errno.EBUSY, "Device or resource busy"),
+        OSError(errno.EMFILE, "Too many open files"),
+        # Из процесса cpu_pool __cause__ не доходит — узнаём сбой рендера по тексту
+        ConversionError("Failed to render PDF via pdfkit: wkhtmltopdf exited with non-zero code -6"),
+    ],
+)
+def test_transient_errors(exc):
+    assert classify(exc) == "transient"
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        _http_error(400),
+        _http_error(401),
+        ConversionError("PDF not found: /tmp/missing.pdf"),
+        _wrapped(ImportError("No module named pdf2docx"), "pdf2docx is required"),
+        _wrapped(FileNotFoundError("missing")),
+        _wrapped(OSError(errno.ENOSPC, "No space left on device")),
+        OSError(errno.EINVAL, "Invalid argument"),
+        OSError("cannot identify image file"),
+        ValueError("bad outline"),
+        RuntimeError("LLM returned empty graph outline"),
+    ],
+)
+def test_permanent_errors(exc):
+    assert classify(exc) == "permanent"
+
+
+def test_delay_grows_exponentially_with_full_jitter():
+    policy = RetryPolicy(max_attempts=5, base_sec=2.0, max_sec=10.0)
+    rng = random.Random(7)
+    for attempt, cap in [(1, 2.0), (2, 4.0), (3, 8.0), (4, 10.0), (5, 10.0)]:
+        delays = [policy.delay(attempt, rng) for _ in range(200)]
+        assert 0.0 <= min(delays) and max(delays) <= cap
+        # Разброс на всю ширину окна, а не фиксированная пауза
+        assert max(delays) - min(delays) > cap / 2
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("VKMAX_RETRY_MAX_ATTEMPTS", "5")
+    monkeypatch.setenv("VKMAX_RETRY_BASE_SEC", "0.5")
+    monkeypatch.setenv("VKMAX_RETRY_MAX_SEC", "bad")
+    assert RetryPolicy.from_env() == RetryPolicy(max_attempts=5, base_sec=0.5, max_sec=60.0)
+    monkeypatch.setenv("VKMAX_RETRY_MAX_ATTEMPTS", "0")
+    assert RetryPolicy.from_env().max_attempts == 1
+
+
+def test_note_error_collects_only_inside_bound_context():
+    note_error(ValueError("ignored"))  # вне задачи диспетчера — ничего не делает
+
+    def _job() -> list:
+        errors: list = []
+        bind_errors(errors)
+        note_error(exc)
+        return errors
+
+    exc = ValueError("kept")
+    assert contextvars.copy_context().run(_job) == [exc]
@@ -0,0 +1,103 @@
+# Руководство к файлу (TESTS/unit/test_scheduler_unit.py)
+# Назначение:
+# - Unit-тесты CONVERT/scheduler.py: строгий приоритет классов, fair-share между
+#   пользователями с учётом стоимости, лимит на пользователя, старение и отмена ожидания.
+
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from BACKEND.CONVERT.scheduler import FairScheduler
+
+
+async def _grant_order(sched: FairScheduler, jobs: List[tuple]) -> List[str]:
+    """Занимает единственный слот, ставит jobs (name, user, priority, cost) и возвращает порядок выдачи."""
+
+    order: List[str] = []
+    blocker = await sched.acquire("blocker", priority="interactive")
+
+    async def _job(name: str, user: str, priority: str, cost: float) -> None:
+        async with sched.slot(user, priority=priority, cost=cost):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(_job(*job)) for job in jobs]
+    await asyncio.sleep(0)
+    sched.release(blocker)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_interactive_jumps_ahead_of_batch_and_background():
+    sched = FairScheduler("cpu", 1)
+    order = await _grant_order(
+        sched,
+        [("bg", "u1", "background", 1.0), ("batch", "u1", "batch", 1.0), ("ui", "u2", "interactive", 1.0)],
+    )
+    assert order == ["ui", "batch", "bg"]
+    assert sched.running == 0 and sched.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_share_interleaves_users_by_cost():
+    sched = FairScheduler("cpu", 1)
+    heavy = [(f"a{i}", "alice", "batch", 10.0) for i in range(4)]
+    light = [(f"b{i}", "bob", "batch", 1.0) for i in range(4)]
+    order = await _grant_order(sched, heavy + light)
+
+    # Пользователь с дешёвыми задачами не ждёт, пока пройдут все дорогие задачи другого
+    assert order.index("b3") < order.index("a1")
+    assert order[0] == "a0"
+
+
+@pytest.mark.asyncio
+async def test_user_limit_leaves_slots_for_others():
+    sched = FairScheduler("network", 2, user_limit=1)
+    first = await sched.acquire("alice")
+    waiter = asyncio.create_task(sched.acquire("alice"))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    other = await asyncio.wait_for(sched.acquire("bob"), timeout=1)
+    assert sched.running == 2
+    sched.release(first)
+    second = await asyncio.wait_for(waiter, timeout=1)
+    sched.release(second)
+    sched.release(other)
+    assert sched.running == 0
+
+
+@pytest.mark.asyncio
+async def test_aging_promotes_waiting_background_job():
+    sched = FairScheduler("cpu", 1, aging_sec=0.01)
+    blocker = await sched.acquire("x", priority="interactive")
+    bg = asyncio.create_task(sched.acquire("u1", priority="background"))
+    await asyncio.sleep(0.05)
+    ui = asyncio.create_task(sched.acquire("u2", priority="interactive"))
+    await asyncio.sleep(0)
+    sched.release(blocker)
+    # Фоновая задача ждала дольше 2×aging_sec и сравнялась с interactive; раньше в очереди — раньше выдана
+    ticket = await asyncio.wait_for(bg, timeout=1)
+    assert not ui.done()
+    sched.release(ticket)
+    sched.release(await asyncio.wait_for(ui, timeout=1))
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    sched = FairScheduler("cpu", 1)
+    blocker = await sched.acquire("u1")
+    waiter = asyncio.create_task(sched.acquire("u2"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert sched.queued == 0
+    sched.release(blocker)
+    assert sched.running == 0
+    ticket = await asyncio.wait_for(sched.acquire("u3"), timeout=1)
+    sched.release(ticket)
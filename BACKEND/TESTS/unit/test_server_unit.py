@@ -0,0 +1,74 @@
+# Руководство к файлу (TESTS/unit/test_server_unit.py)
+# Назначение:
+# - Unit-тесты продакшн-запуска FAST_API/server.py (выбор loop/http, число воркеров,
+#   конфиг uvicorn из Settings, общий лимитер при нескольких воркерах) и остановки
+#   диспетчера: JobDispatcher.wait_idle, after_fork.
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+
+import pytest
+
+from BACKEND.CONVERT.job_dispatcher import JobDispatcher
+from BACKEND.FAST_API import server
+from BACKEND.FAST_API.config import settings
+
+
+def test_auto_loop_and_http_prefer_uvloop_and_httptools():
+    has_uvloop = importlib.util.find_spec("uvloop") is not None
+    has_httptools = importlib.util.find_spec("httptools") is not None
+    assert server.resolve_loop("auto") == ("uvloop" if has_uvloop else "asyncio")
+    assert server.resolve_http("auto") == ("httptools" if has_httptools else "h11")
+    assert server.resolve_loop("asyncio") == "asyncio"
+    assert server.resolve_http("H11") == "h11"
+
+
+def test_worker_count_and_config_from_settings(monkeypatch):
+    assert server.worker_count(3) == 3
+    assert server.worker_count(0) >= 1
+
+    monkeypatch.setattr(settings, "server_graceful_timeout_sec", 7)
+    monkeypatch.setattr(settings, "server_http", "h11")
+    config = server.build_config(server.APP_PATH, host="127.0.0.1", port=9000, workers=2)
+    assert config.timeout_graceful_shutdown == 7
+    assert config.http == "h11"
+    assert config.workers == 2
+    assert config.access_log is False
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_drains_or_times_out():
+    dispatcher = JobDispatcher()
+    short = asyncio.create_task(asyncio.sleep(0.05))
+    dispatcher._tasks.add(short)
+    short.add_done_callback(dispatcher._tasks.discard)
+    assert await dispatcher.wait_idle(2.0) is True
+
+    long = asyncio.create_task(asyncio.sleep(10))
+    dispatcher._tasks.add(long)
+    try:
+        assert await dispatcher.wait_idle(0.05) is False
+    finally:
+        long.cancel()
+
+
+def test_after_fork_gives_worker_its_own_lease_owner():
+    dispatcher = JobDispatcher()
+    before = dispatcher.owner
+    dispatcher.after_fork()
+    assert dispatcher.owner != before
+
+
+@pytest.mark.parametrize(
+    "workers, configured, expected",
+    [(1, None, None), (4, None, "db"), (4, "memory", "db"), (4, "off", "off"), (4, "db", "db")],
+)
+def test_multiple_workers_share_rate_limit(monkeypatch, workers, configured, expected):
+    if configured is None:
+        monkeypatch.delenv("VKMAX_RATE_LIMIT", raising=False)
+    else:
+        monkeypatch.setenv("VKMAX_RATE_LIMIT", configured)
+    server.share_rate_limit(workers)
+    assert server.os.environ.get("VKMAX_RATE_LIMIT") == expected
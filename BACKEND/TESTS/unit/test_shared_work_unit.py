@@ -0,0 +1,38 @@
+# Руководство к файлу (TESTS/unit/test_shared_work_unit.py)
+# Назначение:
+# - Unit-тесты CONVERT/shared_work.py: single-flight хэширования исходников и
+#   запоминание результата/ошибки в пределах пакета.
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+
+import pytest
+
+from BACKEND.CONVERT.shared_work import SharedWork, sha256_file
+
+
+@pytest.mark.asyncio
+async def test_file_digest_computed_once_for_concurrent_callers(tmp_path):
+    path = tmp_path / "src.bin"
+    path.write_bytes(b"vkmax" * 1000)
+    shared = SharedWork()
+
+    digests = await asyncio.gather(*(shared.file_digest(str(path)) for _ in range(5)))
+
+    assert set(digests) == {hashlib.sha256(b"vkmax" * 1000).hexdigest()}
+    assert digests[0] == sha256_file(str(path))
+    assert shared.hits == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_work_is_shared_too(tmp_path):
+    shared = SharedWork()
+    missing = str(tmp_path / "missing.pdf")
+
+    with pytest.raises(FileNotFoundError):
+        await shared.file_digest(missing)
+    with pytest.raises(FileNotFoundError):
+        await shared.file_digest(missing)
+    assert shared.hits == 1
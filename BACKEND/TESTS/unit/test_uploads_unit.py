@@ -0,0 +1,72 @@
+# Руководство к файлу (TESTS/unit/test_uploads_unit.py)
+# Назначение:
+# - Unit-тесты записи загрузки (FAST_API/uploads.py): размер и sha256 считаются по ходу
+#   записи, файл появляется под заранее выбранным ключом целиком, при превышении лимита
+#   и ошибке чтения временные файлы не остаются.
+
+from __future__ import annotations
+
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from BACKEND.FAST_API.uploads import save_upload, storage_key
+
+
+class _FakeUpload:
+    """Минимальный UploadFile: read(n) отдаёт куски из памяти, после fail_after — ошибка."""
+
+    def __init__(self, data: bytes, fail_after: int | None = None) -> None:
+        self._data = data
+        self._pos = 0
+        self._fail_after = fail_after
+
+    async def read(self, size: int = -1) -> bytes:
+        if self._fail_after is not None and self._pos >= self._fail_after:
+            raise ConnectionResetError("client went away")
+        chunk = self._data[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+
+def test_storage_key_is_unique_and_strips_client_dirs(tmp_path) -> None:
+    first = storage_key(str(tmp_path), "../../etc/passwd")
+    second = storage_key(str(tmp_path), "C:\\docs\\report.pdf")
+    assert os.path.dirname(first) == str(tmp_path.resolve())
+    assert first.endswith("__passwd")
+    assert second.endswith("__report.pdf")
+    assert storage_key(str(tmp_path), "report.pdf") != storage_key(str(tmp_path), "report.pdf")
+
+
+@pytest.mark.asyncio
+async def test_save_upload_hashes_and_sizes_stream(tmp_path) -> None:
+    data = os.urandom(3 * 1024 + 17)
+    dst = storage_key(str(tmp_path), "doc.pdf")
+
+    stored = await save_upload(_FakeUpload(data), dst, max_bytes=1024 * 1024, chunk_size=1024)
+
+    assert stored.path == dst
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    with open(dst, "rb") as fh:
+        assert fh.read() == data
+    assert os.listdir(tmp_path) == [os.path.basename(dst)]
+
+
+@pytest.mark.asyncio
+async def test_save_upload_over_limit_leaves_nothing(tmp_path) -> None:
+    dst = storage_key(str(tmp_path), "big.bin")
+    with pytest.raises(HTTPException) as exc:
+        await save_upload(_FakeUpload(b"x" * 5000), dst, max_bytes=4096, chunk_size=1024)
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_save_upload_read_error_removes_partial(tmp_path) -> None:
+    dst = storage_key(str(tmp_path), "cut.bin")
+    with pytest.raises(ConnectionResetError):
+        await save_upload(_FakeUpload(b"y" * 4096, fail_after=2048), dst, max_bytes=1 << 20, chunk_size=1024)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,71 @@
+# Руководство к файлу (TESTS/unit/test_warmup_unit.py)
+# Назначение:
+# - Unit-тесты ленивых импортов и прогрева (CONVERT/warmup.py, CONVERT/__init__.py):
+#   точка входа API не тянет тяжёлые библиотеки, роли разбираются из настройки,
+#   прогрев пропускает отсутствующие модули и не импортирует конвертеры в процесс
+#   API, когда они выполняются в процессах cpu_pool.
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from BACKEND.CONVERT import warmup as warmup_module
+from BACKEND.CONVERT.warmup import CONVERTER_MODULES, import_modules, parse_roles, warmup
+
+HEAVY = ["reportlab", "mammoth", "pdf2docx", "fitz", "docx", "selectolax", "bs4", "tldextract", "networkx", "matplotlib"]
+
+
+def test_api_entry_point_does_not_import_heavy_libraries():
+    root = Path(__file__).resolve().parents[3]
+    code = (
+        "import json, sys; import BACKEND.FAST_API.fast_api; "
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(root), str(root / "BACKEND" / "WebParser")])}
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=root, timeout=120)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
+
+
+def test_lazy_package_exports_resolve_on_access():
+    import BACKEND.CONVERT as convert
+
+    assert "run_file_conversion" in dir(convert)
+    assert convert.run_file_conversion.__module__ == "BACKEND.CONVERT.conversion_service"
+
+
+def test_parse_roles():
+    assert parse_roles("api, crawl,api") == ("api", "crawl")
+    assert parse_roles("off") == ()
+    assert parse_roles("") == ()
+    assert parse_roles("api,unknown") == ("api",)
+
+
+def test_import_modules_skips_missing():
+    timings = import_modules(["json", "vkmax_missing_module"])
+    assert list(timings) == ["json"]
+
+
+def test_convert_role_leaves_converters_to_cpu_pool(monkeypatch):
+    imported = []
+    prestarted = []
+    monkeypatch.setenv("VKMAX_CPU_POOL", "process")
+    monkeypatch.setattr(warmup_module, "import_modules", lambda modules: imported.extend(modules) or {})
+    monkeypatch.setattr(warmup_module.cpu_pool, "prestart", lambda modules: prestarted.append(modules) or 0)
+
+    warmup("api", "convert", prestart_pool=False)
+    assert not set(imported) & set(CONVERTER_MODULES)
+    assert "BACKEND.CONVERT.conversion_service" in imported
+    assert prestarted == []
+
+    warmup("convert")
+    assert prestarted == [CONVERTER_MODULES]
+
+    imported.clear()
+    monkeypatch.setenv("VKMAX_CPU_POOL", "thread")
+    warmup("convert")
+    assert imported == list(CONVERTER_MODULES)
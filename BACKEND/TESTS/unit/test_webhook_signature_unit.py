@@ -0,0 +1,44 @@
+# Руководство к файлу (TESTS/unit/test_webhook_signature_unit.py)
+# Назначение:
+# - Unit-тесты подписи вебхуков (CONVERT/webhook_dispatcher.sign_payload/verify_signature):
+#   совпадение HMAC, отказ при чужом секрете, изменённом теле и устаревшей метке;
+#   совместимость с проверкой на стороне бота и формат текста уведомления.
+
+from __future__ import annotations
+
+import time
+
+from BACKEND.BOT.SERVICES import webhook_receiver
+from BACKEND.CONVERT.webhook_dispatcher import sign_payload, verify_signature
+from BACKEND.DATABASE.CACHE_MANAGER.webhooks import matches, parse_patterns
+
+
+def test_signature_roundtrip_and_tampering() -> None:
+    body = b'{"events":[{"id":"e1"}]}'
+    now = int(time.time())
+    header = sign_payload("secret-1", body, now)
+    assert header.startswith(f"t={now},v1=")
+    assert verify_signature("secret-1", body, header, now=now)
+    assert not verify_signature("secret-2", body, header, now=now)
+    assert not verify_signature("secret-1", body + b" ", header, now=now)
+    assert not verify_signature("secret-1", body, header, now=now + 301)
+    assert not verify_signature("secret-1", body, "garbage", now=now)
+    # Бот проверяет подпись тем же алгоритмом
+    assert webhook_receiver.verify_signature("secret-1", body, sign_payload("secret-1", body, int(time.time())))
+
+
+def test_event_patterns() -> None:
+    assert parse_patterns("") == ["*"]
+    assert parse_patterns("operation.*, batch.finished") == ["operation.*", "batch.finished"]
+    assert matches(["operation.*"], "operation.completed")
+    assert not matches(["operation.*"], "batch.finished")
+
+
+def test_bot_event_text() -> None:
+    done = {"type": "operation.completed", "data": {"operation_id": 7, "status": "completed", "result_file_id": 9}}
+    assert webhook_receiver.format_event(done) == "Операция 7 готова. Файл результата: 9."
+    failed = {"type": "operation.failed", "data": {"operation_id": 8, "status": "failed", "error_message": "boom"}}
+    assert webhook_receiver.format_event(failed) == "Операция 8 завершилась ошибкой.\nПричина: boom"
+    batch = {"type": "batch.finished", "data": {"batch_id": 3, "status": "completed", "counts": {"completed": 2}}}
+    assert webhook_receiver.format_event(batch) == "Пакет 3 завершён (completed). completed: 2"
+    assert webhook_receiver.format_event({"type": "file.created", "data": {}}) is None
@@ -0,0 +1,65 @@
+# Руководство к файлу (TESTS/unit/test_webhook_transport_unit.py)
+# Назначение:
+# - Unit-тесты PublicOnlyTransport (CONVERT/webhook_dispatcher.py): запрос уходит на
+#   проверенный IP с исходными Host и SNI, внутренний адрес — BlockedAddressError,
+#   нерезолвящийся хост — ConnectError (временная ошибка), VKMAX_WEBHOOK_ALLOW_PRIVATE.
+
+from __future__ import annotations
+
+import importlib
+from typing import List
+
+import httpx
+import pytest
+
+from BACKEND.CONVERT.webhook_dispatcher import BlockedAddressError, PublicOnlyTransport, is_internal_address
+
+webhook_module = importlib.import_module("BACKEND.CONVERT.webhook_dispatcher")
+
+
+def _dns(monkeypatch, table):
+    async def _resolve(host: str, port: int) -> List[str]:
+        if host not in table:
+            raise OSError(f"unknown host {host}")
+        return table[host]
+
+    monkeypatch.setattr(webhook_module, "resolve_host", _resolve)
+
+
+def test_internal_address_rule():
+    for address in ("127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254", "::1", "fe80::1%eth0", "::ffff:127.0.0.1", "0.0.0.0"):
+        assert is_internal_address(address), address
+    assert not is_internal_address("93.184.215.14")
+    assert not is_internal_address("2606:2800:220:1:248:1893:25c8:1946")
+
+
+@pytest.mark.asyncio
+async def test_request_is_pinned_to_checked_address(monkeypatch):
+    _dns(monkeypatch, {"hook.example.com": ["93.184.215.14"]})
+    seen: List[httpx.Request] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200)
+
+    async with httpx.AsyncClient(transport=PublicOnlyTransport(httpx.MockTransport(_handler))) as client:
+        resp = await client.post("https://hook.example.com:8443/events", content=b"{}")
+    assert resp.status_code == 200
+    [request] = seen
+    assert request.url.host == "93.184.215.14" and request.url.port == 8443
+    assert request.headers["Host"] == "hook.example.com:8443"
+    assert request.extensions["sni_hostname"] == "hook.example.com"
+
+
+@pytest.mark.asyncio
+async def test_internal_and_unresolvable_hosts(monkeypatch):
+    _dns(monkeypatch, {"evil.example.com": ["93.184.215.14", "127.0.0.1"]})
+    transport = PublicOnlyTransport(httpx.MockTransport(lambda request: httpx.Response(200)))
+    async with httpx.AsyncClient(transport=transport) as client:
+        with pytest.raises(BlockedAddressError):
+            await client.post("https://evil.example.com/", content=b"{}")
+        with pytest.raises(httpx.ConnectError):
+            await client.post("https://gone.example.com/", content=b"{}")
+
+        monkeypatch.setenv("VKMAX_WEBHOOK_ALLOW_PRIVATE", "1")
+        assert (await client.post("https://evil.example.com/", content=b"{}")).status_code == 200
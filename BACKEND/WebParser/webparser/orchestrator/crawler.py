@@ -3,12 +3,15 @@
 # Этап: расширенная реализация. Поддерживает сохранение минимального HTML в режиме text_only.
 # Обновляйте комментарий при изменениях.
 # Важно: конкурентность 10 задач; по завершении слота — добор из очереди.
+# on_progress(processed, queue_size) вызывается после каждой обработанной страницы (для push-прогресса).
+# Отмена run() (таймаут/отмена задачи VKMax) останавливает все воркеры и закрывает fetcher.
+# fetch_errors — число загрузок с ошибкой (сеть/таймаут — status 0, либо HTTP >= 400).
 
 from __future__ import annotations
 
 import asyncio
 import logging
-from typing import List, Set
+from typing import Callable, List, Optional, Set
 from pathlib import Path
 
 from webparser.core.config import CrawlConfig
@@ -29,8 +32,9 @@ from webparser.utils.url import normalize_url, same_registrable_domain, url_to_c
 class CrawlerOrchestrator:
     """Оркестратор обхода и построения графа ссылок."""
 
-    def __init__(self, cfg: CrawlConfig) -> None:
+    def __init__(self, cfg: CrawlConfig, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
         self.cfg = cfg
+        self.on_progress = on_progress
         self.log = logging.getLogger(__name__)
         self.frontier = Frontier()
         self.dedup = Deduplicator(use_bloom=False)
@@ -42,6 +46,7 @@ class CrawlerOrchestrator:
         self.allowed_domains: Set[str] = set()
         # счётчик обработанных страниц и событие остановки
         self._processed = 0
+        self.fetch_errors = 0
         self._stop_event = asyncio.Event()
         self._cnt_lock = asyncio.Lock()
 
@@ -89,6 +94,8 @@ class CrawlerOrchestrator:
             # лимиты
             async with self.limiter.slot(task.url):
                 res = await self.fetcher.fetch(task.url)
+            if res.status == 0 or res.status >= 400:
+                self.fetch_errors += 1
 
             # дедуп по финальному url (с нормализацией)
             final_raw = res.final_url or task.url
@@ -157,6 +164,11 @@ class CrawlerOrchestrator:
                 # Простое информирование о прогрессе: каждые 50 страниц
                 if self._processed == 1 or self._processed % 50 == 0:
                     self.log.info("progress: processed=%d queue=%d", self._processed, self.frontier.size())
+                if self.on_progress is not None:
+                    try:
+                        self.on_progress(self._processed, self.frontier.size())
+                    except Exception as e:
+                        self.log.debug(f"on_progress-failed err={e}")
                 if self._processed >= self.cfg.max_pages:
                     self.log.info("stop: reached max_pages=%d", self.cfg.max_pages)
                     self._stop_event.set()
@@ -166,7 +178,13 @@ class CrawlerOrchestrator:
         # старт компонентов
         await self._init_allowed_domains()
         await self.fetcher.start()
+        try:
+            return await self._crawl()
+        finally:
+            # При отмене/таймауте задачи клиент HTTP закрывается так же, как при успехе
+            await self.fetcher.stop()
 
+    async def _crawl(self) -> GraphStore:
         # начальные задачи (нормализованные seeds)
         for s in self.cfg.seeds:
             norm = normalize_url(
@@ -185,7 +203,12 @@ class CrawlerOrchestrator:
         workers = [asyncio.create_task(self._worker(i)) for i in range(self.cfg.concurrency)]
 
         # ожидание завершения очереди или пока не достигнем лимита
-        await asyncio.gather(*workers)
-
-        await self.fetcher.stop()
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Отмена run() или сбой воркера: останавливаем остальных, не оставляя фоновых задач
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
         return self.graph